@@ -11,14 +11,35 @@
 ####################################################################################################
 ####################################################################################################
 
-from apsw import Connection
-from time import sleep
+import re
+from apsw import BusyError
+from itertools import chain, islice
+from os import stat
+from time import sleep, time
+from pool import ConnectionPool, POOL_SIZE, BUSY_TIMEOUT
+from timing import timed, QUERY
 
 ####################################################################################################
 # Globals ##########################################################################################
 ####################################################################################################
 ####################################################################################################
 
+STATEMENT_CACHE_SIZE = 256
+BULK_INSERT_BATCH_SIZE = 5000
+WAIT_MIN_INTERVAL = 0.05        # seconds between first checks for database changes while waiting
+WAIT_MAX_INTERVAL = 1.0         # seconds between checks for database changes (after backing off)
+WAIT_RECHECK_INTERVAL = 15      # seconds between checks of a wait condition when nothing changed
+
+# literal values (quoted strings and numbers) interpolated into SQL statements
+SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\"[^\"]*\"|\b\d+(?:\.\d+)?\b")
+
+
+def return_parameterized_statement(statement):
+    """ Return a SQL statement with its literal values replaced by ? placeholders (e.g., to
+    time interpolated statements by the statement they would be if parameterized).
+    """
+
+    return SQL_LITERAL.sub('?', statement)
 
 
 ####################################################################################################
@@ -30,26 +51,38 @@ from time import sleep
 class Charon():
     """ API Library for interacting with a SQLite database. """
 
-    def __init__(self, db_path, logger):
+    def __init__(self, db_path, logger, statement_cache_size=STATEMENT_CACHE_SIZE,
+                 pool_size=POOL_SIZE, busy_timeout=BUSY_TIMEOUT, wal=False):
         """
         INPUT
             db_path: The file path to the database.
             logger: An initialized instance of a logging class to use.
+            statement_cache_size: the number of compiled statements cached per connection.
+            pool_size: the maximum number of connections (one per thread) open at once.
+            busy_timeout: milliseconds to wait on a locked database before failing a statement.
+            wal: whether to turn on write-ahead logging when connecting (this converts the database
+                file, so only for databases Tartaros owns, not e.g. the ViM database).
         """
 
         # define default attributes
         self.db_path = db_path
         self.connection = None
         self.handles = []
+        self.waits = []
 
         # instantiate logger
         self.log = logger
 
+        # define connection pool (connections are opened per thread, on demand)
+        self.pool = ConnectionPool(self.db_path, self.log, size=pool_size,
+                                   busy_timeout=busy_timeout,
+                                   statement_cache_size=statement_cache_size, wal=wal)
+
         self.module_name = self.__class__.__name__
         self.log.info("Initializing %s module ..." % self.module_name)
 
     def connect_to_database(self):
-        """ Connect to the database.
+        """ Connect to the database (checking out a connection for the calling thread).
         """
 
         self.log.debug("Connecting to database %s ..." % self.db_path)
@@ -58,7 +91,7 @@ class Charon():
         # define connection
         if self.connection is None:
             try:
-                self.connection = Connection(self.db_path)
+                self.connection = self.pool.checkout()
                 result['successful'] = True
             except BaseException, e:
                 self.log.error("Failed to connect to database.")
@@ -69,33 +102,46 @@ class Charon():
         # return
         return result
 
+    def return_connection(self):
+        """ Return the connection of the calling thread (checked out from the pool on first use).
+        """
+
+        return self.pool.checkout()
+
+    def release_connection(self):
+        """ Return the connection of the calling thread to the pool (e.g., when a thread is done
+        with the database).
+        """
+
+        if self.connection is not None and self.connection is self.pool.return_thread_connection():
+            self.connection = None
+        self.pool.release()
+
+    def return_pool_metrics(self):
+        """ Return connection pool metrics (see ConnectionPool.return_metrics).
+        """
+
+        return self.pool.return_metrics()
+
     def create_database_handle(self):
-        """ Create a new database handle.
+        """ Create a new database handle (on the connection of the calling thread).
         """
 
         self.log.debug("Creating new database handle ...")
         result = {'successful': False, 'handle': None}
 
         # define handle (database cursor)
-        if self.connection is not None:
-            try:
-                handle = self.connection.cursor()
-                result['successful'] = True
+        try:
+            handle = self.return_connection().cursor()
+            result['successful'] = True
 
-                # add handle to list of active handles
-                self.handles.append(handle)
-            except BaseException, e:
-                self.log.error("Failed to create handle.")
-                self.log.error(str(e))
-                handle = None
-        else:
-            self.log.warn("Failed to create handle. No connection to database established.")
+            # add handle to list of active handles
+            self.handles.append(handle)
+        except BaseException, e:
+            self.log.error("Failed to create handle.")
+            self.log.error(str(e))
             handle = None
 
-        # turn on pragma foreign_keys (keeps entries without required data from being entered)
-        if handle is not None:
-            handle.execute("pragma foreign_keys=on")
-
         # return
         result['handle'] = handle
         return result
@@ -132,22 +178,16 @@ class Charon():
         self.log.debug("Disconnecting from database %s ..." % self.db_path)
         result = {'successful': False}
 
-        # disconnect from database
-        if self.connection is not None:
+        # disconnect from database (including connections checked out by other threads)
+        if self.connection is not None or self.pool.open_connections:
             # close all active handles
-            try:
-                for handle in self.handles:
-                    del handle
-                    #self.handles.remove(handle)
-
-            except BaseException, e:
-                self.log.error("Failed to close all active handles to database.")
-                self.log.error(str(e))
+            self.handles = []
 
-            # close connection
+            # close connections
             try:
-                self.connection.close()
+                self.pool.close()
                 self.connection = None
+                result['successful'] = True
 
             except BaseException, e:
                 self.log.error("Failed to disconnect from database.")
@@ -158,7 +198,236 @@ class Charon():
         # return
         return result
 
-    def execute_SQL(self, handle, statement, return_id=False, return_ex='', max_attempts=5):
+    def return_cursor(self, handle=None):
+        """ Return the given handle, or the default handle of the calling thread if none is given
+        (or if the handle given belongs to the connection of another thread).
+        @param handle: an active handle to the database (optional).
+        @return: an active handle (cursor) to the database.
+        """
+
+        if handle is not None and handle.getconnection() is self.pool.checkout():
+            return handle
+
+        return self.pool.return_cursor()
+
+    def execute(self, sql, params=None, handle=None):
+        """ Execute a parameterized SQL statement.
+        Values are bound to placeholders rather than interpolated into the statement, so the
+        statement text stays constant and its compiled form is reused from the statement cache of
+        the connection. A locked database is retried by SQLite for the busy timeout of the pool.
+        @param sql: the SQL statement, using ? (or :name) placeholders for values.
+        @param params: a sequence (or dict) of values to bind to the placeholders.
+        @param handle: an active handle to the database (default handle if None).
+        @return: the handle executing the statement (iterable over any rows returned).
+        """
+
+        self.log.trace("Executing SQL %s with %s ..." % (sql, params))
+        handle = self.return_cursor(handle)
+
+        try:
+            with timed(QUERY, sql):
+                if params is None:
+                    return handle.execute(sql)
+                return handle.execute(sql, params)
+        except BusyError, e:
+            self.log.error("Failed to execute SQL. Database remained locked for %d ms."
+                           % self.pool.busy_timeout)
+            self.log.error(str(e))
+            raise
+        except BaseException, e:
+            self.log.error("Failed to execute SQL.")
+            self.log.error(str(e))
+            raise
+
+    def executemany(self, sql, params, handle=None):
+        """ Execute a parameterized SQL statement once for each set of values given.
+        @param sql: the SQL statement, using ? (or :name) placeholders for values.
+        @param params: an iterable of sequences (or dicts) of values to bind.
+        @param handle: an active handle to the database (default handle if None).
+        @return: the handle executing the statement.
+        """
+
+        self.log.trace("Executing SQL %s for multiple values ..." % sql)
+        handle = self.return_cursor(handle)
+
+        try:
+            with timed(QUERY, sql):
+                return handle.executemany(sql, params)
+        except BaseException, e:
+            self.log.error("Failed to execute SQL.")
+            self.log.error(str(e))
+            raise
+
+    def query_all(self, sql, params=None, handle=None):
+        """ Return all rows for a parameterized SQL query.
+        @return: a list of row tuples.
+        """
+
+        return list(self.execute(sql, params, handle))
+
+    def query_one(self, sql, params=None, handle=None):
+        """ Return the first row for a parameterized SQL query.
+        @return: a row tuple, or None if no rows were returned.
+        """
+
+        for row in self.execute(sql, params, handle):
+            return row
+        return None
+
+    def query_iter(self, sql, params=None):
+        """ Yield the rows for a parameterized SQL query as they are stepped from the database.
+        A dedicated handle is used, so other queries may be executed while iterating.
+        @return: a generator of row tuples.
+        """
+
+        handle = self.return_connection().cursor()
+        for row in self.execute(sql, params, handle):
+            yield row
+
+    def query_value(self, sql, params=None, handle=None):
+        """ Return the first value of the first row for a parameterized SQL query.
+        @return: the value, or None if no rows were returned.
+        """
+
+        row = self.query_one(sql, params, handle)
+        if row is None:
+            return None
+        return row[0]
+
+    def return_last_insert_id(self):
+        """ Return the row id of the last entry inserted over the connection.
+        """
+
+        return self.return_connection().last_insert_rowid()
+
+    def return_change_signature(self):
+        """ Return a signature of the current state of the database, which changes whenever
+        another connection (or process) commits changes to it.
+        @return: a tuple of the database data version and the modification times and sizes of
+            the database files.
+        """
+
+        # (queried on the calling thread's connection directly, as it is polled while waiting)
+        try:
+            data_version = self.return_cursor().execute("pragma data_version").next()[0]
+        except BaseException:
+            data_version = None
+
+        files = []
+        for file_path in (self.db_path, self.db_path + '-wal'):
+            try:
+                info = stat(file_path)
+                files.append((info.st_mtime, info.st_size))
+            except OSError:
+                files.append(None)
+
+        return tuple([data_version] + files)
+
+    def wait_for(self, predicate, timeout, description=None, min_interval=WAIT_MIN_INTERVAL,
+                 max_interval=WAIT_MAX_INTERVAL, recheck_interval=WAIT_RECHECK_INTERVAL):
+        """ Wait for a condition on the database to be met. The condition is checked as soon as
+        a change to the database is detected (checking for changes with adaptive backoff), and at
+        least every recheck interval otherwise.
+        @param predicate: a function returning a value that evaluates True once the condition is
+            met (e.g., the id of an expected entry).
+        @param timeout: how long (s) to wait for the condition to be met.
+        @param description: a description of the condition (for logging and metrics).
+        @param min_interval: the initial seconds between checks for database changes.
+        @param max_interval: the maximum seconds between checks for database changes.
+        @param recheck_interval: the seconds between checks of the condition when no changes
+            are detected.
+        @return: a dict containing:
+            value: the last value returned by the predicate.
+            met: whether the condition was met or not.
+            wait time: how long (s) was waited for the condition.
+        """
+
+        if description is None:
+            description = getattr(predicate, '__name__', 'condition')
+        self.log.trace("Waiting up to %s seconds for %s ..." % (timeout, description))
+        result = {'value': None, 'met': False, 'wait time': 0.0}
+
+        t0 = time()
+        checks = 0
+        interval = min_interval
+        signature = self.return_change_signature()
+        while True:
+            # check condition
+            checks += 1
+            result['value'] = predicate()
+            checked = time()
+            if result['value']:
+                result['met'] = True
+                break
+
+            # wait for a change to the database (or the recheck interval)
+            while True:
+                if time() - t0 >= timeout:
+                    break
+                sleep(min(interval, max(0, timeout - (time() - t0))))
+                latest = self.return_change_signature()
+                if latest != signature:
+                    signature = latest
+                    interval = min_interval
+                    break
+                if time() - checked >= recheck_interval:
+                    break
+                interval = min(interval * 2, max_interval)
+
+            if time() - t0 >= timeout:
+                # check condition a last time
+                checks += 1
+                result['value'] = predicate()
+                result['met'] = bool(result['value'])
+                break
+
+        result['wait time'] = time() - t0
+        self.waits.append({'description': description, 'met': result['met'],
+                           'wait time': result['wait time'], 'checks': checks})
+        if result['met']:
+            self.log.trace("Waited %.2f seconds for %s (%d checks)."
+                           % (result['wait time'], description, checks))
+        else:
+            self.log.trace("Timed out after %.2f seconds waiting for %s (%d checks)."
+                           % (result['wait time'], description, checks))
+
+        # return
+        return result
+
+    def return_wait_metrics(self):
+        """ Return metrics for the waits made on the database (see wait_for).
+        @return: a dict containing:
+            waits: the number of waits.
+            met: the number of waits for which the condition was met.
+            timed out: the number of waits that timed out.
+            wait time: the total seconds spent waiting.
+            max wait time: the longest wait (seconds).
+            history: the list of individual waits (description, met, wait time, checks).
+        """
+
+        waits = list(self.waits)
+        return {
+            'waits':            len(waits),
+            'met':              len([wait for wait in waits if wait['met']]),
+            'timed out':        len([wait for wait in waits if not wait['met']]),
+            'wait time':        sum([wait['wait time'] for wait in waits]),
+            'max wait time':    max([wait['wait time'] for wait in waits] or [0.0]),
+            'history':          waits,
+        }
+
+    def translate_value_for_binding(self, value):
+        """ Translate a value to bind the way the statement string builders quote values.
+        'NULL' (or None) is bound as NULL; anything else is bound as text.
+        """
+
+        if value is None or value == 'NULL':
+            return None
+        elif isinstance(value, basestring):
+            return value
+        else:
+            return str(value)
+
+    def execute_SQL(self, handle, statement, return_id=False, return_ex=''):
         """ Execute the given SQL statement.
         @param handle: an active handle to the database.
         @param statement: a line of SQL code to execute.
@@ -171,35 +440,33 @@ class Charon():
         result = {'response': None, 'id': None}
 
         response = None
-        while response is None:
-            try:
-                # execute SQL
-                statement = statement.replace('"NULL"', 'NULL').replace("'NULL'", 'NULL')
-                statement += ';'
+        try:
+            # execute SQL (a locked database is retried by SQLite for the busy timeout)
+            statement = statement.replace('"NULL"', 'NULL').replace("'NULL'", 'NULL')
+            statement += ';'
+            handle = self.return_cursor(handle)
+            with timed(QUERY, return_parameterized_statement(statement)):
                 response = handle.execute(statement) # system-wide crash caused when using 3.8.1.2
-                # return row id
-                if return_id:
-                    statement = "SELECT last_insert_rowid() " + return_ex + ";"
-                    self.log.trace("Executing:\t%s" % statement)
-                    result['id'] = handle.execute(statement).next()[0]
-                    self.log.trace("Returned ID:\t%s" % result['id'])
-            except BaseException, e:
-                self.log.error("Failed to execute SQL.")
-                self.log.error(str(e))
-                if str(e) == 'BusyError: database is locked':
-                    sleep(1)
-                    continue
-                else:
-                    response = None
-                    sleep(1)
-                    break
+            # return row id
+            if return_id:
+                statement = "SELECT last_insert_rowid() " + return_ex + ";"
+                self.log.trace("Executing:\t%s" % statement)
+                result['id'] = handle.execute(statement).next()[0]
+                self.log.trace("Returned ID:\t%s" % result['id'])
+        except BaseException, e:
+            self.log.error("Failed to execute SQL.")
+            self.log.error(str(e))
+            response = None
 
         # return
         result['response'] = response
         return result
 
-    def query_database_table(self, handle, table, return_field=None, addendum='', max=False):
-        """ Query a database table. """
+    def query_database_table(self, handle, table, return_field=None, addendum='', max=False,
+                             params=None):
+        """ Query a database table.
+        @param params: values to bind to any ? placeholders in the addendum.
+        """
 
         self.log.debug("Querying database table %s ..." % table)
         result = {'response': [[None]]}
@@ -221,10 +488,7 @@ class Charon():
 
         # execute query and fetch all results
         try:
-            response = self.execute_SQL(handle, query)['response'].fetchall()
-            if response is []: response = [[None]]
-            # convert response to list
-            response = list(response)
+            response = self.query_all(query, params, handle)
         except BaseException, e:
             self.log.error("Failed to query database table.")
             self.log.error(str(e))
@@ -244,9 +508,12 @@ class Charon():
                                                                  known_value))
         result = {'value':None}
 
-        # query database table
+        # query database table (binding the known value keeps the statement text constant)
+        #   (a NULL known value is matched with IS, as = never matches NULL)
+        value = self.translate_value_for_binding(known_value)
+        operator = 'IS' if value is None else '='
         response = self.query_database_table(handle, table, return_field,
-            'WHERE %s = "%s"' % (known_field, known_value) + addendum, max)['response']
+            'WHERE %s %s ?' % (known_field, operator) + addendum, max, params=(value,))['response']
 
         # get value from response
         try:
@@ -272,15 +539,14 @@ class Charon():
         # create fields to update list
         fields = list(entry.keys())
         # create values to update list
-        values = list(entry.values())
+        values = [self.translate_value_for_binding(value) for value in entry.values()]
 
         # create SQL statement to execute
-        template = "UPDATE %s SET %s = '%s' WHERE %s = %s"
-        for n in range(0, len(fields)):
-            # build statement
-            sql = template % (str(table), str(fields[n]), str(values[n]), id_field, str(id))
+        if len(fields) > 0:
+            assignments = ', '.join(['%s = ?' % field for field in fields])
+            sql = "UPDATE %s SET %s WHERE %s = ?" % (table, assignments, id_field)
             # execute SQL statement
-            self.execute_SQL(handle, sql)
+            self.execute(sql, values + [id], handle)
 
         # return
         return result
@@ -298,60 +564,100 @@ class Charon():
         self.log.debug("Adding entry %s to %s table ..." % (entry, table))
         result = {'id': None}
 
-        # build insert fields statement by adding each key, comma-delimited
+        # build insert fields and values sub-statements
         fields = list(entry.keys())
-        insert_fields = None
-        # add first field (if any)
-        if len(fields) > 0:
-            insert_fields = '"%s"' % fields[0]
-        else:
+        if len(fields) == 0:
             self.log.error("No fields specified. Cannot add entry.")
-            # add additional fields (if any)
-        if insert_fields is not None\
-        and len(fields) > 1:
-            for field in fields[1:]:
-                insert_fields += ',"%s"' % field
-            # update final sub-statement to proper format
-        if insert_fields is not None:
-            insert_fields = '(%s)' % insert_fields
-
-        # build insert field values sub-statement by adding each value, comma-delimited
-        values = list(entry.values())
-        insert_values = None
-        # add first value (if any)
-        if len(values) > 0:
-            insert_values = '"%s"'%values[0]
-            if values[0] is None:
-                value = 'NULL'
-            elif 'strftime' in str(values[0]).lower():
-                value = values[0]
+            return result
+
+        placeholders = []
+        values = []
+        for value in entry.values():
+            # strftime() expressions are evaluated by SQLite, so pass them through as-is
+            if 'strftime' in str(value).lower():
+                placeholders.append(str(value))
             else:
-                value = '"%s"' % values[0]
-            insert_values = "%s" % value
-        else:
-            self.log.error("No fields specified. Cannot insert entry.")
-            # add additional values (if any)
-        if insert_values is not None\
-        and len(values) > 1:
-            for value in values[1:]:
-                # translate misc value types
-                if value is None:
-                    value = 'NULL'
-                elif 'strftime' in str(value).lower():
-                    value = value
-                else:
-                    value = '"%s"' % value
-                insert_values += ",%s" % value
-            # update final sub-statement to proper format
-        if insert_values is not None:
-            insert_values = 'VALUES (%s)' % insert_values
+                placeholders.append('?')
+                values.append(self.translate_value_for_binding(value))
 
         # collate SQL statement and execute
-        statement = 'INSERT INTO %s %s %s' % (table, insert_fields, insert_values)
-        entryID = self.execute_SQL(handle, statement, return_id=True)['id']
+        statement = 'INSERT INTO %s (%s) VALUES (%s)' % (
+            table, ','.join(['"%s"' % field for field in fields]), ','.join(placeholders))
+        try:
+            self.execute(statement, values, handle)
+            result['id'] = self.return_last_insert_id()
+            self.log.trace("Returned ID:\t%s" % result['id'])
+        except BaseException, e:
+            self.log.error("Failed to add entry to %s table." % table)
+            self.log.error(str(e))
+
+        # return
+        return result
+
+    def bulk_insert(self, table, rows, batch_size=BULK_INSERT_BATCH_SIZE, fields=None,
+                    handle=None):
+        """ Add entries to given table in database in batches (one transaction per batch).
+        INPUT
+            table: the table to add entries to (see maps).
+            rows: an iterable (or generator) of data dictionaries pairing table fields with entry
+                values (or of value sequences, ordered as given fields).
+            batch size: the number of entries to add per transaction.
+            fields: the table fields of the entries (leave None to use those of the first entry).
+            handle: an active handle to the database (default handle if None).
+        OUTPUT
+            successful: whether the function executed successfully or not.
+            number of rows: the number of entries added to the database table.
+        """
+
+        self.log.debug("Adding entries to %s table in batches of %d ..." % (table, batch_size))
+        result = {'successful': False, 'number of rows': 0}
+
+        rows = iter(rows)
+        try:
+            first = rows.next()
+        except StopIteration:
+            self.log.trace("No entries to add.")
+            result['successful'] = True
+            return result
+        rows = chain([first], rows)
+
+        # build insert statement (from given fields or those of the first entry)
+        if fields is None:
+            fields = list(first.keys())
+        fields = list(fields)
+        statement = 'INSERT INTO %s (%s) VALUES (%s)' % (
+            table, ','.join(['"%s"' % field for field in fields]), ','.join(['?'] * len(fields)))
+
+        def values(batch):
+            for row in batch:
+                if isinstance(row, dict):
+                    row = [row[field] for field in fields]
+                yield [self.translate_value_for_binding(value) for value in row]
+
+        handle = self.return_cursor(handle)
+        try:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                handle.execute("BEGIN IMMEDIATE")
+                try:
+                    with timed(QUERY, statement):
+                        handle.executemany(statement, values(batch))
+                    handle.execute("COMMIT")
+                except BaseException:
+                    handle.execute("ROLLBACK")
+                    raise
+                result['number of rows'] += len(batch)
+                self.log.trace("Added %d entries to %s table." % (result['number of rows'], table))
+
+            result['successful'] = True
+        except BaseException, e:
+            self.log.error("Failed to add entries to %s table (%d added)."
+                           % (table, result['number of rows']))
+            self.log.error(str(e))
 
         # return
-        result['id'] = entryID
         return result
 
     def update_table_field_for_entry(self, handle, table, field, value, knownField, knownValue,
@@ -368,16 +674,22 @@ class Charon():
 
         # define statement
         if math:
-            statement = '''UPDATE %(table)s SET %(field)s = %(value)s '''\
-                        % {'table': table, 'field': field, 'value': value}
+            statement = "UPDATE %(table)s SET %(field)s = %(value)s WHERE %(known field)s = ?"\
+                        % {'table': table, 'field': field, 'value': value,
+                           'known field': knownField}
+            params = [self.translate_value_for_binding(knownValue)]
         else:
-            statement = '''UPDATE %(table)s SET %(field)s = '%(value)s' '''\
-                        % {'table': table, 'field': field, 'value': value}
-        statement += '''WHERE %(known field)s = '%(known value)s' '''\
-                     % {'known field': knownField, 'known value': knownValue}
+            statement = "UPDATE %(table)s SET %(field)s = ? WHERE %(known field)s = ?"\
+                        % {'table': table, 'field': field, 'known field': knownField}
+            params = [self.translate_value_for_binding(value),
+                      self.translate_value_for_binding(knownValue)]
 
         # update database table
-        self.execute_SQL(handle, statement)
+        try:
+            self.execute(statement, params, handle)
+        except BaseException, e:
+            self.log.error("Failed to update %s table." % table)
+            self.log.error(str(e))
 
         # return
         return result
@@ -401,12 +713,16 @@ class Charon():
         result = {}
 
         # delete entries from table
-        statement = "DELETE FROM %s WHERE %s = %s"%(table, knownField.lower(), value)
-        self.execute_SQL(handle, statement)
+        statement = "DELETE FROM %s WHERE %s = ?" % (table, knownField.lower())
+        try:
+            self.execute(statement, (value,), handle)
+        except BaseException, e:
+            self.log.error("Failed to remove entries from %s table." % table)
+            self.log.error(str(e))
         # return
         return result
 
-    def return_number_of_rows(self, handle, table, addendum=''):
+    def return_number_of_rows(self, handle, table, addendum='', params=None):
         """ Return the number of rows from a database table. """
 
         self.log.debug("Returning number of rows from %s table ..." % table)
@@ -415,7 +731,7 @@ class Charon():
         # execute SQL statment
         statement = 'SELECT COUNT(*) FROM %s' % table
         statement += addendum
-        result['number of rows'] = self.execute_SQL(handle, statement).next()[0]
+        result['number of rows'] = self.query_one(statement, params, handle)[0]
 
         # return
         return result
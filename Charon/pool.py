@@ -0,0 +1,239 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+from apsw import Connection
+from threading import Lock, local, current_thread
+from Queue import Queue, Empty
+from time import time
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+POOL_SIZE = 16
+BUSY_TIMEOUT = 30000            # milliseconds SQLite retries a locked database before failing
+CHECKOUT_TIMEOUT = 60           # seconds a thread waits for a connection before failing
+RECLAIM_INTERVAL = 0.1          # seconds between checks for connections of finished threads
+
+####################################################################################################
+# Connection Pool ##################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class ConnectionPool():
+    """ Thread-aware pool of connections to a SQLite database. Each thread checks out (and keeps)
+    its own connection on first use, so threads never share a connection or its handles.
+    """
+
+    def __init__(self, db_path, logger, size=POOL_SIZE, busy_timeout=BUSY_TIMEOUT,
+                 statement_cache_size=100, wal=False, checkout_timeout=CHECKOUT_TIMEOUT):
+        """
+        INPUT
+            db_path: The file path to the database.
+            logger: An initialized instance of a logging class to use.
+            size: the maximum number of connections open at once.
+            busy timeout: milliseconds to wait on a locked database before failing a statement.
+            statement cache size: the number of compiled statements cached per connection.
+            wal: whether to turn on write-ahead logging when connecting (readers and the writer
+                no longer block each other).
+            checkout timeout: seconds to wait for a connection when all are checked out.
+        """
+
+        # define default attributes
+        self.db_path = db_path
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self.statement_cache_size = statement_cache_size
+        self.wal = wal
+        self.checkout_timeout = checkout_timeout
+
+        # connection tracking
+        self.lock = Lock()
+        self.idle = Queue()
+        self.owners = {}
+        self.threads = local()
+        self.open_connections = 0
+
+        # metrics
+        self.metrics = {
+            'connections':      0,
+            'checkouts':        0,
+            'releases':         0,
+            'reclaims':         0,
+            'waits':            0,
+            'wait time':        0.0,
+            'max wait time':    0.0,
+        }
+
+        # instantiate logger
+        self.log = logger
+
+    def open_connection(self):
+        """ Open a new connection to the database (configured for pooled use).
+        """
+
+        self.log.debug("Opening connection to database %s ..." % self.db_path)
+
+        connection = Connection(self.db_path, statementcachesize=self.statement_cache_size)
+        connection.setbusytimeout(self.busy_timeout)
+
+        handle = connection.cursor()
+        # turn on pragma foreign_keys (keeps entries without required data from being entered)
+        handle.execute("pragma foreign_keys=on")
+        if self.wal:
+            try:
+                handle.execute("pragma journal_mode=wal")
+            except BaseException, e:
+                self.log.warn("Failed to turn on write-ahead logging for %s." % self.db_path)
+                self.log.warn(str(e))
+
+        self.metrics['connections'] += 1
+        return connection
+
+    def reclaim_connections(self):
+        """ Return the connections of threads that have finished to the pool.
+        Must be called holding the pool lock.
+        """
+
+        for connection, thread in self.owners.items():
+            if not thread.is_alive():
+                self.log.trace("Reclaiming connection of finished thread %s." % thread.name)
+                del self.owners[connection]
+                self.idle.put(connection)
+                self.metrics['reclaims'] += 1
+
+    def return_thread_connection(self):
+        """ Return the connection checked out by the calling thread (None if none, without
+        checking one out).
+        """
+
+        return getattr(self.threads, 'connection', None)
+
+    def checkout(self):
+        """ Return the connection of the calling thread, checking one out of the pool on first use.
+        """
+
+        connection = self.return_thread_connection()
+        if connection is not None:
+            return connection
+
+        t0 = time()
+        with self.lock:
+            try:
+                connection = self.idle.get_nowait()
+            except Empty:
+                if self.open_connections < self.size:
+                    connection = self.open_connection()
+                    self.open_connections += 1
+                else:
+                    self.reclaim_connections()
+                    try: connection = self.idle.get_nowait()
+                    except Empty: connection = None
+
+        # wait for a connection to be released (or for a thread holding one to finish)
+        if connection is None:
+            self.log.trace("All %d connections checked out. Waiting ..." % self.size)
+            while connection is None:
+                try:
+                    connection = self.idle.get(timeout=RECLAIM_INTERVAL)
+                except Empty:
+                    if time() - t0 > self.checkout_timeout:
+                        raise RuntimeError("Timed out waiting for a connection to %s."
+                                           % self.db_path)
+                    with self.lock:
+                        self.reclaim_connections()
+            waited = True
+        else:
+            waited = False
+
+        with self.lock:
+            self.owners[connection] = current_thread()
+            self.metrics['checkouts'] += 1
+            if waited:
+                wait_time = time() - t0
+                self.metrics['waits'] += 1
+                self.metrics['wait time'] += wait_time
+                self.metrics['max wait time'] = max(self.metrics['max wait time'], wait_time)
+        self.threads.connection = connection
+        self.threads.handle = None
+
+        return connection
+
+    def return_cursor(self):
+        """ Return the default handle (cursor) of the calling thread's connection.
+        """
+
+        connection = self.checkout()
+        if self.threads.handle is None:
+            self.threads.handle = connection.cursor()
+        return self.threads.handle
+
+    def release(self):
+        """ Return the connection of the calling thread to the pool.
+        """
+
+        connection = self.return_thread_connection()
+        if connection is None:
+            return
+
+        with self.lock:
+            self.owners.pop(connection, None)
+            self.metrics['releases'] += 1
+        self.threads.connection = None
+        self.threads.handle = None
+        self.idle.put(connection)
+
+    def close(self):
+        """ Close all connections (idle and checked out).
+        """
+
+        self.log.debug("Closing all connections to database %s ..." % self.db_path)
+
+        with self.lock:
+            connections = self.owners.keys()
+            self.owners = {}
+            self.open_connections = 0
+            while True:
+                try: connections.append(self.idle.get_nowait())
+                except Empty: break
+
+        for connection in connections:
+            try:
+                connection.close()
+            except BaseException, e:
+                self.log.error("Failed to close connection.")
+                self.log.error(str(e))
+
+        self.threads = local()
+
+    def return_metrics(self):
+        """ Return pool metrics.
+        OUTPUT
+            connections: the number of connections opened.
+            checkouts: the number of connections checked out by threads.
+            releases: the number of connections released by threads.
+            reclaims: the number of connections reclaimed from finished threads.
+            waits: the number of checkouts that waited for a connection.
+            wait time: the total seconds spent waiting for connections.
+            max wait time: the longest wait for a connection (seconds).
+            in use: the number of connections currently checked out.
+            idle: the number of connections currently idle.
+        """
+
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics['in use'] = len(self.owners)
+            metrics['idle'] = self.idle.qsize()
+        return metrics
@@ -17,6 +17,7 @@ from os import getcwdu, path, mkdir
 from datetime import datetime
 from time import sleep
 from utc import UTC
+from diagnostics import ConnectionDiagnostics
 
 ####################################################################################################
 # Globals ##########################################################################################
@@ -57,6 +58,7 @@ class Danaides():
         self.vim_connection_lapse_max = 600
         self.vim_connection_diagnostic_start_time = None
         self.vim_connection_diagnostic_end_time = None
+        self.connection_diagnostics = None
 
         # load configuration
         self.load_config()
@@ -195,12 +197,17 @@ class Danaides():
         # return
         return result
 
-    def compile_vim_connection_diagnostics(self, start_time=None, end_time=None, dir=None):
-        """ Compile connection diagnostics for ViM.
+    def compile_vim_connection_diagnostics(self, start_time=None, end_time=None, dir=None,
+                                           keep_timestamps=True):
+        """ Compile connection diagnostics for ViM. The connection log is processed in a single
+        pass; compiling the same diagnostics again only processes connections logged since (see
+        diagnostics.ConnectionDiagnostics).
         INPUT
             start time: optional start time for which to collect diagnostics (in db time format).
             end time: optional end time for which to collect diagnostics (in db time format).
             dir: the folder path containing the VIM.db file.
+            keep timestamps: whether to include every connection (and time between connections)
+                of each site in the diagnostics or not.
         OUPUT
             successful: whether the function executed successfully or not.
             diagnostics: a data dictionary including all diagnostic information (per site).
@@ -225,122 +232,27 @@ class Danaides():
             else:
                 hestia = Hestia(self.log, self.database)
             hestia.db.connect_to_database()
-            hestia.db.db_handle = hestia.db.create_database_handle()['handle']
-
-            self.log.trace("Building data dictionary to track connection data per site ...")
-
-            # query database for sites
-            handle = hestia.db.db_handle
-            table = "RemoteSites"
-            response = hestia.db.query_database_table(handle, table)['response']
-
-            # build data dictionary to track connection data per site
-            connection_data = {}
-            for entry in response:
-                connection_data[str(entry[0])] = {
-                    'name': str(entry[4]),
-                    'timestamps':   [],
-                    'times between connections':    [],
-                    'connection frequency': 0,
-                    'total number of connections':  0,
-                    'long re-connect periods': [],
-                }
-
-            # query database for connection timestamps
-            table = "ConnectionLog"
-            if start_time is not None and end_time is not None:
-                addendum = 'WHERE csTimeStamp > %s and csTimeStamp < %s' % (start_time, end_time)
-            elif start_time is not None and end_time is None:
-                addendum = 'WHERE csTimeStamp > %s' % start_time
-            elif start_time is None and end_time is not None:
-                addendum = 'WHERE csTimeStamp < %s' % end_time
-            else:
-                addendum = ''
-            response = hestia.db.query_database_table(handle, table, addendum=addendum)['response']
+
+            # continue the diagnostics compiled for the same log (and period), if any
+            key = (dir, start_time, end_time, self.vim_connection_lapse_max, keep_timestamps)
+            if self.connection_diagnostics is None or self.connection_diagnostics[0] != key:
+                self.connection_diagnostics = (key, ConnectionDiagnostics(
+                    self.log, self.vim_connection_lapse_max, start_time, end_time,
+                    keep_timestamps))
+            diagnostics = self.connection_diagnostics[1]
+
+            self.log.trace("Processing connection log from row %d ..." % diagnostics.watermark)
+            rows = diagnostics.update(hestia.db)
+            self.log.trace("... DONE processing %d connections." % rows)
 
             # determine start and end times (if none given) from connection log
             if start_time is None:
-                start_time = response[0][3]
-                self.vim_connection_diagnostic_start_time = start_time
+                self.vim_connection_diagnostic_start_time = diagnostics.first_time
             if end_time is None:
-                end_time = response[-1][3]
-                self.vim_connection_diagnostic_end_time = end_time
-
-            self.log.trace("... DONE building data dictionary to track connection data per site.")
-
-            # build list of connection timestamps from database list for each site
-            self.log.trace("Building list of connection timestamps for each site")
-            for entry in response:
-                connection_data[str(entry[0])]['timestamps'].append(entry[3])
-
-            self.log.trace("... DONE building list of connection timestamps for each site.")
-
-            # build list of time between connections for each site
-            self.log.trace("Building list of time between connections for each site ...")
-            for entry in connection_data:
-                site = connection_data[entry]
-                c_timestamp = None
-                for timestamp in site['timestamps']:
-
-                    # determine time between connections only if current (previous) timestamp set
-                    if c_timestamp is not None:
-                        time_between_connections = timestamp - c_timestamp
-                        site['times between connections'].append({
-                            'time between connections': time_between_connections,
-                            'previous connection time': c_timestamp,
-                            're-connect time': timestamp})
-
-                    # update current timestamp
-                    c_timestamp = timestamp
-
-            self.log.trace("... DONE building list of time between connections for each site.")
-                #self.log.trace("Times between Connections for %s:\t%s"
-                #               % (site['name'], site['times between connections']))
-
-            # determine connection frequency for each site
-            self.log.trace("Determining connection frequency for each site ...")
-            for entry in connection_data:
-                site = connection_data[str(entry)]
-
-                amalgamated_time_between_connections = 0
-                for time_between_connections in site['times between connections']:
-                    amalgamated_time_between_connections += \
-                        time_between_connections['time between connections']
-
-                try:
-                    site['connection frequency'] = \
-                        amalgamated_time_between_connections/len(site['times between connections'])
-                except ZeroDivisionError:
-                    site['connection frequency'] = 0
-
-            self.log.trace("... DONE determining connection frequency for each site.")
-
-            # determine total number of connections made per site
-            self.log.trace("Determining total number of connections made for each site ...")
-            for entry in connection_data:
-                site = connection_data[entry]
-
-                site['total number of connections'] = len(site['timestamps'])
-
-            self.log.trace("... DONE determining total number of connections made for each site.")
-
-            # determine any long re-connect periods for each site
-            self.log.trace("Looking for long re-connect periods for each site ...")
-            for entry in connection_data:
-                site = connection_data[str(entry)]
-
-                for connection_entry in site['times between connections']:
-                    if connection_entry['time between connections'] > self.vim_connection_lapse_max:
-                        site['long re-connect periods'].append({
-                            'previous connection time':
-                                connection_entry['previous connection time'],
-                            're-connection time': connection_entry['re-connect time'],
-                            'time between connections':
-                                connection_entry['time between connections'],
-                        })
+                self.vim_connection_diagnostic_end_time = diagnostics.last_time
 
             self.log.debug("... DONE Compiling ViM connection diagnostics.")
-            result['diagnostics'] = connection_data
+            result['diagnostics'] = diagnostics.return_diagnostics()
             result['successful'] = True
         except BaseException, e:
             self.handle_exception(e, operation="compile ViM connection diagnostics")
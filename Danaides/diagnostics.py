@@ -0,0 +1,212 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+from mapping import HESTIA
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+CONNECTION_LOG = HESTIA['database']['connection log']
+CONNECTION_LOG_TABLE = CONNECTION_LOG['table']
+CONNECTION_LOG_FIELDS = CONNECTION_LOG['fields']
+SITES_TABLE = 'RemoteSites'
+
+PERCENTILES = (50, 90, 95, 99)
+
+####################################################################################################
+# Connection Diagnostics ###########################################################################
+####################################################################################################
+####################################################################################################
+
+
+class SiteConnections():
+    """ The connections of a site, summarized as they are recorded (the times between connections
+    are counted by value, so their distribution is kept exactly without keeping every connection).
+    """
+
+    def __init__(self, name, lapse_max, keep_timestamps=True):
+        """
+        INPUT
+            name: the name of the site.
+            lapse max: the time between connections beyond which a re-connect period is long.
+            keep timestamps: whether to keep every connection (and time between connections) or
+                not.
+        """
+
+        self.name = name
+        self.lapse_max = lapse_max
+        self.connections = 0
+        self.previous = None
+        self.gaps = {}
+        self.gap_count = 0
+        self.gap_total = 0
+        self.long_periods = []
+        self.timestamps = [] if keep_timestamps else None
+        self.times_between_connections = [] if keep_timestamps else None
+
+    def record(self, timestamp):
+        """ Record a connection (in connection log order). """
+
+        self.connections += 1
+        if self.timestamps is not None:
+            self.timestamps.append(timestamp)
+
+        previous = self.previous
+        self.previous = timestamp
+        if previous is not None:
+            gap = timestamp - previous
+            gaps = self.gaps
+            gaps[gap] = gaps.get(gap, 0) + 1
+            self.gap_count += 1
+            self.gap_total += gap
+            if self.times_between_connections is not None:
+                self.times_between_connections.append({
+                    'time between connections': gap,
+                    'previous connection time': previous,
+                    're-connect time': timestamp})
+            if gap > self.lapse_max:
+                self.long_periods.append({
+                    'previous connection time': previous,
+                    're-connection time': timestamp,
+                    'time between connections': gap})
+
+    def return_percentiles(self):
+        """ Return the percentiles (and extremes) of the times between connections (None if there
+        were fewer than two connections).
+        """
+
+        if not self.gap_count:
+            return None
+
+        gaps = sorted(self.gaps)
+        percentiles = {'min': gaps[0], 'max': gaps[-1]}
+        ranks = [(max(1, int(round(self.gap_count * percentile / 100.0))), percentile)
+                 for percentile in PERCENTILES]
+        seen = 0
+        for gap in gaps:
+            seen += self.gaps[gap]
+            while ranks and seen >= ranks[0][0]:
+                percentiles['p%d' % ranks.pop(0)[1]] = gap
+        return percentiles
+
+    def return_diagnostics(self):
+        """ Return the diagnostics of the site.
+        OUTPUT
+            name: the name of the site.
+            total number of connections: the number of connections made.
+            connection frequency: the mean time between connections.
+            time between connections percentiles: see return_percentiles.
+            long re-connect periods: the periods between connections longer than lapse max.
+            timestamps, times between connections: each connection (if kept).
+        """
+
+        diagnostics = {
+            'name':                                     self.name,
+            'total number of connections':              self.connections,
+            'connection frequency':
+                self.gap_total / self.gap_count if self.gap_count else 0,
+            'time between connections percentiles':     self.return_percentiles(),
+            'long re-connect periods':                  list(self.long_periods),
+        }
+        if self.timestamps is not None:
+            diagnostics['timestamps'] = list(self.timestamps)
+            diagnostics['times between connections'] = list(self.times_between_connections)
+        return diagnostics
+
+
+class ConnectionDiagnostics():
+    """ Compiles ViM connection diagnostics (per site) from the connection log in a single pass,
+    streaming rows from the database. The last row processed is kept as a watermark, so updating
+    the diagnostics later only processes rows logged since.
+    """
+
+    def __init__(self, logger, lapse_max, start_time=None, end_time=None, keep_timestamps=True):
+        """
+        INPUT
+            logger: An initialized instance of a logging class to use.
+            lapse max: the time between connections beyond which a re-connect period is long.
+            start time: optional start time for which to collect diagnostics (in db time format).
+            end time: optional end time for which to collect diagnostics (in db time format).
+            keep timestamps: whether to keep every connection of each site or not.
+        """
+
+        # instance logger
+        self.log = logger
+
+        self.lapse_max = lapse_max
+        self.start_time = start_time
+        self.end_time = end_time
+        self.keep_timestamps = keep_timestamps
+
+        self.sites = {}
+        self.watermark = 0
+        self.first_time = None
+        self.last_time = None
+        self.rows = 0
+
+    def return_site(self, site_id, name=None):
+        site = self.sites.get(site_id)
+        if site is None:
+            site = SiteConnections(name or site_id, self.lapse_max, self.keep_timestamps)
+            self.sites[site_id] = site
+        return site
+
+    def update(self, database):
+        """ Process the connection log rows logged since the last update.
+        INPUT
+            database: the (connected) ViM database (see Charon).
+        OUTPUT
+            the number of rows processed.
+        """
+
+        # track every site (including those that never connected)
+        for entry in database.query_all("SELECT * FROM %s" % SITES_TABLE):
+            self.return_site(str(entry[0]), str(entry[4]))
+
+        # stream new connections (in log order; ids and times bound as integers, as the columns
+        #   may be untyped and an integer never compares greater than text)
+        sql = "SELECT %s, %s, %s FROM %s WHERE %s > ?" \
+              % (CONNECTION_LOG_FIELDS['id'], CONNECTION_LOG_FIELDS['site id'],
+                 CONNECTION_LOG_FIELDS['time'], CONNECTION_LOG_TABLE, CONNECTION_LOG_FIELDS['id'])
+        params = [int(self.watermark)]
+        if self.start_time is not None:
+            sql += " AND %s > ?" % CONNECTION_LOG_FIELDS['time']
+            params.append(int(self.start_time))
+        if self.end_time is not None:
+            sql += " AND %s < ?" % CONNECTION_LOG_FIELDS['time']
+            params.append(int(self.end_time))
+        sql += " ORDER BY %s" % CONNECTION_LOG_FIELDS['id']
+
+        rows = 0
+        sites = {}
+        for row_id, site_id, timestamp in database.query_iter(sql, params):
+            site = sites.get(site_id)
+            if site is None:
+                site = sites[site_id] = self.return_site(str(site_id))
+                if self.first_time is None:
+                    self.first_time = timestamp
+            site.record(timestamp)
+            rows += 1
+
+        if rows:
+            self.watermark = row_id
+            self.last_time = timestamp
+            self.rows += rows
+        return rows
+
+    def return_diagnostics(self):
+        """ Return a dict pairing each site id with its diagnostics (see SiteConnections). """
+        return dict([(site_id, site.return_diagnostics())
+                     for site_id, site in self.sites.items()])
@@ -27,6 +27,7 @@ FEATURE_FIELDS = DB['features']['fields']
 USERSTORY_FIELDS = DB['user stories']['fields']
 TEST_FIELDS = DB['tests']['fields']
 TESTCASE_FIELDS = DB['testcases']['fields']
+TESTCASE_OPTIONAL_FIELDS = DB['testcases']['optional fields']
 STEP_FIELDS = DB['procedure steps']['fields']
 FUNCTION_FIELDS = DB['functions']['fields']
 SUBMODULE_FIELDS = DB['submodules']['fields']
@@ -34,6 +35,54 @@ LICENSE_FIELDS = DB['licenses']['fields']
 SITE_FIELDS = DB['sites']['fields']
 DVR_FIELDS = DB['dvrs']['fields']
 
+
+def select_columns(alias, fields):
+    """ Return the comma-delimited list of columns of a table (by alias) for a field map. """
+    return ', '.join(['%s.%s' % (alias, column) for column in fields.values()])
+
+# testcase with its parent test, user story, feature and module (see Database.map_row_to_data)
+TESTCASE_CONTEXT_SQL = "SELECT %s, %s, %s, %s, %s FROM %s tc "\
+                       "JOIN %s t ON t.%s = tc.%s "\
+                       "JOIN %s us ON us.%s = t.%s "\
+                       "JOIN %s f ON f.%s = us.%s "\
+                       "JOIN %s m ON m.%s = us.%s "\
+                       "WHERE tc.%s = ?" % (
+    select_columns('tc', TESTCASE_FIELDS), select_columns('t', TEST_FIELDS),
+    select_columns('us', USERSTORY_FIELDS), select_columns('f', FEATURE_FIELDS),
+    select_columns('m', MODULE_FIELDS), DB_TABLES['testcases'],
+    DB_TABLES['tests'], TEST_FIELDS['id'], TESTCASE_FIELDS['test'],
+    DB_TABLES['user stories'], USERSTORY_FIELDS['id'], TEST_FIELDS['user story'],
+    DB_TABLES['features'], FEATURE_FIELDS['id'], USERSTORY_FIELDS['feature'],
+    DB_TABLES['modules'], MODULE_FIELDS['id'], USERSTORY_FIELDS['module'],
+    TESTCASE_FIELDS['id'])
+
+# active testcases in hierarchy order: by module, then feature (in order of its first user story
+# in the module), user story, test and testcase (conditions are formatted in)
+TESTCASE_SELECTION_SQL = "SELECT tc.%s FROM %s tc "\
+                         "JOIN %s t ON t.%s = tc.%s "\
+                         "JOIN %s us ON us.%s = t.%s "\
+                         "WHERE %%s "\
+                         "ORDER BY us.%s, "\
+                         "(SELECT MIN(fs.rowid) FROM %s fs WHERE fs.%s = us.%s AND fs.%s = us.%s), "\
+                         "us.rowid, t.rowid, tc.rowid" % (
+    TESTCASE_FIELDS['id'], DB_TABLES['testcases'],
+    DB_TABLES['tests'], TEST_FIELDS['id'], TESTCASE_FIELDS['test'],
+    DB_TABLES['user stories'], USERSTORY_FIELDS['id'], TEST_FIELDS['user story'],
+    USERSTORY_FIELDS['module'],
+    DB_TABLES['user stories'], USERSTORY_FIELDS['module'], USERSTORY_FIELDS['module'],
+    USERSTORY_FIELDS['feature'], USERSTORY_FIELDS['feature'])
+
+# procedure steps with their function and submodule (step ids are formatted in as placeholders)
+PROCEDURE_DATA_SQL = "SELECT %s, %s, %s FROM %s ps "\
+                     "JOIN %s fn ON fn.%s = ps.%s "\
+                     "JOIN %s sm ON sm.%s = fn.%s "\
+                     "WHERE ps.%s IN (%%s)" % (
+    select_columns('ps', STEP_FIELDS), select_columns('fn', FUNCTION_FIELDS),
+    select_columns('sm', SUBMODULE_FIELDS), DB_TABLES['procedure steps'],
+    DB_TABLES['functions'], FUNCTION_FIELDS['id'], STEP_FIELDS['function'],
+    DB_TABLES['submodules'], SUBMODULE_FIELDS['id'], FUNCTION_FIELDS['submodule id'],
+    STEP_FIELDS['id'])
+
 ####################################################################################################
 # Database #########################################################################################
 ####################################################################################################
@@ -54,7 +103,7 @@ class Database(Charon):
 
         # initialize SQLite API library
         db_path = TARTAROS_DB_PATH if path is None else path
-        Charon.__init__(self, db_path, self.log)
+        Charon.__init__(self, db_path, self.log, wal=True)
 
         # define default database handle
         self.db_handle = self.establish_handle_to_database()['handle']
@@ -72,12 +121,9 @@ class Database(Charon):
 
         try:
             # determine module id
-            table = DB_TABLES['modules']
-            return_field = MODULE_FIELDS['name']
-            known_field = MODULE_FIELDS['id']
-            known_value = name
-            result['name'] = self.query_database_table_for_single_value(self.db_handle,
-                                                                        table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                MODULE_FIELDS['name'], DB_TABLES['modules'], MODULE_FIELDS['id'])
+            result['name'] = self.query_value(sql, (name,), self.db_handle)
 
             self.log.trace("Returned module name.")
             result['successful'] = True
@@ -130,8 +176,8 @@ class Database(Charon):
 
         try:
             # query database for all Functions table entries
-            table = DB_TABLES['functions']
-            response = self.query_database_table(self.db_handle, table)['response']
+            sql = "SELECT * FROM %s" % DB_TABLES['functions']
+            response = self.query_all(sql, handle=self.db_handle)
 
             # add response items to modules list
             for item in response:
@@ -160,10 +206,8 @@ class Database(Charon):
 
         try:
             # query database for site data
-            table = DB_TABLES['sites']
-            addendum = 'WHERE %s = "%s"' % (SITE_FIELDS['name'], name.lower())
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
+            sql = "SELECT * FROM %s WHERE %s = ?" % (DB_TABLES['sites'], SITE_FIELDS['name'])
+            response = self.query_all(sql, (name.lower(),), self.db_handle)
             # parse response into data dictionary for configuration
             site_data = {}
             fields = SITE_FIELDS.keys()
@@ -200,10 +244,8 @@ class Database(Charon):
 
         try:
             # query database for site data
-            table = DB_TABLES['dvrs']
-            addendum = 'WHERE %s = "%s"' % (DVR_FIELDS['id'], dvr_id)
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
+            sql = "SELECT * FROM %s WHERE %s = ?" % (DB_TABLES['dvrs'], DVR_FIELDS['id'])
+            response = self.query_all(sql, (dvr_id,), self.db_handle)
             # parse response into data dictionary for configuration
             dvr_data = {}
             fields = DVR_FIELDS.keys()
@@ -240,10 +282,8 @@ class Database(Charon):
 
         try:
             # query database for license configuration
-            table = DB_TABLES['licenses']
-            addendum = 'WHERE %s = "%s"' % (LICENSE_FIELDS['name'], name)
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
+            sql = "SELECT * FROM %s WHERE %s = ?" % (DB_TABLES['licenses'], LICENSE_FIELDS['name'])
+            response = self.query_all(sql, (name,), self.db_handle)
             # parse response into data dictionary for configuration
             license_data = {}
             fields = LICENSE_FIELDS.keys()
@@ -276,13 +316,10 @@ class Database(Charon):
         result = {'successful': False, 'data': None}
 
         try:
-            # determine module id
-            table = DB_TABLES['submodules']
-            known_field = SUBMODULE_FIELDS['id']
-            known_value = id
-            addendum = "WHERE %s = '%s'" % (known_field, known_value)
-            result['data'] = self.query_database_table(self.db_handle,
-                table, addendum=addendum)['value']
+            # determine submodule data
+            sql = "SELECT * FROM %s WHERE %s = ?" % (DB_TABLES['submodules'],
+                                                     SUBMODULE_FIELDS['id'])
+            result['data'] = self.query_one(sql, (id,), self.db_handle)
 
             self.log.trace("Returned submodule data.")
             result['successful'] = True
@@ -307,12 +344,9 @@ class Database(Charon):
 
         try:
             # determine module id
-            table = DB_TABLES['modules']
-            return_field = MODULE_FIELDS['name']
-            known_field = MODULE_FIELDS['id']
-            known_value = id
-            result['name'] = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                MODULE_FIELDS['name'], DB_TABLES['modules'], MODULE_FIELDS['id'])
+            result['name'] = self.query_value(sql, (id,), self.db_handle)
 
             self.log.trace("Returned module name.")
             result['successful'] = True
@@ -337,12 +371,9 @@ class Database(Charon):
 
         try:
             # determine module id
-            table = DB_TABLES['modules']
-            return_field = MODULE_FIELDS['id']
-            known_field = MODULE_FIELDS['name']
-            known_value = name
-            result['id'] = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                MODULE_FIELDS['id'], DB_TABLES['modules'], MODULE_FIELDS['name'])
+            result['id'] = self.query_value(sql, (name,), self.db_handle)
 
             self.log.trace("Returned module ID.")
             result['successful'] = True
@@ -367,12 +398,9 @@ class Database(Charon):
 
         try:
             # determine module id
-            table = DB_TABLES['modules']
-            return_field = MODULE_FIELDS['submodule']
-            known_field = MODULE_FIELDS['id']
-            known_value = module_id
-            result['id'] = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                MODULE_FIELDS['submodule'], DB_TABLES['modules'], MODULE_FIELDS['id'])
+            result['id'] = self.query_value(sql, (module_id,), self.db_handle)
 
             self.log.trace("Returned submodule ID.")
             result['successful'] = True
@@ -406,19 +434,15 @@ class Database(Charon):
 
         # determine submodule id if needed
         if submodule_id is None:
-            table = DB_TABLES['submodules']
-            return_field = SUBMODULE_FIELDS['id']
-            known_field = SUBMODULE_FIELDS['name']
-            known_value = submodule_name
-            module_id = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                SUBMODULE_FIELDS['id'], DB_TABLES['submodules'], SUBMODULE_FIELDS['name'])
+            submodule_id = self.query_value(sql, (submodule_name,), self.db_handle)
 
         try:
             # query database for all modules associated with submodule
-            table = DB_TABLES['modules']
-            addendum = 'WHERE %s = "%s"' % (MODULE_FIELDS['submodule'], submodule_id)
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
+            sql = "SELECT * FROM %s WHERE %s = ?" % (
+                DB_TABLES['modules'], MODULE_FIELDS['submodule'])
+            response = self.query_all(sql, (submodule_id,), self.db_handle)
 
             # add response items to modules list
             for item in response:
@@ -448,12 +472,9 @@ class Database(Charon):
 
         try:
             # determine module id
-            table = DB_TABLES['user stories']
-            return_field = USERSTORY_FIELDS['module']
-            known_field = USERSTORY_FIELDS['id']
-            known_value = user_story_id
-            result['id'] = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                USERSTORY_FIELDS['module'], DB_TABLES['user stories'], USERSTORY_FIELDS['id'])
+            result['id'] = self.query_value(sql, (user_story_id,), self.db_handle)
 
             self.log.trace("Returned module ID.")
             result['successful'] = True
@@ -476,10 +497,9 @@ class Database(Charon):
 
         try:
             # query database for all features
-            table = DB_TABLES['features']
-            addendum = 'WHERE %s = "%s"' % (FEATURE_FIELDS['submodule'], submodule_id)
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
+            sql = "SELECT * FROM %s WHERE %s = ?" % (
+                DB_TABLES['features'], FEATURE_FIELDS['submodule'])
+            response = self.query_all(sql, (submodule_id,), self.db_handle)
 
             # add response items to modules list
             for item in response:
@@ -517,38 +537,24 @@ class Database(Charon):
 
         # determine module id if needed
         if module_id is None:
-            table = DB_TABLES['modules']
-            return_field = MODULE_FIELDS['id']
-            known_field = MODULE_FIELDS['name']
-            known_value = module_name
-            module_id = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                MODULE_FIELDS['id'], DB_TABLES['modules'], MODULE_FIELDS['name'])
+            module_id = self.query_value(sql, (module_name,), self.db_handle)
 
         try:
-            # query database for all features that share a user story with the module
-            table = DB_TABLES['user stories']
-            addendum = 'WHERE %s = "%s"' % (USERSTORY_FIELDS['module'], module_id)
-            response =\
-                self.query_database_table(self.db_handle, table, addendum=addendum)['response']
-
-            # create a list of unique feature ids from query response
-            feature_ids = []
+            # query database for all features that share a user story with the module (in order
+            # of their first user story)
+            sql = "SELECT f.%s, f.%s, f.%s FROM %s us JOIN %s f ON f.%s = us.%s WHERE us.%s = ? "\
+                  "GROUP BY f.%s ORDER BY MIN(us.rowid)" % (
+                FEATURE_FIELDS['id'], FEATURE_FIELDS['name'], FEATURE_FIELDS['submodule'],
+                DB_TABLES['user stories'], DB_TABLES['features'], FEATURE_FIELDS['id'],
+                USERSTORY_FIELDS['feature'], USERSTORY_FIELDS['module'], FEATURE_FIELDS['id'])
+            response = self.query_all(sql, (module_id,), self.db_handle)
+
+            # add response items to features list
             for item in response:
-                feature_id = item[1]
-                if feature_id not in feature_ids:
-                    feature_ids.append(feature_id)
-
-            # query database for all features for the module and build list of feature data
-            for feature_id in feature_ids:
-                table = DB_TABLES['features']
-                addendum = 'WHERE %s = "%s"' % (FEATURE_FIELDS['id'], feature_id)
-                response =\
-                    self.query_database_table(self.db_handle, table, addendum=addendum)['response']
-
-                # add response items to features list
-                if len(response) > 0:
-                    result['features'].append({'id': response[0][0], 'name': str(response[0][1]),
-                                               'submodule': response[0][2]})
+                result['features'].append({'id': item[0], 'name': str(item[1]),
+                                           'submodule': item[2]})
 
             self.log.trace("Returned features.")
             result['successful'] = True
@@ -574,12 +580,9 @@ class Database(Charon):
 
         try:
             # determine feature id
-            table = DB_TABLES['features']
-            return_field = FEATURE_FIELDS['id']
-            known_field = FEATURE_FIELDS['name']
-            known_value = name
-            result['id'] = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                FEATURE_FIELDS['id'], DB_TABLES['features'], FEATURE_FIELDS['name'])
+            result['id'] = self.query_value(sql, (name,), self.db_handle)
 
             self.log.trace("Returned feature ID.")
             result['successful'] = True
@@ -604,12 +607,9 @@ class Database(Charon):
 
         try:
             # determine module id
-            table = DB_TABLES['user stories']
-            return_field = USERSTORY_FIELDS['feature']
-            known_field = USERSTORY_FIELDS['id']
-            known_value = story_id
-            result['id'] = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                USERSTORY_FIELDS['feature'], DB_TABLES['user stories'], USERSTORY_FIELDS['id'])
+            result['id'] = self.query_value(sql, (story_id,), self.db_handle)
 
             self.log.trace("Returned feature ID.")
             result['successful'] = True
@@ -648,35 +648,29 @@ class Database(Charon):
             module_id = None
 
         if module is not None and module_id is None:
-            table = DB_TABLES['modules']
-            return_field = MODULE_FIELDS['id']
-            known_field = MODULE_FIELDS['name']
-            known_value = module
-            module_id = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                MODULE_FIELDS['id'], DB_TABLES['modules'], MODULE_FIELDS['name'])
+            module_id = self.query_value(sql, (module,), self.db_handle)
 
         # determine feature id if needed
         if feature_id is None:
-            table = DB_TABLES['features']
-            return_field = FEATURE_FIELDS['id']
-            known_field = FEATURE_FIELDS['name']
-            known_value = feature_name
-
-            feature_id = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                FEATURE_FIELDS['id'], DB_TABLES['features'], FEATURE_FIELDS['name'])
+            feature_id = self.query_value(sql, (feature_name,), self.db_handle)
 
         try:
             # query database for all user stories associated with feature
-            table = DB_TABLES['user stories']
             if module_id is not None:
-                addendum = 'WHERE %s = "%s" AND %s = "%s"' % (USERSTORY_FIELDS['feature'],
-                                                              feature_id, USERSTORY_FIELDS['module'],
-                                                              module_id)
+                sql = "SELECT * FROM %s WHERE %s = ? AND %s = ?" % (
+                    DB_TABLES['user stories'], USERSTORY_FIELDS['feature'],
+                    USERSTORY_FIELDS['module'])
+                params = (feature_id, module_id)
             else:
-                addendum = 'WHERE %s = "%s"' % (USERSTORY_FIELDS['feature'], feature_id)
+                sql = "SELECT * FROM %s WHERE %s = ?" % (DB_TABLES['user stories'],
+                                                         USERSTORY_FIELDS['feature'])
+                params = (feature_id,)
 
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
+            response = self.query_all(sql, params, self.db_handle)
 
             # add response items to modules list
             for item in response:
@@ -708,12 +702,9 @@ class Database(Charon):
 
         try:
             # determine user story id
-            table = DB_TABLES['user stories']
-            return_field = USERSTORY_FIELDS['id']
-            known_field = USERSTORY_FIELDS['action']
-            known_value = action
-            result['id'] = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                USERSTORY_FIELDS['id'], DB_TABLES['user stories'], USERSTORY_FIELDS['action'])
+            result['id'] = self.query_value(sql, (action,), self.db_handle)
 
             self.log.trace("Returned story ID.")
             result['successful'] = True
@@ -750,10 +741,8 @@ class Database(Charon):
 
         try:
             # query database for all tests associated with user story
-            table = DB_TABLES['tests']
-            addendum = 'WHERE %s = "%s"' % (TEST_FIELDS['user story'], story_id)
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
+            sql = "SELECT * FROM %s WHERE %s = ?" % (DB_TABLES['tests'], TEST_FIELDS['user story'])
+            response = self.query_all(sql, (story_id,), self.db_handle)
 
             # add response items to modules list
             for item in response:
@@ -785,13 +774,10 @@ class Database(Charon):
 
         try:
             # determine test id
-            table = DB_TABLES['tests']
-            return_field = TEST_FIELDS['id']
-            addendum = 'WHERE %s = "%s" AND %s = "%s"' % (TEST_FIELDS['name'], name,
-                                                          TEST_FIELDS['user story'], story_id)
-            response =\
-            result['id'] = self.query_database_table(self.db_handle, table, return_field=return_field,
-                addendum=addendum)['response'][0][0]
+            sql = "SELECT %s FROM %s WHERE %s = ? AND %s = ?" % (
+                TEST_FIELDS['id'], DB_TABLES['tests'], TEST_FIELDS['name'],
+                TEST_FIELDS['user story'])
+            result['id'] = self.query_one(sql, (name, story_id), self.db_handle)[0]
 
             self.log.trace("Returned test ID.")
             result['successful'] = True
@@ -816,12 +802,9 @@ class Database(Charon):
 
         try:
             # determine results id
-            table = DB_TABLES['tests']
-            return_field = TEST_FIELDS['results id']
-            known_field = TEST_FIELDS['id']
-            known_value = test_id
-            result['id'] = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                TEST_FIELDS['results id'], DB_TABLES['tests'], TEST_FIELDS['id'])
+            result['id'] = self.query_value(sql, (test_id,), self.db_handle)
 
             self.log.trace("Returned results ID.")
             result['successful'] = True
@@ -846,12 +829,9 @@ class Database(Charon):
 
         try:
             # determine module id
-            table = DB_TABLES['tests']
-            return_field = TEST_FIELDS['user story']
-            known_field = TEST_FIELDS['id']
-            known_value = test_id
-            result['id'] = self.query_database_table_for_single_value(self.db_handle,
-                table, return_field, known_field, known_value)['value']
+            sql = "SELECT %s FROM %s WHERE %s = ?" % (
+                TEST_FIELDS['user story'], DB_TABLES['tests'], TEST_FIELDS['id'])
+            result['id'] = self.query_value(sql, (test_id,), self.db_handle)
 
             self.log.trace("Returned user story ID.")
             result['successful'] = True
@@ -915,14 +895,13 @@ class Database(Charon):
 
         # determine test id if needed
         if test_id is None:
-            test_id = self.return_test_id(test_name, story_id)
+            test_id = self.return_test_id(test_name, story_id)['id']
 
         try:
             # query database for all testcases associated with test
-            table = DB_TABLES['testcases']
-            addendum = 'WHERE %s = "%s"' % (TESTCASE_FIELDS['test'], test_id)
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
+            sql = "SELECT * FROM %s WHERE %s = ?" % (
+                DB_TABLES['testcases'], TESTCASE_FIELDS['test'])
+            response = self.query_all(sql, (test_id,), self.db_handle)
 
             # parse response into data dictionary for testcase
             for i in range(len(response)):
@@ -946,6 +925,118 @@ class Database(Charon):
         # return
         return result
 
+    def select_testcase_ids(self, submodule_id=None, module_id=None, feature_id=None,
+                            story_id=None, test_id=None, case_id=None, case_class=None,
+                            case_type=None, excluded_case_type=None, min_version=None):
+        """ Select the ids of all active testcases within the given scope (in one query).
+        INPUT
+            submodule id: the id of the submodule (product) being tested.
+            module id: the id of the module being tested (None if all).
+            feature id: the id of the feature being tested (None if all).
+            story id: the id of the user story being tested (None if all).
+            test id: the id of the test being tested (None if all).
+            case id: the id of the test case being tested (None if all).
+            case class: the class of testcases to select (None if all).
+            case type: the type id of testcases to select (None if all).
+            excluded case type: the type id of testcases to leave out (None if none).
+            min version: the (release) version of the product under test; testcases with a
+                greater minimum version are left out (None if all).
+        OUTPUT
+            a list of testcase ids (in hierarchy order).
+        """
+
+        self.log.debug("Selecting testcases ...")
+
+        conditions = ["tc.%s > 0" % TESTCASE_FIELDS['active']]
+        params = []
+
+        # narrow to the most specific scope given
+        if case_id is not None:
+            conditions.append("tc.%s = ?" % TESTCASE_FIELDS['id'])
+            params.append(case_id)
+        elif test_id is not None:
+            conditions.append("t.%s = ?" % TEST_FIELDS['id'])
+            params.append(test_id)
+        elif story_id is not None:
+            conditions.append("us.%s = ?" % USERSTORY_FIELDS['id'])
+            params.append(story_id)
+        elif feature_id is not None:
+            conditions.append("us.%s = ?" % USERSTORY_FIELDS['feature'])
+            params.append(feature_id)
+            if module_id is not None:
+                conditions.append("us.%s = ?" % USERSTORY_FIELDS['module'])
+                params.append(module_id)
+        elif module_id is not None:
+            conditions.append("us.%s = ?" % USERSTORY_FIELDS['module'])
+            params.append(module_id)
+        elif submodule_id is not None:
+            conditions.append("us.%s IN (SELECT %s FROM %s WHERE %s = ?)" % (
+                USERSTORY_FIELDS['module'], MODULE_FIELDS['id'], DB_TABLES['modules'],
+                MODULE_FIELDS['submodule']))
+            params.append(submodule_id)
+
+        # filter
+        if case_class is not None:
+            conditions.append("tc.%s = ?" % TESTCASE_FIELDS['class'])
+            params.append(case_class)
+        if case_type is not None:
+            conditions.append("tc.%s = ?" % TESTCASE_FIELDS['type'])
+            params.append(case_type)
+        if excluded_case_type is not None:
+            conditions.append("tc.%s != ?" % TESTCASE_FIELDS['type'])
+            params.append(excluded_case_type)
+        if min_version is not None:
+            conditions.append("CAST(tc.%s AS REAL) <= ?" % TESTCASE_FIELDS['minimum version'])
+            params.append(float(min_version))
+
+        sql = TESTCASE_SELECTION_SQL % ' AND '.join(conditions)
+        return [row[0] for row in self.query_all(sql, params)]
+
+    def return_testcase_requirements(self, testcase_ids):
+        """ Return the declared requirements (see scheduler.parse_requirements) of given testcases.
+        INPUT
+            testcase ids: the ids of the testcases.
+        OUTPUT
+            requirements: a dict pairing each testcase id with its requirements (None if none
+                declared, or if the database does not track requirements).
+        """
+
+        self.log.debug("Returning requirements for %d testcases ..." % len(testcase_ids))
+        result = {'successful': False, 'requirements': {}}
+
+        for testcase_id in testcase_ids:
+            result['requirements'][testcase_id] = None
+
+        try:
+            # requirements are only tracked by databases migrated to include them
+            columns = [row[1] for row in self.query_all(
+                "pragma table_info(%s)" % DB_TABLES['testcases'], handle=self.db_handle)]
+            if TESTCASE_OPTIONAL_FIELDS['requirements'] not in columns:
+                self.log.trace("Requirements not tracked by database (running testcases with "
+                               "default requirements).")
+
+            else:
+                # look up in chunks (SQLite limits the number of values bound per statement)
+                testcase_ids = list(testcase_ids)
+                for i in range(0, len(testcase_ids), 500):
+                    chunk = testcase_ids[i:i+500]
+                    sql = "SELECT %s, %s FROM %s WHERE %s IN (%s)" % (
+                        TESTCASE_FIELDS['id'], TESTCASE_OPTIONAL_FIELDS['requirements'],
+                        DB_TABLES['testcases'], TESTCASE_FIELDS['id'],
+                        ','.join(['?'] * len(chunk)))
+                    for testcase_id, requirements in self.query_all(sql, chunk, self.db_handle):
+                        result['requirements'][testcase_id] = requirements
+                self.log.trace("Returned requirements.")
+
+            result['successful'] = True
+        except BaseException, e:
+            self.log.error("Failed to return testcase requirements.")
+            self.log.error(str(e))
+            self.log.error("Error: %s." % return_execution_error()['error'])
+
+        # return
+        return result
+
     def return_testcase_id(self, name, test_id):
         """ Return the test case id given its name and test id.
         INPUT
@@ -960,13 +1051,10 @@ class Database(Charon):
 
         try:
             # determine test case id
-            table = DB_TABLES['testcases']
-            return_field = TESTCASE_FIELDS['id']
-            addendum = 'WHERE %s = "%s" AND %s = "%s"' % (TESTCASE_FIELDS['name'], name,
-                                                          TESTCASE_FIELDS['test'], test_id)
-            response =\
-            result['id'] = self.query_database_table(self.db_handle, table, return_field=return_field,
-                addendum=addendum)['response'][0][0]
+            sql = "SELECT %s FROM %s WHERE %s = ? AND %s = ?" % (
+                TESTCASE_FIELDS['id'], DB_TABLES['testcases'], TESTCASE_FIELDS['name'],
+                TESTCASE_FIELDS['test'])
+            result['id'] = self.query_one(sql, (name, test_id), self.db_handle)[0]
 
             self.log.trace("Returned test case ID.")
             result['successful'] = True
@@ -978,8 +1066,36 @@ class Database(Charon):
         # return
         return result
 
+    def map_row_to_data(self, row, *field_maps):
+        """ Map the values of a (joined) row onto data dictionaries, consuming the row in order.
+        INPUT
+            row: the row of values returned from the database.
+            field maps: the field maps (see maps) of each table selected, in order of selection.
+        OUTPUT
+            a list of data dictionaries, one for each field map given.
+        """
+
+        data = []
+        offset = 0
+        for fields in field_maps:
+            keys = fields.keys()
+            data.append(dict(zip(keys, row[offset:offset + len(keys)])))
+            offset += len(keys)
+        return data
+
+    def parse_procedure(self, procedure):
+        """ Parse a testcase procedure into a list of procedure step ids.
+        INPUT
+            procedure: the comma-delimited procedure of a testcase.
+        OUTPUT
+            a list of procedure step ids (in order of execution).
+        """
+
+        return [int(item.strip()) for item in str(procedure).split(',') if item.strip() != '']
+
     def return_testcase_data(self, testcase_id):
-        """ Return data for testcase with given ID.
+        """ Return data for testcase with given ID (and its parent test, user story, feature and
+        module in the same query).
         INPUT
             testcase_id: the id of the testcase for which to return data.
         OUTPUT
@@ -995,74 +1111,16 @@ class Database(Charon):
                   'feature data': {}, 'module data': {}}
 
         try:
-            # query database for testcase
-            table = DB_TABLES['testcases']
-            addendum = 'WHERE %s = "%s"' % (TESTCASE_FIELDS['id'], testcase_id)
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
-            # parse response into data dictionary for testcase
-            testcase_data = {}
-            fields = TESTCASE_FIELDS.keys()
-            values = list(response[0])
-            for i in range(len(values)):
-                testcase_data[fields[i]] = values[i]
-            result['testcase data'] = testcase_data
-
-            # query database for test
-            test_id = testcase_data['test']
-            table = DB_TABLES['tests']
-            addendum = 'WHERE %s = "%s"' % (TEST_FIELDS['id'], test_id)
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
-            # parse response into data dictionary for test
-            test_data = {}
-            fields = TEST_FIELDS.keys()
-            values = list(response[0])
-            for i in range(len(values)):
-                test_data[fields[i]] = values[i]
-            result['test data'] = test_data
-
-            # query database for user story
-            story_id = test_data['user story']
-            table = DB_TABLES['user stories']
-            addendum = 'WHERE %s = "%s"' % (USERSTORY_FIELDS['id'], story_id)
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
-            # parse response into data dictionary for user story
-            story_data = {}
-            fields = USERSTORY_FIELDS.keys()
-            values = list(response[0])
-            for i in range(len(values)):
-                story_data[fields[i]] = values[i]
-            result['user story data'] = story_data
-
-            # query database for feature
-            feature_id = story_data['feature']
-            table = DB_TABLES['features']
-            addendum = 'WHERE %s = "%s"' % (FEATURE_FIELDS['id'], feature_id)
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
-            # parse response into data dictionary for feature
-            feature_data = {}
-            fields = FEATURE_FIELDS.keys()
-            values = list(response[0])
-            for i in range(len(values)):
-                feature_data[fields[i]] = values[i]
-            result['feature data'] = feature_data
-
-            # query database for module
-            module_id = story_data['module']
-            table = DB_TABLES['modules']
-            addendum = 'WHERE %s = "%s"' % (MODULE_FIELDS['id'], module_id)
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
-            # parse response into data dictionary for module
-            module_data = {}
-            fields = MODULE_FIELDS.keys()
-            values = list(response[0])
-            for i in range(len(values)):
-                module_data[fields[i]] = values[i]
-            result['module data'] = module_data
+            # query database for testcase and its parents
+            row = self.query_one(TESTCASE_CONTEXT_SQL, (testcase_id,), self.db_handle)
+            if row is None:
+                raise LookupError("Testcase %s not found." % testcase_id)
+
+            # parse response into data dictionaries
+            result['testcase data'], result['test data'], result['user story data'],\
+                result['feature data'], result['module data'] = self.map_row_to_data(
+                    row, TESTCASE_FIELDS, TEST_FIELDS, USERSTORY_FIELDS, FEATURE_FIELDS,
+                    MODULE_FIELDS)
 
             self.log.trace("Returned testcase data.")
             result['successful'] = True
@@ -1075,6 +1133,51 @@ class Database(Charon):
         # return
         return result
 
+    def return_procedure_data(self, procedure_step_ids):
+        """ Return data for all of the procedure steps given (in one query).
+        INPUT
+            procedure step ids: the ids of the procedure steps (in order of execution).
+        OUTPUT
+            procedure data: list of {step data, function data, submodule data} for each step id
+                given, in the same order (steps may repeat).
+        """
+
+        self.log.debug("Returning data for procedure steps %s ..." % procedure_step_ids)
+        result = {'successful': False, 'procedure data': []}
+
+        try:
+            # query database for all unique procedure steps
+            unique_ids = list(set(procedure_step_ids))
+            sql = PROCEDURE_DATA_SQL % ','.join(['?'] * len(unique_ids))
+            steps = {}
+            for row in self.execute(sql, unique_ids, self.db_handle):
+                step_data, function_data, submodule_data = self.map_row_to_data(
+                    row, STEP_FIELDS, FUNCTION_FIELDS, SUBMODULE_FIELDS)
+                steps[step_data['id']] = {'step data': step_data, 'function data': function_data,
+                                          'submodule data': submodule_data}
+
+            # resolve procedure in order
+            for step_id in procedure_step_ids:
+                if step_id not in steps:
+                    raise LookupError("Procedure step %s not found." % step_id)
+                # give each occurrence its own copy of the data (callers modify step data)
+                step = steps[step_id]
+                result['procedure data'].append(
+                    {'step data': dict(step['step data']),
+                     'function data': dict(step['function data']),
+                     'submodule data': dict(step['submodule data'])})
+
+            self.log.trace("Returned procedure data.")
+            result['successful'] = True
+        except BaseException, e:
+            self.log.error("Failed to return procedure data.")
+            self.log.error(str(e))
+            self.log.error("Error: %s." % return_execution_error()['error'])
+            result['successful'] = False
+
+        # return
+        return result
+
     def return_procedure_step_data(self, procedure_step_id):
         """ Return data for procedure step with given ID.
         INPUT
@@ -1087,53 +1190,35 @@ class Database(Charon):
         result = {'successful': False, 'step data': {}, 'function data': {},
                   'submodule data': {}}
 
-        try:
-            # query database for procedure step
-            table = DB_TABLES['procedure steps']
-            addendum = 'WHERE %s = "%s"' % (STEP_FIELDS['id'], procedure_step_id)
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
-            # parse response into data dictionary for procedure step
-            step_data = {}
-            fields = STEP_FIELDS.keys()
-            values = list(response[0])
-            for i in range(len(values)):
-                step_data[fields[i]] = values[i]
-            result['step data'] = step_data
-
-            # query database for procedure step
-            table = DB_TABLES['functions']
-            addendum = 'WHERE %s = "%s"' % (FUNCTION_FIELDS['id'], step_data['function'])
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
-            # parse response into data dictionary for procedure step
-            function_data = {}
-            fields = FUNCTION_FIELDS.keys()
-            values = list(response[0])
-            for i in range(len(values)):
-                function_data[fields[i]] = values[i]
-            result['function data'] = function_data
-
-            # query database for procedure step
-            table = DB_TABLES['submodules']
-            addendum = 'WHERE %s = "%s"' % (SUBMODULE_FIELDS['id'], function_data['submodule id'])
-            response =\
-            self.query_database_table(self.db_handle, table, addendum=addendum)['response']
-            # parse response into data dictionary for procedure step
-            submodule_data = {}
-            fields = SUBMODULE_FIELDS.keys()
-            values = list(response[0])
-            for i in range(len(values)):
-                submodule_data[fields[i]] = values[i]
-            result['submodule data'] = submodule_data
-
-            self.log.trace("Returned procedure step data.")
+        returned = self.return_procedure_data([procedure_step_id])
+        if returned['successful']:
+            result.update(returned['procedure data'][0])
             result['successful'] = True
-        except BaseException, e:
-            self.log.error("Failed to return procedure step data.")
-            self.log.error(str(e))
-            self.log.error("Error: %s." % return_execution_error()['error'])
-            result['successful'] = False
 
         # return
-        return result
\ No newline at end of file
+        return result
+
+    def return_testcase_context(self, testcase_id):
+        """ Return data for testcase with given ID, along with the data of each step of its
+        procedure (in two queries).
+        INPUT
+            testcase_id: the id of the testcase for which to return data.
+        OUTPUT
+            (see return_testcase_data)
+            procedure data: list of {step data, function data, submodule data} for each step of
+                the testcase procedure, in order of execution.
+        """
+
+        self.log.debug("Returning context for testcase %s ..." % testcase_id)
+
+        result = self.return_testcase_data(testcase_id)
+        result['procedure data'] = []
+
+        if result['successful']:
+            procedure = result['testcase data']['procedure']
+            returned = self.return_procedure_data(self.parse_procedure(procedure))
+            result['procedure data'] = returned['procedure data']
+            result['successful'] = returned['successful']
+
+        # return
+        return result
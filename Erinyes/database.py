@@ -40,7 +40,7 @@ class Database(Charon):
 
         # initialize SQLite API library
         db_path = db_path
-        Charon.__init__(self, db_path, self.log)
+        Charon.__init__(self, db_path, self.log, wal=True)
 
     def establish_handle_to_database(self):
         """ Connect to and establish a handle to the database.
@@ -13,11 +13,12 @@
 
 from utility import return_execution_error, read_file_into_list, return_machine_ip_address
 import inspect
-from os import getcwdu, rename
+from os import getcwdu
 from time import sleep, time
 import socket
 from binascii import hexlify, unhexlify
-from select import select
+from transport import Transport, open_listener, return_socket_name
+from sync import DatabaseReceiver, is_sync_message
 from Database import Database
 from logger import Logger
 from testrun import TestRun
@@ -59,6 +60,9 @@ class Hekate():
         self.Sisyphus = sisyphus
         self.sisyphus = self.Sisyphus(self.log)
 
+        # the Tartaros database (opened by the first test run, and closed by database syncs)
+        self.database = None
+
         # stacktrace
         self.inspect = inspect
 
@@ -69,9 +73,7 @@ class Hekate():
         self.local_ip = return_machine_ip_address(self.log)['ip address']
         self.local_port = 333
         self.local_addr = (self.local_ip, self.local_port)
-        self.packet_size = 16284
-        self.client = socket.socket()
-        self.client.bind(self.local_addr)
+        self.client = open_listener(self.local_addr, 1)
 
     def TEMPLATE(self):
         """
@@ -127,71 +129,52 @@ class Hekate():
         self.log.trace("... DONE %s." % operation.replace('_', ' '))
         return result
 
-    def receive_incoming_messages_from_socket(self, sock, logging=True):
-        """ Receive any incoming messages from specified socket.
-        @param sock: the socket from which to receive any incoming messages.
+    def receive_incoming_messages_from_socket(self, transport, logging=True):
+        """ Receive the next (framed) message from specified connection.
+        @param transport: the Transport of the connection from which to receive the message.
         @param logging: whether the data received by the socket should be logged or not.
         @return: a data dictionary including
             successful: whether the function executed successfully or not.
             communicating: whether the socket is actively communicating or not.
-            data: the data received by the socket.
-            hex: the data received by the socket, translated into hex.
+            data: the message received (translated from hex, if hex).
         """
 
         operation = inspect.stack()[0][3]
-        result = {'successful': False, 'communicating': True, 'data': None, 'hex': None}
+        result = {'successful': False, 'communicating': True, 'data': None}
 
         try:
             self.log.trace("%s ..." % operation.replace('_', ' '))
 
-            # define the local and remote addresses (for reference)
-            try:
-                sock_name = str(sock.getpeername())
-            except BaseException:
-                try:
-                    sock_name = str(sock.getsockname())
-                except BaseException:
-                    sock_name = str(sock)
-
+            sock_name = transport.name
             if logging: self.log.trace_in_line("%s ..." % sock_name)
 
-            # receive incoming messages to socket
+            # receive the next message
             try:
-                buf = sock.recv(self.packet_size)
-
-                # translate hex (if needed)
-                try:
-                    dat = unhexlify(buf)
-                except BaseException:
-                    dat = buf
-
-                if logging: self.log.trace("Received data.")
-                #if logging: self.log.trace("Received Data: %s." % dat)
+                message = transport.receive_message()
 
                 # wait until remote client is done communicating
-                if len(buf) == 0:
+                if message is None:
                     if logging: self.log.trace("%s disconnected." % sock_name)
                     result['communicating'] = False
+                    message = ''
 
-                # update result
-                result['data'] = dat
+                # translate hex (if needed)
+                try:
+                    result['data'] = unhexlify(message)
+                except BaseException:
+                    result['data'] = message
 
                 if logging: self.log.trace("Received incoming messages from socket %s." % sock_name)
                 else: self.log.trace_in_line('.')
                 result['successful'] = True
             except BaseException, e:
                 result['data'] = ''
-                result['hex'] = 'ff'
-                result['successful'] = False
                 result['communicating'] = False
                 reported = False
-                if e.args[0] == 10053:
+                if isinstance(e, socket.error) and e.args[0] == 10053:
                     self.log.warn("Connection to %s aborted by host." % sock_name)
                     reported = True
-                    try:
-                        sock.close()
-                    except BaseException, e:
-                        pass
+                transport.close()
                 if logging and not reported:
                     self.handle_exception(
                         self.log, e, operation="receive incoming messages from socket %s" % sock_name)
@@ -204,7 +187,7 @@ class Hekate():
         return result
 
     def send_binary_data_to_socket(self, sock, data, logging=False):
-        """ Send a packet of binary data to specified socket.
+        """ Send a (framed) message of binary data to specified socket.
         @param sock: the socket to which to send the data.
         @param logging: whether the data sent to the socket should be logged or not.
         @return: a data dictionary including
@@ -217,26 +200,12 @@ class Hekate():
         try:
             self.log.trace("%s ..." % operation.replace('_', ' '))
 
-            # define the local and remote addresses (for reference)
-            try:
-                sock_name = str(sock.getpeername())
-            except BaseException:
-                try:
-                    sock_name = str(sock.getsockname())
-                except BaseException:
-                    sock_name = str(sock)
-
+            sock_name = return_socket_name(sock)
             if logging: self.log.trace_in_line("%s ..." % sock_name)
 
-             # send binary data to socket
+            # send binary data to socket
             if logging: self.log.trace("Binary Data: %s." % hexlify(data))
-            if logging:
-                try:
-                    sock.send(data)
-                except BaseException:
-                    return
-            else:
-                sock.send(data)
+            Transport(sock).send_message(data)
 
             if logging: self.log.trace("Binary data packet sent to socket %s." % sock_name)
             else: self.log.trace_in_line('.')
@@ -253,50 +222,45 @@ class Hekate():
 
     def listen_to_socket(self, sock, logging=False):
         """ Listen to the socket.
-        @param sock: the socket to which to send the data.
+        @param sock: the listening socket at which to accept a connection.
         @param logging: whether data should be logged or not.
         @return: a data dictionary including
             successful: whether the function executed successfully or not.
-            data: the full data message received (automatically translated from hex).
+            messages: the messages received over the connection (translated from hex, if hex;
+                database syncs are applied as they are received).
         """
 
         operation = inspect.stack()[0][3]
-        result = {'successful': False, 'data': None}
+        result = {'successful': False, 'messages': []}
 
         try:
             self.log.trace("%s ..." % operation.replace('_', ' '))
 
-            # define the local and remote addresses (for reference)
-            try:
-                sock_name = str(sock.getpeername())
-            except BaseException:
-                try:
-                    sock_name = str(sock.getsockname())
-                except BaseException:
-                    sock_name = str(sock)
-
+            sock_name = return_socket_name(sock)
             if logging: self.log.trace_in_line(" %s ..." % sock_name)
 
-            # listen
-            sock.listen(1)
-            #sock.settimeout(5)
+            # accept a connection
             conn, addr = sock.accept()
+            transport = Transport(conn, keepalive=True)
 
             # loop to handle message traffic with socket
+            messages = []
             running = True
-            data = ''
             while running:
+                received = self.receive_incoming_messages_from_socket(transport, logging=logging)
+                if is_sync_message(received['data']):
+                    DatabaseReceiver(self.log, TARTAROS_DB_PATH, database=self.database).receive(
+                        transport, received['data'])
+                elif received['data']:
+                    messages.append(received['data'])
+                running = received['communicating']
+            transport.close()
 
-                result = self.receive_incoming_messages_from_socket(conn, logging=logging)
-                data += result['data']
-                running = result['communicating']
-
-            self.log.trace("Data received.")
-            #self.log.trace('Data Received:\t%s' % str(data))
+            self.log.trace("%d messages received." % len(messages))
 
             # compile results
             result['successful'] = True
-            result['data'] = data
+            result['messages'] = messages
 
         except BaseException, e:
             self.handle_exception(self.log, e, operation)
@@ -316,10 +280,6 @@ class Hekate():
             self.log.trace("%sning ..." % operation.replace('_', ' '))
 
             while True:
-                database_path = TARTAROS_DB_PATH
-                updating_database = False
-                i = 1
-
                 # DEFINE THREAD: listen for incoming communication
                 self.sisyphus.add_process_to_thread_queue(
                     self.listen_to_socket, (self.client, True,)
@@ -330,31 +290,9 @@ class Hekate():
 
                 # build list of messages received
                 messages = []
-                while len(result['data']) > 0:
-                    datum = result['data'].pop()
-
-                    # check for database update
-                    if 'SQLite' in datum['data']:
-                        # backup previous database
-                        self.log.trace("Backing up old database ...")
-                        timestamp = str(time())
-                        rename(database_path, "%s%s.db" % (database_path[:-7], timestamp))
-
-                        # update database
-                        self.log.trace("Updating database ...")
-
-                        # create updated database file
-                        f = open(database_path, 'wb')
-
-                        # write to updated database file
-                        f.write(datum['data'])
-
-                        # close file
-                        f.close()
-                    else:
-                        data = datum['data'].split(';;')
-                        for command in data:
-                            messages.append(command)
+                for message in [m for datum in result['data'] if datum for m in datum['messages']]:
+                    for command in message.split(';;'):
+                        messages.append(command)
 
                 # handle communication received
                 self.handle_server_commands(messages)
@@ -408,7 +346,7 @@ class Hekate():
 
     def run_test(self, build, test_name, results_plan_id, module=None, feature=None, story=None,
                  test=None, case=None, case_class=None, case_type=None, int_dvr_ip=None,
-                 mode=None):
+                 mode=None, workers=1, profiling=False):
         """ Run test with given parameters.
         """
 
@@ -425,28 +363,27 @@ class Hekate():
                 testcase.run()
 
             else:
-                database = Database(Logger(logging_level='info'))
+                if self.database is None:
+                    self.database = Database(Logger(logging_level='info'))
+                database = self.database
 
                 # initialize test run object
                 testrun = TestRun(self.log, database, name=test_name, submodule_id=2,
-                                  results_plan_id=results_plan_id, int_dvr_ip=int_dvr_ip)
-
-                # build testcase list for test run
-                testcases = testrun.build_testcase_list_for_run(module_id=module,
-                    feature_id=feature, story_id=story, test_id=test,
-                    case_id=case, case_class=case_class)['testcases']
+                                  results_plan_id=results_plan_id, int_dvr_ip=int_dvr_ip,
+                                  workers=workers, profiling=profiling)
 
-                # filter by class
-                if case_class is not None:
-                    testrun.filter_testcases_by_class(testcases, case_class)
-
-                # filter by type
+                # leave out dvr integration testcases unless running them specifically
+                excluded_case_type = None
                 if case_type is not None:
-                    testrun.filter_testcases_by_type(testcases, case_type)
-
                     if case_type.lower() != 'dvr integration' and str(module) != '9'\
                             and str(module).lower() != 'dvr integration':
-                        testrun.filter_testcases_by_type(testcases, 'dvr integration', inclusive=False)
+                        excluded_case_type = 'dvr integration'
+
+                # build testcase list for test run (filtered by class and type)
+                testcases = testrun.build_testcase_list_for_run(module_id=module,
+                    feature_id=feature, story_id=story, test_id=test,
+                    case_id=case, case_class=case_class, case_type=case_type,
+                    excluded_case_type=excluded_case_type)['testcases']
 
                 # set testcase list for test run
                 testrun.testcases = testcases
@@ -0,0 +1,378 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+import os
+import zlib
+from apsw import Connection
+from hashlib import md5, sha1
+from struct import Struct
+from shutil import copyfile
+from tempfile import mkstemp
+from time import time
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+# A database sync is an exchange of framed messages (see transport) over one connection:
+#   sender -> START     (SYNC_MAGIC, mode, page size)
+#   client -> MANIFEST  (client page size, then the digest of each page of its database, if
+#                        incremental; none if full or it has no database of that page size)
+#   sender -> CHUNK...  (runs of pages that differ from the manifest, compressed)
+#   sender -> END       (size and SHA-1 of the database sent)
+#   client -> ACK       (whether the database was applied, and why not)
+# The client applies chunks to a copy of its database, and only replaces its database once the
+# copy matches the SHA-1 sent, so a sync cut short or corrupted never damages it. The sender
+# sends a snapshot of its database (see snapshot_database), as commits of a database in WAL mode
+# may not be in its file yet.
+SYNC_MAGIC = 'HKSYNC01'
+START = Struct('!8sBI')         # magic, mode, page size
+MANIFEST = Struct('!cI')        # type, page size (followed by page digests)
+CHUNK = Struct('!cQIII')        # type, first page, pages, raw length, CRC-32 (of raw data)
+END = Struct('!cQ20s')          # type, size, SHA-1
+ACK = Struct('!cB')             # type, status (followed by a reason)
+
+MANIFEST_TYPE = 'M'
+CHUNK_TYPE = 'C'
+END_TYPE = 'E'
+ACK_TYPE = 'A'
+
+FULL = 0
+INCREMENTAL = 1
+
+DIGEST_SIZE = 16                # (MD5) bytes per page digest
+CHUNK_SIZE = 1024 * 1024        # maximum raw bytes of pages per chunk
+COMPRESSION_LEVEL = 6
+DEFAULT_PAGE_SIZE = 4096
+DATABASE_HEADER = 'SQLite format 3\0'
+
+
+class SyncError(Exception):
+    """ A database sync failed. """
+    pass
+
+
+def return_page_size(path):
+    """ Return the page size of a SQLite database (DEFAULT_PAGE_SIZE if not a database). """
+
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(18)
+    except IOError:
+        return DEFAULT_PAGE_SIZE
+    if not header.startswith(DATABASE_HEADER) or len(header) < 18:
+        return DEFAULT_PAGE_SIZE
+    page_size = Struct('!H').unpack_from(header, 16)[0]
+    return 65536 if page_size == 1 else page_size
+
+
+def return_page_digests(path, page_size):
+    """ Return the digests of each page of a file, concatenated ('' if there is no file). """
+
+    if not os.path.exists(path):
+        return ''
+    digests = []
+    with open(path, 'rb') as f:
+        while True:
+            page = f.read(page_size)
+            if not page:
+                break
+            digests.append(md5(page).digest())
+    return ''.join(digests)
+
+
+def snapshot_database(path, snapshot_path):
+    """ Copy a database (with any commits still in its write-ahead log) to a file, consistently
+    even while it is written to (using the SQLite backup API).
+    """
+
+    source = Connection(path)
+    try:
+        destination = Connection(snapshot_path)
+        try:
+            with destination.backup("main", source, "main") as backup:
+                while not backup.done:
+                    backup.step(-1)
+        finally:
+            destination.close()
+    finally:
+        source.close()
+
+
+def checkpoint_database(path):
+    """ Write any commits in the write-ahead log of a database into its file, then remove the log
+    (and shared memory) files, so the file alone is the database.
+    """
+
+    if os.path.exists(path) and os.path.exists(path + '-wal'):
+        connection = Connection(path)
+        try:
+            connection.cursor().execute("pragma wal_checkpoint(TRUNCATE)")
+        finally:
+            connection.close()
+    for file_path in (path + '-wal', path + '-shm'):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def backup_database(path):
+    """ Move a database aside (to <path minus extension><timestamp>.db), returning the new path. """
+
+    backup_path = "%s%s.db" % (os.path.splitext(path)[0], str(time()))
+    os.rename(path, backup_path)
+    return backup_path
+
+####################################################################################################
+# Sender ###########################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class DatabaseSender():
+    """ Sends a database to a Hekate client. """
+
+    def __init__(self, logger, path):
+        """
+        INPUT
+            logger: An initialized instance of a logging class to use.
+            path: the file path of the database to send.
+        """
+
+        # instance logger
+        self.log = logger
+
+        self.path = path
+
+    def send(self, transport, incremental=True):
+        """ Sync the database to a client.
+        INPUT
+            transport: a Transport connected to the client.
+            incremental: whether to send only the pages the client does not have or not (all).
+        OUTPUT
+            successful: whether the function executed successfully (and the client applied the
+                database) or not.
+            pages: the number of pages in the database.
+            pages sent: the number of pages sent.
+            bytes sent: the number of (compressed) bytes of pages sent.
+        """
+
+        self.log.debug("Syncing database %s to %s ..." % (self.path, transport.name))
+        result = {'successful': False, 'pages': 0, 'pages sent': 0, 'bytes sent': 0}
+
+        snapshot_path = None
+        try:
+            # (a file of its own, as the database may be synced to several clients at once)
+            handle, snapshot_path = mkstemp('.snapshot', os.path.basename(self.path) + '.',
+                                            os.path.dirname(os.path.abspath(self.path)))
+            os.close(handle)
+            snapshot_database(self.path, snapshot_path)
+            page_size = return_page_size(snapshot_path)
+            transport.send_message(START.pack(SYNC_MAGIC, INCREMENTAL if incremental else FULL,
+                                              page_size))
+
+            # determine the pages the client has
+            manifest = transport.receive_message()
+            if manifest is None or manifest[:1] != MANIFEST_TYPE:
+                raise SyncError("No manifest from %s." % transport.name)
+            client_page_size = MANIFEST.unpack_from(manifest)[1]
+            digests = manifest[MANIFEST.size:] if client_page_size == page_size else ''
+            client_pages = len(digests) / DIGEST_SIZE
+
+            # send runs of changed pages
+            checksum = sha1()
+            size = 0
+            run = []
+            run_start = 0
+            with open(snapshot_path, 'rb') as f:
+                number = 0
+                while True:
+                    page = f.read(page_size)
+                    if not page:
+                        break
+                    checksum.update(page)
+                    size += len(page)
+
+                    changed = number >= client_pages or md5(page).digest() != \
+                        digests[number * DIGEST_SIZE:(number + 1) * DIGEST_SIZE]
+                    if changed:
+                        if not run:
+                            run_start = number
+                        run.append(page)
+                    if run and (not changed or len(run) * page_size >= CHUNK_SIZE):
+                        self.send_chunk(transport, run_start, run, result)
+                        run = []
+                    number += 1
+                if run:
+                    self.send_chunk(transport, run_start, run, result)
+            result['pages'] = number
+
+            transport.send_message(END.pack(END_TYPE, size, checksum.digest()))
+
+            # wait for the client to apply the database
+            ack = transport.receive_message()
+            if ack is None or ack[:1] != ACK_TYPE:
+                raise SyncError("No acknowledgement from %s." % transport.name)
+            if not ACK.unpack_from(ack)[1]:
+                raise SyncError("%s failed to apply database: %s" % (transport.name,
+                                                                     ack[ACK.size:]))
+
+            self.log.trace("Synced database to %s (%d of %d pages, %d bytes sent)."
+                           % (transport.name, result['pages sent'], result['pages'],
+                              result['bytes sent']))
+            result['successful'] = True
+        except BaseException, e:
+            self.log.error("Failed to sync database to %s." % transport.name)
+            self.log.error(str(e))
+        finally:
+            if snapshot_path is not None and os.path.exists(snapshot_path):
+                try:
+                    os.remove(snapshot_path)
+                except OSError:
+                    pass
+
+        # return
+        return result
+
+    def send_chunk(self, transport, first_page, pages, result):
+        raw = ''.join(pages)
+        data = zlib.compress(raw, COMPRESSION_LEVEL)
+        transport.send_message(CHUNK.pack(CHUNK_TYPE, first_page, len(pages), len(raw),
+                                          zlib.crc32(raw) & 0xffffffff) + data)
+        result['pages sent'] += len(pages)
+        result['bytes sent'] += len(data)
+
+####################################################################################################
+# Receiver #########################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class DatabaseReceiver():
+    """ Receives a database from a Tartaros server. """
+
+    def __init__(self, logger, path, backup=True, database=None):
+        """
+        INPUT
+            logger: An initialized instance of a logging class to use.
+            path: the file path of the database to update.
+            backup: whether to keep the previous database (see backup_database) or not.
+            database: a Charon connected to the database, if any (disconnected before the
+                database is replaced).
+        """
+
+        # instance logger
+        self.log = logger
+
+        self.path = path
+        self.backup = backup
+        self.database = database
+        self.temp_path = path + '.sync'
+
+    def receive(self, transport, start):
+        """ Sync the database from a server.
+        INPUT
+            transport: a Transport connected to the server.
+            start: the START message received (see is_sync_message).
+        OUTPUT
+            successful: whether the function executed successfully or not.
+            pages received: the number of pages received.
+            backup: the file path of the previous database (None if none kept).
+        """
+
+        self.log.debug("Receiving database from %s ..." % transport.name)
+        result = {'successful': False, 'pages received': 0, 'backup': None}
+        reason = ''
+
+        try:
+            magic, mode, page_size = START.unpack_from(start)
+
+            # start from a copy of the database (if incremental)
+            digests = ''
+            if mode == INCREMENTAL and os.path.exists(self.path) \
+                    and return_page_size(self.path) == page_size:
+                copyfile(self.path, self.temp_path)
+                digests = return_page_digests(self.temp_path, page_size)
+            else:
+                open(self.temp_path, 'wb').close()
+            transport.send_message(MANIFEST.pack(MANIFEST_TYPE, page_size) + digests)
+
+            # apply chunks
+            with open(self.temp_path, 'r+b') as f:
+                while True:
+                    message = transport.receive_message()
+                    if message is None:
+                        raise SyncError("%s disconnected during sync." % transport.name)
+
+                    if message[:1] == CHUNK_TYPE:
+                        kind, first_page, pages, length, crc = CHUNK.unpack_from(message)
+                        raw = zlib.decompress(buffer(message, CHUNK.size))
+                        if len(raw) != length or zlib.crc32(raw) & 0xffffffff != crc:
+                            raise SyncError("Chunk at page %d is corrupt." % first_page)
+                        f.seek(first_page * page_size)
+                        f.write(raw)
+                        result['pages received'] += pages
+
+                    elif message[:1] == END_TYPE:
+                        kind, size, digest = END.unpack_from(message)
+                        f.truncate(size)
+                        break
+
+                    else:
+                        raise SyncError("Unexpected message type %r." % message[:1])
+
+            # verify the copy
+            checksum = sha1()
+            with open(self.temp_path, 'rb') as f:
+                for block in iter(lambda: f.read(CHUNK_SIZE), ''):
+                    checksum.update(block)
+            if checksum.digest() != digest:
+                raise SyncError("Database checksum mismatch.")
+
+            # replace the database (closing connections to it, and folding its write-ahead log
+            # into it, so no log is applied to the new database)
+            if self.database is not None:
+                self.database.disconnect_from_database()
+            checkpoint_database(self.path)
+            if os.path.exists(self.path):
+                if self.backup:
+                    result['backup'] = backup_database(self.path)
+                else:
+                    os.remove(self.path)
+            os.rename(self.temp_path, self.path)
+
+            self.log.trace("Received database (%d pages)." % result['pages received'])
+            result['successful'] = True
+        except BaseException, e:
+            self.log.error("Failed to receive database from %s." % transport.name)
+            self.log.error(str(e))
+            reason = str(e)
+            if os.path.exists(self.temp_path):
+                try:
+                    os.remove(self.temp_path)
+                except OSError:
+                    pass
+
+        # acknowledge
+        try:
+            transport.send_message(ACK.pack(ACK_TYPE, int(result['successful'])) + reason)
+        except BaseException, e:
+            self.log.warn("Failed to acknowledge database sync: %s." % str(e))
+
+        # return
+        return result
+
+
+def is_sync_message(message):
+    """ Return whether a message starts a database sync or not. """
+    return message.startswith(SYNC_MAGIC)
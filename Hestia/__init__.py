@@ -24,8 +24,10 @@ from emailnotification import EmailNotification
 from events import Events
 from gps import GPS
 from http import HTTP
+from httpclient import HTTPClient, MAX_IDLE_CONNECTIONS, RETRIES, BACKOFF
 from installer import Installer
 from licenseconfig import  LicenseConfiguration
+from loadgen import LoadGeneration
 from pagequeries import PageQueries
 from server import Server
 from session import Session
@@ -53,12 +55,13 @@ DEFAULT_SERVER_URL = HESTIA['default server url']
 
 
 class Hestia(ClipClassification, Clips, DriveStatus, EmailNotification, Events, GPS, HTTP, Installer,
-    LicenseConfiguration, PageQueries, Server, Session, Software, SiteConfiguration, SiteConnectivity,
+    LicenseConfiguration, LoadGeneration, PageQueries, Server, Session, Software, SiteConfiguration, SiteConnectivity,
     SiteGroupConfiguration, SystemConfiguration, UserConfiguration):
     """ Library for ViM interaction and testing. """
 
     def __init__(self, logger, app_db, dir=DEFAULT_BIN_LOC, storage_loc=DEFAULT_STORAGE_LOC,
-                 server_url=DEFAULT_SERVER_URL, int_dvr_ip=None, int_dvr_pwd=''):
+                 server_url=DEFAULT_SERVER_URL, int_dvr_ip=None, int_dvr_pwd='',
+                 max_connections=MAX_IDLE_CONNECTIONS, http_retries=RETRIES, http_backoff=BACKOFF):
         """
         INPUT
             logger: An initialized instance of a logging class to use.
@@ -68,6 +71,9 @@ class Hestia(ClipClassification, Clips, DriveStatus, EmailNotification, Events,
             server_url: the server url.
             int_dvr_ip: the ip address of the DVR being used for integration testing.
             int_dvr_pwd: the password of the DVR being used for integration testing.
+            max connections: the idle (keep-alive) connections kept to the server.
+            http retries: the retries of a request failing to connect to the server.
+            http backoff: the seconds before the first retry of a request (doubled per retry).
         """
 
         # instance logger
@@ -83,6 +89,9 @@ class Hestia(ClipClassification, Clips, DriveStatus, EmailNotification, Events,
         self.version = "1.0.0.0"
         self.release_version = 1.0
 
+        # HTTP client (keeps connections to the server alive, and the session cookie)
+        self.http_client = HTTPClient(max_connections, retries=http_retries, backoff=http_backoff)
+
         # general-use file paths
         self.server_exe_path = self.dir + "VIM.exe"
         self.database_path = self.dir + "VIM.db"
@@ -402,6 +402,53 @@ class Clips():
         if testcase is not None: testcase.processing = result['successful']
         return result
 
+    def return_geoclip_packet(self, gps_point, start='1 hour ago', end='15 minutes ago',
+                              pre_time=15, post_time=45, notify=False, settings=[]):
+        """ Return the data packet of a GeoClip request (see request_geoclip).
+        """
+
+        # define default data packet to send to server
+        packet = {
+            GEOCLIP_FIELDS['start']:                    self.utc.convert_string_to_time(start),
+            GEOCLIP_FIELDS['end']:                      self.utc.convert_string_to_time(end),
+            GEOCLIP_FIELDS['start date/time']:          '',
+            GEOCLIP_FIELDS['end date/time']:            '',
+            GEOCLIP_FIELDS['ne latitude']:              '',
+            GEOCLIP_FIELDS['ne longitude']:             '',
+            GEOCLIP_FIELDS['sw latitude']:              '',
+            GEOCLIP_FIELDS['sw longitude']:             '',
+            GEOCLIP_FIELDS['cameras']:                  -1,
+            GEOCLIP_FIELDS['event label']:              GEOEVENT_LABEL,
+            GEOCLIP_FIELDS['notes']:                    'Request Location: lat:%s, lon:%s'
+                                                        % (gps_point[0], gps_point[1]),
+            GEOCLIP_FIELDS['notification']:             'false',
+            GEOCLIP_FIELDS['pre-event time']:                 pre_time,
+            GEOCLIP_FIELDS['post-event time']:                post_time,
+        }
+
+        # update date/time values
+        packet[GEOCLIP_FIELDS['start date/time']] = \
+            self.utc.convert_database_time_to_server_date(packet[GEOCLIP_FIELDS['start']])
+        packet[GEOCLIP_FIELDS['end date/time']] = \
+            self.utc.convert_database_time_to_server_date(packet[GEOCLIP_FIELDS['end']])
+
+        # update GPS values
+        packet[GEOCLIP_FIELDS['ne latitude']] = str(float(gps_point[0])+0.001)
+        packet[GEOCLIP_FIELDS['sw latitude']] = str(float(gps_point[0])-0.001)
+        packet[GEOCLIP_FIELDS['ne longitude']] = str(float(gps_point[1])+0.001)
+        packet[GEOCLIP_FIELDS['sw longitude']] = str(float(gps_point[1])-0.001)
+
+        # update notification value
+        if notify: packet[GEOCLIP_FIELDS['notification']] = 'true'
+
+        # update data packet with any additional parameters given
+        for setting in settings:
+            self.log.trace("Setting '%(field)s' to '%(value)s' ..."%{'field':setting[0],
+                                                          'value':str(setting[1])})
+            packet[GEOCLIP_FIELDS[setting[0].lower()]] = setting[1]
+
+        return packet
+
     def request_geoclip(self, gps_point, start='1 hour ago', end='15 minutes ago',
                         pre_time=15, post_time=45, notify=False, expected=[], timeout=30,
                         settings=[], testcase=None):
@@ -430,45 +477,9 @@ class Clips():
         try:
             self.log.trace("%s ..." % operation.replace('_', ' '))
 
-            # define default data packet to send to server
-            packet = {
-                GEOCLIP_FIELDS['start']:                    self.utc.convert_string_to_time(start),
-                GEOCLIP_FIELDS['end']:                      self.utc.convert_string_to_time(end),
-                GEOCLIP_FIELDS['start date/time']:          '',
-                GEOCLIP_FIELDS['end date/time']:            '',
-                GEOCLIP_FIELDS['ne latitude']:              '',
-                GEOCLIP_FIELDS['ne longitude']:             '',
-                GEOCLIP_FIELDS['sw latitude']:              '',
-                GEOCLIP_FIELDS['sw longitude']:             '',
-                GEOCLIP_FIELDS['cameras']:                  -1,
-                GEOCLIP_FIELDS['event label']:              GEOEVENT_LABEL,
-                GEOCLIP_FIELDS['notes']:                    'Request Location: lat:%s, lon:%s'
-                                                            % (gps_point[0], gps_point[1]),
-                GEOCLIP_FIELDS['notification']:             'false',
-                GEOCLIP_FIELDS['pre-event time']:                 pre_time,
-                GEOCLIP_FIELDS['post-event time']:                post_time,
-            }
-
-            # update date/time values
-            packet[GEOCLIP_FIELDS['start date/time']] = \
-                self.utc.convert_database_time_to_server_date(packet[GEOCLIP_FIELDS['start']])
-            packet[GEOCLIP_FIELDS['end date/time']] = \
-                self.utc.convert_database_time_to_server_date(packet[GEOCLIP_FIELDS['end']])
-
-            # update GPS values
-            packet[GEOCLIP_FIELDS['ne latitude']] = str(float(gps_point[0])+0.001)
-            packet[GEOCLIP_FIELDS['sw latitude']] = str(float(gps_point[0])-0.001)
-            packet[GEOCLIP_FIELDS['ne longitude']] = str(float(gps_point[1])+0.001)
-            packet[GEOCLIP_FIELDS['sw longitude']] = str(float(gps_point[1])-0.001)
-
-            # update notification value
-            if notify: packet[GEOCLIP_FIELDS['notification']] = 'true'
-
-            # update data packet with any additional parameters given
-            for setting in settings:
-                self.log.trace("Setting '%(field)s' to '%(value)s' ..."%{'field':setting[0],
-                                                              'value':str(setting[1])})
-                packet[GEOCLIP_FIELDS[setting[0].lower()]] = setting[1]
+            # define data packet to send to server
+            packet = self.return_geoclip_packet(gps_point, start, end, pre_time, post_time,
+                                                notify, settings)
 
             successful = False
             attempt = 1
@@ -658,35 +669,26 @@ class Clips():
         try:
             self.log.trace("%s ..." % operation.replace('_', ' '))
 
-            # query event log for GeoClip entry for site
-            attempt = 1
-            interval = 15
-            event_id = None
-            while event_id is None and attempt < timeout/interval:
-                handle = self.db.db_handle
-                table = DB_EVENTLOG_TABLE
-                return_field = DB_EVENTLOG_FIELDS['id']
-                known_field = DB_EVENTLOG_FIELDS['site id']
-                known_value = site_id
-                addendum = " AND %s = '%s'"%(DB_EVENTLOG_FIELDS['label'], GEOEVENT_LABEL)
-                event_id = self.db.query_database_table_for_single_value(
-                    handle, table, return_field, known_field, known_value, addendum)['value']
-
-                if event_id is not None:
-                    self.log.trace("GeoEvent found for site: event %s." % event_id)
-                    result['verified'] = True
-                    result['event id'] = event_id
-                    break
+            # query event log for GeoClip entry for site (waiting for it to be added)
+            handle = self.db.db_handle
+            table = DB_EVENTLOG_TABLE
+            return_field = DB_EVENTLOG_FIELDS['id']
+            known_field = DB_EVENTLOG_FIELDS['site id']
+            known_value = site_id
+            addendum = " AND %s = '%s'"%(DB_EVENTLOG_FIELDS['label'], GEOEVENT_LABEL)
 
-                elif event_id is None and attempt < timeout/interval:
-                    self.log.trace("No GeoEvent found for site (attempt %s). "
-                                   "Re-attempting in %s seconds ..." % (attempt, interval))
-                    sleep(interval)
-                    attempt += 1
+            def geoevent_exists():
+                return self.db.query_database_table_for_single_value(
+                    handle, table, return_field, known_field, known_value, addendum)['value']
 
-                elif event_id is None and attempt >= timeout/interval:
-                    self.log.warn("No GeoEvent found for site.")
-                    break
+            event_id = self.db.wait_for(geoevent_exists, timeout,
+                                        description="GeoEvent for site %s" % site_id)['value']
+            if event_id is not None:
+                self.log.trace("GeoEvent found for site: event %s." % event_id)
+                result['verified'] = True
+                result['event id'] = event_id
+            else:
+                self.log.warn("No GeoEvent found for site.")
 
             self.log.trace("... done %s." % operation.replace('_', ' '))
             result['successful'] = True
@@ -718,34 +720,26 @@ class Clips():
         try:
             self.log.trace("%s ..." % operation.replace('_', ' '))
 
-            # query clip log for clip entry for event
-            attempt = 1
-            interval = 15
-            clip_id = None
-            while clip_id is None and attempt < timeout/interval:
-                handle = self.db.db_handle
-                table = DB_CLIPLOG_TABLE
-                return_field = DB_CLIPLOG_FIELDS['id']
-                known_field = DB_CLIPLOG_FIELDS['event id']
-                known_value = event_id
-                clip_id = self.db.query_database_table_for_single_value(
-                    handle, table, return_field, known_field, known_value, max=True)['value']
-
-                if clip_id is not None:
-                    self.log.trace("Clip entry found for event: clip %s." % clip_id)
-                    result['verified'] = True
-                    result['clip id'] = clip_id
-                    break
+            # query clip log for clip entry for event (waiting for it to be scheduled)
+            handle = self.db.db_handle
+            table = DB_CLIPLOG_TABLE
+            return_field = DB_CLIPLOG_FIELDS['id']
+            known_field = DB_CLIPLOG_FIELDS['event id']
+            known_value = event_id
 
-                elif clip_id is None and attempt < timeout/interval:
-                    self.log.trace("No clip entry found for event (attempt %s). "
-                                   "Re-attempting in %s seconds ..." % (attempt, interval))
-                    sleep(interval)
-                    attempt += 1
+            def clip_scheduled():
+                return self.db.query_database_table_for_single_value(
+                    handle, table, return_field, known_field, known_value, max=True)['value']
 
-                elif clip_id is None and attempt >= timeout/interval:
-                    self.log.warn("No clip entry found for site.")
-                    break
+            clip_id = self.db.wait_for(
+                clip_scheduled, timeout,
+                description="clip scheduled for event %s" % event_id)['value']
+            if clip_id is not None:
+                self.log.trace("Clip entry found for event: clip %s." % clip_id)
+                result['verified'] = True
+                result['clip id'] = clip_id
+            else:
+                self.log.warn("No clip entry found for site.")
 
             # verify expected clip length
             if expected_length is not None and clip_id is not None:
@@ -1673,13 +1667,15 @@ class Clips():
         return result
 
     def continuously_request_clips_from_sites_over_time(
-            self, num_sites, duration=60, length=None, interval=1, testcase=None):
+            self, num_sites, duration=60, length=None, interval=1, rate=None, testcase=None):
         """
         @param num_sites: the number of sites being tested (requests will correspond
             to num = site id).
         @param duration: the number of seconds the test should run for.
         @param length: the length of the clip to request (random length if None).
         @param interval: the amount of time to wait between requests.
+        @param rate: the number of requests per second to make concurrently (see
+            generate_load), instead of requesting from each site in turn.
         @param testcase: a testcase object supplied when executing function as part
             of a testcase step.
         :return:
@@ -1692,8 +1688,13 @@ class Clips():
         result = {'successful': False, 'verified': False}
 
         try:
+            # request clips at a rate (concurrently)
+            if rate is not None:
+                load = [self.return_custom_clip_load(range(1, num_sites+1), length)]
+                result['verified'] = self.generate_load(load, rate, duration,
+                                                        testcase=testcase)['verified']
 
-            running = True
+            running = rate is None
             end_time = time() + duration
             while running:
 
@@ -1846,6 +1847,97 @@ class Clips():
         if testcase is not None: testcase.processing = result['successful']
         return result
 
+    def return_custom_clip_packet(self, site_id, start_time=None, length=1, settings=[],
+                                  event_id=None):
+        """ Return the data packet of a custom clip request (see request_custom_clip).
+        """
+
+        # define default data packet to send to server
+        data = {}
+        data[CLIPREQ_FIELDS['site id']] = site_id
+        data[CLIPREQ_FIELDS['site name']] = site_id
+        data[CLIPREQ_FIELDS['start']] = self.utc.convert_string_to_time(start_time) \
+            if start_time is not None else self.utc.convert_string_to_time("5 minutes ago")
+        data[CLIPREQ_FIELDS['duration']] = length
+        data[CLIPREQ_FIELDS['start date/time']] = self.utc.convert_database_time_to_server_date(
+            data[CLIPREQ_FIELDS['start']]
+        )
+        data[CLIPREQ_FIELDS['end date/time']] = self.utc.convert_database_time_to_server_date(
+            data[CLIPREQ_FIELDS['start']] + length
+        )
+        data[CLIPREQ_FIELDS['event label']] = '-'
+        data[CLIPREQ_FIELDS['cameras']] = -1
+        data[CLIPREQ_FIELDS['notification']] = 'false'
+        data[CLIPREQ_FIELDS['notes']] = ''
+
+        # update for HQ clips if version > 4.2
+        try:
+            if self.release_version > 4.2:
+                data[CLIPREQ_FIELDS['high quality']] = 'false'
+        except AttributeError:
+            self.log.warn("Failed to set high quality parameter for clip request.")
+
+        # update data packet with event parameters if event id given
+        if event_id is not None:
+            # database query parameters
+            handle = self.db.db_handle
+            table = DB_EVENTLOG_TABLE
+            known_field = DB_EVENTLOG_FIELDS['id']
+            known_value = event_id
+
+            # determine event id
+            data[CLIPREQ_FIELDS['event id']] = event_id
+
+            # determine event label
+            return_field = DB_EVENTLOG_FIELDS['label']
+            data[CLIPREQ_FIELDS['event label']] = self.db.query_database_table_for_single_value(
+                handle, table, return_field, known_field, known_value)['value']
+
+            # determine event type id
+            return_field = DB_EVENTLOG_FIELDS['event id']
+            data[CLIPREQ_FIELDS['event type id']] = \
+                self.db.query_database_table_for_single_value(
+                handle, table, return_field, known_field, known_value)['value']
+
+            # determine event type
+            return_field = DB_EVENTLOG_FIELDS['type']
+            data[CLIPREQ_FIELDS['event type']] = self.db.query_database_table_for_single_value(
+                handle, table, return_field, known_field, known_value)['value']
+
+            # update health vs other clip specific values
+            if str(data[CLIPREQ_FIELDS['event type']]) in EVENT_TYPE_TO_ID.values()[1:-2]:
+                duration = '60'
+                length = 60
+                data[CLIPREQ_FIELDS['time buffer']] = '+/- 30 sec'
+                data[CLIPREQ_FIELDS['camera label']] = 'All'
+            else:
+                duration = '1'
+                length = 1
+            data[CLIPREQ_FIELDS['duration']] = duration
+            data[CLIPREQ_FIELDS['end date/time']] = \
+                self.utc.convert_database_time_to_server_date(
+                data[CLIPREQ_FIELDS['start']] + length)
+
+            # determine event duration
+            return_field = DB_EVENTLOG_FIELDS['duration']
+            data[CLIPREQ_FIELDS['event duration']] = \
+                self.db.query_database_table_for_single_value(
+                handle, table, return_field, known_field, known_value)['value']
+
+            # determine event time
+            return_field = DB_EVENTLOG_FIELDS['start']
+            event_time = self.db.query_database_table_for_single_value(handle, table,
+                return_field, known_field, known_value)['value']
+            data[CLIPREQ_FIELDS['event start']] = event_time
+
+        # update data packet with any additional parameters given
+        for setting in settings:
+            self.log.trace("Setting '%(field)s' to '%(value)s' ..."%{'field':setting[0],
+                                                          'value':str(setting[1])})
+            data[CLIPREQ_FIELDS[setting[0].lower()]] = setting[1]
+
+        return data
+
     def request_custom_clip(self, site_id, start_time=None, length=1, settings=[], event_id=None,
                             max_attempts=5, testcase=None):
         """ Request a custom clip from specified site.
@@ -1868,89 +1960,8 @@ class Clips():
         result = {'successful': False, 'verified': False, 'clip id': None}
 
         try:
-            # define default data packet to send to server
-            data = {}
-            data[CLIPREQ_FIELDS['site id']] = site_id
-            data[CLIPREQ_FIELDS['site name']] = site_id
-            data[CLIPREQ_FIELDS['start']] = self.utc.convert_string_to_time(start_time) \
-                if start_time is not None else self.utc.convert_string_to_time("5 minutes ago")
-            data[CLIPREQ_FIELDS['duration']] = length
-            data[CLIPREQ_FIELDS['start date/time']] = self.utc.convert_database_time_to_server_date(
-                data[CLIPREQ_FIELDS['start']]
-            )
-            data[CLIPREQ_FIELDS['end date/time']] = self.utc.convert_database_time_to_server_date(
-                data[CLIPREQ_FIELDS['start']] + length
-            )
-            data[CLIPREQ_FIELDS['event label']] = '-'
-            data[CLIPREQ_FIELDS['cameras']] = -1
-            data[CLIPREQ_FIELDS['notification']] = 'false'
-            data[CLIPREQ_FIELDS['notes']] = ''
-
-            # update for HQ clips if version > 4.2
-            try:
-                if self.release_version > 4.2:
-                    data[CLIPREQ_FIELDS['high quality']] = 'false'
-            except AttributeError:
-                self.log.warn("Failed to set high quality parameter for clip request.")
-
-            # update data packet with event parameters if event id given
-            if event_id is not None:
-                # database query parameters
-                handle = self.db.db_handle
-                table = DB_EVENTLOG_TABLE
-                known_field = DB_EVENTLOG_FIELDS['id']
-                known_value = event_id
-
-                # determine event id
-                data[CLIPREQ_FIELDS['event id']] = event_id
-
-                # determine event label
-                return_field = DB_EVENTLOG_FIELDS['label']
-                data[CLIPREQ_FIELDS['event label']] = self.db.query_database_table_for_single_value(
-                    handle, table, return_field, known_field, known_value)['value']
-
-                # determine event type id
-                return_field = DB_EVENTLOG_FIELDS['event id']
-                data[CLIPREQ_FIELDS['event type id']] = \
-                    self.db.query_database_table_for_single_value(
-                    handle, table, return_field, known_field, known_value)['value']
-
-                # determine event type
-                return_field = DB_EVENTLOG_FIELDS['type']
-                data[CLIPREQ_FIELDS['event type']] = self.db.query_database_table_for_single_value(
-                    handle, table, return_field, known_field, known_value)['value']
-
-                # update health vs other clip specific values
-                if str(data[CLIPREQ_FIELDS['event type']]) in EVENT_TYPE_TO_ID.values()[1:-2]:
-                    duration = '60'
-                    length = 60
-                    data[CLIPREQ_FIELDS['time buffer']] = '+/- 30 sec'
-                    data[CLIPREQ_FIELDS['camera label']] = 'All'
-                else:
-                    duration = '1'
-                    length = 1
-                data[CLIPREQ_FIELDS['duration']] = duration
-                data[CLIPREQ_FIELDS['end date/time']] = \
-                    self.utc.convert_database_time_to_server_date(
-                    data[CLIPREQ_FIELDS['start']] + length)
-
-                # determine event duration
-                return_field = DB_EVENTLOG_FIELDS['duration']
-                data[CLIPREQ_FIELDS['event duration']] = \
-                    self.db.query_database_table_for_single_value(
-                    handle, table, return_field, known_field, known_value)['value']
-
-                # determine event time
-                return_field = DB_EVENTLOG_FIELDS['start']
-                event_time = self.db.query_database_table_for_single_value(handle, table,
-                    return_field, known_field, known_value)['value']
-                data[CLIPREQ_FIELDS['event start']] = event_time
-
-            # update data packet with any additional parameters given
-            for setting in settings:
-                self.log.trace("Setting '%(field)s' to '%(value)s' ..."%{'field':setting[0],
-                                                              'value':str(setting[1])})
-                data[CLIPREQ_FIELDS[setting[0].lower()]] = setting[1]
+            # define data packet to send to server
+            data = self.return_custom_clip_packet(site_id, start_time, length, settings, event_id)
 
             successful = False
             attempt = 1
@@ -86,33 +86,34 @@ class Events():
             # return disk id for site
             dvr_id = self.return_dvr_for_site(site_id)['dvr id']
 
-            # query database for event for site (on loop)
-            i = 15
-            while not result['verified'] and i <= wait:
-                handle = self.db.db_handle
-                table = DB_SYSLOG_TABLE
-                return_field = DB_SYSLOG_FIELDS['id']
-                known_field = DB_SYSLOG_FIELDS['dvr id']
-                known_value = dvr_id
-                if syslogtype is not None:
-                    addendum = " AND %s = '%s'" % (DB_SYSLOG_FIELDS['type'],
-                                                   SYSLOG_EVENT_TYPES[syslogtype])
-                else:
-                    addendum = ''
-                event_id = self.db.query_database_table_for_single_value(handle, table,
-                                                                         return_field, known_field,
-                                                                         known_value,
-                                                                         addendum=addendum)['value']
-                if event_id is not None and allowed:
-                    self.log.trace("Verified system event downloaded for site %s." % site_id)
-                    result['event id'] = event_id
-                    result['verified'] = True
-                else:
-                    self.log.trace("Event NOT found (attempt %d). Retrying ..." % (i/15))
-                    i += 15
-                    sleep(15)
-
-            if result['event id'] is None and allowed:
+            # query database for event for site (waiting for it to download)
+            handle = self.db.db_handle
+            table = DB_SYSLOG_TABLE
+            return_field = DB_SYSLOG_FIELDS['id']
+            known_field = DB_SYSLOG_FIELDS['dvr id']
+            known_value = dvr_id
+            if syslogtype is not None:
+                addendum = " AND %s = '%s'" % (DB_SYSLOG_FIELDS['type'],
+                                               SYSLOG_EVENT_TYPES[syslogtype])
+            else:
+                addendum = ''
+
+            def system_event_downloaded():
+                return self.db.query_database_table_for_single_value(handle, table, return_field,
+                                                                     known_field, known_value,
+                                                                     addendum=addendum)['value']
+
+            result['event id'] = self.db.wait_for(
+                system_event_downloaded, wait,
+                description="system event downloaded for site %s" % site_id)['value']
+
+            if result['event id'] is not None and allowed:
+                self.log.trace("Verified system event downloaded for site %s." % site_id)
+                result['verified'] = True
+            elif result['event id'] is not None and not allowed:
+                self.log.trace("Failed to verify system event NOT downloaded for site %s."
+                               % site_id)
+            elif result['event id'] is None and allowed:
                 self.log.trace("Failed to verify system event downloaded for site %s." % site_id)
             elif result['event id'] is None and not allowed:
                 self.log.trace("Verified system event NOT downloaded for site %s." % site_id)
@@ -147,25 +148,27 @@ class Events():
             # return disk id for site
             drive_id = self.return_drive_for_site(site_id)['drive id']
 
-            # query database for event for site (on loop)
-            i = 15
-            while not result['verified'] and i <= wait:
-                handle = self.db.db_handle
-                table = DB_GPS_TABLE
-                return_field = DB_GPS_FIELDS['id']
-                known_field = DB_GPS_FIELDS['disk id']
-                known_value = drive_id
-                event_id = self.db.query_database_table_for_single_value(handle, table,
-                                                                         return_field, known_field,
-                                                                         known_value)['value']
-                if event_id is not None:
-                    self.log.trace("Verified gps event downloaded for site %s." % site_id)
-                    result['event id'] = event_id
-                    result['verified'] = True
-                else:
-                    self.log.trace("Event NOT found (attempt %d). Retrying ..." % (i/15))
-                    i += 15
-                    sleep(15)
+            # query database for event for site (waiting for it to download)
+            handle = self.db.db_handle
+            table = DB_GPS_TABLE
+            return_field = DB_GPS_FIELDS['id']
+            known_field = DB_GPS_FIELDS['disk id']
+            known_value = drive_id
+
+            def gps_event_downloaded():
+                return self.db.query_database_table_for_single_value(handle, table, return_field,
+                                                                     known_field,
+                                                                     known_value)['value']
+
+            event_id = self.db.wait_for(
+                gps_event_downloaded, wait,
+                description="gps event downloaded for site %s" % site_id)['value']
+            if event_id is not None:
+                self.log.trace("Verified gps event downloaded for site %s." % site_id)
+                result['event id'] = event_id
+                result['verified'] = True
+            else:
+                self.log.trace("Failed to verify gps event downloaded for site %s." % site_id)
 
             result['successful'] = True
         except BaseException, e:
@@ -200,28 +203,32 @@ class Events():
             # translate event type to database type number
             type_id = int(EVENT_TYPES[event_type.lower()])
 
-            # query database for event for site (on loop)
-            i = 15
-            while not result['verified'] and i <= wait:
-                handle = self.db.db_handle
-                table = DB_EVENTLOG_TABLE
-                return_field = DB_EVENTLOG_FIELDS['id']
-                known_field = DB_EVENTLOG_FIELDS['site id']
-                known_value = '%s" AND %s = "%s' % (site_id, DB_EVENTLOG_FIELDS['type'], type_id)
-                if cam_id is not None:
-                    # translate camera id 1-8 to 0-8
-                    cam_id -= 1
-                    known_value += '" AND %s = "%s' % (DB_EVENTLOG_FIELDS['event id'], cam_id)
-                event_id = self.db.query_database_table_for_single_value(handle, table, return_field, known_field,
-                    known_value)['value']
-                if event_id is not None:
-                    self.log.trace("Verified %s event downloaded for site %s." % (event_type, site_id))
-                    result['event id'] = event_id
-                    result['verified'] = True
-                else:
-                    self.log.trace("Event NOT found (attempt %d). Retrying ..."%(i/15))
-                    i += 15
-                    sleep(15)
+            # query database for event for site (waiting for it to download)
+            handle = self.db.db_handle
+            table = DB_EVENTLOG_TABLE
+            return_field = DB_EVENTLOG_FIELDS['id']
+            known_field = DB_EVENTLOG_FIELDS['site id']
+            known_value = site_id
+            addendum = " AND %s = '%s'" % (DB_EVENTLOG_FIELDS['type'], type_id)
+            if cam_id is not None:
+                # translate camera id 1-8 to 0-8
+                addendum += " AND %s = '%s'" % (DB_EVENTLOG_FIELDS['event id'], cam_id - 1)
+
+            def event_downloaded():
+                return self.db.query_database_table_for_single_value(handle, table, return_field,
+                                                                     known_field, known_value,
+                                                                     addendum=addendum)['value']
+
+            event_id = self.db.wait_for(
+                event_downloaded, wait,
+                description="%s event downloaded for site %s" % (event_type, site_id))['value']
+            if event_id is not None:
+                self.log.trace("Verified %s event downloaded for site %s." % (event_type, site_id))
+                result['event id'] = event_id
+                result['verified'] = True
+            else:
+                self.log.trace("Failed to verify %s event downloaded for site %s."
+                               % (event_type, site_id))
 
             result['successful'] = True
         except BaseException, e:
@@ -12,6 +12,7 @@
 ####################################################################################################
 
 from mapping import HESTIA
+from Charon import BULK_INSERT_BATCH_SIZE
 from time import sleep
 
 ####################################################################################################
@@ -105,34 +106,8 @@ class GPS():
 
             # update avl table (if specified)
             if update_avl:
-                # determine if an entry for site already exists
-                table = DB_AVL_TABLE
-                return_field = DB_AVL_FIELDS['id']
-                known_field = DB_AVL_FIELDS['site id']
-                known_value = site_id
-                exists = self.db.query_database_table_for_single_value(handle, table, return_field,
-                                                              known_field, known_value)['value']
-
-                # define base entry
-                entry = {
-                    DB_AVL_FIELDS['time']:      time,
-                    DB_AVL_FIELDS['latitude']:  latitude,
-                    DB_AVL_FIELDS['longitude']: longitude,
-                    DB_AVL_FIELDS['speed']:     speed,
-                    DB_AVL_FIELDS['direction']: course,
-                }
-
-                # if entry for site already exists, update
-                if exists is not None:
-                    avl_id = exists
-                    self.db.update_entry_in_table(handle, table, avl_id, entry,
-                                                  id_field=DB_AVL_FIELDS['id'])
-                    result['avl id'] = avl_id
-
-                # else, create a new entry
-                else:
-                    entry[DB_AVL_FIELDS['site id']] = site_id
-                    result['avl id'] = self.db.add_entry_to_table(handle, table, entry)['id']
+                result['avl id'] = self.update_avl_for_site(site_id, time, latitude, longitude,
+                                                            speed, course)
 
             self.log.trace("... done %s." % operation)
             result['successful'] = True
@@ -145,4 +120,121 @@ class GPS():
             if result['avl id'] is not None: testcase.avl_id = result['avl id']
             testcase.gps_point = [latitude, longitude]
             testcase.processing = result['successful']
-        return result
\ No newline at end of file
+        return result
+
+    def generate_gps_events_for_site(self, site_id, events, disk_id=None, update_avl=False,
+                                     batch_size=BULK_INSERT_BATCH_SIZE, testcase=None):
+        """ Simulate a number of GPS events for given site (mass generation, added in batches).
+        @param site_id: the id of the site for which to generate the events.
+        @param events: an iterable (or generator) of data dicts defining each event, containing any
+            of 'time', 'latitude', 'longitude', 'speed', and 'course' (see
+            generate_gps_event_for_site for defaults).
+        @param disk_id: the id of the disk for which to generate the events (leave None to auto-
+            determine from site_id).
+        @param update_avl: whether to update the avl table or not with the last event added.
+        @param batch_size: the number of events to add to the database per transaction.
+        @param testcase: a testcase object supplied when executing function as part of a testcase step.
+        @return: a data dict containing:
+            'successful' - whether the function executed successfully or not.
+            'number of events' - the number of events generated.
+        """
+
+        operation = self.inspect.stack()[0][3]
+        result = {'successful': False, 'number of events': 0}
+        last = {}
+
+        try:
+            self.log.trace("%s ..." % operation.replace('_', ' '))
+
+            # return diskID for site (if none given)
+            if disk_id is None:
+                disk_id = self.return_drive_for_site(site_id)['drive id']
+
+            def entries():
+                for event in events:
+                    # set time to now (if none given)
+                    time = event.get('time', None)
+                    if time is None:
+                        time = self.utc.convert_string_to_time('now')
+                    else:
+                        # try to convert time
+                        try:
+                            time = self.utc.convert_string_to_time(time)
+                        except BaseException:
+                            pass
+
+                    last['time'] = time
+                    last['latitude'] = event.get('latitude', 47.767365)
+                    last['longitude'] = event.get('longitude', -122.15175)
+                    last['speed'] = event.get('speed', 0)
+                    last['course'] = event.get('course', 0)
+
+                    yield (disk_id, time, last['latitude'], last['longitude'], last['speed'],
+                           last['course'])
+
+            # insert events into database
+            fields = [DB_GPS_FIELDS['disk id'], DB_GPS_FIELDS['time'], DB_GPS_FIELDS['latitude'],
+                      DB_GPS_FIELDS['longitude'], DB_GPS_FIELDS['speed'],
+                      DB_GPS_FIELDS['direction']]
+            inserted = self.db.bulk_insert(DB_GPS_TABLE, entries(), batch_size, fields=fields,
+                                           handle=self.db.db_handle)
+            result['number of events'] = inserted['number of rows']
+            if not inserted['successful']:
+                raise RuntimeError("Failed to add GPS events for site %s (%d added)."
+                                   % (site_id, inserted['number of rows']))
+
+            # update avl table with the last event (if specified)
+            if update_avl and last:
+                self.update_avl_for_site(site_id, last['time'], last['latitude'],
+                                         last['longitude'], last['speed'], last['course'])
+
+            self.log.trace("... done %s (%d events)." % (operation, result['number of events']))
+            result['successful'] = True
+        except BaseException, e:
+            self.handle_exception(e, operation=operation)
+
+        # return
+        if testcase is not None:
+            if last: testcase.gps_point = [last['latitude'], last['longitude']]
+            testcase.processing = result['successful']
+        return result
+
+    def update_avl_for_site(self, site_id, time, latitude, longitude, speed=0, course=0):
+        """ Update the avl table (last position) for given site.
+        @param site_id: the id of the site for which to update the avl table.
+        @param time: the time of the last position.
+        @param latitude: the latitude of the last position.
+        @param longitude: the longitude of the last position.
+        @param speed: the speed of the last position.
+        @param course: the course (degrees) of the last position.
+        @return: the id of the avl table entry for the site.
+        """
+
+        # determine if an entry for site already exists
+        handle = self.db.db_handle
+        table = DB_AVL_TABLE
+        return_field = DB_AVL_FIELDS['id']
+        known_field = DB_AVL_FIELDS['site id']
+        known_value = site_id
+        exists = self.db.query_database_table_for_single_value(handle, table, return_field,
+                                                               known_field, known_value)['value']
+
+        # define base entry
+        entry = {
+            DB_AVL_FIELDS['time']:      time,
+            DB_AVL_FIELDS['latitude']:  latitude,
+            DB_AVL_FIELDS['longitude']: longitude,
+            DB_AVL_FIELDS['speed']:     speed,
+            DB_AVL_FIELDS['direction']: course,
+        }
+
+        # if entry for site already exists, update
+        if exists is not None:
+            self.db.update_entry_in_table(handle, table, exists, entry,
+                                          id_field=DB_AVL_FIELDS['id'])
+            return exists
+
+        # else, create a new entry
+        else:
+            entry[DB_AVL_FIELDS['site id']] = site_id
+            return self.db.add_entry_to_table(handle, table, entry)['id']
@@ -12,14 +12,17 @@
 ####################################################################################################
 
 from urllib import urlencode
-from urllib2 import urlopen, HTTPError, Request, URLError
+from urllib2 import HTTPError, Request, URLError
 from httplib import IncompleteRead
-from time import sleep, clock
 from json import dumps
 from csv import DictReader
 from cStringIO import StringIO
+from urlparse import urlsplit
+from ast import literal_eval
 from utility import return_execution_error
 from mapping import HESTIA
+from timing import timed, monotonic, HTTP as HTTP_TIMING
+from tables import Columns, QueryResponse, iterate_rows
 
 ####################################################################################################
 # Globals ##########################################################################################
@@ -35,9 +38,33 @@ CATEGORIES_PATH = HESTIA['server']['categories']['query path']
 
 
 class HTTP():
-    """ Sub-library for ViM server interaction via HTTP calls.
+    """ Sub-library for ViM server interaction via HTTP calls (made by the pooled keep-alive client
+    self.http_client, see httpclient.HTTPClient).
     """
 
+    def open_url(self, url, data=None, read=False, stream=False):
+        """ Open a url over a kept-alive connection (timing the request, see timing.record_timing).
+        INPUT
+            url: the url (or Request object) to open.
+            data: the (encoded) data to post, if any.
+            read: whether to read the response (returning its stripped body) or not.
+            stream: whether to return the response before its body is read or not (see
+                httpclient.HTTPClient.request).
+        OUPUT
+            the response (or its body, if read).
+        """
+
+        if isinstance(url, Request):
+            method, full_url = url.get_method(), url.get_full_url()
+        else:
+            method, full_url = 'GET' if data is None else 'POST', url
+
+        with timed(HTTP_TIMING, "%s %s" % (method, urlsplit(full_url).path)):
+            response = self.http_client.open(url, data, stream)
+            if read:
+                response = response.read().strip()
+        return response
+
     def make_delete_request_to_server(self, url, testcase=None):
         """ Make a DELETE request to the ViM server. """
 
@@ -47,7 +74,7 @@ class HTTP():
         try:
             # build request object
             request = DeleteRequest(url)
-            try: result['response'] = urlopen(request)
+            try: result['response'] = self.open_url(request)
             except HTTPError, e:
                 self.log.warn(str(e))
                 self.log.warn("Failed to make DELETE request to server.")
@@ -73,13 +100,17 @@ class HTTP():
         if testcase is not None: testcase.processing = result['successful']
         return result
 
-    def get_http_request(self, url, testcase=None):
+    def get_http_request(self, url, stream=False, testcase=None):
         """
         INPUT
             url: the full url to make the get request from.
+            stream: whether to return the response unread (to be read as it arrives) or not (its
+                stripped body).
             testcase: a testcase object supplied when executing function as part of a testcase step.
         OUPUT
             successful: whether the function executed successfully or not.
+            response: the response to the request.
+            time: the elapsed time of the request.
         """
 
         self.log.debug("Making GET request to server:\t%s ..." % url)
@@ -87,13 +118,13 @@ class HTTP():
 
         try:
             # begin timing
-            t0 = clock()
+            t0 = monotonic()
 
             attempt = 1
             max_attempts = 5
             while result['response'] is None and attempt <= max_attempts:
                 # make the request (and strip of whispace)
-                try: result['response'] = urlopen(url).read().strip()
+                try: result['response'] = self.open_url(url, read=not stream, stream=stream)
                 except HTTPError, e:
                     self.log.trace("Failed to make GET request to server due to HTTP error.")
                     self.log.trace(str(e))
@@ -118,24 +149,25 @@ class HTTP():
                     if attempt == max_attempts: result['response'] = {}
                     else:
                         self.log.trace("Failed to make GET request to server (attempt %d). "
-                                       "Re-attempting in 5 seconds ..." % attempt)
+                                       "Re-attempting ..." % attempt)
                         self.log.trace(str(e))
                         for error in e:
                             self.log.trace(str(error))
                         exception = return_execution_error()['error']
                         self.log.trace("Error: %s." % exception)
-                        sleep(5)
+                        self.http_client.back_off(attempt)
 
                     # increment
                     attempt += 1
 
             # end timing
-            t = clock()
+            t = monotonic()
             # calculate total time
             result['time'] = t - t0
 
             self.log.trace("Made GET request to server.")
-            self.log.trace("Response:\t%s" %result['response'])
+            if not stream:
+                self.log.trace("Response:\t%s" %result['response'])
             result['successful'] = True
         except BaseException, e:
             self.handle_exception(e, operation="make GET request to server")
@@ -178,7 +210,7 @@ class HTTP():
                     else:
                         request = PutRequest(url, s_data)
 
-                    result['response'] = urlopen(request)
+                    result['response'] = self.open_url(request)
                     self.log.trace("PUT HTTP request.")
 
                     self.log.trace("Response: %s" % result['response'])
@@ -189,23 +221,23 @@ class HTTP():
                     else:
                         self.log.trace("Failed to PUT HTTP request %s %s (attempt %s). "
                                        "No response received from server."
-                                       "Re-attempting in 5 seconds ..." % (url, str(s_data), attempt))
+                                       "Re-attempting ..." % (url, str(s_data), attempt))
                 except HTTPError, e:
                     self.log.trace(str(e))
                     self.log.trace("Failed to PUT HTTP request %s %s (attempt %s). "
-                                   "Re-attempting in 5 seconds ..." % (url, str(s_data), attempt))
+                                   "Re-attempting ..." % (url, str(s_data), attempt))
                 except BaseException, e:
                     self.handle_exception(e,
                         operation="post HTTP request %s %s (attempt %s)" % (url, str(s_data), attempt))
-                    self.log.trace("Re-attempting in 5 seconds ...")
+                    self.log.trace("Re-attempting ...")
 
                 if attempt >= max_attempts:
                     self.log.error("Failed to post HTTP request to the ViM server.")
                     break
 
                 # increment
+                self.http_client.back_off(attempt)
                 attempt += 1
-                sleep(5)
 
             self.log.trace("... done %s." % operation)
             result['successful'] = True
@@ -249,10 +281,10 @@ class HTTP():
                 # post the request
                 if json:
                     request = Request(url, s_data, {"Content-Type": "application/json"})
-                    result['response'] = urlopen(request).read().strip()
+                    result['response'] = self.open_url(request, read=True)
                     self.log.trace("Posted JSON request.")
                 else:
-                    result['response'] = urlopen(url, s_data).read().strip()
+                    result['response'] = self.open_url(url, s_data, read=True)
                     self.log.trace("Posted HTTP request.")
 
                 self.log.trace("Response: %s" % result['response'])
@@ -263,38 +295,47 @@ class HTTP():
                 else:
                     self.log.trace("Failed to post HTTP request %s %s (attempt %s). "
                                    "No response received from server."
-                                   "Re-attempting in 5 seconds ..." % (url, str(s_data), attempt))
+                                   "Re-attempting ..." % (url, str(s_data), attempt))
             except HTTPError, e:
                 self.log.trace(str(e))
                 self.log.trace("Failed to post HTTP request %s %s (attempt %s). "
-                               "Re-attempting in 5 seconds ..." % (url, str(s_data), attempt))
+                               "Re-attempting ..." % (url, str(s_data), attempt))
             except BaseException, e:
                 self.handle_exception(e,
                     operation="post HTTP request %s %s (attempt %s)" % (url, str(s_data), attempt))
-                self.log.trace("Re-attempting in 5 seconds ...")
+                self.log.trace("Re-attempting ...")
 
             if attempt >= max_attempts:
                 self.log.error("Failed to post HTTP request to the ViM server.")
                 break
 
             # increment
+            self.http_client.back_off(attempt)
             attempt += 1
-            sleep(5)
 
         # return
         if testcase is not None: testcase.processing = result['successful']
         return result
 
-    def query_server_table(self, url, columns, data=None, testcase=None):
-        """ Query a server table.
+    def query_server_table(self, url, columns, data=None, types=None, stream=False,
+                           testcase=None):
+        """ Query a server table. Rows are parsed as the response arrives (see tables).
         INPUT
             url: the full url to the server table.
             columns: the server table columns names map (see mapping).
+            data: a dict of query parameters.
+            types: a dict pairing column names with a function converting their values (when
+                accessed; values are otherwise strings).
+            stream: whether to return the rows as they are read (an iterator; stopping early leaves
+                the rest unread, and failing to read the rest is not retried) or not (a
+                tables.QueryResponse, read in full by get_http_request).
             testcase: a testcase object supplied when executing function as part of a testcase step.
         OUPUT
             successful: whether the function executed successfully or not.
-            response: the server response to the query.
-            time: the elapsed time while executing the query.
+            response: the server response to the query (rows, each a dict, or a tables.Record if
+                streamed).
+            time: the elapsed time of the request (to the first byte of the response, if streamed;
+                not including parsing).
         """
 
         self.log.debug("Querying server table:\t %s ..." % str(url))
@@ -307,41 +348,27 @@ class HTTP():
             # build query path
             query = url + '?' + query.replace('+', '%20').replace('%28', '(').replace('%29', ')')
             query = query.replace('%40', '@').replace('%21', '!')
-            # get query from server
-            data = self.get_http_request(query)
+            # get query from server (reading its body within the retries, unless streamed)
+            categories = url == self.server_url + CATEGORIES_PATH
+            data = self.get_http_request(query, stream=stream and not categories)
             response = data['response']
             time = data['time']
 
-            invalid_responses = [None, '', {}, 'HTTP Error 404']
-            if response not in invalid_responses\
-            and url != self.server_url + CATEGORIES_PATH:
-                # split into tab-delimited column values
-                entries = response.split('\n')
-                # build list of entry dicts
-                entry_list = []
-                for entry in entries:
-                    values = entry.split('\t')
-                    # rebuild response as dict
-                    response_dict = {}
-                    for i in range(0, len(columns)):
-                        try:
-                            response_dict[columns[i]] = values[i]
-                        except BaseException, e:
-                            #self.handle_exception(e, operation="build response as dict")
-                            pass
-                    # append to list of entries
-                    entry_list.append(response_dict)
-                # update response
-                response = entry_list
-            elif response == 'HTTP Error 404':
+            if response == 'HTTP Error 404':
                 pass
-            elif response in invalid_responses:
+            elif response in [None, '', {}]:
                 response = None
-            elif url == self.server_url + CATEGORIES_PATH:
-                response = eval(response)
+            elif categories:
+                response = literal_eval(response)
+                self.log.trace("Server response:\t%s" % str(response))
             else:
-                response = None
-            self.log.trace("Server response:\t%s" % str(response))
+                # parse rows of tab-delimited column values (dicts, unless streamed)
+                if not stream:
+                    response = StringIO(response)
+                response = iterate_rows(response, Columns(columns, types), records=stream)
+                if not stream:
+                    response = QueryResponse(response) or None
+                    self.log.trace("Server response:\t%d rows" % len(response or []))
             # return response
             result['response'] = response
             result['time'] = time
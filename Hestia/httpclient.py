@@ -0,0 +1,308 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+import socket
+from select import select
+from httplib import HTTPConnection, HTTPSConnection, HTTPException
+from urllib2 import Request, HTTPError, URLError
+from urlparse import urlsplit, urljoin
+from cookielib import CookieJar
+from cStringIO import StringIO
+from threading import Lock
+from time import sleep
+from timing import monotonic
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+MAX_IDLE_CONNECTIONS = 8    # idle (keep-alive) connections kept per host
+TIMEOUT = 60                # seconds to wait on a connection
+RETRIES = 3                 # retries of a request failing to connect (or losing its connection)
+BACKOFF = 0.5               # seconds before the first retry (doubled per retry)
+MAX_BACKOFF = 8.0
+MAX_REDIRECTS = 5
+
+REDIRECT_CODES = (301, 302, 303, 307)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+####################################################################################################
+# HTTP Client ######################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Response():
+    """ A (fully read) response to a request, with the interface of a urlopen response. """
+
+    def __init__(self, url, response, body, time):
+        self.url = url
+        self.code = response.status
+        self.msg = response.reason
+        self.headers = response.msg
+        self.body = body
+        self.time = time
+        self.fp = StringIO(body)
+
+    def read(self, size=-1):
+        return self.fp.read(size)
+
+    def info(self):
+        return self.headers
+
+    def getcode(self):
+        return self.code
+
+    def geturl(self):
+        return self.url
+
+    def close(self):
+        pass
+
+
+class StreamedResponse(Response):
+    """ A response whose body is read as it arrives (see HTTPClient.request). Its connection is
+    returned to the pool once the body is read, or closed if the response is closed first.
+    """
+
+    def __init__(self, url, response, time, client, key, connection):
+        Response.__init__(self, url, response, '', time)
+        self.response = response
+        self.client = client
+        self.key = key
+        self.connection = connection
+
+    def read(self, size=-1):
+        if self.connection is None:
+            return ''
+        data = self.response.read() if size < 0 else self.response.read(size)
+        if self.response.isclosed():
+            self.client.finish_response(self.key, self.connection, self.response)
+            self.connection = None
+        return data
+
+    def close(self):
+        """ Discard the rest of the body (closing the connection). """
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class CookieResponse():
+    """ The interface cookielib needs of a response (to extract its cookies). """
+
+    def __init__(self, headers):
+        self.headers = headers
+
+    def info(self):
+        return self.headers
+
+
+def is_connection_dropped(connection):
+    """ Return whether an idle connection was closed by the server (or is unusable) or not. """
+
+    if connection.sock is None:
+        return True
+    try:
+        # (an idle connection is only readable once the server has closed it)
+        return bool(select([connection.sock], [], [], 0)[0])
+    except (socket.error, ValueError):
+        return True
+
+
+class HTTPClient():
+    """ HTTP/1.1 client keeping connections alive (pooled per host) and cookies (shared by all
+    requests, e.g., the ViM session). Requests failing to connect, or losing a kept-alive
+    connection, are retried with exponential backoff; requests that are not idempotent (e.g.,
+    POST) are only retried if they failed to connect, as they may otherwise have been processed.
+    """
+
+    def __init__(self, max_idle_connections=MAX_IDLE_CONNECTIONS, timeout=TIMEOUT, retries=RETRIES,
+                 backoff=BACKOFF, max_backoff=MAX_BACKOFF):
+        """
+        INPUT
+            max idle connections: the idle connections kept per host.
+            timeout: the seconds to wait on a connection.
+            retries: the retries of a request failing to connect (or losing its connection).
+            backoff: the seconds before the first retry (doubled per retry, up to max backoff).
+        """
+
+        self.max_idle_connections = max_idle_connections
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.cookies = CookieJar()
+        self.pools = {}
+        self.lock = Lock()
+
+        # metrics
+        self.metrics = {'requests': 0, 'connections': 0, 'reused': 0, 'retries': 0}
+
+    def return_backoff(self, attempt):
+        """ Return the seconds to wait before a retry (the first is attempt 1). """
+        return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+
+    def back_off(self, attempt):
+        """ Wait before a retry (see return_backoff). """
+        sleep(self.return_backoff(attempt))
+
+    def acquire_connection(self, scheme, host):
+        """ Return an idle connection to a host (or a new one), and whether it was reused. """
+
+        while True:
+            with self.lock:
+                pool = self.pools.get((scheme, host))
+                connection = pool.pop() if pool else None
+                if connection is None:
+                    self.metrics['connections'] += 1
+                    break
+            if not is_connection_dropped(connection):
+                with self.lock:
+                    self.metrics['reused'] += 1
+                return connection, True
+            connection.close()
+        connection_class = HTTPSConnection if scheme == 'https' else HTTPConnection
+        connection = connection_class(host, timeout=self.timeout)
+        connection.connect()
+
+        # send requests at once (not waiting on the acknowledgement of their headers)
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection, False
+
+    def release_connection(self, scheme, host, connection):
+        """ Return a connection to its pool (closing it if the pool is full). """
+
+        with self.lock:
+            pool = self.pools.setdefault((scheme, host), [])
+            if len(pool) < self.max_idle_connections:
+                pool.append(connection)
+                return
+        connection.close()
+
+    def request(self, method, url, data=None, headers=None, stream=False):
+        """ Make a request (following redirects).
+        INPUT
+            method: the method of the request (e.g., GET).
+            url: the url of the request.
+            data: the body of the request (None if none).
+            headers: a dict of headers of the request.
+            stream: whether to return a (successful) response before reading its body or not.
+        OUTPUT
+            the Response (raising HTTPError for error responses, URLError if the request could not
+                be made).
+        """
+
+        t0 = monotonic()
+        for redirect in range(MAX_REDIRECTS + 1):
+            response, body, key, connection = self.send_request(method, url, data, headers or {},
+                                                                stream)
+            if response.status not in REDIRECT_CODES or not response.getheader('location'):
+                break
+
+            # follow redirect (as GET, unless it must keep its method)
+            url = urljoin(url, response.getheader('location'))
+            if response.status != 307:
+                method, data = 'GET', None
+
+        if connection is not None:
+            return StreamedResponse(url, response, monotonic() - t0, self, key, connection)
+        result = Response(url, response, body, monotonic() - t0)
+        if result.code >= 400:
+            raise HTTPError(url, result.code, result.msg, result.headers, result.fp)
+        return result
+
+    def send_request(self, method, url, data, headers, stream=False):
+        """ Send a request over a pooled connection (retrying lost connections), returning the
+        response, its body, and its pool and connection (if its body is yet to be read, see
+        request).
+        """
+
+        scheme, host, path, query, fragment = urlsplit(url)
+        if query:
+            path += '?' + query
+
+        # add session cookies (cookielib works on urllib2 requests)
+        cookie_request = Request(url, data, headers)
+        self.cookies.add_cookie_header(cookie_request)
+        headers = dict(cookie_request.header_items())
+        if data is not None and 'Content-type' not in headers and 'Content-Type' not in headers:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        attempt = 0
+        while True:
+            connection, reused, sent = None, False, False
+            try:
+                connection, reused = self.acquire_connection(scheme, host)
+                sent = True
+                connection.request(method, path or '/', data, headers)
+                response = connection.getresponse()
+                streamed = stream and 200 <= response.status < 300
+                body = None if streamed else response.read()
+                break
+            except (socket.error, HTTPException), e:
+                if connection is not None:
+                    connection.close()
+
+                # a request that may have reached the server is only repeated if that is safe
+                if sent and method not in IDEMPOTENT_METHODS:
+                    raise URLError(e)
+
+                # a kept-alive connection the server closed is retried at once (once per pool)
+                if reused:
+                    continue
+                attempt += 1
+                if attempt > self.retries:
+                    raise URLError(e)
+                self.metrics['retries'] += 1
+                self.back_off(attempt)
+
+        self.metrics['requests'] += 1
+        self.cookies.extract_cookies(CookieResponse(response.msg), cookie_request)
+        if streamed:
+            return response, body, (scheme, host), connection
+        self.finish_response((scheme, host), connection, response)
+        return response, body, None, None
+
+    def finish_response(self, key, connection, response):
+        """ Return the connection of a (read) response to its pool, unless the server closes it.
+        """
+
+        if response.will_close:
+            connection.close()
+        else:
+            self.release_connection(key[0], key[1], connection)
+
+    def open(self, url, data=None, stream=False):
+        """ Open a url (or urllib2 Request), like urlopen (see request).
+        """
+
+        if isinstance(url, Request):
+            return self.request(url.get_method(), url.get_full_url(), url.get_data(),
+                                dict(url.header_items()), stream)
+        return self.request('GET' if data is None else 'POST', url, data, stream=stream)
+
+    def clear_cookies(self):
+        self.cookies.clear()
+
+    def close(self):
+        """ Close all idle connections.
+        """
+
+        with self.lock:
+            pools, self.pools = self.pools, {}
+        for pool in pools.values():
+            for connection in pool:
+                connection.close()
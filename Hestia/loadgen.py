@@ -0,0 +1,295 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+import random
+from math import log
+from threading import Lock
+from time import sleep
+from timing import monotonic
+from Sisyphus.executor import Executor
+from pagequeries import PAGE_CFGS
+from clips import CLIPREQ_PATH, GEOCLIP_PATH
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+# arrival models (of requests issued at a target rate, regardless of how fast they complete)
+POISSON = 'poisson'         # exponentially distributed gaps (independent users)
+UNIFORM = 'uniform'         # evenly spaced
+
+MAX_WORKERS = 64            # requests in flight at once (later arrivals wait, and so are slower)
+DRAIN_TIMEOUT = 60          # seconds to wait for requests in flight once the load ends
+MAX_ERROR_RATE = 0.01       # fraction of requests that may fail for the load to be verified
+
+# latency histogram buckets (logarithmic, each BUCKET_WIDTH wider than the last)
+MIN_LATENCY = 0.0001        # seconds (shorter latencies are counted in the first bucket)
+BUCKET_WIDTH = 0.02
+PERCENTILES = (50, 95, 99)
+
+####################################################################################################
+# Latency Histogram ################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class LatencyHistogram():
+    """ Latencies of requests (and their errors), counted in logarithmic buckets so percentiles
+    are found to within BUCKET_WIDTH at a fixed cost, however many requests are recorded.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = Lock()
+
+    def record(self, latency, error=False):
+        index = int(log(max(latency, MIN_LATENCY) / MIN_LATENCY) / log(1 + BUCKET_WIDTH))
+        with self.lock:
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += latency
+            self.max = max(self.max, latency)
+            if error:
+                self.errors += 1
+
+    def return_percentile(self, percentile):
+        """ Return the latency below which percentile % of latencies fall (None if none). """
+
+        with self.lock:
+            if not self.count:
+                return None
+            rank = max(1, int(round(self.count * percentile / 100.0)))
+            seen = 0
+            for index in sorted(self.buckets):
+                seen += self.buckets[index]
+                if seen >= rank:
+                    # (upper bound of bucket)
+                    return min(MIN_LATENCY * (1 + BUCKET_WIDTH) ** (index + 1), self.max)
+
+    def return_summary(self):
+        """ Return a summary of the latencies.
+        OUTPUT
+            requests: the number of requests.
+            errors: the number of requests that failed.
+            error rate: the fraction of requests that failed.
+            mean: the mean latency.
+            p50, p95, p99: latency percentiles.
+            max: the maximum latency.
+        """
+
+        summary = {'requests': self.count, 'errors': self.errors,
+                   'error rate': float(self.errors) / self.count if self.count else 0.0,
+                   'mean': self.total / self.count if self.count else None, 'max': self.max}
+        for percentile in PERCENTILES:
+            summary['p%d' % percentile] = self.return_percentile(percentile)
+        return summary
+
+####################################################################################################
+# Load Generation ##################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class LoadGeneration():
+    """ Sub-library for generating load on the ViM server: requests (page queries, clip requests)
+    are issued concurrently at a target rate, and their latencies and errors recorded per request
+    type (e.g., per page).
+
+    Arrivals are open-loop: a request is issued when it is due, whether or not earlier ones have
+    completed, and its latency is measured from when it was due. A slow server therefore shows as
+    rising latency (and a backlog), rather than silently lowering the rate of requests.
+    """
+
+    def return_page_query_load(self, page, data={}, weight=1):
+        """ Return a load item querying a page (see generate_load).
+        INPUT
+            page: the page to query (one of PAGE_CFGS).
+            data: the query data (see query_page).
+            weight: the relative frequency of the item.
+        """
+
+        page = page.lower()
+        if page not in PAGE_CFGS:
+            raise KeyError("Unknown page %s." % page)
+
+        def query():
+            response = self.query_page(page, data, max_attempts=1)['query response']
+            return response is not None and response != 'HTTP Error 404'
+
+        return page, query, weight
+
+    def return_custom_clip_load(self, site_ids, length=None, weight=1):
+        """ Return a load item requesting custom clips (see generate_load).
+        INPUT
+            site ids: the sites to request clips from (one at random per request).
+            length: the length of the clips to request (random, up to 10 seconds, if None).
+            weight: the relative frequency of the item.
+        """
+
+        def request():
+            # (only the request, not its verification; see request_custom_clip)
+            start = "%d minutes ago" % random.randint(5, 4320)
+            packet = self.return_custom_clip_packet(random.choice(site_ids), start_time=start,
+                                                    length=length or random.randint(1, 10))
+            response = self.post_http_request(self.server_url + CLIPREQ_PATH, packet)['response']
+            return response is not None and response.lower() == 'ok'
+
+        return 'custom clip', request, weight
+
+    def return_geoclip_load(self, gps_points, weight=1):
+        """ Return a load item requesting GeoClips (see generate_load).
+        INPUT
+            gps points: the points to request GeoClips around ([lat, long]; one at random per
+                request).
+            weight: the relative frequency of the item.
+        """
+
+        def request():
+            # (only the request, not its verification; see request_geoclip)
+            packet = self.return_geoclip_packet(random.choice(gps_points))
+            response = self.post_http_request(self.server_url + GEOCLIP_PATH, packet)['response']
+            return response is not None and response.lower() == 'ok'
+
+        return 'geoclip', request, weight
+
+    def return_page_queries_load(self, pages=None):
+        """ Return load items querying each page (all of PAGE_CFGS if None), equally weighted. """
+        return [self.return_page_query_load(page) for page in (pages or sorted(PAGE_CFGS))]
+
+    def generate_load(self, load, rate, duration, max_workers=MAX_WORKERS, arrivals=POISSON,
+                      max_error_rate=MAX_ERROR_RATE, seed=None, testcase=None):
+        """ Generate load on the server.
+        INPUT
+            load: a list of load items (name, function, weight), e.g., from return_page_query_load;
+                each request runs a function (chosen at random, by weight), which returns whether
+                the request succeeded or not.
+            rate: the target number of requests per second.
+            duration: the number of seconds to issue requests for.
+            max workers: the number of requests that may be in flight at once.
+            arrivals: the arrival model (POISSON or UNIFORM).
+            max error rate: the fraction of requests that may fail for the load to be verified.
+            seed: the seed of the random choices (for repeatable loads).
+            testcase: a testcase object supplied when executing function as part of a testcase step.
+        OUPUT
+            successful: whether the function executed successfully or not.
+            verified: whether all requests completed (within the error rate) or not.
+            requests: the number of requests issued.
+            rate: the rate at which requests were issued.
+            latency: a summary (see LatencyHistogram.return_summary) of all requests.
+            items: a dict pairing each load item name with a summary of its requests.
+            max backlog: the most requests waiting (beyond those in flight) at once; if large, the
+                load exceeded what the server (or max workers) could handle.
+        """
+
+        self.log.debug("Generating %s requests per second for %s seconds ..." % (rate, duration))
+        result = {'successful': False, 'verified': False, 'requests': 0, 'rate': 0.0,
+                  'latency': None, 'items': {}, 'max backlog': 0}
+
+        executor = None
+        try:
+            generator = random.Random(seed)
+            names = [item[0] for item in load]
+            functions = [item[1] for item in load]
+            weights = [float(item[2]) for item in load]
+            cumulative = [sum(weights[:i + 1]) for i in range(len(weights))]
+            histograms = dict([(name, LatencyHistogram()) for name in names])
+            overall = LatencyHistogram()
+            state = {'outstanding': 0}
+            lock = Lock()
+
+            def run_request(number, due):
+                histogram = histograms[names[number]]
+                try:
+                    error = not functions[number]()
+                except BaseException, e:
+                    self.log.trace("Request %s failed: %s" % (names[number], str(e)))
+                    error = True
+                latency = monotonic() - due
+                histogram.record(latency, error)
+                overall.record(latency, error)
+                with lock:
+                    state['outstanding'] -= 1
+
+            # issue requests as they fall due
+            executor = Executor(max_workers)
+            start = monotonic()
+            end = start + duration
+            due = start
+            while True:
+                if arrivals == POISSON:
+                    due += generator.expovariate(rate)
+                else:
+                    due += 1.0 / rate
+                if due >= end:
+                    break
+                wait = due - monotonic()
+                if wait > 0:
+                    sleep(wait)
+
+                choice = generator.random() * cumulative[-1]
+                number = 0
+                while cumulative[number] <= choice and number < len(cumulative) - 1:
+                    number += 1
+                with lock:
+                    state['outstanding'] += 1
+                    result['max backlog'] = max(result['max backlog'],
+                                                state['outstanding'] - max_workers)
+                executor.submit(run_request, number, due)
+                result['requests'] += 1
+            result['rate'] = result['requests'] / (monotonic() - start)
+
+            # wait for requests in flight
+            drain_end = monotonic() + DRAIN_TIMEOUT
+            while state['outstanding'] > 0 and monotonic() < drain_end:
+                sleep(0.05)
+            if state['outstanding'] > 0:
+                self.log.warn("%d requests still in flight after %d seconds."
+                              % (state['outstanding'], DRAIN_TIMEOUT))
+
+            # summarize
+            for name in names:
+                summary = histograms[name].return_summary()
+                result['items'][name] = summary
+                if summary['requests']:
+                    self.log.trace("%s: %d requests, %.1f%% errors, p50 %.3fs, p95 %.3fs, "
+                                   "p99 %.3fs, max %.3fs." % (name, summary['requests'],
+                                                              summary['error rate'] * 100,
+                                                              summary['p50'], summary['p95'],
+                                                              summary['p99'], summary['max']))
+            result['latency'] = overall.return_summary()
+            if result['max backlog'] > 0:
+                self.log.warn("Requests waited on each other (backlog of up to %d); latencies "
+                              "include the wait." % result['max backlog'])
+
+            if state['outstanding'] == 0 and result['latency']['error rate'] <= max_error_rate:
+                self.log.trace("Verified load (%.1f requests per second)." % result['rate'])
+                result['verified'] = True
+            else:
+                self.log.warn("Failed to verify load: %.1f%% of requests failed."
+                              % (result['latency']['error rate'] * 100))
+
+            result['successful'] = True
+        except BaseException, e:
+            self.handle_exception(e, operation="generate load")
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_pending=True)
+
+        # return
+        if testcase is not None: testcase.processing = result['successful']
+        return result
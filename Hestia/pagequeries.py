@@ -12,6 +12,7 @@
 ####################################################################################################
 
 from mapping import HESTIA, HESTIA_PAGE_TO_CONFIG
+from tables import return_entry, return_projection
 from time import sleep
 
 ####################################################################################################
@@ -66,7 +67,7 @@ class PageQueries():
         try: sort = data['sort']
         except KeyError: sort = None
         #   start index
-        try: startIndex = data['sort']
+        try: startIndex = data['start index']
         except KeyError: startIndex = None
         #   filters
         try: filters = data['filters']
@@ -91,8 +92,8 @@ class PageQueries():
         try:
             # determine page and set config for that page
             pageCFG = PAGE_CFGS[page.lower()]
-            # define default query parameters
-            params = pageCFG['parameters']
+            # define default query parameters (a copy, as queries may be made concurrently)
+            params = dict(pageCFG['parameters'])
             #   translate default date/time filters using yesterday and today (health pages)
             try:
                 defaultWhere = params['where']
@@ -118,7 +119,7 @@ class PageQueries():
                 params['sort'] = sort
             # update start index
             if startIndex is not None:
-                params['start index'] = startIndex
+                params['startIndex'] = startIndex
             # update filters to apply
             if filters is not None:
                 params['where'] = self.translate_filter_list_to_where_statement(page,filters)['where']
@@ -166,24 +167,24 @@ class PageQueries():
                                     result['query response'])
             elif entryID is not None and result['query response'] is not None:
 
-                # verify page query response entry
+                # verify page query response entry (re-querying the same window of the page)
                 verified = False
                 attempt = 1
                 maxAttempts = max_attempts
+                response = result['query response']
                 while not verified and attempt <= maxAttempts:
-                    verified = self.verify_page_query_response_entry(page, result['query response'],
-                        entryID, expected)['verified']
+                    verification = self.verify_page_query_response_entry(page, response, entryID,
+                                                                         expected)
+                    verified = verification['verified']
+                    result['entry'] = verification['entry']
 
                     if not verified and attempt < maxAttempts:
                         self.log.trace("Failed to verify page query response entry (attempt %s). "
                             "Re-attempting in 5 seconds ..." % attempt)
                         sleep(5)
                         self.log.trace("Re-querying (just in case) ...")
-                        response = self.query_server_table(url, fieldNames, params)['response']
-                        verified = self.verify_page_query_response_entry(
-                            page, response, entryID, expected)['verified']
-                        if verified:
-                            break
+                        response = self.query_server_table(url, fieldNames, params,
+                                                           stream=True)['response'] or []
                     elif not verified and attempt >= maxAttempts:
                         self.log.warn("Failed to verify page query response entry. ")
                         break
@@ -195,13 +196,6 @@ class PageQueries():
                     attempt += 1
 
                 result['verified'] = verified
-                # determine entry
-                #   determine entry ID field name
-                pageCFG = PAGE_CFGS[page.lower()]
-                idField = pageCFG['entry id']
-                for entry in result['query response']:
-                    if str(entry[idField]) == str(entryID):
-                        result['entry'] = entry
 
             elif result['query response'] is None or result['query response'] == 'HTTP Error 404':
                 self.log.warn("No response returned from server.")
@@ -356,7 +350,9 @@ class PageQueries():
         """ Verify an entry was returned in a page query.
         INPUT
             page: the page that was queried.
-            query response: the response from the server page table query.
+            query response: the response from the server page table query (a tables.QueryResponse,
+                whose index on the entry ID field is built once and reused by later verifications,
+                or rows, read only until the entry is found).
             entryID: the ID of an entry to be verified was returned by the server
                 (i.e., siteID or eventID, etc.).
             expected: a data dictionary of optional field/values to verify match the returned
@@ -365,10 +361,11 @@ class PageQueries():
         OUPUT
             successful: whether the function executed successfully or not.
             verified: whether the operation was verified or not.
+            entry: the entry found (None if not found).
         """
 
         self.log.debug("Verifying entry %s in page query response ..." % entry_id)
-        result = {'successful': False, 'verified':False}
+        result = {'successful': False, 'verified':False, 'entry': None}
 
         try:
             # determine page and set config for that page
@@ -376,9 +373,8 @@ class PageQueries():
             # determine entry ID field name
             idField = pageCFG['entry id']
             # look for the entry matching the entry ID given in the query response
-            entry = None
-            for i in query_response:
-                if i[idField] == str(entry_id): entry = i
+            entry = return_entry(query_response, idField, entry_id)
+            result['entry'] = entry
             # verify entry was in response
             if entry is not None:
                 self.log.trace("Entry found in query response.")
@@ -386,12 +382,14 @@ class PageQueries():
             else: self.log.trace("Entry NOT found in query response.")
             # verify expected values (if given)
             if expected is not None:
-                # pull keys for list of values to verify
+                # pull keys for list of values to verify (and only those values of the entry)
                 fieldsToVerify = expected.keys()
+                values = return_projection(entry, [field.lower() for field in fieldsToVerify]) \
+                    if entry is not None else None
                 # verify each field value
                 for field in fieldsToVerify:
                     try:
-                        serverValue = entry.get(field.lower())
+                        serverValue = values.get(field.lower())
                         expectedValue = expected[field]
                         # convert clip status values from server to string values (see database maps
                         #   clip actions)
@@ -11,8 +11,6 @@
 ####################################################################################################
 ####################################################################################################
 
-from cookielib import CookieJar
-from urllib2 import build_opener, HTTPCookieProcessor, install_opener
 from mapping import HESTIA
 
 ####################################################################################################
@@ -49,10 +47,8 @@ class Session():
         result = {'successful': False, 'verified': False}
 
         try:
-            # create a new opener with a CookieJar to store the session id
-            cj = CookieJar()
-            opener = build_opener(HTTPCookieProcessor(cj))
-            install_opener(opener)
+            # start a new session (the client's cookie jar stores the session id)
+            self.http_client.clear_cookies()
 
             # define url and data object
             url = self.server_url + LOGIN_PATH
@@ -0,0 +1,257 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+BLOCK_SIZE = 64 * 1024      # bytes of a table response read at a time
+DELETED = object()          # (marks a column deleted from a Record)
+
+####################################################################################################
+# Server Tables ####################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Columns():
+    """ The columns of a server table (resolved once per query, and shared by its rows). """
+
+    def __init__(self, names, types=None):
+        """
+        INPUT
+            names: the column names, in order (see mapping).
+            types: a dict pairing column names with a function converting their (string) values
+                (e.g., int), applied when a value is accessed; other values are strings.
+        """
+
+        self.names = tuple(names)
+        self.indexes = {}
+        for index, name in enumerate(self.names):
+            self.indexes[name] = index
+        self.converters = None
+        if types:
+            self.converters = tuple([types.get(name) for name in self.names])
+
+    def return_dict(self, values):
+        """ Return a row (its values) as a dict (converting typed values). """
+
+        if self.converters is None:
+            return dict(zip(self.names, values))
+        row = {}
+        for name, converter, value in zip(self.names, self.converters, values):
+            row[name] = converter(value) if converter is not None else value
+        return row
+
+
+class Record(object):
+    """ A row of a server table: its (tab-separated) values, accessed by column name like a dict
+    (with the full dict API; keys set or deleted beyond the columns are kept apart). Rows missing
+    trailing values do not have those columns.
+    """
+
+    __slots__ = ('columns', '_values', '_extra')
+    __hash__ = None
+
+    def __init__(self, columns, values):
+        self.columns = columns
+        self._values = values
+        self._extra = None
+
+    def __getitem__(self, name):
+        if self._extra is not None and name in self._extra:
+            value = self._extra[name]
+            if value is DELETED:
+                raise KeyError(name)
+            return value
+        index = self.columns.indexes.get(name, len(self._values))
+        if index >= len(self._values):
+            raise KeyError(name)
+        if self.columns.converters is not None and self.columns.converters[index] is not None:
+            return self.columns.converters[index](self._values[index])
+        return self._values[index]
+
+    def __setitem__(self, name, value):
+        index = self.columns.indexes.get(name, len(self._values))
+        if index < len(self._values) and (self._extra is None or name not in self._extra):
+            self._values[index] = value
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[name] = value
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        if self._extra is None:
+            self._extra = {}
+        if self.columns.indexes.get(name, len(self._values)) < len(self._values):
+            self._extra[name] = DELETED
+        else:
+            del self._extra[name]
+
+    def __contains__(self, name):
+        if self._extra is not None and name in self._extra:
+            return self._extra[name] is not DELETED
+        return self.columns.indexes.get(name, len(self._values)) < len(self._values)
+
+    has_key = __contains__
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def keys(self):
+        keys = []
+        for name in self.columns.names[:len(self._values)]:
+            if name in self and name not in keys:
+                keys.append(name)
+        if self._extra is not None:
+            keys += [name for name in self._extra if name in self and name not in keys]
+        return keys
+
+    def values(self):
+        return [self[name] for name in self.keys()]
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    iterkeys = __iter__
+
+    def itervalues(self):
+        return iter(self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def pop(self, name, *default):
+        if name not in self:
+            if default:
+                return default[0]
+            raise KeyError(name)
+        value = self[name]
+        del self[name]
+        return value
+
+    def popitem(self):
+        keys = self.keys()
+        if not keys:
+            raise KeyError("popitem(): record is empty")
+        return keys[-1], self.pop(keys[-1])
+
+    def update(self, other=(), **kwargs):
+        if hasattr(other, 'keys'):
+            other = [(name, other[name]) for name in other.keys()]
+        for name, value in list(other) + kwargs.items():
+            self[name] = value
+
+    def clear(self):
+        for name in self.keys():
+            del self[name]
+
+    def copy(self):
+        """ Return the row as a (plain) dict. """
+        return dict(self.items())
+
+    return_dict = copy
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.copy()
+        return self.copy() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
+class QueryResponse(list):
+    """ The rows of a server table query (read in full, so entries are found scanning back from
+    the last row).
+    """
+
+    def return_entry(self, field, value):
+        """ Return the last row whose column has a value (None if none). """
+
+        value = str(value)
+        for row in reversed(self):
+            if str(row.get(field)) == value:
+                return row
+        return None
+
+
+def return_entry(rows, field, value):
+    """ Return the last row (of any rows, e.g., streamed) whose column has a value (None if none).
+    """
+
+    if isinstance(rows, QueryResponse):
+        return rows.return_entry(field, value)
+    value = str(value)
+    entry = None
+    for row in rows:
+        if str(row.get(field)) == value:
+            entry = row
+    return entry
+
+
+def return_projection(entry, fields):
+    """ Return a dict of the values of the given fields of an entry (None for missing fields). """
+    return dict([(field, entry.get(field)) for field in fields])
+
+
+def iterate_rows(response, columns, records=True):
+    """ Yield the rows of a server table response as they are read (closing it once read, or if
+    iteration stops early).
+    INPUT
+        response: the (file-like) response to read.
+        columns: the Columns of the table.
+        records: whether to yield Records or not (dicts).
+    OUTPUT
+        a Record (or dict) per (non-empty) line of the response.
+    """
+
+    row = Record if records else lambda columns, values: columns.return_dict(values)
+
+    try:
+        rest = ''
+        while True:
+            block = response.read(BLOCK_SIZE)
+            if not block:
+                break
+            lines = (rest + block).replace('\r', '').split('\n')
+            rest = lines.pop()
+            for line in lines:
+                if line:
+                    yield row(columns, line.split('\t'))
+        if rest:
+            yield row(columns, rest.split('\t'))
+    finally:
+        response.close()
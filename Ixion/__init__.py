@@ -12,9 +12,11 @@
 ####################################################################################################
 
 import socket, os
-from time import sleep
-from datetime import datetime
-from utility import checksum, return_execution_error
+from time import time
+from utility import return_execution_error
+from broadcaster import GPSBroadcaster, DEFAULT_RATE
+from tracks import Track, TrackPlayer, load_route, generate_route, parse_nmea_coordinate, \
+    return_xor, SYNTHETIC_TRACKS, SENTENCE_HEADER, SENTENCE_TRAILER, HEX
 
 ####################################################################################################
 # Globals ##########################################################################################
@@ -52,7 +54,14 @@ class Ixion():
         self.speed = 22.4
 
         # define targets for GPS simulation
-        self.dvrs_for_lan = self.determine_dvrs_for_lan_from_config()['dvrs']
+        self.config_mtime = None
+        config = self.determine_dvrs_for_lan_from_config()
+        self.dvrs_for_lan = config['dvrs']
+        self.rates = config['rates']
+        self.track_paths = config['tracks']
+
+        # track playback (see simulate_gps_data_for_addresses)
+        self.player = None
 
         # run
         #self.run()
@@ -74,37 +83,56 @@ class Ixion():
 
     def determine_dvrs_for_lan_from_config(self):
         """ Read config.txt and determine which dvrs should be sent GPS data via LAN.
+        Each line of the [LAN GPS SITES] segment is an address (ip, or ip:port), optionally followed
+        by the rate (sentences per second) at which to send to it, e.g., "172.22.48.136 10". Each
+        line of the (optional) [GPS TRACKS] segment is a GPX or CSV route file to play.
         OUPUT
             successful: whether the function executed successfully or not.
             dvrs: the DVRs (ip_address, gps_port) to send simulated GPS data to.
+            rates: a dict pairing each DVR with its rate.
+            tracks: the route files to play (relative to the config file).
         """
 
         #self.log.debug("Determining DVRs for LAN-based GPS simulation from config file at %s ..."
         #% CONFIG_FILE_PATH)
-        result = {'successful': False, 'dvrs': []}
+        result = {'successful': False, 'dvrs': [], 'rates': {}, 'tracks': []}
 
         try:
 
             # open config file
+            self.config_mtime = os.path.getmtime(CONFIG_FILE_PATH)
             f = open(CONFIG_FILE_PATH, 'r')
 
             # read lines into temporary list to parse
             configData = f.readlines()
+            f.close()
 
-            # look for lan DVR segment in config parameters
-            start = 0
-            end = None
+            # look for lan DVR (and track) segments in config parameters
+            segment = None
             for line in configData:
-                if "[LAN GPS SITES]" in line:
-                    start = int(configData.index(line)) + 1
-
-                    for n in configData[start:]:
-                        if "[" in n:
-                            end = int(configData.index(n))
-
-            # add to list of DVRs to send GPS data to via LAN
-            for address in configData[start:end]:
-                result['dvrs'].append((address.replace('\n',''),GPS_PORT))
+                line = line.strip()
+                if line.startswith('['):
+                    segment = line
+                    continue
+                if not line or line.startswith('#'):
+                    continue
+
+                if "[GPS TRACKS]" in segment:
+                    result['tracks'].append(os.path.join(os.path.dirname(CONFIG_FILE_PATH), line))
+                    continue
+                elif "[LAN GPS SITES]" not in segment:
+                    continue
+
+                # add to list of DVRs to send GPS data to via LAN
+                fields = line.split()
+                ip, port = fields[0], GPS_PORT
+                if ':' in ip:
+                    ip, port = ip.split(':')
+                dvr = (ip, int(port))
+                rate = float(fields[1]) if len(fields) > 1 else DEFAULT_RATE
+                if dvr not in result['rates']:
+                    result['dvrs'].append(dvr)
+                result['rates'][dvr] = rate
 
             #self.log.trace("Determined DVRs for LAN-based GPS simulation.")
             result['successful'] = True
@@ -114,159 +142,96 @@ class Ixion():
         # return
         return result
 
-    def simulate_gps_data_for_addresses(self):
-        """ Simulate GPS data and send it via LAN to DVRs.
-        OUPUT
+    def check_config_for_changes(self):
+        """ Re-read config.txt if it changed since last read.
+        OUTPUT
+            the DVRs (see determine_dvrs_for_lan_from_config, rates), or None if unchanged (or
+                unreadable).
+        """
+
+        try:
+            if os.path.getmtime(CONFIG_FILE_PATH) == self.config_mtime:
+                return None
+        except OSError:
+            return None
+
+        self.log.trace("Config file changed. Reloading DVRs ...")
+        config = self.determine_dvrs_for_lan_from_config()
+        if not config['successful']:
+            return None
+        self.dvrs_for_lan = config['dvrs']
+        self.rates = config['rates']
+        return self.rates
+
+    def load_tracks(self, start):
+        """ Load the tracks to play (from the route files in the config file, else synthetic).
+        INPUT
+            start: the (epoch) time playback starts.
+        OUTPUT
             successful: whether the function executed successfully or not.
+            player: a TrackPlayer of the tracks.
         """
 
-        self.log.debug("Simulating GPS Data for target addresses ...")
-        result = {'successful': False}
+        self.log.debug("Loading GPS tracks ...")
+        result = {'successful': False, 'player': None}
 
         try:
+            tracks = []
+            for path in self.track_paths:
+                try:
+                    tracks.append(Track(load_route(path), os.path.basename(path)))
+                except BaseException, e:
+                    self.handle_exception(e, operation="load GPS track %s" % path)
 
-            # define instance of latitude and longitude
-            lat = self.lat
-            long = self.long
-            speed = self.speed
+            # generate distinct routes around the default position
+            if not tracks:
+                origin = (parse_nmea_coordinate(self.lat), parse_nmea_coordinate(self.long))
+                for i in range(SYNTHETIC_TRACKS):
+                    tracks.append(Track(generate_route(i, origin), 'synthetic %d' % i))
 
-            # define initial targets
-            targets = self.dvrs_for_lan
+            result['player'] = TrackPlayer(tracks, start)
+            self.log.trace("Loaded %d GPS tracks (%d positions)."
+                           % (len(tracks), sum([len(track) for track in tracks])))
+            result['successful'] = True
+        except BaseException, e:
+            self.handle_exception(e, operation="load GPS tracks")
 
-            # create socket connection to each address and append to list
-            self.log.trace("Connecting to target addresses ...")
-            connections = []
-            unavailable_addresses = []
-            for target in targets:
-                try:
-                    connection = socket.create_connection(target)
-                    self.log.trace("Connected to %s." % str(target))
-                    connections.append({'connection': connection, 'address': target})
-                except BaseException, e:
-                    self.log.error(str(e))
-                    self.log.error("Failed to connect to %s." % str(target))
-                    unavailable_addresses.append(target)
+        # return
+        return result
 
-            self.log.trace("Sending GPS data ...")
-            while True:
+    def return_nmea_sentence(self, address, when):
+        """ Return the NMEA sentence to send to a DVR at a time (from its track).
+        INPUT
+            address: the address of the DVR.
+            when: the (epoch) time of the sentence.
+        """
 
-                try:
-                    # get current time and date
-                    date_time = datetime.utcnow()
-                    hour = date_time.hour
-                    min = date_time.minute
-                    sec = date_time.second
-                    day = date_time.day
-                    month = date_time.month
-                    year = int(str(date_time.year)[2:])
-                    # generate string
-                    nmea_string = self.generate_nmea_string([hour,min,sec],[day,month,year],lat,
-                        long, speed)['string']
-                    self.log.trace('%s' % nmea_string)
-                    # send GPS data through each connection
-                    for connection in connections:
-                        dst = connection['connection']
-                        address = connection['address']
-                        try:
-                            dst.send(nmea_string)
-                        except BaseException, e:
-                            self.log.error(str(e))
-                            self.log.error("Failed to send GPS data to %s." % str(address))
-                            connections.remove(connection)
-                            unavailable_addresses.append(address)
-                    # update position (move back and forth)
-                    interval = 1
-                    # switch direction based on interval limit
-                    if lat >= self.lat + interval and long >= self.long + interval\
-                    and not self.reversed:
-                        self.reversed = True
-                    elif self.reversed and lat <= self.lat and long <= self.long:
-                        self.reversed = False
-
-                    if not self.reversed:
-                        lat += 0.01
-                        long += 0.01
-                        speed += 0.1
-                    else:
-                        lat -= 0.01
-                        long -= 0.01
-                        speed -= 0.1
-
-                    # attempt to connect to any failed connections
-                    for address in unavailable_addresses:
-                        try:
-                            connection = socket.create_connection(address)
-                            self.log.trace("Connected to %s." % str(address))
-                            connections.append({'connection': connection, 'address': address})
-                            unavailable_addresses.remove(address)
-                        except BaseException, e:
-                            #log(str(e), 'error', Ixion)
-                            #log("Failed to connect to %s." % str(address), 'trace', 'Ixion')
-                            pass
-
-                    # check config file for any new DVRs added
-                    configDVRs = self.determine_dvrs_for_lan_from_config()['dvrs']
-                    for DVR in configDVRs:
-                        found = False
-                        # check successfully connected target list
-                        for connection in connections:
-                            if connection['address'] == DVR:
-                                found = True
-                            # check unavailable target list
-                        for ipaddress in unavailable_addresses:
-                            if ipaddress == DVR:
-                                found = True
-                            # add to unavailable target list if not found in either list
-                        if not found:
-                            unavailable_addresses.append(DVR)
-
-                    # check config file for any DVRs removed
-                    for connection in connections:
-                        found = False
-                        # check config data
-                        for DVR in configDVRs:
-                            if DVR == connection['address']:
-                                found = True
-
-                        # remove if not found
-                        if not found:
-                            self.log.trace("Closing connection to %s ..." % str(connection['address']))
-                            try:
-                                connection['connection'].close()
-                                connections.remove(connection)
-                            except BaseException, e:
-                                self.log.error(str(e))
-                                self.log.error("Failed to close connection to inactive address.")
-
-                    for address in unavailable_addresses:
-                        found = False
-                        # check config data
-                        for DVR in configDVRs:
-                            if DVR == address:
-                                found = True
-
-                        # remove if not found
-                        if not found:
-                            self.log.trace("No longer attempting to connectto %s ..." % str(address))
-                            try:
-                                unavailable_addresses.remove(address)
-                            except BaseException, e:
-                                self.log.error(str(e))
-                                self.log.error("Failed to close connection to inactive address.")
-
-                    # one message per second
-                    sleep(1)
+        return self.player.return_sentence(address, when)
 
-                except BaseException, e:
-                    self.log.error(str(e))
+    def simulate_gps_data_for_addresses(self, duration=None):
+        """ Simulate GPS data and send it via LAN to DVRs.
+        INPUT
+            duration: the seconds for which to simulate GPS data (indefinitely if None).
+        OUPUT
+            successful: whether the function executed successfully or not.
+            metrics: the broadcast metrics (see GPSBroadcaster.return_metrics).
+        """
 
-            # close all active connections
-            for connection in connections:
-                try:
-                    connection['connection'].close()
-                except BaseException, e:
-                    self.log.error(str(e))
+        self.log.debug("Simulating GPS Data for target addresses ...")
+        result = {'successful': False, 'metrics': None}
 
+        try:
+            # play a track to each DVR
+            self.player = self.load_tracks(time())['player']
+            if self.player is None:
+                return result
+
+            # broadcast to all DVRs from one loop (reloading them when the config file changes)
+            broadcaster = GPSBroadcaster(self.log, self.return_nmea_sentence, dict(self.rates),
+                                         self.check_config_for_changes)
+            broadcaster.run(duration)
+
+            result['metrics'] = broadcaster.return_metrics()
             self.log.trace("Simulated GPS data for target DVRs")
             result['successful'] = True
         except BaseException, e:
@@ -286,28 +251,15 @@ class Ixion():
 
         try:
 
-            # determine time values from list
-            hour = str(time[0]) if time[0] > 9 else '0%s' % time[0]
-            min = str(time[1]) if time[1] > 9 else '0%s' % time[1]
-            sec = str(time[2]) if time[2] > 9 else '0%s' % time[2]
-            # determine date values from list
-            day = str(date[0]) if date[0] > 9 else '0%s' % date[0]
-            month = str(date[1]) if date[1] > 9 else '0%s' % date[1]
-            year = str(date[2]) if date[2] > 9 else '0%s' % date[2]
-            fixtime = '%s%s%s' %(hour,min,sec)
-            fixlat = '%s,N' %lat if lat > 0 else '%s,S' % abs(lat)
-            fixlong = '%s,E' %long if long > 0 else '%s,W' % abs(long)
-            speed = speed
+            fixtime = '%02d%02d%02d' % tuple(time)
+            fixdate = '%02d%02d%02d' % tuple(date)
+            fixlat = '%s,N' % lat if lat > 0 else '%s,S' % abs(lat)
+            fixlong = '%s,E' % long if long > 0 else '%s,W' % abs(long)
             angle = '045.0'
-            fixdate = '%s%s%s' %(day,month,year)
-            #self.log.trace("Fix Date: %s." % fixdate)
-            magvar = ','
-            base_string = 'GPRMC,%(time)s,A,%(lat)s,%(long)s,%(speed)s,%(angle)s,%(date)s,%(magvar)s*'\
-                          % {'time':fixtime,'lat':fixlat,'long':fixlong,'speed':speed,'angle':angle,
-                             'date':fixdate,'magvar':magvar}
-            chk = checksum(base_string)['checksum']
-
-            result['string'] = '$' + base_string + chk+'\n'
+            base_string = '%s%s,A,%s,%s,%s,%s,%s%s' % (SENTENCE_HEADER, fixtime, fixlat, fixlong,
+                                                      speed, angle, fixdate, SENTENCE_TRAILER)
+
+            result['string'] = '$%s*%s\n' % (base_string, HEX[return_xor(base_string)])
 
             result['successful'] = True
         except BaseException, e:
@@ -0,0 +1,322 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+import socket
+import select
+import errno
+from heapq import heappush, heappop
+from time import time, sleep
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+DEFAULT_RATE = 1.0          # sentences per second sent to a target (unless configured otherwise)
+MAX_RATE = 50.0
+RETRY_DELAY = 1.0           # seconds before the first reconnection attempt (doubled per failure)
+MAX_RETRY_DELAY = 30.0
+CONNECT_TIMEOUT = 5.0       # seconds a connection attempt may take before it is retried
+CONFIG_CHECK_INTERVAL = 1.0 # seconds between checks for config changes
+SELECT_LIMIT = 500          # sockets per select call (below FD_SETSIZE on Windows)
+
+CONNECT_IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035)
+RETRY_ERRORS = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR, 10035)
+
+# target states
+DISCONNECTED = 'disconnected'
+CONNECTING = 'connecting'
+CONNECTED = 'connected'
+
+####################################################################################################
+# GPS Broadcaster ##################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Target():
+    """ A DVR to which GPS data is broadcast. """
+
+    def __init__(self, address, rate=DEFAULT_RATE):
+        self.address = address
+        self.set_rate(rate)
+
+        self.sock = None
+        self.state = DISCONNECTED
+        self.connect_started = None
+        self.retry_delay = RETRY_DELAY
+        self.retry_at = 0.0
+        self.active = True
+
+        # unsent data (the rest of a partly sent sentence, then the latest sentence)
+        self.partial = None
+        self.latest = None
+
+        # metrics
+        self.metrics = {'sent': 0, 'skipped': 0, 'connections': 0, 'failures': 0}
+
+    def set_rate(self, rate):
+        self.rate = min(max(float(rate), 0.01), MAX_RATE)
+        self.interval = 1.0 / self.rate
+
+    def return_next_due(self, now, start):
+        """ Return the next tick time of the target (ticks are aligned from the start time, so
+        targets with the same rate tick together).
+        """
+
+        ticks = int((now - start) / self.interval) + 1
+        return start + ticks * self.interval
+
+
+class GPSBroadcaster():
+    """ Broadcasts GPS sentences to many DVRs from one thread. Sockets are non-blocking: a target
+    that is not ready is skipped (keeping only its latest sentence, as stale GPS data is of no
+    use), so a slow or unreachable DVR never delays the others. Lost connections are retried with
+    exponential backoff.
+    """
+
+    def __init__(self, logger, return_sentence, targets=None, check_config=None):
+        """
+        INPUT
+            logger: An initialized instance of a logging class to use.
+            return sentence: a function returning the GPS sentence to send (given the target address
+                and the tick time).
+            targets: a dict pairing each target address (ip, port) with its rate (Hz).
+            check config: a function returning the (updated) targets, or None if unchanged (called
+                every CONFIG_CHECK_INTERVAL seconds).
+        """
+
+        # instance logger
+        self.log = logger
+
+        self.return_sentence = return_sentence
+        self.check_config = check_config
+        self.targets = {}
+        self.schedule = []
+        self.start = time()
+        self.running = False
+        self.update_targets(targets or {})
+
+    def update_targets(self, targets):
+        """ Reconcile the targets with the given (address: rate) targets.
+        """
+
+        configured = set(targets.keys())
+        current = set(self.targets.keys())
+
+        for address in current - configured:
+            self.log.trace("No longer sending GPS data to %s." % str(address))
+            target = self.targets.pop(address)
+            target.active = False
+            self.disconnect(target)
+
+        now = time()
+        for address in configured - current:
+            target = Target(address, targets[address])
+            self.targets[address] = target
+            heappush(self.schedule, (target.return_next_due(now, self.start), address, target))
+
+        for address in configured & current:
+            if self.targets[address].rate != targets[address]:
+                self.targets[address].set_rate(targets[address])
+
+    def run(self, duration=None):
+        """ Broadcast until stopped (or for duration seconds).
+        """
+
+        self.log.debug("Broadcasting GPS data to %d targets ..." % len(self.targets))
+        self.running = True
+        end = time() + duration if duration is not None else None
+        next_check = time() + CONFIG_CHECK_INTERVAL
+
+        try:
+            while self.running:
+                now = time()
+                if end is not None and now >= end:
+                    break
+
+                # reload targets
+                if self.check_config is not None and now >= next_check:
+                    next_check = now + CONFIG_CHECK_INTERVAL
+                    targets = self.check_config()
+                    if targets is not None:
+                        self.update_targets(targets)
+
+                # send due sentences
+                while self.schedule and self.schedule[0][0] <= now:
+                    due, address, target = heappop(self.schedule)
+                    if not target.active:
+                        continue
+                    self.tick(target, due, now)
+                    heappush(self.schedule,
+                             (target.return_next_due(now, self.start), address, target))
+
+                # wait for the next tick (or sockets becoming writable)
+                timeout = min(next_check, end or next_check) - time()
+                if self.schedule:
+                    timeout = min(timeout, self.schedule[0][0] - time())
+                self.wait(max(0.0, timeout))
+        finally:
+            self.close()
+
+        self.log.trace("Broadcast GPS data.")
+
+    def stop(self):
+        self.running = False
+
+    def tick(self, target, due, now):
+        """ Send the sentence due to a target (connecting it if need be).
+        """
+
+        if target.state == DISCONNECTED:
+            if now >= target.retry_at:
+                self.connect(target, now)
+            return
+        elif target.state == CONNECTING:
+            if now - target.connect_started > CONNECT_TIMEOUT:
+                self.fail(target, now, "timed out connecting")
+            return
+
+        sentence = self.return_sentence(target.address, due)
+        if target.partial is not None or target.latest is not None:
+            # still sending (keep only the latest sentence)
+            if target.latest is not None:
+                target.metrics['skipped'] += 1
+            target.latest = sentence
+            return
+        self.send(target, sentence, now)
+
+    def connect(self, target, now):
+        """ Start connecting to a target (without blocking).
+        """
+
+        target.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        target.sock.setblocking(0)
+        error = target.sock.connect_ex(target.address)
+        if error == 0:
+            self.connected(target)
+        elif error in CONNECT_IN_PROGRESS:
+            target.state = CONNECTING
+            target.connect_started = now
+        else:
+            self.fail(target, now, errno.errorcode.get(error, error))
+
+    def connected(self, target):
+        target.state = CONNECTED
+        target.retry_delay = RETRY_DELAY
+        target.metrics['connections'] += 1
+        self.log.trace("Connected to %s." % str(target.address))
+
+    def send(self, target, data, now):
+        """ Send data to a target, keeping any part not sent.
+        """
+
+        try:
+            sent = target.sock.send(data)
+        except socket.error, e:
+            if e.args[0] in RETRY_ERRORS:
+                target.partial = data
+                return
+            self.fail(target, now, str(e))
+            return
+
+        if sent < len(data):
+            target.partial = buffer(data, sent)
+        else:
+            target.partial = None
+            target.metrics['sent'] += 1
+
+    def wait(self, timeout):
+        """ Wait for connecting (or backlogged) sockets to become writable, up to timeout seconds.
+        """
+
+        waiting = [target for target in self.targets.values()
+                   if target.state == CONNECTING or (target.state == CONNECTED and
+                                                     (target.partial is not None or
+                                                      target.latest is not None))]
+        if not waiting:
+            sleep(timeout)
+            return
+
+        socks = dict([(target.sock.fileno(), target) for target in waiting])
+        fds = socks.keys()
+        writable = []
+        for i in range(0, len(fds), SELECT_LIMIT):
+            chunk = fds[i:i + SELECT_LIMIT]
+            try:
+                rlist, wlist, xlist = select.select([], chunk, chunk, timeout if i == 0 else 0)
+            except select.error, e:
+                if e.args[0] == errno.EINTR:
+                    return
+                raise
+            writable += wlist + xlist
+
+        now = time()
+        for fd in set(writable):
+            target = socks[fd]
+            if target.state == CONNECTING:
+                error = target.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if error != 0:
+                    self.fail(target, now, errno.errorcode.get(error, error))
+                    continue
+                self.connected(target)
+            elif target.partial is not None:
+                self.send(target, target.partial, now)
+            if target.state == CONNECTED and target.partial is None and target.latest is not None:
+                latest, target.latest = target.latest, None
+                self.send(target, latest, now)
+
+    def fail(self, target, now, reason):
+        """ Drop the connection to a target and schedule a reconnection (with backoff).
+        """
+
+        if target.state == CONNECTED or target.metrics['failures'] == 0:
+            self.log.error("Failed to send GPS data to %s (%s)." % (str(target.address), reason))
+        self.disconnect(target)
+        target.metrics['failures'] += 1
+        target.retry_at = now + target.retry_delay
+        target.retry_delay = min(target.retry_delay * 2, MAX_RETRY_DELAY)
+
+    def disconnect(self, target):
+        if target.sock is not None:
+            try:
+                target.sock.close()
+            except BaseException:
+                pass
+        target.sock = None
+        target.state = DISCONNECTED
+        target.partial = None
+        target.latest = None
+
+    def close(self):
+        for target in self.targets.values():
+            self.disconnect(target)
+
+    def return_metrics(self):
+        """ Return broadcast metrics.
+        OUTPUT
+            targets: the number of targets.
+            connected: the number of targets connected.
+            sent: the number of sentences sent.
+            skipped: the number of sentences skipped (replaced before they could be sent).
+            failures: the number of failed connections (or attempts).
+        """
+
+        metrics = {'targets': len(self.targets), 'connected': 0, 'sent': 0, 'skipped': 0,
+                   'failures': 0}
+        for target in self.targets.values():
+            if target.state == CONNECTED:
+                metrics['connected'] += 1
+            for key in ('sent', 'skipped', 'failures'):
+                metrics[key] += target.metrics[key]
+        return metrics
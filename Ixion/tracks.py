@@ -0,0 +1,300 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+import os
+import csv
+import random
+from math import radians, degrees, sin, cos, atan2, sqrt
+from array import array
+from datetime import datetime
+from calendar import timegm
+from xml.etree.cElementTree import iterparse
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+SAMPLE_RATE = 10.0          # positions per second precomputed for each track
+EARTH_RADIUS = 6371000.0    # meters
+KNOTS_PER_MPS = 1.943844
+DEFAULT_SPEED = 15.0        # meters per second along routes without times
+CLOSED_ROUTE_DISTANCE = 50  # meters between the ends of a route for it to be treated as a loop
+
+# synthetic routes
+DEFAULT_ORIGIN = (48.0, -122.1167)
+SYNTHETIC_TRACKS = 16
+SYNTHETIC_DURATION = 600    # seconds
+SYNTHETIC_AREA = 0.2        # degrees around the origin routes may start in
+
+# GPRMC sentence: $GPRMC,<hhmmss>,A,<lat>,<N|S>,<long>,<E|W>,<speed>,<course>,<ddmmyy>,,*<checksum>
+SENTENCE_HEADER = 'GPRMC,'
+SENTENCE_TRAILER = ',,'
+HEX = ['%02X' % i for i in range(256)]
+
+
+def return_xor(text):
+    """ Return the NMEA checksum (XOR of characters) of a string. """
+    value = 0
+    for character in text:
+        value ^= ord(character)
+    return value
+
+
+def format_latitude(latitude):
+    """ Return a latitude (decimal degrees) in NMEA format (ddmm.mmmm,N). """
+    minutes = round(abs(latitude) * 60, 4)
+    return '%02d%07.4f,%s' % (minutes // 60, minutes % 60, 'N' if latitude >= 0 else 'S')
+
+
+def format_longitude(longitude):
+    """ Return a longitude (decimal degrees) in NMEA format (dddmm.mmmm,E). """
+    minutes = round(abs(longitude) * 60, 4)
+    return '%03d%07.4f,%s' % (minutes // 60, minutes % 60, 'E' if longitude >= 0 else 'W')
+
+
+def parse_nmea_coordinate(value):
+    """ Return an NMEA-style coordinate (e.g., 4800.00 for 48 degrees 0 minutes) in degrees. """
+    degrees_part = int(abs(value) / 100)
+    decimal = degrees_part + (abs(value) - degrees_part * 100) / 60.0
+    return decimal if value >= 0 else -decimal
+
+
+def return_distance(start, end):
+    """ Return the distance (meters) between two positions (lat, long). """
+    lat1, lat2 = radians(start[0]), radians(end[0])
+    a = sin((lat2 - lat1) / 2) ** 2 + \
+        cos(lat1) * cos(lat2) * sin(radians(end[1] - start[1]) / 2) ** 2
+    return 2 * EARTH_RADIUS * atan2(sqrt(a), sqrt(1 - a))
+
+
+def return_course(start, end):
+    """ Return the course (degrees from north) from one position (lat, long) to another. """
+    lat1, lat2 = radians(start[0]), radians(end[0])
+    delta = radians(end[1] - start[1])
+    x = sin(delta) * cos(lat2)
+    y = cos(lat1) * sin(lat2) - sin(lat1) * cos(lat2) * cos(delta)
+    return degrees(atan2(x, y)) % 360
+
+####################################################################################################
+# Routes ###########################################################################################
+####################################################################################################
+####################################################################################################
+
+
+def parse_time(text):
+    """ Return an ISO 8601 time (e.g., 2014-05-01T12:00:00.5Z) as epoch seconds. """
+    text = text.strip().rstrip('Z')
+    fraction = 0.0
+    if '.' in text:
+        text, decimals = text.split('.', 1)
+        fraction = float('0.' + ''.join([c for c in decimals if c.isdigit()]) or 0)
+    return timegm(datetime.strptime(text[:19], '%Y-%m-%dT%H:%M:%S').timetuple()) + fraction
+
+
+def load_gpx_route(path):
+    """ Return the points (lat, long, time or None) of the track (or route) of a GPX file. """
+
+    points = []
+    point = None
+    for event, element in iterparse(path, events=('start', 'end')):
+        tag = element.tag.rsplit('}', 1)[-1]
+        if event == 'start' and tag in ('trkpt', 'rtept'):
+            point = [float(element.get('lat')), float(element.get('lon')), None]
+        elif event == 'end' and tag == 'time' and point is not None and element.text:
+            point[2] = parse_time(element.text)
+        elif event == 'end' and tag in ('trkpt', 'rtept'):
+            points.append(tuple(point))
+            point = None
+            element.clear()
+    return points
+
+
+def load_csv_route(path):
+    """ Return the points (lat, long, time or None) of a CSV file of lat,long[,time] rows (time in
+    seconds, or ISO 8601; a header row is skipped).
+    """
+
+    points = []
+    with open(path, 'rb') as f:
+        for row in csv.reader(f):
+            if len(row) < 2:
+                continue
+            try:
+                latitude, longitude = float(row[0]), float(row[1])
+            except ValueError:
+                continue
+            when = None
+            if len(row) > 2 and row[2].strip():
+                try:
+                    when = float(row[2])
+                except ValueError:
+                    when = parse_time(row[2])
+            points.append((latitude, longitude, when))
+    return points
+
+
+def load_route(path):
+    """ Return the points (lat, long, time or None) of a GPX or CSV route file. """
+
+    if os.path.splitext(path)[1].lower() == '.gpx':
+        return load_gpx_route(path)
+    return load_csv_route(path)
+
+
+def generate_route(seed, origin=DEFAULT_ORIGIN, duration=SYNTHETIC_DURATION):
+    """ Return the points (lat, long, time) of a synthetic route (a drive with gradual turns and
+    speed changes; each seed gives a different route).
+    """
+
+    generator = random.Random(seed)
+    latitude = origin[0] + generator.uniform(-SYNTHETIC_AREA, SYNTHETIC_AREA)
+    longitude = origin[1] + generator.uniform(-SYNTHETIC_AREA, SYNTHETIC_AREA)
+    course = generator.uniform(0, 360)
+    speed = generator.uniform(8, 25)
+
+    points = []
+    for second in xrange(int(duration) + 1):
+        points.append((latitude, longitude, float(second)))
+        course = (course + generator.gauss(0, 4)) % 360
+        speed = min(max(speed + generator.gauss(0, 0.5), 0.0), 35.0)
+        latitude += degrees(speed * cos(radians(course)) / EARTH_RADIUS)
+        longitude += degrees(speed * sin(radians(course)) / EARTH_RADIUS) / cos(radians(latitude))
+    return points
+
+####################################################################################################
+# Tracks ###########################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Track():
+    """ A route precomputed at a fixed sample rate: the NMEA sentence fields (all but time and date)
+    of each position, and their checksums. Routes that do not end where they start are played
+    back and forth.
+    """
+
+    def __init__(self, points, name='track', sample_rate=SAMPLE_RATE):
+        """
+        INPUT
+            points: the points of the route (lat, long, time or None).
+            name: the name of the track (e.g., its file).
+            sample rate: positions per second to precompute.
+        """
+
+        self.name = name
+        self.sample_rate = sample_rate
+        if len(points) < 2:
+            raise ValueError("Route %s has fewer than 2 points." % name)
+
+        # time the route (by distance, where not timed), relative to its start
+        positions = [(point[0], point[1]) for point in points]
+        timed = all([point[2] is not None for point in points])
+        times = [0.0]
+        for i in xrange(1, len(points)):
+            if timed:
+                times.append(points[i][2] - points[0][2])
+            else:
+                times.append(times[-1] + return_distance(positions[i - 1], positions[i]) /
+                             DEFAULT_SPEED)
+
+        # return along the route if it is not a loop
+        if return_distance(positions[0], positions[-1]) > CLOSED_ROUTE_DISTANCE:
+            total = times[-1]
+            for i in xrange(len(positions) - 2, -1, -1):
+                times.append(2 * total - times[i])
+                positions.append(positions[i])
+
+        # speed (knots) and course of each segment
+        motion = [(0.0, 0.0)]
+        for i in xrange(1, len(positions)):
+            distance = return_distance(positions[i - 1], positions[i])
+            span = times[i] - times[i - 1]
+            motion.append((distance / span * KNOTS_PER_MPS if span > 0 else 0.0,
+                           return_course(positions[i - 1], positions[i]) if distance > 0 else 0.0))
+
+        # sample positions (fields ',A,<lat>,<long>,<speed>,<course>,' and their checksums)
+        self.fields = []
+        self.checksums = array('B')
+        segment = 1
+        duration = times[-1]
+        for sample in xrange(max(1, int(duration * sample_rate))):
+            t = sample / sample_rate
+            while segment < len(times) - 1 and times[segment] < t:
+                segment += 1
+            start, end = positions[segment - 1], positions[segment]
+            span = times[segment] - times[segment - 1]
+            fraction = (t - times[segment - 1]) / span if span > 0 else 0.0
+            latitude = start[0] + (end[0] - start[0]) * fraction
+            longitude = start[1] + (end[1] - start[1]) * fraction
+            fields = ',A,%s,%s,%.1f,%05.1f,' % (format_latitude(latitude),
+                                                format_longitude(longitude), motion[segment][0],
+                                                motion[segment][1])
+            self.fields.append(fields)
+            self.checksums.append(return_xor(fields))
+
+    def __len__(self):
+        return len(self.fields)
+
+
+class TrackPlayer():
+    """ Streams tracks to DVRs. Each DVR is given a track (in turn) and a time offset into it, so
+    DVRs sharing a track report different positions; a sentence is assembled from the precomputed
+    fields of its position and the current time and date.
+    """
+
+    def __init__(self, tracks, start):
+        """
+        INPUT
+            tracks: the Tracks to play.
+            start: the (epoch) time playback started.
+        """
+
+        self.tracks = tracks
+        self.start = start
+        self.assignments = {}
+
+        # time and date fields of the current second (second, time, date, checksum)
+        self.clock = (None, None, None, 0)
+
+    def assign(self, address):
+        """ Assign a track and offset to a DVR (spreading DVRs sharing a track along it). """
+
+        number = len(self.assignments)
+        track = self.tracks[number % len(self.tracks)]
+        turn = number // len(self.tracks)
+        offset = int(len(track) * (turn * 0.381966)) % len(track)    # golden-ratio spacing
+        self.assignments[address] = (track, offset)
+        return self.assignments[address]
+
+    def return_sentence(self, address, when):
+        """ Return the NMEA sentence for a DVR at a time.
+        INPUT
+            address: the address of the DVR.
+            when: the (epoch) time of the sentence.
+        """
+
+        track, offset = self.assignments.get(address) or self.assign(address)
+
+        second = int(when)
+        if self.clock[0] != second:
+            date_time = datetime.utcfromtimestamp(second)
+            fix_time = date_time.strftime('%H%M%S')
+            fix_date = date_time.strftime('%d%m%y')
+            self.clock = (second, fix_time, fix_date,
+                          return_xor(SENTENCE_HEADER + fix_time + fix_date + SENTENCE_TRAILER))
+        second, fix_time, fix_date, checksum = self.clock
+
+        index = (int((when - self.start) * track.sample_rate) + offset) % len(track)
+        return '$%s%s%s%s%s*%s\n' % (SENTENCE_HEADER, fix_time, track.fields[index], fix_date,
+                                     SENTENCE_TRAILER, HEX[checksum ^ track.checksums[index]])
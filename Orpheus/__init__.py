@@ -192,7 +192,7 @@ class Orpheus(API, TestResults, TestRuns):
             try:
                 from Database import Database
                 self.database = Database(self.log)
-                case_dat = self.database.return_testcase_data(case_id)
+                case_dat = self.database.return_testcase_context(case_id)
                 case = case_dat['testcase data']
                 case_name = case['name']
                 case_type_id = case['type']
@@ -258,14 +258,11 @@ class Orpheus(API, TestResults, TestRuns):
             # translate procedure into list object
             procedure = []
             #steps = case.procedure.split(',')
-            steps = case['procedure'].split(',')
-            for step in steps:
+            for step in case_dat['procedure data']:
                 #step_id = int(step)
                 #step_name = db(db.procedure_steps.id == step_id).select()[0].name
 
-                step_id = int(step)
-                step_dat = self.database.return_procedure_step_data(step_id)['step data']
-                step_name = step_dat['name']
+                step_name = step['step data']['name']
 
                 procedure.append([step_name, ''])
 
@@ -11,30 +11,8 @@
 ####################################################################################################
 ####################################################################################################
 
-from threading import Thread
 import time
-
-####################################################################################################
-# Updated Thread Class #############################################################################
-##### handles return values from threads ###########################################################
-####################################################################################################
-
-
-class ThreadWithReturnValue(Thread):
-
-    def __init__(self, group=None, target=None, name=None,
-                 args=(), kwargs={}, Verbose=None):
-        Thread.__init__(self, group, target, name, args, kwargs, Verbose)
-        self._return = None
-
-    def run(self):
-        if self._Thread__target is not None:
-            self._return = self._Thread__target(*self._Thread__args,
-                                                **self._Thread__kwargs)
-
-    def join(self):
-        Thread.join(self)
-        return self._return
+from executor import Executor, Future, as_completed, CancelledError, TimeoutError, MAX_WORKERS
 
 ####################################################################################################
 # Globals ##########################################################################################
@@ -52,10 +30,12 @@ class ThreadWithReturnValue(Thread):
 class Sisyphus():
     """ Library for test data generation. """
 
-    def __init__(self, logger):
+    def __init__(self, logger, max_workers=MAX_WORKERS, processes=False):
         """
         INPUT
             logger: An initialized instance of a logging class to use.
+            max workers: the maximum number of tasks to run at once.
+            processes: whether to run tasks in a pool of processes or not (threads).
         """
 
         # instantialize logger
@@ -63,9 +43,9 @@ class Sisyphus():
 
         # thread attributes
         self.threads_to_run = []
-        self.running_threads = []
-        self.data = []
-        self.maxThreads = 256
+        self.maxThreads = max_workers
+        self.processes = processes
+        self.executor = None
 
         self.module_name = self.__class__.__name__
         self.log.info("Initializing %s module ..." % self.module_name)
@@ -99,49 +79,71 @@ class Sisyphus():
 
     def add_process_to_thread_queue(self, process, arguments=()):
 
-        # define thread
-        t = ThreadWithReturnValue(target=process, args=arguments)
+        # add process to threads to run list
+        self.threads_to_run.append((process, arguments))
+
+    def return_executor(self):
+        """ Return the executor of this instance (started on first use). """
+
+        if self.executor is None:
+            self.executor = Executor(self.maxThreads, self.processes)
+        return self.executor
+
+    def submit(self, process, *args, **kwargs):
+        """ Submit a process to run in the worker pool.
+        OUTPUT
+            the Future of the process (see Sisyphus.executor).
+        """
+
+        return self.return_executor().submit(process, *args, **kwargs)
+
+    def as_completed(self, futures, timeout=None):
+        """ Return a generator of futures as their processes are done (in the order they finish).
+        """
 
-        # add thread to threads to run list
-        self.threads_to_run.append(t)
+        return as_completed(futures, timeout)
 
-    def execute_pending_threads(self):
+    def execute_pending_threads(self, timeout=None):
+        """ Run all processes in the thread queue (in the order queued) and wait for them.
+        INPUT
+            timeout: the maximum seconds to wait for them (indefinitely if None).
+        OUTPUT
+            time: the seconds it took to run them all.
+            data: the return value of each process (in the order they finished; None if failed).
+            futures: the Future of each process (in the order queued), for timing.
+        """
 
-        result = {'time':None, 'data':[]}
+        result = {'time': None, 'data': [], 'futures': []}
 
         # set start timer
         t0 = time.time()
 
-        # execute each thread in threads to run list, de-populating list as they are run
+        # submit each process in the thread queue, de-populating the queue
+        executor = self.return_executor()
         while len(self.threads_to_run) > 0:
+            process, arguments = self.threads_to_run.pop(0)
+            result['futures'].append(executor.submit(process, *arguments))
 
-            # limit the number of concurrent running threads to the max threads allowed
-            while len(self.running_threads) < self.maxThreads and len(self.threads_to_run) > 0:
-                thread = self.threads_to_run.pop()
-                self.running_threads.append(thread)
-                thread.start()
-
-            # check each running thread to see if it is still running, de-populating list as they are cleared
-            while len(self.running_threads) > 0:
-                thread = self.running_threads.pop()
-                if thread.isAlive():
-                    # re-append to list (if not done executing yet)
-                    self.running_threads.append(thread)
-                else:
-                    # append return data from thread
-                    self.data.append(thread.join())
-
-                # pause loop to avoid CPU pinging (tested as working as low as 0.001, 0.0001 causes
-                #   CPU to be maxed out)
-                time.sleep(0.01)
+        # compile return data as each process finishes
+        for future in as_completed(result['futures'], timeout):
+            if future.exception() is not None:
+                self.log.error("Process %s failed:\n%s" % (future.name(), future.error_traceback))
+                result['data'].append(None)
+            else:
+                result['data'].append(future.result())
 
         # end timer and report elapsed time
         t = time.time() - t0
         result['time'] = t
         self.log.trace("All threads executed in %s seconds." % t)
 
-        # compile return data
-        result['data'] = self.data
-
         # return
-        return result
\ No newline at end of file
+        return result
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """ Shut down the worker pool (see Executor.shutdown).
+        """
+
+        if self.executor is not None:
+            self.executor.shutdown(wait, cancel_pending)
+            self.executor = None
@@ -0,0 +1,336 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+from threading import Thread, Lock, Condition
+from Queue import Queue, Empty
+from multiprocessing import Pool
+from traceback import format_exc
+from time import time
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+MAX_WORKERS = 256
+
+# task states
+PENDING = 'pending'
+RUNNING = 'running'
+CANCELLED = 'cancelled'
+FINISHED = 'finished'
+
+
+class CancelledError(Exception):
+    """ The task of a future was cancelled. """
+    pass
+
+
+class TimeoutError(Exception):
+    """ A task did not finish in time. """
+    pass
+
+####################################################################################################
+# Future ###########################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Future():
+    """ The pending result of a task submitted to an Executor. """
+
+    def __init__(self, process, args=(), kwargs={}):
+        self.process = process
+        self.args = args
+        self.kwargs = kwargs
+
+        self.condition = Condition()
+        self.state = PENDING
+        self.value = None
+        self.error = None
+        self.error_traceback = None
+        self.callbacks = []
+
+        # timing
+        self.queued = time()
+        self.started = None
+        self.finished = None
+
+    def cancel(self):
+        """ Cancel the task, if it has not started.
+        OUTPUT
+            whether the task is cancelled or not.
+        """
+
+        with self.condition:
+            if self.state in (RUNNING, FINISHED):
+                return False
+            if self.state == PENDING:
+                self.state = CANCELLED
+                self.finished = time()
+                self.condition.notify_all()
+        self.run_callbacks()
+        return True
+
+    def cancelled(self):
+        return self.state == CANCELLED
+
+    def running(self):
+        return self.state == RUNNING
+
+    def done(self):
+        return self.state in (CANCELLED, FINISHED)
+
+    def set_running(self):
+        """ Mark the task as running (return False if it was cancelled). """
+        with self.condition:
+            if self.state != PENDING:
+                return False
+            self.state = RUNNING
+            self.started = time()
+        return True
+
+    def set_result(self, value):
+        with self.condition:
+            self.value = value
+            self.state = FINISHED
+            self.finished = time()
+            self.condition.notify_all()
+        self.run_callbacks()
+
+    def set_exception(self, error, error_traceback=None):
+        with self.condition:
+            self.error = error
+            self.error_traceback = error_traceback
+            self.state = FINISHED
+            self.finished = time()
+            self.condition.notify_all()
+        self.run_callbacks()
+
+    def wait(self, timeout=None):
+        """ Wait (up to timeout seconds, or indefinitely if None) for the task to be done. """
+        with self.condition:
+            if not self.done():
+                self.condition.wait(timeout)
+            if not self.done():
+                raise TimeoutError("Task %s did not finish in %s seconds." % (self.name(), timeout))
+
+    def result(self, timeout=None):
+        """ Return the return value of the task (raising its exception if it failed).
+        INPUT
+            timeout: the maximum seconds to wait for the task (indefinitely if None).
+        """
+
+        self.wait(timeout)
+        if self.state == CANCELLED:
+            raise CancelledError("Task %s was cancelled." % self.name())
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def exception(self, timeout=None):
+        """ Return the exception raised by the task (None if it did not fail).
+        INPUT
+            timeout: the maximum seconds to wait for the task (indefinitely if None).
+        """
+
+        self.wait(timeout)
+        if self.state == CANCELLED:
+            raise CancelledError("Task %s was cancelled." % self.name())
+        return self.error
+
+    def add_done_callback(self, callback):
+        """ Call callback (with the future) once the task is done (now, if it is). """
+        with self.condition:
+            if not self.done():
+                self.callbacks.append(callback)
+                return
+        callback(self)
+
+    def run_callbacks(self):
+        with self.condition:
+            callbacks = self.callbacks
+            self.callbacks = []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except BaseException:
+                pass
+
+    def name(self):
+        return getattr(self.process, '__name__', str(self.process))
+
+    def return_timing(self):
+        """ Return the timing of the task.
+        OUTPUT
+            waited: the seconds the task waited (queued) to start.
+            ran: the seconds the task ran (None if it has not finished or never started).
+            total: the seconds from submission to done (None if not done).
+        """
+
+        timing = {'waited': None, 'ran': None, 'total': None}
+        if self.started is not None:
+            timing['waited'] = self.started - self.queued
+            if self.finished is not None:
+                timing['ran'] = self.finished - self.started
+        if self.finished is not None:
+            timing['total'] = self.finished - self.queued
+        return timing
+
+
+def as_completed(futures, timeout=None):
+    """ Return a generator of futures as their tasks are done (in the order they finish).
+    INPUT
+        futures: the futures to wait on.
+        timeout: the maximum seconds to wait for all of them (indefinitely if None).
+    """
+
+    futures = list(futures)
+    done = Queue()
+    for future in futures:
+        future.add_done_callback(done.put)
+
+    deadline = time() + timeout if timeout is not None else None
+    for i in xrange(len(futures)):
+        try:
+            if deadline is None:
+                # (a long timeout keeps the wait interruptible)
+                yield done.get(True, 86400)
+            else:
+                yield done.get(True, max(0, deadline - time()))
+        except Empty:
+            raise TimeoutError("%d of %d tasks did not finish in %s seconds."
+                               % (len(futures) - i, len(futures), timeout))
+
+####################################################################################################
+# Executor #########################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Executor():
+    """ Runs submitted tasks on a bounded pool of worker threads (started as needed), in the order
+    submitted. In process mode the workers hand tasks to a pool of processes instead (tasks must
+    then be picklable, i.e., module-level functions with picklable arguments).
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, processes=False):
+        """
+        INPUT
+            max workers: the maximum number of tasks to run at once.
+            processes: whether to run tasks in a pool of processes or not (threads).
+        """
+
+        self.max_workers = max_workers
+        self.pool = Pool(max_workers) if processes else None
+
+        self.tasks = Queue()
+        self.lock = Lock()
+        self.workers = []
+        self.idle = 0
+        self.unclaimed = 0
+        self.shut_down = False
+
+    def submit(self, process, *args, **kwargs):
+        """ Submit a task.
+        INPUT
+            process: the function to run.
+            args, kwargs: the arguments with which to run it.
+        OUTPUT
+            the Future of the task.
+        """
+
+        future = Future(process, args, kwargs)
+        with self.lock:
+            if self.shut_down:
+                raise RuntimeError("Cannot submit %s to a shut down executor." % future.name())
+            self.tasks.put(future)
+            self.unclaimed += 1
+
+            # start another worker if the idle ones cannot take this task
+            if self.unclaimed > self.idle and len(self.workers) < self.max_workers:
+                worker = Thread(target=self.work)
+                worker.daemon = True
+                self.workers.append(worker)
+                worker.start()
+        return future
+
+    def map(self, process, *iterables):
+        """ Submit a task for each set of arguments, returning a generator of their results (in
+        order).
+        """
+
+        futures = [self.submit(process, *args) for args in zip(*iterables)]
+        for future in futures:
+            yield future.result()
+
+    def work(self):
+        """ Run tasks until shut down (a worker thread). """
+
+        while True:
+            with self.lock:
+                self.idle += 1
+            future = self.tasks.get()
+            with self.lock:
+                self.idle -= 1
+                if future is not None:
+                    self.unclaimed -= 1
+            if future is None:
+                return
+            self.run_task(future)
+
+    def run_task(self, future):
+        if not future.set_running():
+            return
+        try:
+            if self.pool is not None:
+                value = self.pool.apply(future.process, future.args, future.kwargs)
+            else:
+                value = future.process(*future.args, **future.kwargs)
+        except BaseException, e:
+            future.set_exception(e, format_exc())
+        else:
+            future.set_result(value)
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """ Stop accepting tasks and stop the workers once the tasks submitted are done.
+        INPUT
+            wait: whether to wait for the tasks to be done or not.
+            cancel pending: whether to cancel the tasks not yet started or not.
+        """
+
+        with self.lock:
+            if self.shut_down:
+                return
+            self.shut_down = True
+            workers = list(self.workers)
+
+        if cancel_pending:
+            while True:
+                try:
+                    future = self.tasks.get_nowait()
+                except Empty:
+                    break
+                if future is not None:
+                    future.cancel()
+
+        for worker in workers:
+            self.tasks.put(None)
+        if wait:
+            for worker in workers:
+                worker.join()
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+        elif self.pool is not None:
+            self.pool.close()
@@ -12,13 +12,18 @@
 ####################################################################################################
 
 from utility import return_execution_error, return_machine_ip_address, read_file_into_list
-from time import sleep
+from time import sleep, time
 import socket
 from select import select
 from binascii import hexlify, unhexlify
 from os import getcwdu
-from threading import Thread
+from threading import Thread, Lock
+from multiprocessing import Process
 from encoder import Encoder
+from engine import DVREngine, run_engine_in_process
+from capture import CaptureWriter, Replayer, FROM_SITE, FROM_DVR
+from relay import FanOutRelay, CLONE_BUFFER_LIMIT, DISCONNECT
+from transport import Transport, open_connection, open_listener, return_socket_name
 from mapping import AdminSDKMap, SearchSDKMap
 
 ####################################################################################################
@@ -40,6 +45,21 @@ CONFIG_FILE_PATH = ROOT_PATH + "\\config.ini"
 setup_virtual_ips = 'FOR /L %A IN (1,1,255) DO netsh interface ipv4 add address "Local Area Connection" 172.22.65.%A 255.255.0.0'
 teardown_virtual_ips = 'FOR /L %A IN (1,1,255) DO netsh interface ipv4 delete address "Local Area Connection" addr=172.22.80.%A'
 
+# number of GPS events each simulated site serves to the search SDK (by default)
+NUM_SIMULATED_GPS_EVENTS = 300
+
+# search SDK message markers (binary), in order of precedence when matching requests
+SEARCH_IGNORED_REQUEST_MARKER = unhexlify('16000000')
+SEARCH_CAMERA_LIST_REQUEST_MARKER = unhexlify('0d000000')
+SEARCH_REQUEST_3B_MARKER = unhexlify('530000')
+SEARCH_GPS_EVENTS_REQUEST = unhexlify('050000006d')
+
+# length (bytes) of the SDK message header used to match unknown requests
+SDK_HEADER_LENGTH = 4
+
+# search SDK response to the camera list request ('0d000000')
+SEARCH_CAMERA_LIST_RESPONSE = '09000000600d4a000009000000600d46000009000000600d42000009000000600d3e000009000000600d3a000009000000600d36000009000000600d32000009000000600d2e000009000000600d2a000009000000600d26000009000000600d22000009000000600d1e000009000000600d1a000009000000600d16000009000000600d12000009000000600d0e000009000000600d0a000009000000600d0600000900000060cd7d00000900000060cd7900000900000060cd7500000900000060cd7100000900000060cd6d00000900000060cd6900000900000060cd65000009000000604a0e000009000000604a0a000009000000604a0600000500000061'
+
 ####################################################################################################
 # Tantalus (DVR Simulation) ########################################################################
 ####################################################################################################
@@ -49,12 +69,15 @@ teardown_virtual_ips = 'FOR /L %A IN (1,1,255) DO netsh interface ipv4 delete ad
 class Tantalus(Encoder):
     """ Library for DVR simulation and interaction. """
 
-    def __init__(self, logger, sisyphus, num_sites=10, output_on=False):
+    def __init__(self, logger, sisyphus, num_sites=10, output_on=False,
+                 num_gps_events=NUM_SIMULATED_GPS_EVENTS):
         """
         INPUT
             logger: An initialized instance of a logging class to use.
             sisyphus: Sisyphus submodule for multi-threading.
             mode: the mode to run in.
+            num gps events: the number of GPS events (one per second, up to the time of
+                connection) each simulated site serves to the search SDK.
         """
 
         # instantialize logger
@@ -98,6 +121,13 @@ class Tantalus(Encoder):
         # size of data packets to receive
         self.packet_size = 16284
 
+        # GPS event history of each simulated site
+        self.num_gps_events = num_gps_events
+
+        # pre-encoded response tables (by port and site id, see return_dvr_response_table)
+        self.dvr_response_tables = {}
+        self.dvr_response_tables_lock = Lock()
+
         # set default socket timeout
         #socket.setdefaulttimeout(15)
 
@@ -182,13 +212,14 @@ class Tantalus(Encoder):
         # return
         return result
 
-    def run(self):
+    def run(self, capture_path=None):
         # open output file
         self.search_output = open(OUTPUT_PATH_SEARCH, 'w')
         self.admin_output = open(OUTPUT_PATH_ADMIN, 'w')
-        self.open_persistent_bridge_to_dvr(self.vim_admin_listener_address, self.vim_search_listener_address, self.dvr_ip)
+        self.open_persistent_bridge_to_dvr(self.vim_admin_listener_address, self.vim_search_listener_address, self.dvr_ip,
+                                           capture_path=capture_path)
 
-    def open_persistent_bridge_to_dvr(self, admin_listener, search_listener, dvr_ip):
+    def open_persistent_bridge_to_dvr(self, admin_listener, search_listener, dvr_ip, capture_path=None):
         """ Open a persistent bridge between local ViM server and a live DVR.
         INPUT
             admin listener: the address (ip, port) to which to listen for communications
@@ -196,23 +227,28 @@ class Tantalus(Encoder):
             search listener: the address (ip, port) to which to listen for communications
                 to relay to the dvr admin port.
             dvr ip: the ip address of the DVR to which to connect.
+            capture path: the file path of a capture (see Tantalus.capture) to record the bridged
+                traffic to, for replay (None if not recording).
         """
 
         self.log.debug("Opening persistent bridge between ViM and DVR at %s ..." % dvr_ip)
         result = {}
 
         try:
+            # open capture
+            capture = CaptureWriter(capture_path) if capture_path is not None else None
+
 
             # loop single connection bridge
             while True:
 
                 # add threads for bridging admin port to thread queue
                 self.sisyphus.add_process_to_thread_queue(self.bridge_two_addresses,
-                    (admin_listener, (dvr_ip, self.admin_port)))
+                    (admin_listener, (dvr_ip, self.admin_port), capture))
 
                 # add threads for bridging search port to thread queue
                 self.sisyphus.add_process_to_thread_queue(self.bridge_two_addresses,
-                    (search_listener, (dvr_ip, self.search_port)))
+                    (search_listener, (dvr_ip, self.search_port), capture))
 
                 # execute threads in thread queue
                 self.sisyphus.execute_pending_threads()
@@ -223,8 +259,13 @@ class Tantalus(Encoder):
         # return
         return result
 
-    def run_in_dvr_response_simulation_mode(self):
+    def run_in_dvr_response_simulation_mode(self, threaded=False, loops=1):
         """ Respond to site connections from ViM with canned data responses to simulate a DVR connection.
+        INPUT
+            threaded: whether to serve each site connection in its own thread (rather than from
+                event loops).
+            loops: the number of event loops (processes) over which to spread the sites (e.g.,
+                one per core).
         """
 
         self.log.debug("Running in DVR response simulation mode ...")
@@ -238,6 +279,14 @@ class Tantalus(Encoder):
             self.admin_sdk_map = AdminSDKMap()
             self.search_sdk_map = SearchSDKMap()
 
+            if not threaded:
+                # serve all sites from event loops
+                if loops > 1:
+                    self.run_dvr_simulation_engine_processes(loops)
+                else:
+                    self.run_dvr_simulation_engine()
+                return result
+
             # listen for incoming communications (multi-threaded)
             for address in self.admin_listener_addresses:
                 self.sisyphus.add_process_to_thread_queue(
@@ -255,6 +304,352 @@ class Tantalus(Encoder):
         # return
         return result
 
+    def run_dvr_simulation_engine(self, site_ids=None, idle_timeout=None):
+        """ Serve the admin and search ports of the simulated sites from a single event loop
+        (see DVREngine), until interrupted.
+        INPUT
+            site ids: the ids (1 to number of sites) of the sites to serve (None if all).
+            idle timeout: seconds after which to close a connection that has not communicated
+                (None if never).
+        OUTPUT
+            successful: whether the function executed successfully or not.
+            metrics: the engine metrics (see DVREngine.return_metrics).
+        """
+
+        if site_ids is None:
+            site_ids = range(1, self.num_sites + 1)
+        self.log.debug("Running DVR simulation engine for %d sites ..." % len(site_ids))
+        result = {'successful': False, 'metrics': {}}
+
+        try:
+            # run mode-specific variables (if not already running in simulation mode)
+            if not hasattr(self, 'syslog_event_time_counter'):
+                self.syslog_event_time_counter = 1
+                self.admin_sdk_map = AdminSDKMap()
+                self.search_sdk_map = SearchSDKMap()
+
+            addresses = []
+            for site_id in site_ids:
+                addresses.append(self.admin_listener_addresses[site_id - 1])
+                addresses.append(self.search_listener_addresses[site_id - 1])
+
+            engine = DVREngine(self, addresses, self.log, packet_size=self.packet_size,
+                               idle_timeout=idle_timeout)
+            try:
+                engine.run()
+            finally:
+                result['metrics'] = engine.return_metrics()
+                self.log.trace("Engine metrics: %s." % str(result['metrics']))
+
+            self.log.trace("Ran DVR simulation engine.")
+            result['successful'] = True
+        except BaseException, e:
+            self.handle_exception(e, operation="run DVR simulation engine")
+
+        # return
+        return result
+
+    def run_dvr_simulation_engine_processes(self, loops):
+        """ Serve the simulated sites from an event loop in each of a number of processes (sites
+        spread evenly over them), until interrupted.
+        INPUT
+            loops: the number of event loops (processes) to run.
+        OUTPUT
+            successful: whether the function executed successfully or not.
+        """
+
+        self.log.debug("Running DVR simulation engine in %d processes ..." % loops)
+        result = {'successful': False}
+
+        try:
+            processes = []
+            for loop in range(loops):
+                site_ids = range(loop + 1, self.num_sites + 1, loops)
+                process = Process(target=run_engine_in_process,
+                                  args=(self.num_sites, site_ids, loop + 1, self.num_gps_events),
+                                  name="tantalus loop %d" % (loop + 1))
+                process.daemon = True
+                process.start()
+                processes.append(process)
+                self.log.trace("Started loop %d for %d sites." % (loop + 1, len(site_ids)))
+
+            for process in processes:
+                process.join()
+
+            self.log.trace("Ran DVR simulation engine in %d processes." % loops)
+            result['successful'] = True
+        except BaseException, e:
+            self.handle_exception(e, operation="run DVR simulation engine in %d processes" % loops)
+
+        # return
+        return result
+
+    def run_capture_replay_engine(self, capture_path, speed=1.0, site_ids=None, idle_timeout=None):
+        """ Serve the sessions of a capture (see Tantalus.capture) to the simulated sites from a
+        single event loop (see DVREngine), until interrupted.
+        INPUT
+            capture path: the file path of the capture to replay.
+            speed: the replay speed (e.g., 2.0 for twice as fast; None to send without delays).
+            site ids: the ids (1 to number of sites) of the sites to serve (None if all).
+            idle timeout: seconds after which to close a connection that has not communicated
+                (None if never).
+        OUTPUT
+            successful: whether the function executed successfully or not.
+            metrics: the engine metrics (see DVREngine.return_metrics).
+        """
+
+        if site_ids is None:
+            site_ids = range(1, self.num_sites + 1)
+        self.log.debug("Replaying capture %s to %d sites ..." % (capture_path, len(site_ids)))
+        result = {'successful': False, 'metrics': {}}
+
+        try:
+            replayer = Replayer(capture_path, self.log, speed=speed)
+
+            addresses = []
+            for site_id in site_ids:
+                addresses.append(self.admin_listener_addresses[site_id - 1])
+                addresses.append(self.search_listener_addresses[site_id - 1])
+
+            engine = DVREngine(replayer, addresses, self.log, packet_size=self.packet_size,
+                               idle_timeout=idle_timeout)
+            try:
+                engine.run()
+            finally:
+                result['metrics'] = engine.return_metrics()
+                self.log.trace("Engine metrics: %s." % str(result['metrics']))
+                replayer.close()
+
+            self.log.trace("Replayed capture %s." % capture_path)
+            result['successful'] = True
+        except BaseException, e:
+            self.handle_exception(e, operation="replay capture %s" % capture_path)
+
+        # return
+        return result
+
+    def compile_dvr_responses(self, responses):
+        """ Decode a list of hex-encoded responses into binary messages (responses that fail to
+        decode are logged and skipped).
+        """
+
+        messages = []
+        if isinstance(responses, basestring):
+            responses = [responses]
+        for response in responses:
+            try:
+                messages.append(unhexlify(response))
+            except BaseException:
+                self.log.error('String:\t%s' % response)
+        return messages
+
+    def compile_dvr_response_table(self, port, site_id):
+        """ Build the response table of a simulated site port, with requests and responses
+        pre-encoded as binary (so requests are matched and answered without hex conversion).
+        INPUT
+            port: the port (admin or search) of the site connection.
+            site id: a numerical id to distinguish this site from others.
+        OUTPUT
+            successful: whether the function executed successfully or not.
+            table: a dict of
+                port: the port of the table.
+                responses: a dict pairing each (binary) request with its (binary) responses.
+                headers: a dict pairing each header-length window of the requests with the
+                    responses of the last request containing it (to answer unknown requests).
+                rules (search): a list of (marker, responses) answering any request containing
+                    the marker, in order of precedence.
+                drive info (admin): the responses to a drive info request.
+                syslog requests (admin): the requests answered with a syslog event.
+                syslog templates (admin): the hex-encoded syslog event responses (with a time
+                    to fill in).
+                last responses (admin): the responses to the last request.
+        """
+
+        self.log.debug("Compiling DVR response table for site %s at port %s ..." % (site_id, port))
+        result = {'successful': False, 'table': None}
+
+        try:
+            if port == self.admin_port:
+                response_pck = self.build_dvr_response_dict_to_admin_sdk(site_id)['response dict']
+            elif port == self.search_port:
+                response_pck = self.build_dvr_response_list_to_search_sdk(
+                    self.num_gps_events, site_id)['response dict']
+            else:
+                raise AssertionError("No valid input type could be determined from port %s." % port)
+
+            table = {'port': port, 'responses': {}, 'headers': {}}
+            for request, responses in response_pck.items():
+                # requests with fields to fill in only match unknown requests by their header
+                known = request.split('%(')[0]
+                known = unhexlify(known[:len(known) - len(known) % 2])
+                if known == '':
+                    continue
+                if '%(' not in request:
+                    table['responses'][known] = self.compile_dvr_responses(responses)
+
+            # requests are matched by header in the order they were defined
+            for request in response_pck.keys():
+                known = request.split('%(')[0]
+                known = unhexlify(known[:len(known) - len(known) % 2])
+                for i in range(len(known) - SDK_HEADER_LENGTH + 1):
+                    table['headers'][known[i:i + SDK_HEADER_LENGTH]] = \
+                        self.compile_dvr_responses(response_pck[request])
+
+            if port == self.search_port:
+                table['rules'] = [
+                    (SEARCH_IGNORED_REQUEST_MARKER, []),
+                    (SEARCH_CAMERA_LIST_REQUEST_MARKER,
+                     self.compile_dvr_responses([SEARCH_CAMERA_LIST_RESPONSE])),
+                    (SEARCH_REQUEST_3B_MARKER,
+                     self.compile_dvr_responses([self.search_sdk_map.dvr_request_3b_response,
+                                                 self.search_sdk_map.dvr_request_3b_response2])),
+                ]
+            else:
+                syslog_responses = response_pck[self.admin_sdk_map.dvr_syslog_event_request]
+                table['drive info tag'] = unhexlify(self.admin_sdk_map.dvr_drive_info_request_tag)
+                table['drive info'] = self.compile_dvr_responses(
+                    response_pck[self.admin_sdk_map.dvr_drive_info_request])
+                table['syslog requests'] = set(
+                    [unhexlify(request) for request, responses in response_pck.items()
+                     if '%(' not in request and responses == syslog_responses])
+                table['syslog templates'] = list(syslog_responses)
+                table['last responses'] = self.compile_dvr_responses(
+                    response_pck[self.admin_sdk_map.dvr_last_request])
+
+            result['table'] = table
+            result['successful'] = True
+        except BaseException, e:
+            self.handle_exception(e, operation="compile DVR response table for site %s" % site_id)
+
+        # return
+        return result
+
+    def return_dvr_response_table(self, port, site_id):
+        """ Return the response table of a simulated site port (compiled on first use, then shared
+        by all connections to it).
+        """
+
+        table = self.dvr_response_tables.get((port, site_id))
+        if table is None:
+            with self.dvr_response_tables_lock:
+                table = self.dvr_response_tables.get((port, site_id))
+                if table is None:
+                    table = self.compile_dvr_response_table(port, site_id)['table']
+                    if table is not None:
+                        self.dvr_response_tables[(port, site_id)] = table
+        return table
+
+    def open_dvr_session(self, site_address):
+        """ Open a simulated DVR session for a site connection (the responses and state used to
+        respond to its requests).
+        INPUT
+            site address: the local address (ip, port) of the site connection.
+        OUTPUT
+            successful: whether the function executed successfully or not.
+            session: the session (see respond_to_dvr_request).
+        """
+
+        result = {'successful': False, 'session': None}
+
+        try:
+            # determine site ID
+            site_id = int(site_address[0].split('.')[3])
+            table = self.return_dvr_response_table(site_address[1], site_id)
+            if table is None:
+                raise AssertionError("No response table could be compiled for address '%s'."
+                                     % str(site_address))
+
+            result['session'] = {
+                'address':          site_address,
+                'site id':          site_id,
+                'port':             site_address[1],
+                'table':            table,
+                'sent syslog':      False,
+                'gps events':       self.num_gps_events,
+                'gps end time':     time(),
+            }
+            result['successful'] = True
+        except BaseException, e:
+            self.handle_exception(e, operation="open DVR session for %s" % str(site_address))
+
+        # return
+        return result
+
+    def respond_to_dvr_request(self, session, data):
+        """ Determine the responses of a simulated DVR to a request from a site.
+        INPUT
+            session: the session of the site connection (see open_dvr_session).
+            data: the binary data received from the site.
+        OUTPUT
+            messages: the binary messages to send to the site.
+            closing: whether the connection should be closed once the messages are sent.
+        """
+
+        result = {'messages': [], 'closing': False}
+        table = session['table']
+        messages = None
+
+        # handle search SDK
+        if session['port'] == self.search_port:
+            for marker, responses in table['rules']:
+                if marker in data:
+                    messages = responses
+                    break
+            if messages is None:
+                if data == SEARCH_GPS_EVENTS_REQUEST:
+                    if session['gps events'] >= 100:
+                        packet = self.build_gps_event_data_packet(
+                            session['gps events']/100, end_time=session['gps end time'],
+                            encoded=False)['packet']
+                        messages = [packet]
+                        session['gps events'] -= 100
+                    else:
+                        messages = []
+                        result['closing'] = True
+                else:
+                    messages = table['responses'].get(data)
+                    if messages is None:
+                        messages = table['headers'].get(data[:SDK_HEADER_LENGTH], [])
+                        if messages == []:
+                            self.log.warn("Unknown Request Received:\t%s" % hexlify(data))
+
+        # handle admin SDK
+        else:
+            if data.strip() == '':
+                messages = []
+            elif table['drive info tag'] in data:
+                messages = table['drive info']
+            elif data in table['syslog requests'] and not session['sent syslog']:
+                # determine hex time
+                self.syslog_event_time_counter += 1
+                thousands = (self.syslog_event_time_counter / 4096)
+                hundreds = ((self.syslog_event_time_counter % 4096) / 256)
+                tens = (((self.syslog_event_time_counter % 4096) % 256) / 16)
+                ones = ((((self.syslog_event_time_counter % 4096) % 256) % 16) % 16)
+
+                hex_time = '0000%(tens)s%(thousands)s%(ones)s%(hundreds)s' \
+                           % {'thousands': thousands, 'hundreds': hundreds,
+                              'tens': tens, 'ones': ones}
+
+                # build response list
+                messages = self.compile_dvr_responses(
+                    [template % {'time': hex_time} for template in table['syslog templates']])
+                session['sent syslog'] = True
+            elif data in table['syslog requests'] and session['sent syslog']:
+                messages = table['last responses']
+                session['sent syslog'] = False
+                result['closing'] = True
+            else:
+                messages = table['responses'].get(data)
+                if messages is None:
+                    self.log.warn("Unknown Request Received:\t%s" % hexlify(data))
+                    messages = []
+
+        result['messages'] = messages
+
+        # return
+        return result
+
     def simulate_dvr_responses_at_address(self, listener_address):
         """ Simulate DVR responses for all incoming site connections at given address.
         INPUT
@@ -269,9 +664,7 @@ class Tantalus(Encoder):
             while True:
                 # create listener for ViM sites
                 self.log.trace("Creating listener for ViM sites at %s ..." % str(listener_address))
-                listener = socket.socket()
-                listener.bind(listener_address)
-                listener.listen(0)
+                listener = open_listener(listener_address)
 
                 while True:
 
@@ -348,11 +741,12 @@ class Tantalus(Encoder):
         # return
         return result
 
-    def relay_live_dvr_responses_to_all_sockets(self, sockets, dvr_address):
+    def relay_live_dvr_responses_to_all_sockets(self, sockets, dvr_address, capture=None):
         """ Relay the live DVR responses for multiple incoming "spoofed" connections to all connections.
         INPUT
             sockets: a list of socket objects to eahc of which to clone the live DVR responses.
             dvr address: the network address (ip, port) of the live DVR.
+            capture: a CaptureWriter to record the relayed traffic to (None if not recording).
         """
 
         self.log.debug("Relaying responses from DVR at %s to all sockets ..." % str(dvr_address))
@@ -361,7 +755,7 @@ class Tantalus(Encoder):
 
         try:
             # connect to the DVR
-            dvr_site = socket.create_connection(dvr_address)
+            dvr_site = open_connection(dvr_address)
             self.log.trace("DVR (%s) connected." % str(dvr_address))
             dvr_site.settimeout(5)
 
@@ -372,20 +766,8 @@ class Tantalus(Encoder):
                 first_site = sockets.pop()
                 clone_sites = sockets
 
-                # define second instance of Sisyphus (for sub-threading)
-                sisyphus = self.Sisyphus(self.log)
-
-                # thread communication between a site and DVR
-                sisyphus.add_process_to_thread_queue(self.listen_to_socket_and_bridge_with_dvr,
-                    (first_site, dvr_site, clone_sites))
-
-                # thread communication with clone sites
-                for site in clone_sites:
-                    sisyphus.add_process_to_thread_queue(self.listen_to_socket,
-                                                        (site,))
-
-                # execute all threads
-                sisyphus.execute_pending_threads()
+                # bridge communication between a site and DVR, cloning DVR responses to the others
+                self.listen_to_socket_and_bridge_with_dvr(first_site, dvr_site, clone_sites, capture)
 
             self.log.trace("Relayed responses from DVR at %s to all sockets." % str(dvr_address))
         except BaseException, e:
@@ -394,68 +776,36 @@ class Tantalus(Encoder):
         # return
         return result
 
-    def listen_to_socket_and_bridge_with_dvr(self, sock, dvr_socket, clone_sockets=[]):
+    def listen_to_socket_and_bridge_with_dvr(self, sock, dvr_socket, clone_sockets=[], capture=None,
+                                             buffer_limit=CLONE_BUFFER_LIMIT, overflow=DISCONNECT):
         """ Listen to the socket and bridge communications between it and the DVR.
         INPUT
             sock: a socket object connected to a site.
             dvr socket: a socket object connected to the DVR.
             clone sockets: a list of sockets to which to clone the DVR responses.
+            capture: a CaptureWriter to record the bridged traffic to (replacing the text output,
+                None if not recording).
+            buffer limit: the bytes queued for a clone before the overflow policy applies.
+            overflow: what to do with a clone that falls behind (DISCONNECT or DROP, see relay).
+        OUTPUT
+            successful: whether the function executed successfully or not.
+            metrics: the relay metrics (see FanOutRelay.return_metrics).
         """
 
-        try:
-            sock_name = str(sock.getpeername())
-        except BaseException:
-            try:
-                sock_name = str(sock.getsockname())
-            except BaseException:
-                sock_name = str(sock)
+        sock_name = return_socket_name(sock)
         self.log.debug("Listening to socket %s and bridge with DVR ..." % sock_name)
-        result = {}
+        result = {'successful': False, 'metrics': None}
 
         try:
-            # set timeout for socket
-            sock.settimeout(5)
-
-            # loop to handle message traffic between first site and DVR
-            running = True
-            while running:
+            # relay traffic (clone sites are served from the same loop, each with its own buffer)
+            output = self.output if self.output_on and capture is None else None
+            relay = FanOutRelay(sock, dvr_socket, clone_sockets, self.log, self.packet_size,
+                                buffer_limit, overflow, capture, output)
+            relay.run()
 
-                # handle communications between first site and DVR only
-                rlist = select([sock, dvr_socket], [], [])[0]
-
-                # accept communications from first socket
-                if sock in rlist:
-                    # reset data bin for messages sent to DVR this session
-
-                    # receive site messages
-                    result = self.receive_incoming_messages_from_socket(sock)
-                    data        = result['data']
-                    running     = result['communicating']
-
-
-
-                    # relay message to DVR
-                    self.send_binary_data_to_socket(dvr_socket, data)
-
-                if dvr_socket in rlist:
-                    # reset data bin for messages sent to DVR this session
-
-                    result = self.receive_incoming_messages_from_socket(dvr_socket)
-                    data        = result['data']
-                    running     = result['communicating']
-
-                    # relay message to site
-                    self.send_binary_data_to_socket(sock, data)
-
-                    # relay message to clone sites
-                    if len(clone_sockets) > 0:
-                        for clone_sock in clone_sockets:
-                            self.send_binary_data_to_socket(clone_sock, data)
-
-            # close sockets
-            self.log.trace("Closing open sockets ...")
-            sock.close()
-            dvr_socket.close()
+            result['metrics'] = relay.return_metrics()
+            if len(clone_sockets) > 0:
+                self.log.debug("Relay metrics: %s." % str(result['metrics']))
 
             self.log.trace("Listened to socket %s and bridged with DVR." % sock_name)
             result['successful'] = True
@@ -465,91 +815,28 @@ class Tantalus(Encoder):
         # return
         return result
 
-    def listen_to_socket(self, sock):
-        """ Listen to the socket.
-        INPUT
-            sock: a socket object connected to a site.
-        """
-
-        try:
-            sock_name = str(sock.getpeername())
-        except BaseException:
-            try:
-                sock_name = str(sock.getsockname())
-            except BaseException:
-                sock_name = str(sock)
-        self.log.debug("Listening to socket %s ..." % sock_name)
-        result = {}
-
-        try:
-            # set timeout for socket
-            sock.settimeout(5)
-
-            # loop to handle message traffic with socket
-            running = True
-            while running:
-                pass
-
-                #  accept communications from socket
-                rlist = select([sock], [], [])[0]
-
-                if sock in rlist:
-                    # receive socket messages
-                    result = self.receive_incoming_messages_from_socket(sock)
-                    data        = result['data']
-                    running     = result['communicating']
-
-            # close sockets
-            self.log.trace("Closing open sockets ...")
-            sock.close()
-
-            self.log.trace("Listened to socket %s." % sock_name)
-            result['successful'] = True
-        except BaseException, e:
-            self.handle_exception(e, operation="listen to socket %s" % sock_name)
-
-        # return
-        return result
-
-    def listen_to_socket_and_respond(self, site, response_pck=None):
+    def listen_to_socket_and_respond(self, site):
         """ Listen to the socket.
         INPUT
             site: the ViM site connection (socket) to which to listen and respond.
-            response pck: a data list of responses in format [[message, message, message],[message]].
         """
 
         self.log.debug("Listening and responding to %s ..." % str(site.getpeername()))
         result = {}
 
         try:
-            # build response package
-            site_add = site.getsockname()
-
-            # determine site ID
-            site_id = int(site_add[0].split('.')[3])
-
-            # determine input type
-            if site_add[1] == self.admin_port:
-                response_pck = self.build_dvr_response_dict_to_admin_sdk(site_id)['response dict']
-                expected_admin_requests = response_pck.keys()
+            transport = Transport(site)
 
-            elif site_add[1] == self.search_port:
-                # build gps event pack
-                num_events = 300
-
-                response_pck = self.build_dvr_response_list_to_search_sdk(num_events, site_id)['response dict']
-                expected_search_requests = response_pck.keys()
-
-            else:
-                raise AssertionError("No valid input type could be determined from address '%s'."
-                                     % str(site.getsockname()))
+            # open simulated DVR session
+            site_add = site.getsockname()
+            session = self.open_dvr_session(site_add)['session']
+            if session is None:
+                raise AssertionError("Failed to open DVR session for %s." % str(site_add))
 
             # loop to handle message traffic with socket
             running = True
-            sent_sys_log = False
             while running:
                 # set socket time out
-                #site.settimeout((30 * 60))
                 site.settimeout(300)
 
                 #  accept communications from socket
@@ -557,109 +844,28 @@ class Tantalus(Encoder):
 
                 if site in rlist:
                     # receive socket messages
-                    result = self.receive_incoming_messages_from_socket(site)
+                    result = self.receive_incoming_messages_from_socket(transport)
                     data        = result['data']
                     running     = result['communicating']
-                    #running     = result['successful']
-
-                    # handle search SDK
-                    if site.getsockname()[1] == self.search_port:
-                        try:
-                            responses = []
-
-                            if str(16000000) in hexlify(data):
-                                responses = []
-                            elif '0d000000' in hexlify(data):
-                                responses = ['09000000600d4a000009000000600d46000009000000600d42000009000000600d3e000009000000600d3a000009000000600d36000009000000600d32000009000000600d2e000009000000600d2a000009000000600d26000009000000600d22000009000000600d1e000009000000600d1a000009000000600d16000009000000600d12000009000000600d0e000009000000600d0a000009000000600d0600000900000060cd7d00000900000060cd7900000900000060cd7500000900000060cd7100000900000060cd6d00000900000060cd6900000900000060cd65000009000000604a0e000009000000604a0a000009000000604a0600000500000061']
-                            elif '530000' in hexlify(data):
-                                responses = [self.search_sdk_map.dvr_request_3b_response,
-                                             self.search_sdk_map.dvr_request_3b_response2]
-                            elif hexlify(data) == '050000006d':
-                                if num_events >= 100:
-                                    responses = [self.build_gps_event_data_packet(num_events/100)['packet']]
-                                    num_events -= 100
-                                else:
-                                    break
-
-                            else:
-                                responses = response_pck[hexlify(data).strip()]
-                        except BaseException:
-                            try:
-                                for request in expected_search_requests:
-                                    if hexlify(data)[:8] in request:
-                                        responses = response_pck[request]
-                            except BaseException, e:
-                                self.handle_exception(e, 'determine response to unknown request %s' % hexlify(data))
-
-                            if responses is []:
-                                self.log.warn("Unknown Request Received:\t%s" % hexlify(data))
-
-                    # handle admin SDK
-                    else:
-                        try:
-                            if str(data).strip() == '':
-                                responses = []
-                                #msg = ''
-                                if not sent_sys_log:
-                                    msg = response_pck['283665000100000002']
-                                    sent_sys_log = False
-                                else:
-                                    msg = '.'
-
-                                self.send_binary_data_to_socket(site, msg, muted=True)
-                            elif self.admin_sdk_map.dvr_drive_info_request_tag in hexlify(data):
-                                responses = response_pck[self.admin_sdk_map.dvr_drive_info_request]
-
-                            elif response_pck[hexlify(data)] == response_pck['28367300140000000000000000000000010000000000000000000000']\
-                                and not sent_sys_log:
-                                # determine hex time
-                                self.syslog_event_time_counter += 1
-                                thousands = (self.syslog_event_time_counter / 4096)
-                                hundreds = ((self.syslog_event_time_counter % 4096) / 256)
-                                tens = (((self.syslog_event_time_counter % 4096) % 256) / 16)
-                                ones = ((((self.syslog_event_time_counter % 4096) % 256) % 16) % 16)
-
-                                hex_time = '0000%(tens)s%(thousands)s%(ones)s%(hundreds)s' \
-                                           % {'thousands': thousands, 'hundreds': hundreds,
-                                              'tens': tens, 'ones': ones}
-
-                                # build response list
-                                raw_responses = response_pck[hexlify(data).strip()]
-                                responses = []
-                                for raw_response in raw_responses:
-                                    response = raw_response % {'time': hex_time}
-                                    responses.append(response)
-
-                                sent_sys_log = True
-                            elif response_pck[hexlify(data)] == response_pck['28367300140000000000000000000000010000000000000000000000']\
-                                and sent_sys_log:
-                                msg = response_pck['283665000100000002']
-                                sent_sys_log = False
-                                self.send_binary_data_to_socket(site, msg, muted=True)
-                                break
-                            else:
-                                responses = response_pck[hexlify(data).strip()]
-                        except BaseException:
-                            self.log.warn("Unknown Request Received:\t%s" % hexlify(data))
-                            responses = []
+                    if not running:
+                        break
 
-                    for response in responses:
+                    response = self.respond_to_dvr_request(session, data)
+                    for msg in response['messages']:
                         # loop until message sent successfully
                         sent = False
-                        try:
-                            msg = unhexlify(response)
-                        except BaseException:
-                            self.log.error('String:\t%s' % response)
-
                         while not sent:
-                            sent = self.send_binary_data_to_socket(site, msg, muted=True)['successful']
+                            sent = self.send_binary_data_to_socket(transport, msg,
+                                                                   muted=True)['successful']
 
                             if not sent:
                                 sleep(1)
+                    if response['closing']:
+                        break
 
             # close sockets
             self.log.trace("Closing open sockets to %s ..." % str(site_add))
-            site.close()
+            transport.close()
 
             self.log.trace("Listened and responded to %s." % str(site_add))
             result['successful'] = True
@@ -729,11 +935,13 @@ class Tantalus(Encoder):
         # return
         return result
 
-    def bridge_two_addresses(self, first_add, second_add):
+    def bridge_two_addresses(self, first_add, second_add, capture=None):
         """ Bridge a connection between two network (ip/port) addresses.
         INPUT
             first add: the address (ip, port) of the first site in the connection.
             second add: the address (ip, port) of the second site in the connection.
+            capture: a CaptureWriter to record the bridged traffic to (replacing the text output,
+                None if not recording).
         OUPUT
             successful: whether the function executed successfully or not.
         """
@@ -743,30 +951,36 @@ class Tantalus(Encoder):
 
         try:
             # define TCP/IP socket from first site to bridge
-            listener = socket.socket()
-            listener.bind(first_add)
-            listener.listen(1)
-            first_site = listener.accept()[0]
+            listener = open_listener(first_add, 1)
+            first_site = Transport(listener.accept()[0])
             listener.close()
             self.log.trace("First site (%s) connected." % str(first_add))
 
             # define TCP/IP socket from second site to bridge
-            second_site = socket.create_connection(second_add)
+            second_site = Transport(open_connection(second_add))
             self.log.trace("Second site (%s) connected." % str(second_add))
 
+            # record connection as a capture session
+            logged = capture is None
+            if capture is not None:
+                session = capture.open_session()
+
             running = True
 
             while running:
 
-                rlist = select([first_site, second_site], [], [])[0]
+                rlist = select([first_site.sock, second_site.sock], [], [])[0]
 
-                if first_site in rlist:
-                    result = self.receive_incoming_messages_from_socket(first_site)
+                if first_site.sock in rlist:
+                    result = self.receive_incoming_messages_from_socket(first_site, logged=logged)
                     data        = result['data']
                     running     = result['communicating']
 
-                    # write received to output
-                    if self.output_on:
+                    # write received to capture (or output)
+                    if capture is not None:
+                        if data:
+                            capture.record(session, second_add[1], FROM_SITE, data)
+                    elif self.output_on:
                         output = "\nFROM %s TO %s:\t%s" % (str(first_add), str(second_add), hexlify(data))
                         if first_add[1] == self.admin_port:
                             self.admin_output.write(output)
@@ -776,15 +990,18 @@ class Tantalus(Encoder):
                             self.output.write(output)
 
                     # send message along to DVR
-                    self.send_binary_data_to_socket(second_site, data)
+                    self.send_binary_data_to_socket(second_site, data, logged=logged)
 
-                if second_site in rlist:
-                    result = self.receive_incoming_messages_from_socket(second_site)
+                if second_site.sock in rlist:
+                    result = self.receive_incoming_messages_from_socket(second_site, logged=logged)
                     data        = result['data']
                     running     = result['communicating']
 
-                    # write received to output
-                    if self.output_on:
+                    # write received to capture (or output)
+                    if capture is not None:
+                        if data:
+                            capture.record(session, second_add[1], FROM_DVR, data)
+                    elif self.output_on:
                         output = "\nFROM %s TO %s:\t%s" % (str(second_add), str(first_add), hexlify(data))
                         if first_add[1] == self.admin_port:
                             self.admin_output.write(output)
@@ -794,7 +1011,10 @@ class Tantalus(Encoder):
                             self.output.write(output)
 
                     # send message along to ViM Server
-                    self.send_binary_data_to_socket(first_site, data)
+                    self.send_binary_data_to_socket(first_site, data, logged=logged)
+
+            if capture is not None:
+                capture.flush()
 
             try:
                 # close open connections
@@ -811,23 +1031,18 @@ class Tantalus(Encoder):
         # return
         return result
 
-    def send_binary_data_to_socket(self, sock, data, muted=False):
+    def send_binary_data_to_socket(self, transport, data, muted=False, logged=True):
         """ Send a packet of binary data to specified socket.
         INPUT
-            sock: the socket to which to send the data.
+            transport: the Transport of the connection to which to send the data.
             data: the binary data to send to the scoket.
             muted: whether to mute exception reporting or not (for message loops)
+            logged: whether to log the packet (to output and trace) or not.
         OUPUT
             successful: whether the function executed successfully or not.
         """
 
-        try:
-            sock_name = str(sock.getpeername())
-        except BaseException:
-            try:
-                sock_name = str(sock.getsockname())
-            except BaseException:
-                sock_name = str(sock)
+        sock_name = transport.name
         #self.log.trace("Sending binary data packet to socket %s ..." % sock_name)
         result = {'successful': False}
 
@@ -836,18 +1051,19 @@ class Tantalus(Encoder):
             #self.log.trace("Binary Data: %s." % hexlify(data))
             if muted:
                 try:
-                    sock.send(data)
+                    transport.send(data)
                 except BaseException:
-                    return
+                    return result
             else:
-                sock.send(data)
+                transport.send(data)
 
             # write received to output
-            msg = "\nSENT TO %s:\t%s" % (str(sock.getpeername()), hexlify(data))
-            if self.output_on: self.output.write(msg)
+            if logged:
+                if self.output_on:
+                    self.output.write("\nSENT TO %s:\t%s" % (sock_name, hexlify(data)))
 
-            #self.log.trace("Binary data packet sent to socket %s." % sock_name)
-            self.log.trace_in_line('.')
+                #self.log.trace("Binary data packet sent to socket %s." % sock_name)
+                self.log.trace_in_line('.')
             result['successful'] = True
         except BaseException, e:
             self.handle_exception(e, operation="send binary data packet to socket %s"
@@ -856,10 +1072,12 @@ class Tantalus(Encoder):
         # return
         return result
 
-    def receive_incoming_messages_from_socket(self, sock, muted=False):
+    def receive_incoming_messages_from_socket(self, transport, muted=False, logged=True):
         """ Receive any incoming messages from specified socket.
         INPUT
-            sock: socket from which to receive any incoming messages.
+            transport: the Transport of the connection from which to receive any incoming
+                messages.
+            logged: whether to log the packet (to output and trace) or not.
         OUPUT
             successful: whether the function executed successfully or not.
             communicating: whether the socket is actively communicating or not.
@@ -867,20 +1085,14 @@ class Tantalus(Encoder):
             hex: the data received by the socket, translated into hex.
         """
 
-        try:
-            sock_name = str(sock.getpeername())
-        except BaseException:
-            try:
-                sock_name = str(sock.getsockname())
-            except BaseException:
-                sock_name = str(sock)
+        sock_name = transport.name
         #self.log.trace("Receiving incoming messages from socket %s ..." % sock_name)
         result = {'successful': False, 'communicating': True, 'data': None, 'hex': None}
 
         try:
             # receive incoming messages to socket
-            buf = sock.recv(self.packet_size)
-            hex = hexlify(buf)
+            buf = transport.receive(self.packet_size)
+            hex = hexlify(buf) if logged else None
             #self.log.trace("Received Data: %s." % hex)
 
             # wait until remote client is done communicating
@@ -893,11 +1105,12 @@ class Tantalus(Encoder):
             result['hex']           = hex
 
             # write received to output
-            msg = "\nRECEIVED FROM %s:\t%s" % (str(sock_name), hex)
-            if self.output_on: self.output.write(msg)
+            if logged:
+                if self.output_on:
+                    self.output.write("\nRECEIVED FROM %s:\t%s" % (str(sock_name), hex))
 
-            #self.log.trace("Received incoming messages from socket %s." % sock_name)
-            self.log.trace_in_line('.')
+                #self.log.trace("Received incoming messages from socket %s." % sock_name)
+                self.log.trace_in_line('.')
             result['successful'] = True
         except BaseException, e:
             result['data'] = ''
@@ -908,10 +1121,7 @@ class Tantalus(Encoder):
             if e.args[0] == 10053:
                 self.log.warn("Connection to %s aborted by host." % sock_name)
                 reported = True
-                try:
-                    sock.close()
-                except BaseException, e:
-                    pass
+                transport.close()
             if not muted and not reported:
                 self.handle_exception(e, operation="receive incoming messages from socket %s"
                                                    % sock_name)
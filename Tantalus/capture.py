@@ -0,0 +1,337 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+import os
+import mmap
+from struct import Struct
+from threading import Lock
+from itertools import cycle
+from time import time
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+# A capture is a pair of append-only files:
+#   <path> (data): CAPTURE_MAGIC, then the payload of each message, back to back.
+#   <path>.idx (index): INDEX_MAGIC, then an INDEX_ENTRY for each message, in order.
+# Index entries are fixed-size, so both files can be read in place (mmap) and a message found by
+# its number without scanning. A message is only indexed once its payload is written, so a
+# capture cut short (e.g., by a crash) stays readable up to its last whole entry.
+CAPTURE_MAGIC = 'TANCAP01'
+INDEX_MAGIC = 'TANIDX01'
+INDEX_EXTENSION = '.idx'
+
+# offset (of payload in data file), time, session, port, direction, length
+INDEX_ENTRY = Struct('<QdIHBxI')
+
+# message directions
+FROM_SITE = 0       # from the ViM site (to the DVR)
+FROM_DVR = 1        # from the DVR (to the ViM site)
+
+
+def return_index_path(path):
+    """ Return the path of the index file of a capture. """
+    return path + INDEX_EXTENSION
+
+####################################################################################################
+# Capture Writer ###################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class CaptureWriter():
+    """ Appends timestamped messages of bridged sessions to a capture (thread-safe). """
+
+    def __init__(self, path):
+        """
+        INPUT
+            path: the file path of the capture (created, or appended to if it exists). An
+                existing file without a capture index is refused (IOError), not overwritten.
+        """
+
+        self.path = path
+        self.lock = Lock()
+
+        # continue an existing capture after its last whole index entry
+        index_path = return_index_path(path)
+        if os.path.exists(path) and os.path.exists(index_path):
+            index_size = os.path.getsize(index_path)
+            whole = index_size - (index_size - len(INDEX_MAGIC)) % INDEX_ENTRY.size
+            if whole != index_size:
+                with open(index_path, 'r+b') as index:
+                    index.truncate(whole)
+            reader = CaptureReader(path)
+            self.next_session = reader.return_last_session() + 1
+            reader.close()
+        elif os.path.exists(path):
+            raise IOError("%s exists but has no capture index (%s)." % (path, index_path))
+        else:
+            # an index without its data file indexes nothing
+            if os.path.exists(index_path):
+                os.remove(index_path)
+            self.next_session = 1
+
+        self.data = open(path, 'ab')
+        self.index = open(index_path, 'ab')
+        if self.next_session == 1 and os.path.getsize(path) == 0:
+            self.data.write(CAPTURE_MAGIC)
+            self.index.write(INDEX_MAGIC)
+            self.data.flush()
+            self.index.flush()
+        self.offset = os.path.getsize(path)
+
+    def open_session(self):
+        """ Return the id of a new session (e.g., a bridged connection) of the capture.
+        """
+
+        with self.lock:
+            session = self.next_session
+            self.next_session += 1
+        return session
+
+    def record(self, session, port, direction, data, timestamp=None):
+        """ Append a message to the capture.
+        INPUT
+            session: the session (see open_session) of the message.
+            port: the DVR port (e.g., admin or search) of the session.
+            direction: the direction of the message (FROM_SITE or FROM_DVR).
+            data: the binary data of the message.
+            timestamp: the time of the message (now if None).
+        """
+
+        if timestamp is None:
+            timestamp = time()
+
+        with self.lock:
+            self.data.write(data)
+            self.index.write(INDEX_ENTRY.pack(self.offset, timestamp, session, port, direction,
+                                              len(data)))
+            self.offset += len(data)
+
+    def flush(self):
+        """ Flush the capture to disk (payloads before their index entries).
+        """
+
+        with self.lock:
+            self.data.flush()
+            self.index.flush()
+
+    def close(self):
+        """ Flush and close the capture.
+        """
+
+        with self.lock:
+            self.data.close()
+            self.index.close()
+
+####################################################################################################
+# Capture Reader ###################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class CaptureReader():
+    """ Reads a capture in place (memory-mapped). """
+
+    def __init__(self, path):
+        """
+        INPUT
+            path: the file path of the capture.
+        """
+
+        self.path = path
+
+        self.data_file = open(path, 'rb')
+        self.index_file = open(return_index_path(path), 'rb')
+        if self.data_file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC \
+                or self.index_file.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            raise AssertionError("Invalid capture file %s." % path)
+
+        # map files (ignoring any partial entry at the end of the index)
+        data_size = os.path.getsize(path)
+        index_size = os.path.getsize(return_index_path(path))
+        self.count = (index_size - len(INDEX_MAGIC)) / INDEX_ENTRY.size
+        self.data = mmap.mmap(self.data_file.fileno(), data_size, access=mmap.ACCESS_READ)
+        self.index = mmap.mmap(self.index_file.fileno(), index_size, access=mmap.ACCESS_READ)
+
+        # ignore entries whose payloads were not written in full
+        while self.count > 0:
+            entry = self.return_entry(self.count - 1)
+            if entry[0] + entry[5] <= data_size:
+                break
+            self.count -= 1
+
+    def return_entry(self, number):
+        """ Return an index entry (offset, time, session, port, direction, length) by its number.
+        """
+
+        return INDEX_ENTRY.unpack_from(self.index, len(INDEX_MAGIC) + number * INDEX_ENTRY.size)
+
+    def return_entries(self):
+        """ Return a generator of all index entries, in order.
+        """
+
+        for number in xrange(self.count):
+            yield self.return_entry(number)
+
+    def return_payload(self, entry):
+        """ Return the payload of an index entry (a read-only view of the capture).
+        """
+
+        return buffer(self.data, entry[0], entry[5])
+
+    def return_sessions(self):
+        """ Return the entries of each session.
+        OUTPUT
+            a dict pairing each session with the list of its entries, in order.
+        """
+
+        sessions = {}
+        for entry in self.return_entries():
+            sessions.setdefault(entry[2], []).append(entry)
+        return sessions
+
+    def return_last_session(self):
+        """ Return the highest session id in the capture (0 if none).
+        """
+
+        last = 0
+        for entry in self.return_entries():
+            last = max(last, entry[2])
+        return last
+
+    def close(self):
+        self.index.close()
+        self.data.close()
+        self.index_file.close()
+        self.data_file.close()
+
+####################################################################################################
+# Replayer #########################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Replayer():
+    """ Serves the sessions of a capture to ViM site connections (through a DVREngine), as the DVR
+    did when they were recorded. Each connection is given the next recorded session of its port
+    (cycling through them); once the site has sent as many bytes as it did in the recording, they
+    are answered with the DVR messages that followed, at their original pace (scaled by speed).
+    """
+
+    def __init__(self, path, logger, speed=1.0):
+        """
+        INPUT
+            path: the file path of the capture.
+            logger: An initialized instance of a logging class to use.
+            speed: the replay speed (e.g., 2.0 for twice as fast; None to send without delays).
+        """
+
+        # instance logger
+        self.log = logger
+
+        self.speed = speed
+        self.reader = CaptureReader(path)
+
+        # sessions by port (taken in turn by new connections)
+        self.sessions = {}
+        for session, entries in sorted(self.reader.return_sessions().items()):
+            self.sessions.setdefault(entries[0][3], []).append(entries)
+        self.turns = dict([(port, cycle(sessions)) for port, sessions in self.sessions.items()])
+
+        self.log.debug("Loaded %d messages of %d sessions from capture %s."
+                       % (self.reader.count, sum([len(s) for s in self.sessions.values()]), path))
+
+    def open_dvr_session(self, site_address):
+        """ Open a replayed session for a site connection.
+        INPUT
+            site address: the local address (ip, port) of the site connection.
+        OUTPUT
+            successful: whether the function executed successfully or not.
+            session: the session (see respond_to_dvr_request).
+            messages: the DVR messages to send before the site's first message.
+            delays: the seconds (from now) at which to send each message.
+        """
+
+        result = {'successful': False, 'session': None, 'messages': [], 'delays': []}
+
+        turns = self.turns.get(site_address[1])
+        if turns is None:
+            self.log.warn("No recorded sessions for port %s." % site_address[1])
+            return result
+
+        session = {'address': site_address, 'entries': turns.next(), 'position': 0, 'received': 0}
+        result.update(self.return_dvr_messages(session))
+        result['session'] = session
+        result['successful'] = True
+        return result
+
+    def respond_to_dvr_request(self, session, data):
+        """ Determine the recorded DVR responses to a message from a site.
+        INPUT
+            session: the session of the site connection (see open_dvr_session).
+            data: the binary data received from the site.
+        OUTPUT
+            messages: the binary messages to send to the site.
+            delays: the seconds (from now) at which to send each message.
+            closing: whether the connection should be closed once the messages are sent.
+        """
+
+        # consume the recorded site messages the data covers (it may hold several, or part of one)
+        entries = session['entries']
+        remaining = len(data)
+        while remaining > 0 and session['position'] < len(entries) \
+                and entries[session['position']][4] == FROM_SITE:
+            needed = entries[session['position']][5] - session['received']
+            if remaining < needed:
+                session['received'] += remaining
+                break
+            remaining -= needed
+            session['received'] = 0
+            session['position'] += 1
+
+        # wait for the rest of the recorded site messages before responding
+        if session['position'] < len(entries) and entries[session['position']][4] == FROM_SITE:
+            return {'messages': [], 'delays': [], 'closing': False}
+        return self.return_dvr_messages(session)
+
+    def return_dvr_messages(self, session):
+        """ Return the DVR messages from the position of a session to the next site message.
+        """
+
+        result = {'messages': [], 'delays': [], 'closing': False}
+
+        entries = session['entries']
+        position = session['position']
+        start = entries[position - 1][1] if position > 0 else None
+        while position < len(entries) and entries[position][4] == FROM_DVR:
+            entry = entries[position]
+            if start is None:
+                start = entry[1]
+            result['messages'].append(self.reader.return_payload(entry))
+            if self.speed:
+                result['delays'].append(max(0.0, entry[1] - start) / self.speed)
+            else:
+                result['delays'].append(0.0)
+            position += 1
+        session['position'] = position
+
+        # recorded session over
+        result['closing'] = position >= len(entries)
+
+        return result
+
+    def close(self):
+        self.reader.close()
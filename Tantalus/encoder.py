@@ -12,18 +12,382 @@
 ####################################################################################################
 
 from binascii import hexlify, unhexlify
-from datetime import datetime
-from time import time
-from Ixion import Ixion
+from time import time, gmtime
+from os import urandom
+from struct import pack, unpack
 from mapping import AdminSDKMap, SearchSDKMap
-from random import randint
 
 ####################################################################################################
 # Globals ##########################################################################################
 ####################################################################################################
 ####################################################################################################
 
+# GPS event data packet (hex) as captured from a DVR: 100 event records, each followed by the NMEA
+# string of the event (the length of which, with its terminator, is given in the record)
+GPS_EVENT_PACKET_TEMPLATE = \
+    '000008036508000000817416ae15e72d01461473003a00000000000000000000000000' \
+    '%(event 1)s' \
+    '000008036508000000857416ae0de82d01a01473003c00000000000000000000000000' \
+    '%(event 2)s' \
+    '0000080365080000008a7416ae01e92d01fc1473003c00000000000000000000000000' \
+    '%(event 3)s' \
+    '0000080365080000008e7416aef5e92d01581573003c00000000000000000000000000' \
+    '%(event 4)s' \
+    '000008036508000000927416aee5ea2d01b41573003c00000000000000000000000000' \
+    '%(event 5)s' \
+    '000008036508000000967416aed1eb2d01101673003c00000000000000000000000000' \
+    '%(event 6)s' \
+    '0000080365080000009a7416aec5ec2d016c1673003c00000000000000000000000000' \
+    '%(event 7)s' \
+    '0000080365080000009e7416aeb9ed2d01c81673003c00000000000000000000000000' \
+    '%(event 8)s' \
+    '000008036508000000a27416aea9ee2d01241773003c00000000000000000000000000' \
+    '%(event 9)s' \
+    '000008036508000000a67416ae9def2d01801773003c00000000000000000000000000' \
+    '%(event 10)s' \
+    '000008036508000000aa7416ae8df02d01dc1773003a00000000000000000000000000' \
+    '%(event 11)s' \
+    '000008036508000000ae7416ae85f12d01361873003c00000000000000000000000000' \
+    '%(event 12)s' \
+    '000008036508000000b27416ae7df22d01921873003c00000000000000000000000000' \
+    '%(event 13)s' \
+    '000008036508000000b67416ae6df32d01ee1873003c00000000000000000000000000' \
+    '%(event 14)s' \
+    '000008036508000000ba7416ae65f42d014a1973003c00000000000000000000000000' \
+    '%(event 15)s' \
+    '000008036508000000c27416ae55f52d01a61973003c00000000000000000000000000' \
+    '%(event 16)s' \
+    '000008036508000000c67416ae49f62d01021a73003c00000000000000000000000000' \
+    '%(event 17)s' \
+    '000008036508000000ca7416ae35f72d015e1a73003c00000000000000000000000000' \
+    '%(event 18)s' \
+    '000008036508000000ce7416ae29f82d01ba1a73003c00000000000000000000000000' \
+    '%(event 19)s' \
+    '000008036508000000d27416ae1df92d01161b73003c00000000000000000000000000' \
+    '%(event 20)s' \
+    '000008036508000000d67416ae11fa2d01721b73003a00000000000000000000000000' \
+    '%(event 21)s' \
+    '000008036508000000da7416aefdfa2d01cc1b73003c00000000000000000000000000' \
+    '%(event 22)s' \
+    '000008036508000000de7416aef5fb2d01281c73003c00000000000000000000000000' \
+    '%(event 23)s' \
+    '000008036508000000e27416aee1fc2d01841c73003c00000000000000000000000000' \
+    '%(event 24)s' \
+    '000008036508000000e77416aed9fd2d01e01c73003c00000000000000000000000000' \
+    '%(event 25)s' \
+    '000008036508000000eb7416aecdfe2d013c1d73003c00000000000000000000000000' \
+    '%(event 26)s' \
+    '000008036508000000ef7416aeb9ff2d01981d73003c00000000000000000000000000' \
+    '%(event 27)s' \
+    '000008036508000000f37416aea9002e01f41d73003c00000000000000000000000000' \
+    '%(event 28)s' \
+    '000008036508000000f77416aea1012e01501e73003c00000000000000000000000000' \
+    '%(event 29)s' \
+    '000008036508000000fb7416ae91022e01ac1e73003c00000000000000000000000000' \
+    '%(event 30)s' \
+    '000008036508000000037516ae81032e01081f73003a00000000000000000000000000' \
+    '%(event 31)s' \
+    '000008036508000000077516ae75042e01621f73003c00000000000000000000000000' \
+    '%(event 32)s' \
+    '0000080365080000000b7516ae69052e01be1f73003c00000000000000000000000000' \
+    '%(event 33)s' \
+    '0000080365080000000f7516ae61062e011a2073003c00000000000000000000000000' \
+    '%(event 34)s' \
+    '000008036508000000137516ae4d072e01762073003c00000000000000000000000000' \
+    '%(event 35)s' \
+    '000008036508000000177516ae3d082e01d22073003c00000000000000000000000000' \
+    '%(event 36)s' \
+    '0000080365080000001b7516ae31092e012e2173003c00000000000000000000000000' \
+    '%(event 37)s' \
+    '0000080365080000001f7516ae250a2e018a2173003c00000000000000000000000000' \
+    '%(event 38)s' \
+    '000008036508000000237516ae150b2e01e62173003c00000000000000000000000000' \
+    '%(event 39)s' \
+    '000008036508000000277516ae090c2e01422273003c00000000000000000000000000' \
+    '%(event 40)s' \
+    '0000080365080000002b7516aef90c2e019e2273003a00000000000000000000000000' \
+    '%(event 41)s' \
+    '0000080365080000002f7516aeed0d2e01f82273003c00000000000000000000000000' \
+    '%(event 42)s' \
+    '000008036508000000337516aedd0e2e01542373003c00000000000000000000000000' \
+    '%(event 43)s' \
+    '000008036508000000377516aed10f2e01b02373003c00000000000000000000000000' \
+    '%(event 44)s' \
+    '0000080365080000003b7516aec1102e010c2473003c00000000000000000000000000' \
+    '%(event 45)s' \
+    '000008036508000000437516aeb1112e01682473003c00000000000000000000000000' \
+    '%(event 46)s' \
+    '000008036508000000477516aea1122e01c42473003c00000000000000000000000000' \
+    '%(event 47)s' \
+    '0000080365080000004b7516ae99132e01202573003c00000000000000000000000000' \
+    '%(event 48)s' \
+    '0000080365080000004f7516ae89142e017c2573003c00000000000000000000000000' \
+    '%(event 49)s' \
+    '000008036508000000537516ae7d152e01d82573003c00000000000000000000000000' \
+    '%(event 50)s' \
+    '000008036508000000577516ae75162e01342673003a00000000000000000000000000' \
+    '%(event 51)s' \
+    '0000080365080000005c7516ae65172e018e2673003c00000000000000000000000000' \
+    '%(event 52)s' \
+    '000008036508000000607516ae59182e01ea2673003c00000000000000000000000000' \
+    '%(event 53)s' \
+    '000008036508000000647516ae4d192e01462773003c00000000000000000000000000' \
+    '%(event 54)s' \
+    '000008036508000000687516ae3d1a2e01a22773003c00000000000000000000000000' \
+    '%(event 55)s' \
+    '0000080365080000006c7516ae311b2e01fe2773003c00000000000000000000000000' \
+    '%(event 56)s' \
+    '000008036508000000707516ae211c2e015a2873003c00000000000000000000000000' \
+    '%(event 57)s' \
+    '000008036508000000747516ae151d2e01b62873003c00000000000000000000000000' \
+    '%(event 58)s' \
+    '000008036508000000787516ae011e2e01122973003c00000000000000000000000000' \
+    '%(event 59)s' \
+    '000008036508000000807516aef51e2e016e2973003c00000000000000000000000000' \
+    '%(event 60)s' \
+    '000008036508000000847516aee51f2e01ca2973003a00000000000000000000000000' \
+    '%(event 61)s' \
+    '000008036508000000887516aed5202e01242a73003c00000000000000000000000000' \
+    '%(event 62)s' \
+    '0000080365080000008c7516aec9212e01802a73003c00000000000000000000000000' \
+    '%(event 63)s' \
+    '000008036508000000907516aeb9222e01dc2a73003c00000000000000000000000000' \
+    '%(event 64)s' \
+    '000008036508000000947516aead232e01382b73003c00000000000000000000000000' \
+    '%(event 65)s' \
+    '000008036508000000987516ae9d242e01942b73003c00000000000000000000000000' \
+    '%(event 66)s' \
+    '0000080365080000009c7516ae8d252e01f02b73003c00000000000000000000000000' \
+    '%(event 67)s' \
+    '000008036508000000a07516ae81262e014c2c73003c00000000000000000000000000' \
+    '%(event 68)s' \
+    '000008036508000000a47516ae71272e01a82c73003c00000000000000000000000000' \
+    '%(event 69)s' \
+    '000008036508000000a87516ae61282e01042d73003c00000000000000000000000000' \
+    '%(event 70)s' \
+    '000008036508000000ac7516ae51292e01602d73003a00000000000000000000000000' \
+    '%(event 71)s' \
+    '000008036508000000b07516ae412a2e01ba2d73003c00000000000000000000000000' \
+    '%(event 72)s' \
+    '000008036508000000b47516ae312b2e01162e73003c00000000000000000000000000' \
+    '%(event 73)s' \
+    '000008036508000000b87516ae252c2e01722e73003c00000000000000000000000000' \
+    '%(event 74)s' \
+    '000008036508000000c07516ae192d2e01ce2e73003c00000000000000000000000000' \
+    '%(event 75)s' \
+    '000008036508000000c47516ae0d2e2e012a2f73003c00000000000000000000000000' \
+    '%(event 76)s' \
+    '000008036508000000c87516aefd2e2e01862f73003c00000000000000000000000000' \
+    '%(event 77)s' \
+    '000008036508000000cc7516aef12f2e01e22f73003c00000000000000000000000000' \
+    '%(event 78)s' \
+    '000008036508000000d07516aee9302e013e3073003c00000000000000000000000000' \
+    '%(event 79)s' \
+    '000008036508000000d47516aed9312e019a3073003c00000000000000000000000000' \
+    '%(event 80)s' \
+    '000008036508000000d87516aed1322e01f63073003a00000000000000000000000000' \
+    '%(event 81)s' \
+    '000008036508000000dc7516aebd332e01503173003c00000000000000000000000000' \
+    '%(event 82)s' \
+    '000008036508000000e07516aead342e01ac3173003c00000000000000000000000000' \
+    '%(event 83)s' \
+    '000008036508000000e57516aea1352e01083273003c00000000000000000000000000' \
+    '%(event 84)s' \
+    '000008036508000000e97516ae91362e01643273003c00000000000000000000000000' \
+    '%(event 85)s' \
+    '000008036508000000ed7516ae85372e01c03273003c00000000000000000000000000' \
+    '%(event 86)s' \
+    '000008036508000000f17516ae75382e011c3373003c00000000000000000000000000' \
+    '%(event 87)s' \
+    '000008036508000000f57516ae6d392e01783373003c00000000000000000000000000' \
+    '%(event 88)s' \
+    '000008036508000000f97516ae613a2e01d43373003c00000000000000000000000000' \
+    '%(event 89)s' \
+    '000008036508000000017616ae4d3b2e01303473003c00000000000000000000000000' \
+    '%(event 90)s' \
+    '000008036508000000057616ae453c2e018c3473003a00000000000000000000000000' \
+    '%(event 91)s' \
+    '000008036508000000097616ae353d2e01e63473003c00000000000000000000000000' \
+    '%(event 92)s' \
+    '0000080365080000000d7616ae253e2e01423573003c00000000000000000000000000' \
+    '%(event 93)s' \
+    '000008036508000000117616ae193f2e019e3573003c00000000000000000000000000' \
+    '%(event 94)s' \
+    '000008036508000000157616ae09402e01fa3573003c00000000000000000000000000' \
+    '%(event 95)s' \
+    '000008036508000000197616aefd402e01563673003c00000000000000000000000000' \
+    '%(event 96)s' \
+    '0000080365080000001d7616aeed412e01b23673003c00000000000000000000000000' \
+    '%(event 97)s' \
+    '000008036508000000217616aee5422e010e3773003c00000000000000000000000000' \
+    '%(event 98)s' \
+    '000008036508000000257616aed9432e016a3773003c00000000000000000000000000' \
+    '%(event 99)s' \
+    '000008036508000000297616aecd442e01c63773003c00000000000000000000000000' \
+    '%(event 100)s'
+
+GPS_EVENT_PACKET_HEADER = unhexlify('ad240000726400')
+GPS_EVENT_PACKET_TRAILER = unhexlify('0000')
+GPS_EVENT_LAST_PACKET_HEADER = unhexlify('d4250000726400')
+GPS_EVENTS_PER_PACKET = 100
+GPS_EVENT_INTERVAL = 1              # seconds between GPS events
+GPS_EVENT_SPEED = '22.4'            # knots
+
+# NMEA strings of GPS events (events 1, 11, 21, ... of each packet are at a fixed position)
+GPS_NMEA_SENTENCE = '$GPRMC,%(time)s,A,%(lat)s,N,%(long)s,W,' + GPS_EVENT_SPEED + ',045.0,%(date)s,,*%(checksum)s'
+GPS_FIXED_LATITUDE = '4800.2'
+GPS_FIXED_LONGITUDE = '12167.8'
+GPS_RANDOM_LATITUDE = '480#.##'
+GPS_RANDOM_LONGITUDE = '1216#.##'
+
+# two-digit fields and random coordinate fragments ('#.##', digits 1-9) of NMEA strings, with the
+# checksum (xor) of each
+DIGIT_PAIRS = ['%02d' % i for i in range(100)]
+HEX_PAIRS = ['%02X' % i for i in range(256)]
+DIGIT_PAIR_CHECKSUMS = [ord(pair[0]) ^ ord(pair[1]) for pair in DIGIT_PAIRS]
+COORDINATE_FRAGMENTS = ['%d.%d%d' % (a, b, c) for a in range(1, 10) for b in range(1, 10)
+                        for c in range(1, 10)]
+COORDINATE_FRAGMENT_CHECKSUMS = [reduce(lambda checksum, character: checksum ^ ord(character),
+                                        fragment, 0) for fragment in COORDINATE_FRAGMENTS]
 
+####################################################################################################
+# GPS Event Packet Builder #########################################################################
+####################################################################################################
+####################################################################################################
+
+
+class GPSEventPacketBuilder():
+    """ Builds GPS event data packets (see GPS_EVENT_PACKET_TEMPLATE) directly as binary. The
+    packet layout is laid out once; each packet is a copy of it with the time, date, random
+    coordinate digits and checksum of each event written in place, so any number of packets (e.g.,
+    months of GPS history) can be built without string formatting.
+    """
+
+    def __init__(self, interval=GPS_EVENT_INTERVAL):
+        """
+        INPUT
+            interval: the seconds between GPS events.
+        """
+
+        self.interval = interval
+
+        # split template into the record (binary) preceding each event
+        records = []
+        remainder = GPS_EVENT_PACKET_TEMPLATE
+        for i in range(1, GPS_EVENTS_PER_PACKET + 1):
+            record, remainder = remainder.split('%%(event %d)s' % i)
+            records.append(unhexlify(record))
+
+        # lay out the events (with placeholder values) and the offsets of their variable fields
+        self.layout = bytearray()
+        self.events = []
+        for i in range(1, GPS_EVENTS_PER_PACKET + 1):
+            self.layout += records[i - 1]
+            if str(i)[-1:] == '1':
+                lat, long = GPS_FIXED_LATITUDE, GPS_FIXED_LONGITUDE
+            else:
+                lat, long = GPS_RANDOM_LATITUDE, GPS_RANDOM_LONGITUDE
+            sentence = GPS_NMEA_SENTENCE % {'time': '000000', 'lat': lat, 'long': long,
+                                            'date': '000000', 'checksum': '00'}
+            start = len(self.layout)
+            self.layout += sentence
+
+            # checksum of the fixed characters (between $ and *, less the random fragments)
+            checksum = 0
+            for character in sentence[1:sentence.index('*')].replace('#.##', ''):
+                checksum ^= ord(character)
+            time_offset = start + sentence.index(',') + 1
+            date_offset = start + sentence.index(',,*') - 6
+            fragment_offsets = [start + offset for offset in range(len(sentence))
+                                if sentence[offset:offset + 4] == '#.##']
+
+            # (index, time offset, date offset, fragment offsets, checksum offset, checksum)
+            self.events.append((i, time_offset, date_offset, tuple(fragment_offsets),
+                                start + len(sentence) - 2, checksum))
+
+        # the length of a packet (for preallocation)
+        self.size = len(GPS_EVENT_PACKET_HEADER) + len(self.layout) + len(GPS_EVENT_PACKET_TRAILER)
+
+    def build_packet(self, iteration, end_time=None):
+        """ Build a packet of GPS event data (100 events, one interval apart).
+        INPUT
+            iteration: the batch of 100 events (counting back from the end time) to build, the
+                last (newest) being 1.
+            end time: the time (UTC, in seconds) of the newest event (the current time if None).
+        OUTPUT
+            the packet (bytearray).
+        """
+
+        if end_time is None:
+            end_time = time()
+
+        packet = bytearray(self.size)
+        if iteration == 1:
+            header, trailer = GPS_EVENT_LAST_PACKET_HEADER, ''
+        else:
+            header, trailer = GPS_EVENT_PACKET_HEADER, GPS_EVENT_PACKET_TRAILER
+        packet[:len(header)] = header
+        body = len(header)
+        packet[body:body + len(self.layout)] = self.layout
+        if trailer:
+            packet[body + len(self.layout):] = trailer
+        else:
+            del packet[body + len(self.layout):]
+
+        # offset the event layout by the header
+        events = [(i, body + time_offset, body + date_offset,
+                   tuple([body + offset for offset in fragment_offsets]),
+                   body + checksum_offset, checksum)
+                  for i, time_offset, date_offset, fragment_offsets, checksum_offset, checksum
+                  in self.events]
+
+        # random coordinate fragments (for all events at once)
+        fragments = [fragment % len(COORDINATE_FRAGMENTS) for fragment in
+                     unpack('<%dH' % (GPS_EVENTS_PER_PACKET * 2), urandom(GPS_EVENTS_PER_PACKET * 4))]
+        f = 0
+
+        oldest = end_time - self.interval * (GPS_EVENTS_PER_PACKET * iteration + 1)
+        date = None
+        for i, time_offset, date_offset, fragment_offsets, checksum_offset, checksum in events:
+            t = gmtime(oldest + self.interval * i)
+
+            # date (formatted once per day)
+            if t.tm_yday != date:
+                date = t.tm_yday
+                date_field = DIGIT_PAIRS[t.tm_mday] + DIGIT_PAIRS[t.tm_mon] + DIGIT_PAIRS[t.tm_year % 100]
+                date_checksum = DIGIT_PAIR_CHECKSUMS[t.tm_mday] ^ DIGIT_PAIR_CHECKSUMS[t.tm_mon] \
+                    ^ DIGIT_PAIR_CHECKSUMS[t.tm_year % 100]
+            packet[date_offset:date_offset + 6] = date_field
+            packet[time_offset:time_offset + 6] = DIGIT_PAIRS[t.tm_hour] + DIGIT_PAIRS[t.tm_min] \
+                + DIGIT_PAIRS[t.tm_sec]
+            checksum ^= date_checksum ^ DIGIT_PAIR_CHECKSUMS[t.tm_hour] \
+                ^ DIGIT_PAIR_CHECKSUMS[t.tm_min] ^ DIGIT_PAIR_CHECKSUMS[t.tm_sec]
+
+            for offset in fragment_offsets:
+                fragment = fragments[f]
+                f += 1
+                packet[offset:offset + 4] = COORDINATE_FRAGMENTS[fragment]
+                checksum ^= COORDINATE_FRAGMENT_CHECKSUMS[fragment]
+
+            packet[checksum_offset:checksum_offset + 2] = HEX_PAIRS[checksum]
+
+        return packet
+
+    def build_packets(self, num_events, end_time=None):
+        """ Build the packets of a GPS event history, oldest first (see build_packet).
+        INPUT
+            num events: the number of events in the history (rounded up to a whole packet).
+            end time: the time (UTC, in seconds) of the newest event (the current time if None).
+        OUTPUT
+            a generator of packets (bytearrays).
+        """
+
+        if end_time is None:
+            end_time = time()
+
+        iterations = (num_events + GPS_EVENTS_PER_PACKET - 1) / GPS_EVENTS_PER_PACKET
+        for iteration in range(iterations, 0, -1):
+            yield self.build_packet(iteration, end_time)
 
 ####################################################################################################
 # Encoder ##########################################################################################
@@ -34,272 +398,36 @@ from random import randint
 class Encoder():
     """ Sub-library of functions for encoding DVR responses (to ViM SDK)."""
 
-    def build_gps_event_data_packet(self, iteration, dynamic=False):
+    def return_gps_event_packet_builder(self):
+        """ Return the GPS event packet builder (laid out on first use).
+        """
+
+        builder = getattr(self, 'gps_event_packet_builder', None)
+        if builder is None:
+            builder = self.gps_event_packet_builder = GPSEventPacketBuilder()
+        return builder
+
+    def build_gps_event_data_packet(self, iteration, dynamic=False, end_time=None, encoded=True):
         """ Build a packet of GPS event data (100 events).
         INPUT
             iteration: the batch of 100 events (in sequence of entire generation) to be made.
                 NOTE: will be multiplied by 100 to determine oldest time value.
-            template: a response template for splicing in GPS event data.
+            end time: the time (UTC, in seconds) of the newest event of the generation (the current
+                time if None).
+            encoded: whether to return the packet hex-encoded (or binary).
         OUPUT
             successful: whether the function executed successfully or not.
-            packet: a hex-encoded string of GPS binary data.
+            packet: a hex-encoded (or binary) string of GPS binary data.
         """
 
-        template = '000008036508000000817416ae15e72d01461473003a00000000000000000000000000' \
-                   '%(event 1)s' \
-                   '000008036508000000857416ae0de82d01a01473003c00000000000000000000000000' \
-                   '%(event 2)s' \
-                   '0000080365080000008a7416ae01e92d01fc1473003c00000000000000000000000000' \
-                   '%(event 3)s' \
-                   '0000080365080000008e7416aef5e92d01581573003c00000000000000000000000000' \
-                   '%(event 4)s' \
-                   '000008036508000000927416aee5ea2d01b41573003c00000000000000000000000000' \
-                   '%(event 5)s' \
-                   '000008036508000000967416aed1eb2d01101673003c00000000000000000000000000' \
-                   '%(event 6)s' \
-                   '0000080365080000009a7416aec5ec2d016c1673003c00000000000000000000000000' \
-                   '%(event 7)s' \
-                   '0000080365080000009e7416aeb9ed2d01c81673003c00000000000000000000000000' \
-                   '%(event 8)s' \
-                   '000008036508000000a27416aea9ee2d01241773003c00000000000000000000000000' \
-                   '%(event 9)s' \
-                   '000008036508000000a67416ae9def2d01801773003c00000000000000000000000000' \
-                   '%(event 10)s' \
-                   '000008036508000000aa7416ae8df02d01dc1773003a00000000000000000000000000' \
-                   '%(event 11)s' \
-                   '000008036508000000ae7416ae85f12d01361873003c00000000000000000000000000' \
-                   '%(event 12)s' \
-                   '000008036508000000b27416ae7df22d01921873003c00000000000000000000000000' \
-                   '%(event 13)s' \
-                   '000008036508000000b67416ae6df32d01ee1873003c00000000000000000000000000' \
-                   '%(event 14)s' \
-                   '000008036508000000ba7416ae65f42d014a1973003c00000000000000000000000000' \
-                   '%(event 15)s' \
-                   '000008036508000000c27416ae55f52d01a61973003c00000000000000000000000000' \
-                   '%(event 16)s' \
-                   '000008036508000000c67416ae49f62d01021a73003c00000000000000000000000000' \
-                   '%(event 17)s' \
-                   '000008036508000000ca7416ae35f72d015e1a73003c00000000000000000000000000' \
-                   '%(event 18)s' \
-                   '000008036508000000ce7416ae29f82d01ba1a73003c00000000000000000000000000' \
-                   '%(event 19)s' \
-                   '000008036508000000d27416ae1df92d01161b73003c00000000000000000000000000' \
-                   '%(event 20)s' \
-                   '000008036508000000d67416ae11fa2d01721b73003a00000000000000000000000000' \
-                   '%(event 21)s' \
-                   '000008036508000000da7416aefdfa2d01cc1b73003c00000000000000000000000000' \
-                   '%(event 22)s' \
-                   '000008036508000000de7416aef5fb2d01281c73003c00000000000000000000000000' \
-                   '%(event 23)s' \
-                   '000008036508000000e27416aee1fc2d01841c73003c00000000000000000000000000' \
-                   '%(event 24)s' \
-                   '000008036508000000e77416aed9fd2d01e01c73003c00000000000000000000000000' \
-                   '%(event 25)s' \
-                   '000008036508000000eb7416aecdfe2d013c1d73003c00000000000000000000000000' \
-                   '%(event 26)s' \
-                   '000008036508000000ef7416aeb9ff2d01981d73003c00000000000000000000000000' \
-                   '%(event 27)s' \
-                   '000008036508000000f37416aea9002e01f41d73003c00000000000000000000000000' \
-                   '%(event 28)s' \
-                   '000008036508000000f77416aea1012e01501e73003c00000000000000000000000000' \
-                   '%(event 29)s' \
-                   '000008036508000000fb7416ae91022e01ac1e73003c00000000000000000000000000' \
-                   '%(event 30)s' \
-                   '000008036508000000037516ae81032e01081f73003a00000000000000000000000000' \
-                   '%(event 31)s' \
-                   '000008036508000000077516ae75042e01621f73003c00000000000000000000000000' \
-                   '%(event 32)s' \
-                   '0000080365080000000b7516ae69052e01be1f73003c00000000000000000000000000' \
-                   '%(event 33)s' \
-                   '0000080365080000000f7516ae61062e011a2073003c00000000000000000000000000' \
-                   '%(event 34)s' \
-                   '000008036508000000137516ae4d072e01762073003c00000000000000000000000000' \
-                   '%(event 35)s' \
-                   '000008036508000000177516ae3d082e01d22073003c00000000000000000000000000' \
-                   '%(event 36)s' \
-                   '0000080365080000001b7516ae31092e012e2173003c00000000000000000000000000' \
-                   '%(event 37)s' \
-                   '0000080365080000001f7516ae250a2e018a2173003c00000000000000000000000000' \
-                   '%(event 38)s' \
-                   '000008036508000000237516ae150b2e01e62173003c00000000000000000000000000' \
-                   '%(event 39)s' \
-                   '000008036508000000277516ae090c2e01422273003c00000000000000000000000000' \
-                   '%(event 40)s' \
-                   '0000080365080000002b7516aef90c2e019e2273003a00000000000000000000000000' \
-                   '%(event 41)s' \
-                   '0000080365080000002f7516aeed0d2e01f82273003c00000000000000000000000000' \
-                   '%(event 42)s' \
-                   '000008036508000000337516aedd0e2e01542373003c00000000000000000000000000' \
-                   '%(event 43)s' \
-                   '000008036508000000377516aed10f2e01b02373003c00000000000000000000000000' \
-                   '%(event 44)s' \
-                   '0000080365080000003b7516aec1102e010c2473003c00000000000000000000000000' \
-                   '%(event 45)s' \
-                   '000008036508000000437516aeb1112e01682473003c00000000000000000000000000' \
-                   '%(event 46)s' \
-                   '000008036508000000477516aea1122e01c42473003c00000000000000000000000000' \
-                   '%(event 47)s' \
-                   '0000080365080000004b7516ae99132e01202573003c00000000000000000000000000' \
-                   '%(event 48)s' \
-                   '0000080365080000004f7516ae89142e017c2573003c00000000000000000000000000' \
-                   '%(event 49)s' \
-                   '000008036508000000537516ae7d152e01d82573003c00000000000000000000000000' \
-                   '%(event 50)s' \
-                   '000008036508000000577516ae75162e01342673003a00000000000000000000000000' \
-                   '%(event 51)s' \
-                   '0000080365080000005c7516ae65172e018e2673003c00000000000000000000000000' \
-                   '%(event 52)s' \
-                   '000008036508000000607516ae59182e01ea2673003c00000000000000000000000000' \
-                   '%(event 53)s' \
-                   '000008036508000000647516ae4d192e01462773003c00000000000000000000000000' \
-                   '%(event 54)s' \
-                   '000008036508000000687516ae3d1a2e01a22773003c00000000000000000000000000' \
-                   '%(event 55)s' \
-                   '0000080365080000006c7516ae311b2e01fe2773003c00000000000000000000000000' \
-                   '%(event 56)s' \
-                   '000008036508000000707516ae211c2e015a2873003c00000000000000000000000000' \
-                   '%(event 57)s' \
-                   '000008036508000000747516ae151d2e01b62873003c00000000000000000000000000' \
-                   '%(event 58)s' \
-                   '000008036508000000787516ae011e2e01122973003c00000000000000000000000000' \
-                   '%(event 59)s' \
-                   '000008036508000000807516aef51e2e016e2973003c00000000000000000000000000' \
-                   '%(event 60)s' \
-                   '000008036508000000847516aee51f2e01ca2973003a00000000000000000000000000' \
-                   '%(event 61)s' \
-                   '000008036508000000887516aed5202e01242a73003c00000000000000000000000000' \
-                   '%(event 62)s' \
-                   '0000080365080000008c7516aec9212e01802a73003c00000000000000000000000000' \
-                   '%(event 63)s' \
-                   '000008036508000000907516aeb9222e01dc2a73003c00000000000000000000000000' \
-                   '%(event 64)s' \
-                   '000008036508000000947516aead232e01382b73003c00000000000000000000000000' \
-                   '%(event 65)s' \
-                   '000008036508000000987516ae9d242e01942b73003c00000000000000000000000000' \
-                   '%(event 66)s' \
-                   '0000080365080000009c7516ae8d252e01f02b73003c00000000000000000000000000' \
-                   '%(event 67)s' \
-                   '000008036508000000a07516ae81262e014c2c73003c00000000000000000000000000' \
-                   '%(event 68)s' \
-                   '000008036508000000a47516ae71272e01a82c73003c00000000000000000000000000' \
-                   '%(event 69)s' \
-                   '000008036508000000a87516ae61282e01042d73003c00000000000000000000000000' \
-                   '%(event 70)s' \
-                   '000008036508000000ac7516ae51292e01602d73003a00000000000000000000000000' \
-                   '%(event 71)s' \
-                   '000008036508000000b07516ae412a2e01ba2d73003c00000000000000000000000000' \
-                   '%(event 72)s' \
-                   '000008036508000000b47516ae312b2e01162e73003c00000000000000000000000000' \
-                   '%(event 73)s' \
-                   '000008036508000000b87516ae252c2e01722e73003c00000000000000000000000000' \
-                   '%(event 74)s' \
-                   '000008036508000000c07516ae192d2e01ce2e73003c00000000000000000000000000' \
-                   '%(event 75)s' \
-                   '000008036508000000c47516ae0d2e2e012a2f73003c00000000000000000000000000' \
-                   '%(event 76)s' \
-                   '000008036508000000c87516aefd2e2e01862f73003c00000000000000000000000000' \
-                   '%(event 77)s' \
-                   '000008036508000000cc7516aef12f2e01e22f73003c00000000000000000000000000' \
-                   '%(event 78)s' \
-                   '000008036508000000d07516aee9302e013e3073003c00000000000000000000000000' \
-                   '%(event 79)s' \
-                   '000008036508000000d47516aed9312e019a3073003c00000000000000000000000000' \
-                   '%(event 80)s' \
-                   '000008036508000000d87516aed1322e01f63073003a00000000000000000000000000' \
-                   '%(event 81)s' \
-                   '000008036508000000dc7516aebd332e01503173003c00000000000000000000000000' \
-                   '%(event 82)s' \
-                   '000008036508000000e07516aead342e01ac3173003c00000000000000000000000000' \
-                   '%(event 83)s' \
-                   '000008036508000000e57516aea1352e01083273003c00000000000000000000000000' \
-                   '%(event 84)s' \
-                   '000008036508000000e97516ae91362e01643273003c00000000000000000000000000' \
-                   '%(event 85)s' \
-                   '000008036508000000ed7516ae85372e01c03273003c00000000000000000000000000' \
-                   '%(event 86)s' \
-                   '000008036508000000f17516ae75382e011c3373003c00000000000000000000000000' \
-                   '%(event 87)s' \
-                   '000008036508000000f57516ae6d392e01783373003c00000000000000000000000000' \
-                   '%(event 88)s' \
-                   '000008036508000000f97516ae613a2e01d43373003c00000000000000000000000000' \
-                   '%(event 89)s' \
-                   '000008036508000000017616ae4d3b2e01303473003c00000000000000000000000000' \
-                   '%(event 90)s' \
-                   '000008036508000000057616ae453c2e018c3473003a00000000000000000000000000' \
-                   '%(event 91)s' \
-                   '000008036508000000097616ae353d2e01e63473003c00000000000000000000000000' \
-                   '%(event 92)s' \
-                   '0000080365080000000d7616ae253e2e01423573003c00000000000000000000000000' \
-                   '%(event 93)s' \
-                   '000008036508000000117616ae193f2e019e3573003c00000000000000000000000000' \
-                   '%(event 94)s' \
-                   '000008036508000000157616ae09402e01fa3573003c00000000000000000000000000' \
-                   '%(event 95)s' \
-                   '000008036508000000197616aefd402e01563673003c00000000000000000000000000' \
-                   '%(event 96)s' \
-                   '0000080365080000001d7616aeed412e01b23673003c00000000000000000000000000' \
-                   '%(event 97)s' \
-                   '000008036508000000217616aee5422e010e3773003c00000000000000000000000000' \
-                   '%(event 98)s' \
-                   '000008036508000000257616aed9432e016a3773003c00000000000000000000000000' \
-                   '%(event 99)s' \
-                   '000008036508000000297616aecd442e01c63773003c00000000000000000000000000' \
-                   '%(event 100)s'
-
-        if iteration == 1:
-            template = 'd4250000726400' + template# + '0000'
-            #template = 'ad240000726400' + template + '0000'
-
-        else:
-            template = 'ad240000726400' + template + '0000'
-
         self.log.debug("Building GPS event data packet ...")
         result = {'successful': False, 'packet': ''}
 
         try:
-            # build dictionary of GPS events
-            gps_events = {}
-            self.ixion = Ixion(self.log)
-            num_events = 100
-            utc_time_in_seconds = time() + (60 * 60)
-            for i in range(1, num_events + 1):
-                time_in_seconds = utc_time_in_seconds
-                time_in_seconds -= ((num_events * iteration) + 1)
-                time_in_seconds += i
-                date_time = datetime.utcfromtimestamp(time_in_seconds)
-
-                hour = date_time.hour - 1
-                min = date_time.minute
-                sec = date_time.second
-                day = date_time.day
-                month = date_time.month
-                year = int(str(date_time.year)[2:])
-
-                # determine lat/long
-                if '1' in str(i)[-1:]:
-                    lat = 4800.2
-                    long = -12167.8
-
-                else:
-                    #lat = 4800.23
-                    #long = -12167.77
-                    lat = float("480%d.%d%d" % (randint(1, 9), randint(1, 9), randint(1, 9)))
-                    long = float("-1216%d.%d%d" % (randint(1, 9), randint(1, 9), randint(1, 9)))
-
-                nmea_string = self.ixion.generate_nmea_string([hour, min, sec], [day, month, year], lat,
-                                                              long, self.ixion.speed)['string']
-
-                gps_events['event %d' % i] = hexlify(nmea_string.strip())
-
-            # update packet with gps events dict
-            packet = template % gps_events
-            self.log.trace(packet)
-            self.log.trace(len(packet))
-            # NOTE: The length of this packet (in template) MUST BE 18778 or ViM will not accept it as
-            #       a valid packet of data.
+            packet = str(self.return_gps_event_packet_builder().build_packet(iteration, end_time))
 
             # update return variables
-            result['packet'] = packet
+            result['packet'] = hexlify(packet) if encoded else packet
 
             self.log.trace("Built GPS event data packet.")
             result['successful'] = True
@@ -414,7 +542,7 @@ class Encoder():
                                                  search_sdk_map.dvr_request_3b_response2],
                 #search_sdk_map.dvr_request_3c:  [search_sdk_map.dvr_request_3c_response],
                 search_sdk_map.dvr_num_gps_events_request:  [search_sdk_map.dvr_num_gps_events_request_response
-                                                             % {'num gps events': hex(num_gps_events-100).replace('0x', '')}],
+                                                             % {'num gps events': hexlify(pack('<I', num_gps_events-100))}],
                 '': [],
                 search_sdk_map.dvr_request_unknown: []
             }
@@ -0,0 +1,358 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+import socket
+from heapq import heappush, heappop
+from time import time
+from transport import AsyncTransport, TransportError, Poller, READ, WRITE, RETRY_ERRORS, \
+    open_listener
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+LISTEN_BACKLOG = 128        # connections queued on each listener before the loop accepts them
+POLL_TIMEOUT = 1.0          # seconds the loop waits for socket events before checking timers
+ACCEPT_BATCH = 64           # maximum connections accepted per listener event
+
+
+def run_engine_in_process(num_sites, site_ids, loop, num_gps_events, logging_level='info'):
+    """ Run a DVR simulation engine loop in its own process (see Tantalus.run_dvr_simulation_engine).
+    INPUT
+        num sites: the number of sites simulated (in all loops).
+        site ids: the ids of the sites simulated by this loop.
+        loop: the number of the loop (to name its log file).
+        num gps events: the number of GPS events each simulated site serves.
+        logging level: the level of logging for the loop.
+    """
+
+    # imported here (the process builds its own simulator)
+    from logger import Logger
+    from Sisyphus import Sisyphus
+    from Tantalus import Tantalus
+
+    log = Logger(logging_level, output_filename="Tantalus loop %d.log" % loop)
+    tantalus = Tantalus(log, Sisyphus, num_sites=num_sites, num_gps_events=num_gps_events)
+    tantalus.run_dvr_simulation_engine(site_ids=site_ids)
+
+####################################################################################################
+# Engine ###########################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Connection(AsyncTransport):
+    """ A site connection served by the engine. """
+
+    def __init__(self, sock, address, session):
+        AsyncTransport.__init__(self, sock, buffer_limit=None)
+        self.address = address
+        self.session = session
+        self.pending = 0
+        self.last_due = 0.0
+        self.closing = False
+        self.last_activity = time()
+
+
+class DVREngine():
+    """ Single-threaded event loop serving the admin and search SDK ports of simulated DVR sites.
+    Every listener and site connection is a non-blocking socket polled by one loop, so an idle
+    connection costs only its socket and session. Responses to a request are queued on the
+    connection and written as the socket accepts them.
+    """
+
+    def __init__(self, responder, listener_addresses, logger, packet_size=16284,
+                 idle_timeout=None, poll_timeout=POLL_TIMEOUT):
+        """
+        INPUT
+            responder: the DVR simulator (e.g., Tantalus or a capture Replayer), opening a
+                session for each connection (open_dvr_session) and responding to its requests
+                (respond_to_dvr_request). Either may return 'messages' to send, with 'delays'
+                (seconds from now) at which to send them.
+            listener addresses: the addresses (ip, port) at which to listen for site connections.
+            logger: An initialized instance of a logging class to use.
+            packet size: the size of data packets to receive.
+            idle timeout: seconds after which to close a connection that has not communicated
+                (None if never).
+            poll timeout: the maximum seconds to wait for socket events.
+        """
+
+        # instance logger
+        self.log = logger
+
+        # define default attributes
+        self.responder = responder
+        self.listener_addresses = listener_addresses
+        self.packet_size = packet_size
+        self.idle_timeout = idle_timeout
+        self.poll_timeout = poll_timeout
+        self.running = False
+
+        # socket tracking
+        self.poller = Poller()
+        self.listeners = {}
+        self.connections = {}
+
+        # messages to send later (due time, order, connection, message)
+        self.timers = []
+        self.timer_count = 0
+
+        # metrics
+        self.metrics = {
+            'accepted':         0,
+            'closed':           0,
+            'timed out':        0,
+            'requests':         0,
+            'bytes received':   0,
+            'bytes sent':       0,
+            'errors':           0,
+        }
+
+    def open_listeners(self):
+        """ Open a non-blocking listener at each listener address.
+        OUTPUT
+            successful: whether the function executed successfully or not.
+            listeners: the number of listeners opened.
+        """
+
+        self.log.debug("Opening %d listeners ..." % len(self.listener_addresses))
+        result = {'successful': False, 'listeners': 0}
+
+        for address in self.listener_addresses:
+            try:
+                listener = open_listener(address, LISTEN_BACKLOG, blocking=False)
+                self.listeners[listener.fileno()] = (listener, address)
+                self.poller.register(listener.fileno(), READ)
+                result['listeners'] += 1
+            except BaseException, e:
+                self.log.error("Failed to open listener at %s." % str(address))
+                self.log.error(str(e))
+
+        self.log.trace("Opened %d listeners (polling with %s)."
+                       % (result['listeners'], self.poller.mechanism))
+        result['successful'] = result['listeners'] == len(self.listener_addresses)
+        return result
+
+    def run(self):
+        """ Serve site connections until stopped.
+        """
+
+        self.log.debug("Running DVR simulation engine ...")
+
+        if not self.listeners:
+            self.open_listeners()
+
+        self.running = True
+        last_sweep = time()
+        try:
+            while self.running:
+                # wait no longer than the next timer
+                timeout = self.poll_timeout
+                if self.timers:
+                    timeout = max(0.0, min(timeout, self.timers[0][0] - time()))
+
+                for fd, events in self.poller.poll(timeout):
+                    if fd in self.listeners:
+                        self.accept_connections(fd)
+                        continue
+                    connection = self.connections.get(fd)
+                    if connection is None:
+                        continue
+                    if events & READ:
+                        self.read_from_connection(connection)
+                    if events & WRITE and self.connections.get(fd) is connection:
+                        self.write_to_connection(connection)
+
+                # send messages that are due
+                if self.timers:
+                    self.send_due_messages()
+
+                # close idle connections
+                if self.idle_timeout is not None and time() - last_sweep >= self.poll_timeout:
+                    last_sweep = time()
+                    for connection in self.connections.values():
+                        if last_sweep - connection.last_activity > self.idle_timeout:
+                            self.metrics['timed out'] += 1
+                            self.close_connection(connection)
+        finally:
+            self.close()
+
+        self.log.trace("Ran DVR simulation engine.")
+
+    def stop(self):
+        """ Stop the engine (within one poll timeout).
+        """
+
+        self.running = False
+
+    def accept_connections(self, fd):
+        """ Accept the pending connections at a listener.
+        """
+
+        listener, address = self.listeners[fd]
+        for i in range(ACCEPT_BATCH):
+            try:
+                sock, site_address = listener.accept()
+            except socket.error, e:
+                if e.args[0] not in RETRY_ERRORS:
+                    self.log.warn("Failed to accept connection at %s: %s." % (str(address), str(e)))
+                return
+
+            try:
+                result = self.responder.open_dvr_session(sock.getsockname())
+                if result['session'] is None:
+                    sock.close()
+                    continue
+                connection = Connection(sock, site_address, result['session'])
+                self.connections[connection.fd] = connection
+                self.poller.register(connection.fd, READ)
+                self.metrics['accepted'] += 1
+
+                # messages sent on connection (e.g., a replayed DVR greeting)
+                if result.get('messages'):
+                    self.queue_messages(connection, result)
+            except BaseException, e:
+                self.log.warn("Failed to open session for %s: %s." % (str(site_address), str(e)))
+                self.metrics['errors'] += 1
+                sock.close()
+
+    def read_from_connection(self, connection):
+        """ Receive a request from a connection and queue the responses to it.
+        """
+
+        data = connection.read(self.packet_size)
+        if data is None:
+            return
+
+        # site disconnected (or the connection failed)
+        if len(data) == 0:
+            self.close_connection(connection)
+            return
+
+        connection.last_activity = time()
+        self.metrics['requests'] += 1
+        self.metrics['bytes received'] += len(data)
+
+        result = self.responder.respond_to_dvr_request(connection.session, data)
+        self.queue_messages(connection, result)
+
+    def queue_messages(self, connection, result):
+        """ Queue the messages of a response to a connection (or schedule them, if delayed),
+        and send what can be sent now.
+        """
+
+        # (messages follow any still scheduled for the connection, in order)
+        delays = result.get('delays')
+        if (delays and max(delays) > 0) or connection.pending:
+            now = time()
+            for message, delay in zip(result['messages'], delays or [0.0] * len(result['messages'])):
+                connection.last_due = max(now + delay, connection.last_due)
+                self.timer_count += 1
+                heappush(self.timers, (connection.last_due, self.timer_count, connection, message))
+                connection.pending += 1
+            connection.closing = result.get('closing', False)
+            if connection.closing and connection.pending == 0:
+                self.close_connection(connection)
+            return
+
+        for message in result['messages']:
+            connection.queue(message)
+        connection.closing = result.get('closing', False)
+        self.write_to_connection(connection)
+
+    def send_due_messages(self):
+        """ Send the scheduled messages that are due.
+        """
+
+        now = time()
+        written = []
+        while self.timers and self.timers[0][0] <= now:
+            due, count, connection, message = heappop(self.timers)
+            # (skip closed connections, even if a new connection has since reused the fd)
+            if self.connections.get(connection.fd) is not connection:
+                continue
+            connection.queue(message)
+            connection.pending -= 1
+            if not written or written[-1] is not connection:
+                written.append(connection)
+        for connection in written:
+            if self.connections.get(connection.fd) is connection:
+                self.write_to_connection(connection)
+
+    def write_to_connection(self, connection):
+        """ Send as much of the queued responses of a connection as its socket accepts.
+        """
+
+        sent = connection.metrics['bytes sent']
+        try:
+            queued = connection.handle_write()
+        except TransportError:
+            self.metrics['errors'] += 1
+            self.close_connection(connection)
+            return
+        self.metrics['bytes sent'] += connection.metrics['bytes sent'] - sent
+
+        if queued:
+            self.poller.modify(connection.fd, READ | WRITE)
+        elif connection.closing and connection.pending == 0:
+            self.close_connection(connection)
+        else:
+            self.poller.modify(connection.fd, READ)
+
+    def close_connection(self, connection):
+        """ Close a site connection.
+        """
+
+        if self.connections.get(connection.fd) is not connection:
+            return
+        del self.connections[connection.fd]
+        self.poller.unregister(connection.fd)
+        connection.close()
+        self.metrics['closed'] += 1
+
+    def close(self):
+        """ Close all listeners and connections.
+        """
+
+        self.log.trace("Closing %d listeners and %d connections ..."
+                       % (len(self.listeners), len(self.connections)))
+
+        for connection in self.connections.values():
+            self.close_connection(connection)
+        for fd, (listener, address) in self.listeners.items():
+            self.poller.unregister(fd)
+            try:
+                listener.close()
+            except BaseException:
+                pass
+        self.listeners = {}
+        self.poller.close()
+        self.running = False
+
+    def return_metrics(self):
+        """ Return engine metrics.
+        OUTPUT
+            accepted: the number of connections accepted.
+            closed: the number of connections closed.
+            timed out: the number of connections closed for being idle.
+            requests: the number of requests received.
+            bytes received: the number of bytes received.
+            bytes sent: the number of bytes sent.
+            errors: the number of connection errors.
+            open: the number of connections currently open.
+        """
+
+        metrics = dict(self.metrics)
+        metrics['open'] = len(self.connections)
+        return metrics
@@ -78,6 +78,6 @@ class SearchSDKMap():
         #self.dvr_request_3c = '0d0000006b277628ae27762aae'
         self.dvr_request_3c_response = '09000000600d4a000009000000600d46000009000000600d42000009000000600d3e000009000000600d3a000009000000600d36000009000000600d32000009000000600d2e000009000000600d2a000009000000600d26000009000000600d22000009000000600d1e000009000000600d1a000009000000600d16000009000000600d12000009000000600d0e000009000000600d0a000009000000600d0600000900000060cd7d00000900000060cd7900000900000060cd7500000900000060cd7100000900000060cd6d00000900000060cd6900000900000060cd65000009000000604a0e000009000000604a0a000009000000604a0600000500000061'
         self.dvr_num_gps_events_request = '050000006c'
-        self.dvr_num_gps_events_request_response = '0a0000006c%(num gps events)s00000001'
+        self.dvr_num_gps_events_request_response = '0a0000006c%(num gps events)s01'
         self.dvr_gps_events_request = '050000006d'
 
@@ -0,0 +1,230 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+from binascii import hexlify
+from transport import AsyncTransport, TransportError, Poller, READ, WRITE
+from engine import POLL_TIMEOUT
+from capture import FROM_SITE, FROM_DVR
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+CLONE_BUFFER_LIMIT = 4 * 1024 * 1024    # bytes queued for a clone before the overflow policy applies
+
+# overflow policies (when a clone falls too far behind)
+DISCONNECT = 'disconnect'   # disconnect the clone (the rest of its stream would be incomplete)
+DROP = 'drop'               # drop the messages that do not fit (keeping the clone connected)
+
+####################################################################################################
+# Fan-Out Relay ####################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Peer(AsyncTransport):
+    """ A socket of the relay, with its own write buffer (see AsyncTransport). """
+
+    def __init__(self, sock, role, buffer_limit=None):
+        AsyncTransport.__init__(self, sock, buffer_limit=buffer_limit)
+        self.role = role
+        self.metrics['messages dropped'] = 0
+
+
+class FanOutRelay():
+    """ Relays traffic between a site and a live DVR, cloning the DVR responses to any number of
+    other (clone) sites. All sockets are non-blocking and driven by one readiness loop; each has
+    its own bounded write buffer, so a slow clone never holds up the live session or the others.
+    A clone whose buffer overflows is disconnected (or has messages dropped, see overflow).
+    """
+
+    def __init__(self, site, dvr, clones, logger, packet_size=16284,
+                 buffer_limit=CLONE_BUFFER_LIMIT, overflow=DISCONNECT, capture=None, output=None):
+        """
+        INPUT
+            site: a socket connected to the (live) site.
+            dvr: a socket connected to the DVR.
+            clones: a list of sockets connected to the sites to which to clone the DVR responses.
+            logger: An initialized instance of a logging class to use.
+            packet size: the size of data packets to receive.
+            buffer limit: the bytes queued for a clone before the overflow policy applies.
+            overflow: the overflow policy (DISCONNECT or DROP).
+            capture: a CaptureWriter to record the relayed traffic to (None if not recording).
+            output: a file to which to write the relayed traffic as hex (None if not).
+        """
+
+        # instance logger
+        self.log = logger
+
+        self.packet_size = packet_size
+        self.overflow = overflow
+        self.capture = capture
+        self.output = output
+
+        self.poller = Poller()
+        self.peers = {}
+        self.site = self.add_peer(site, 'site')
+        self.dvr = self.add_peer(dvr, 'dvr')
+        self.clones = [self.add_peer(clone, 'clone', buffer_limit) for clone in clones]
+
+        if self.capture is not None:
+            self.session = self.capture.open_session()
+            self.dvr_port = dvr.getpeername()[1]
+
+        # metrics
+        self.metrics = {
+            'relayed':          0,
+            'bytes relayed':    0,
+            'overflows':        0,
+            'disconnected':     0,
+        }
+
+    def add_peer(self, sock, role, buffer_limit=None):
+        peer = Peer(sock, role, buffer_limit)
+        self.peers[peer.fd] = peer
+        self.poller.register(peer.fd, READ)
+        return peer
+
+    def run(self, poll_timeout=POLL_TIMEOUT):
+        """ Relay until the site or DVR disconnects.
+        """
+
+        self.log.debug("Relaying between %s and DVR %s (cloning to %d sites) ..."
+                       % (self.site.name, self.dvr.name, len(self.clones)))
+
+        try:
+            while self.site.open and self.dvr.open:
+                for fd, events in self.poller.poll(poll_timeout):
+                    peer = self.peers.get(fd)
+                    if peer is None:
+                        continue
+                    if events & READ:
+                        self.read_from_peer(peer)
+                    if events & WRITE and self.peers.get(fd) is peer:
+                        self.write_to_peer(peer)
+
+            # deliver what the site was sent before closing
+            if self.site.open:
+                self.site.flush()
+        finally:
+            self.close()
+
+        self.log.trace("Relayed between %s and DVR %s." % (self.site.name, self.dvr.name))
+
+    def read_from_peer(self, peer):
+        """ Receive from a peer and relay (site to DVR, DVR to site and clones; clone traffic is
+        read and discarded).
+        """
+
+        data = peer.read(self.packet_size)
+        if data is None:
+            return
+
+        if len(data) == 0:
+            self.log.trace("%s %s disconnected." % (peer.role.capitalize(), peer.name))
+            self.close_peer(peer)
+            return
+
+        if peer is self.site:
+            self.record(FROM_SITE, peer, data)
+            self.queue(self.dvr, data)
+        elif peer is self.dvr:
+            self.record(FROM_DVR, peer, data)
+            self.queue(self.site, data)
+            for clone in self.clones:
+                if clone.open:
+                    self.queue(clone, data)
+            self.metrics['relayed'] += 1
+            self.metrics['bytes relayed'] += len(data)
+
+    def record(self, direction, peer, data):
+        if self.capture is not None:
+            self.capture.record(self.session, self.dvr_port, direction, data)
+        if self.output is not None:
+            self.output.write("\nRECEIVED FROM %s:\t%s" % (peer.name, hexlify(data)))
+
+    def queue(self, peer, data):
+        """ Queue data to a peer (applying the overflow policy to clones), and send what can be
+        sent now.
+        """
+
+        if peer.buffer_limit is not None and peer.queued + len(data) > peer.buffer_limit:
+            self.metrics['overflows'] += 1
+            if self.overflow == DROP:
+                peer.metrics['messages dropped'] += 1
+                return
+            self.log.warn("Clone %s fell behind (%d bytes queued, lagging %.1f s). Disconnecting ..."
+                          % (peer.name, peer.queued, peer.return_lag()))
+            self.close_peer(peer)
+            return
+
+        was_empty = not peer.outbox
+        peer.queue(data)
+        if was_empty:
+            self.write_to_peer(peer)
+
+    def write_to_peer(self, peer):
+        """ Send as much of the write buffer of a peer as its socket accepts.
+        """
+
+        try:
+            queued = peer.handle_write()
+        except TransportError, e:
+            self.log.trace("Failed to send to %s %s: %s." % (peer.role, peer.name, str(e)))
+            self.close_peer(peer)
+            return
+
+        self.poller.modify(peer.fd, READ | WRITE if queued else READ)
+
+    def close_peer(self, peer):
+        """ Close a peer (dropping its write buffer).
+        """
+
+        if self.peers.get(peer.fd) is not peer:
+            return
+        del self.peers[peer.fd]
+        self.poller.unregister(peer.fd)
+        peer.close()
+        if peer.role == 'clone' and self.site.open and self.dvr.open:
+            self.metrics['disconnected'] += 1
+
+    def close(self):
+        """ Close all peers.
+        """
+
+        for peer in self.peers.values():
+            self.close_peer(peer)
+        self.poller.close()
+        if self.capture is not None:
+            self.capture.flush()
+
+    def return_metrics(self):
+        """ Return relay metrics.
+        OUTPUT
+            relayed: the number of DVR messages relayed.
+            bytes relayed: the number of bytes of DVR messages relayed.
+            overflows: the number of times a clone buffer overflowed.
+            disconnected: the number of clones disconnected.
+            clones: the number of clones relayed to.
+            max lag: the longest any message waited to be sent to a clone (seconds).
+            max queued: the most bytes queued for a clone.
+            messages dropped: the number of messages dropped for clones.
+        """
+
+        metrics = dict(self.metrics)
+        metrics['clones'] = len(self.clones)
+        metrics['max lag'] = max([clone.metrics['max lag'] for clone in self.clones] or [0.0])
+        metrics['max queued'] = max([clone.metrics['max queued'] for clone in self.clones] or [0])
+        metrics['messages dropped'] = sum([clone.metrics['messages dropped'] for clone in self.clones])
+        return metrics
@@ -10,8 +10,8 @@
 ####################################################################################################
 
 import inspect
-import socket
 from binascii import hexlify, unhexlify
+from transport import Transport, open_connection
 from models import *
 from testcase import ThanatosTestCase
 from collections import OrderedDict
@@ -391,15 +391,14 @@ class Thanatos():
 
                 self.log.trace("Connecting to remote client at %s ..." % str(client_addr))
 
-                hekate_conn = socket.socket()
-                hekate_conn.connect(client_addr)
+                hekate_conn = Transport(open_connection(client_addr))
 
                 self.log.trace("... connected.")
 
-                # send commands to client
+                # send commands to client (a message each)
                 for command in commands:
                     self.log.trace("Sending command:\t'%s'." % unhexlify(command))
-                    hekate_conn.send(command)
+                    hekate_conn.send_message(command)
 
                 # close connection to client
                 hekate_conn.close()
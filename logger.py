@@ -11,8 +11,11 @@
 ####################################################################################################
 ####################################################################################################
 
-import sys, os, shutil
+import sys, os, shutil, atexit
 from datetime import datetime
+from time import time
+from threading import Thread, Lock
+from Queue import Queue, Full, Empty
 #from mapping import TARTAROS_LOGGING_PATH
 
 ####################################################################################################
@@ -36,6 +39,207 @@ TEST_STATUSES = {
     'passed with issues':'passed with issues',
     'invalid due to version':'invalid due to version',
 }
+QUEUE_SIZE = 20000                  # messages held for writing before back-pressure applies
+BATCH_SIZE = 1000                   # maximum messages written at once
+FLUSH_INTERVAL = 1.0                # maximum seconds between flushes of log files
+MAX_FILE_SIZE = 100 * 1024 * 1024   # bytes a log file may grow to before being archived
+DROPPABLE_LEVELS = ('trace', 'debug')
+
+
+def archive_logging_file(filepath):
+    """ Archive a logging file (renaming it with the current date and time). """
+
+    try:
+        root, extension = os.path.splitext(filepath)
+        stamp = str(datetime.now()).replace(' ', '_').replace(':', '_').replace('.', '_')
+        shutil.move(filepath, root + stamp + extension)
+    except BaseException, e:
+        sys.stderr.write(str(e))
+
+####################################################################################################
+# Log Writer #######################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class LogWriter():
+    """ Writes logged messages (to stdout and log files) from a queue in a background thread,
+    so that logging never waits on the console or disk. Messages are written in batches, over
+    one open handle per log file, in the order they were logged. When the queue is full, trace
+    and debug messages are dropped (and counted) rather than holding up the threads logging them.
+    """
+
+    def __init__(self, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, max_file_size=MAX_FILE_SIZE):
+        """
+        INPUT
+            queue size: the number of messages held for writing before back-pressure applies.
+            batch size: the maximum number of messages written at once.
+            flush interval: the maximum seconds between flushes of log files.
+            max file size: the bytes a log file may grow to before being archived (None if no
+                limit).
+        """
+
+        self.queue = Queue(queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_file_size = max_file_size
+        self.lock = Lock()
+        self.thread = None
+        self.dropped = 0
+        self.files = {}
+        self.last_flush = time()
+
+    def start(self):
+        """ Start the writing thread (if not already started).
+        """
+
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(target=self.run, name="log writer")
+                self.thread.daemon = True
+                self.thread.start()
+
+    def put(self, level, text, filepath=None):
+        """ Queue text for writing.
+        INPUT
+            level: the level of the message (trace and debug messages may be dropped).
+            text: the text to write to stdout (and the log file, if given).
+            filepath: the path of the log file to also write the text to (None if none).
+        """
+
+        if self.thread is None or not self.thread.is_alive():
+            self.start()
+
+        try:
+            self.queue.put_nowait((text, filepath))
+        except Full:
+            if level in DROPPABLE_LEVELS:
+                with self.lock:
+                    self.dropped += 1
+            else:
+                self.queue.put((text, filepath))
+
+    def is_writing(self, filepath):
+        """ Return whether the given log file is open for writing.
+        """
+
+        return filepath in self.files
+
+    def run(self):
+        """ Write queued messages until closed (a None message is queued).
+        """
+
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except Empty:
+                self.flush_files()
+                continue
+            while len(batch) < self.batch_size:
+                try: batch.append(self.queue.get_nowait())
+                except Empty: break
+
+            closing = None in batch
+            self.write([message for message in batch if message is not None])
+            if closing or self.queue.empty() or time() - self.last_flush >= self.flush_interval:
+                self.flush_files()
+            for message in batch:
+                self.queue.task_done()
+            if closing:
+                self.close_files()
+                break
+
+    def write(self, batch):
+        """ Write a batch of messages.
+        """
+
+        # note dropped messages
+        with self.lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            note = ("\n%s *WARN*\t\tDropped %d trace/debug messages (logging backed up)."
+                    % (datetime.now(), dropped))
+            batch = [(note, None)] + [(note, filepath) for filepath in self.files] + batch
+
+        try:
+            sys.stdout.write(''.join([text for text, filepath in batch]))
+            sys.stdout.flush()
+        except BaseException, e:
+            sys.stderr.write("Failed to write to stdout.")
+            sys.stderr.write(str(e))
+
+        # collate text per log file
+        texts = {}
+        for text, filepath in batch:
+            if filepath is not None:
+                texts.setdefault(filepath, []).append(text)
+        for filepath, text in texts.items():
+            try:
+                self.write_to_file(filepath, ''.join(text))
+            except BaseException, e:
+                sys.stderr.write("Failed to write to output file.")
+                sys.stderr.write(str(e))
+
+    def write_to_file(self, filepath, text):
+        """ Write text to a log file (archiving it first at the end of the day, or when it has
+        reached the maximum size).
+        """
+
+        output = self.files.get(filepath)
+        if output is not None:
+            day, handle = output
+            if datetime.now().day != day or (self.max_file_size is not None
+                                              and handle.tell() >= self.max_file_size):
+                handle.close()
+                del self.files[filepath]
+                archive_logging_file(filepath)
+                output = None
+        if output is None:
+            output = self.files[filepath] = (datetime.now().day, open(filepath, 'a'))
+        output[1].write(text)
+
+    def flush_files(self):
+        """ Flush all open log files.
+        """
+
+        for filepath, (day, handle) in self.files.items():
+            try:
+                handle.flush()
+            except BaseException, e:
+                sys.stderr.write("Failed to flush output file.")
+                sys.stderr.write(str(e))
+        self.last_flush = time()
+
+    def close_files(self):
+        """ Close all open log files.
+        """
+
+        for filepath, (day, handle) in self.files.items():
+            try:
+                handle.close()
+            except BaseException, e:
+                sys.stderr.write(str(e))
+        self.files = {}
+
+    def flush(self):
+        """ Wait for all queued messages to be written (and flushed).
+        """
+
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.join()
+
+    def close(self):
+        """ Write all queued messages, then stop the writing thread and close all log files.
+        """
+
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+# log writer shared by all loggers (one thread and one handle per log file for the process)
+WRITER = LogWriter()
+atexit.register(WRITER.close)
 
 ####################################################################################################
 # Logger ###########################################################################################
@@ -48,10 +252,13 @@ class Logger():
 
     def __init__(
             self, logging_level='trace', output_path=os.getcwdu() + "\\logs",
-            output_filename="Tartaros.log"):
+            output_filename="Tartaros.log", writer=None):
 
         self.logging_level = LEVELS[logging_level.lower()]
 
+        # messages are written in the background (see LogWriter)
+        self.writer = WRITER if writer is None else writer
+
         # validate output path
         self.output_path = output_path
         self.output_filename = output_filename
@@ -59,7 +266,9 @@ class Logger():
             if not os.path.exists(self.output_path):
                 self.output_path = None
                 sys.stderr.write("Failed to validate output path: '%s'." % self.output_path)
-            if os.path.exists(self.output_path + "\\" + self.output_filename):
+            # archive the log of a previous run (unless another logger is writing to it)
+            filepath = self.output_path + "\\" + self.output_filename
+            if os.path.exists(filepath) and not self.writer.is_writing(filepath):
                 self.archive_active_logging_file()
 
         except BaseException, e:
@@ -68,9 +277,6 @@ class Logger():
             self.output_path = None
             self.output = None
 
-        # logger tracking
-        self.active_output_start = datetime.now().day
-
     def log_message(self, message, level, new_line=True):
         """ Log message according to level. """
 
@@ -79,7 +285,7 @@ class Logger():
 
         # modify message depending on level
         if not new_line:
-            sys.stdout.write(message_to_log)
+            self.writer.put(level, message_to_log)
         elif level == 'info' and self.logging_level >= LEVELS['info']:
             message_to_log = '\033[95m*INFO*\t' + message_to_log
         elif level == 'debug' and self.logging_level >= LEVELS['debug']:
@@ -100,34 +306,23 @@ class Logger():
             # add \n
             message_to_log = '\n' + message_to_log
 
-            # write message to log
-            sys.stdout.write(message_to_log)
-            #if level == 'warn' or level == 'error':
-            #    sys.stderr.write(message_to_log)
+            # queue message to write to log (and stdout)
+            if self.output_path is not None:
+                filepath = self.output_path + "\\" + self.output_filename
+            else:
+                filepath = None
+            self.writer.put(level, message_to_log, filepath)
 
-            try:
-                if self.output_path is not None:
-                    # check for roll-over at end of day
-                    if datetime.now().day > self.active_output_start:
-                        self.archive_active_logging_file()
+    def archive_active_logging_file(self):
+        archive_logging_file(self.output_path + "\\" + self.output_filename)
 
-                    # append output
-                    self.output = open(self.output_path + "\\" + self.output_filename, 'a')
-                    self.output.write(message_to_log)
-                    self.output.close()
+    def send_build_message(self, message):
+        """ Send a service message to TeamCity (written to stdout, in order with logging). """
+        self.writer.put('build', message + '\n')
 
-            except BaseException, e:
-                sys.stderr.write("Failed to write to output file.")
-                sys.stderr.write(str(e))
-    def archive_active_logging_file(self):
-        try:
-            filepath = self.output_path + "\\" + self.output_filename
-            filepath_list = filepath.split('.')
-            filepath_list[0] += str(datetime.now()).replace(' ', '_').replace(':', '_').replace('.', '_')
-            new_filepath = '.'.join(filepath_list)
-            shutil.move(filepath, new_filepath)
-        except BaseException, e:
-            sys.stderr.write(str(e))
+    def flush(self):
+        """ Wait for all messages logged to be written. """
+        self.writer.flush()
 
     def info(self, message):
         self.log_message(message, 'info')
@@ -155,7 +350,7 @@ class Logger():
         """
 
         message = "\n##teamcity[message text='%s' errorDetails='' status='ERROR']" % message
-        print message
+        self.send_build_message(message)
 
     def build_test_start(self, test_name):
         """ Send service message to TeamCity that test with specified name is beginning.
@@ -164,7 +359,7 @@ class Logger():
         """
 
         message = "\n##teamcity[testSuiteStarted name='%s']" % test_name
-        print message
+        self.send_build_message(message)
 
     def build_test_end(self, test_name):
         """ Send service message to TeamCity that test case with specified name is ending.
@@ -172,7 +367,7 @@ class Logger():
         """
 
         message = "\n##teamcity[testSuiteFinished name='%s']" % test_name
-        print message
+        self.send_build_message(message)
 
     def build_testcase_start(self, name):
         """ Send service message to TeamCity that test case with specified name is beginning.
@@ -180,7 +375,7 @@ class Logger():
         specified test case until a test case ending message is received. """
 
         message = "\n##teamcity[testStarted name='%s']"%name
-        print message
+        self.send_build_message(message)
 
     def build_testcase_end(self, test_name, status, duration, stacktrace=None):
         """ Send service message to TeamCity that test case with specified name is ending.
@@ -198,12 +393,12 @@ class Logger():
                 failureMessage = "\n##teamcity[testFailed name='%s' details='%s']"\
                                  % (test_name, stacktrace)
             else: failureMessage = "\n##teamcity[testFailed name='%s']" % test_name
-            print failureMessage
+            self.send_build_message(failureMessage)
 
         # convert seconds (recorded duration) to milliseconds (TeamCity)
         duration *= 1000
         message = "\n##teamcity[testFinished name='%s' duration='%d']" % (test_name, duration)
-        print message
+        self.send_build_message(message)
 
     def build_set_label(self, label, version):
         """ Send service message to TeamCity that the build should have the given label.
@@ -213,4 +408,65 @@ class Logger():
         """
 
         message = "##teamcity[buildNumber '%s-%s']" % (str(version), label)
-        print message
\ No newline at end of file
+        self.send_build_message(message)
+
+    def build_statistic_value(self, key, value):
+        """ Send service message to TeamCity reporting a value of a build statistic (charted by
+        TeamCity across builds).
+        INPUT
+            key: the name of the statistic.
+            value: the (numeric) value of the statistic.
+        """
+
+        message = "\n##teamcity[buildStatisticValue key='%s' value='%s']" % (key, value)
+        self.send_build_message(message)
+
+
+class BufferedBuildLogger():
+    """ Logger for a test case run alongside others. Messages are logged as they come, but build
+    server (TeamCity) service messages are held until emitted, so that those of concurrent test
+    cases are not interleaved (see emit_build_messages).
+    """
+
+    def __init__(self, logger):
+        """
+        INPUT
+            logger: the logger to log messages to (and flush build server messages to).
+        """
+
+        self.logger = logger
+        self.build_messages = []
+
+    def __getattr__(self, name):
+        return getattr(self.logger, name)
+
+    def buffer(self, method, *args):
+        self.build_messages.append((method, args))
+
+    def warn(self, message):
+        self.logger.log_message(message, 'warn')
+        self.build_error(message)
+
+    def error(self, message):
+        self.logger.log_message(message, 'error')
+        self.build_error(message)
+
+    def build_error(self, message):
+        self.buffer('build_error', message)
+
+    def build_testcase_start(self, name):
+        self.buffer('build_testcase_start', name)
+
+    def build_testcase_end(self, test_name, status, duration, stacktrace=None):
+        self.buffer('build_testcase_end', test_name, status, duration, stacktrace)
+
+    def build_set_label(self, label, version):
+        self.buffer('build_set_label', label, version)
+
+    def emit_build_messages(self):
+        """ Send held build server messages (in the order they were logged).
+        """
+
+        build_messages, self.build_messages = self.build_messages, []
+        for method, args in build_messages:
+            getattr(self.logger, method)(*args)
@@ -88,6 +88,10 @@ TARTAROS = {
                 ('results id', 'results_id'),
                 ('parent id', 'parent_id'),
             ]),
+            # fields added after the original schema (may not be in older databases)
+            'optional fields': OrderedDict([
+                ('requirements', 'requirements'),
+            ]),
         },
         'procedure steps': {
             'fields': OrderedDict([
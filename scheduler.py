@@ -0,0 +1,151 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+from threading import Thread
+from Queue import Queue
+from utility import return_execution_error
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+SHARED = 'shared'
+EXCLUSIVE = 'exclusive'
+SERVER = 'server'
+EXCLUSIVE_SERVER = 'exclusive server'
+READ_ONLY = 'read-only'
+DEFAULT_REQUIREMENTS = EXCLUSIVE_SERVER
+
+
+def parse_requirements(requirements):
+    """ Translate a testcase requirements declaration into the resources it claims.
+    INPUT
+        requirements: a comma-delimited list of requirements, each of:
+            'exclusive server' - the testcase needs the server to itself (default if blank).
+            'read-only' - the testcase only reads from the server (shares it).
+            any other (e.g., 'site 3', 'dvr 1') - the testcase needs the named resource to itself
+                (sharing the server).
+    OUTPUT
+        a dict pairing each resource claimed with its claim (SHARED or EXCLUSIVE).
+    """
+
+    if requirements is None or str(requirements).strip() == '':
+        requirements = DEFAULT_REQUIREMENTS
+
+    claims = {}
+    for requirement in str(requirements).split(','):
+        requirement = ' '.join(requirement.lower().split())
+        if requirement == '':
+            continue
+        elif requirement == EXCLUSIVE_SERVER:
+            claims[SERVER] = EXCLUSIVE
+        elif requirement == READ_ONLY:
+            claims.setdefault(SERVER, SHARED)
+        else:
+            claims.setdefault(SERVER, SHARED)
+            claims[requirement] = EXCLUSIVE
+
+    return claims
+
+
+def claims_conflict(claims, other_claims):
+    """ Return whether two sets of claims (see parse_requirements) conflict.
+    """
+
+    for resource, claim in claims.items():
+        other_claim = other_claims.get(resource)
+        if other_claim is not None and EXCLUSIVE in (claim, other_claim):
+            return True
+    return False
+
+####################################################################################################
+# Scheduler ########################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Scheduler():
+    """ Schedules items (e.g., testcases) over a pool of worker threads, running items whose
+    claims do not conflict concurrently. An item never starts before an earlier item it conflicts
+    with, and items are delivered (in the calling thread) in their original order.
+    """
+
+    def __init__(self, logger, workers=1):
+        """
+        INPUT
+            logger: An initialized instance of a logging class to use.
+            workers: the maximum number of items to run at once.
+        """
+
+        # instance logger
+        self.log = logger
+
+        # define default attributes
+        self.workers = max(1, int(workers))
+
+    def run(self, items, claims, execute, deliver):
+        """ Execute each item and deliver its outcome.
+        INPUT
+            items: the list of items to execute (in order).
+            claims: the list of claims (see parse_requirements) of each item.
+            execute: a function executing an item in a worker thread, returning its outcome.
+            deliver: a function taking an item and its outcome, called in item order.
+        """
+
+        self.log.debug("Scheduling %d items over %d workers ..." % (len(items), self.workers))
+
+        pending = range(len(items))
+        running = {}
+        finished = {}
+        next_to_deliver = 0
+        done = Queue()
+
+        def work(index):
+            try:
+                outcome = execute(items[index])
+            except BaseException, e:
+                self.log.error("Failed to execute item %d." % index)
+                self.log.error(str(e))
+                self.log.error("Error: %s." % return_execution_error()['error'])
+                outcome = None
+            done.put((index, outcome))
+
+        while pending or running:
+            # start each pending item that conflicts with no running (or earlier pending) item
+            waiting = []
+            for index in list(pending):
+                if len(running) >= self.workers:
+                    break
+                blockers = [running[i] for i in running] + [claims[i] for i in waiting]
+                if True in [claims_conflict(claims[index], other) for other in blockers]:
+                    waiting.append(index)
+                    continue
+                self.log.trace("Starting item %d (%d running) ..." % (index, len(running) + 1))
+                pending.remove(index)
+                running[index] = claims[index]
+                worker = Thread(target=work, args=(index,), name="scheduler item %d" % index)
+                worker.daemon = True
+                worker.start()
+
+            # wait for an item to finish
+            index, outcome = done.get()
+            del running[index]
+            finished[index] = outcome
+
+            # deliver finished items in order
+            while next_to_deliver in finished:
+                deliver(items[next_to_deliver], finished.pop(next_to_deliver))
+                next_to_deliver += 1
+
+        self.log.trace("Scheduled %d items." % len(items))
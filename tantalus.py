@@ -21,41 +21,75 @@ from sys import argv
 ####################################################################################################
 ####################################################################################################
 
-log = Logger()
 
 ####################################################################################################
 # Run Tantalus #####################################################################################
 ####################################################################################################
 ####################################################################################################
 
-# default sys args
-output_on = False
-num_sites = 255
+# (guarded, as each event loop process re-imports this script on Windows)
+if __name__ == '__main__':
+    log = Logger()
 
-# read system arguments
-params = []
-if argv is not None:
-    for arg in argv:
-        # mode
-        if 'output_on=true=' in arg.lower():
-            output_on = True
-            params.append('Output On:\t%s' % str(output_on))
-        elif 'num_sites=' in arg:
-            num_sites = int(arg.split('num_sites=')[1])
-            params.append('Number of Sites:\t%d' % num_sites)
+    # default sys args
+    output_on = False
+    num_sites = 255
+    threaded = False
+    loops = 1
+    num_gps_events = 300
+    capture_path = None
+    replay_path = None
+    speed = 1.0
 
-    # log parameters
-    log.trace("Parameters modified:")
-    for param in params:
-        params[params.index(param)] = param.replace('"', '').replace("'", '')
-        log.trace("\t%s" % param)
+    # read system arguments
+    params = []
+    if argv is not None:
+        for arg in argv:
+            # mode
+            if 'output_on=true=' in arg.lower():
+                output_on = True
+                params.append('Output On:\t%s' % str(output_on))
+            elif 'num_sites=' in arg:
+                num_sites = int(arg.split('num_sites=')[1])
+                params.append('Number of Sites:\t%d' % num_sites)
+            elif 'threaded=true' in arg.lower():
+                threaded = True
+                params.append('Threaded:\t%s' % str(threaded))
+            elif 'loops=' in arg:
+                loops = int(arg.split('loops=')[1])
+                params.append('Loops:\t%d' % loops)
+            elif 'gps_events=' in arg:
+                num_gps_events = int(arg.split('gps_events=')[1])
+                params.append('Number of GPS Events:\t%d' % num_gps_events)
+            elif 'capture=' in arg:
+                capture_path = arg.split('capture=')[1]
+                params.append('Capture:\t%s' % capture_path)
+            elif 'replay=' in arg:
+                replay_path = arg.split('replay=')[1]
+                params.append('Replay:\t%s' % replay_path)
+            elif 'speed=' in arg:
+                speed = float(arg.split('speed=')[1])
+                params.append('Speed:\t%s' % speed)
 
-tantalus = Tantalus(log, Sisyphus, num_sites=num_sites, output_on=output_on)
+        # log parameters
+        log.trace("Parameters modified:")
+        for param in params:
+            params[params.index(param)] = param.replace('"', '').replace("'", '')
+            log.trace("\t%s" % param)
 
-try:
-    tantalus.run_in_dvr_response_simulation_mode()
+    tantalus = Tantalus(log, Sisyphus, num_sites=num_sites, output_on=output_on,
+                        num_gps_events=num_gps_events)
 
-except BaseException, e:
-    log.error("Critical failure occurred.")
-    log.error(str(e))
-    while True: continue
\ No newline at end of file
+    try:
+        if capture_path is not None:
+            # bridge ViM and the live DVR, recording the traffic
+            tantalus.run(capture_path=capture_path)
+        elif replay_path is not None:
+            tantalus.run_capture_replay_engine(replay_path, speed=speed)
+        else:
+            tantalus.run_in_dvr_response_simulation_mode(threaded=threaded, loops=loops)
+
+    except BaseException, e:
+        log.error("Critical failure occurred.")
+        log.error(str(e))
+        while True: continue
\ No newline at end of file
@@ -60,6 +60,12 @@ tests_to_schedule = []
 # dvr integration variables
 int_dvr_ip = None
 
+# number of test cases to run at once
+workers = 1
+
+# whether to profile (cProfile) test case runs
+profiling = False
+
 # read system arguments
 params = []
 if argv is not None:
@@ -121,6 +127,12 @@ if argv is not None:
         elif 'int_dvr_ip=' in arg and 'int_dvr_ip=None' not in arg:
             int_dvr_ip = arg.split('int_dvr_ip=')[1]
             params.append('Integration DVR IP:\t%s' % int_dvr_ip)
+        elif 'workers=' in arg:
+            workers = int(arg.split('workers=')[1])
+            params.append('Workers:\t%s' % workers)
+        elif 'profiling=' in arg:
+            profiling = arg.split('profiling=')[1].lower() == 'true'
+            params.append('Profiling:\t%s' % profiling)
 
     # log parameters
     log.trace("Parameters modified:")
@@ -253,22 +265,20 @@ elif mode == 'testing':
 
     # initialize test run object
     testrun = TestRun(log, database, name=test_name, submodule_id=2,
-                      results_plan_id=results_plan_id, int_dvr_ip=int_dvr_ip)
+                      results_plan_id=results_plan_id, int_dvr_ip=int_dvr_ip, workers=workers,
+                      profiling=profiling)
 
-    # build testcase list for test run
+    # exclude dvr integration testcases (unless testing dvr integration)
+    excluded_case_type = None
+    if str(testcase_type).lower() != 'dvr integration' \
+            and str(module).lower() != 'dvr integration':
+        excluded_case_type = 'dvr integration'
+
+    # build testcase list for test run (filtered by class and type)
     testcases = testrun.build_testcase_list_for_run(module_id=module,
         feature_id=feature, story_id=story, test_id=test,
-        case_id=testcase, case_class=testcase_class)['testcases']
-
-    # filter by class
-    if testcase_class is not None:
-        testrun.filter_testcases_by_class(testcases, testcase_class)
-
-    # filter by type
-    if testcase_type is not None:
-        testrun.filter_testcases_by_type(testcases, testcase_type)
-    if testcase_type.lower() != 'dvr integration' and module.lower() != 'dvr integration':
-        testrun.filter_testcases_by_type(testcases, 'dvr integration', inclusive=False)
+        case_id=testcase, case_class=testcase_class, case_type=testcase_type,
+        excluded_case_type=excluded_case_type)['testcases']
 
     # set testcase list for test run
     testrun.testcases = testcases
@@ -292,16 +302,13 @@ elif mode == 'webtesting':
 
     # initialize test run object
     testrun = TestRun(log, database, name=test_name, submodule_id=2, results_plan_id=results_plan_id,
-                      int_dvr_ip=int_dvr_ip)
+                      int_dvr_ip=int_dvr_ip, workers=workers,
+                      profiling=profiling)
 
-    # build testcase list for test run
+    # build testcase list for test run (filtered by class)
     testcases = testrun.build_testcase_list_for_run(module_id=module,
         feature_id=feature, story_id=story, test_id=test,
-        case_id=testcase)['testcases']
-
-    # filter by class
-    if testcase_class is not None:
-        testrun.filter_testcases_by_class(testcases, testcase_class)
+        case_id=testcase, case_class=testcase_class)['testcases']
 
     # set testcase list for test run
     testrun.testcases = testcases
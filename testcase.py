@@ -13,12 +13,17 @@
 
 import os
 from time import clock
+from cProfile import Profile
 from datetime import datetime
 from mapping import TARTAROS, TARTAROS_LOGGING_PATH
 from utility import return_execution_error
 from Orpheus import Orpheus
+from scheduler import parse_requirements, SERVER, EXCLUSIVE
+from timing import Timings, timed, activate_timings, deactivate_timings, STEP
 import inspect
 from collections import OrderedDict
+from copy import deepcopy
+from threading import Lock
 
 ####################################################################################################
 # Globals ##########################################################################################
@@ -27,6 +32,99 @@ from collections import OrderedDict
 
 TEST_STATUSES = TARTAROS['test statuses']
 
+# procedure steps compiled for execution, shared by all testcases (see compile_step)
+COMPILED_STEPS = {}
+COMPILED_STEPS_LOCK = Lock()
+# names a procedure step's arguments may use and still be pre-evaluated once (as constants)
+CONSTANT_NAMES = set(['step_arguments', 'True', 'False', 'None'])
+
+
+def step_arguments(*args, **kwargs):
+    """ Return the arguments given (compiled procedure step arguments are a call to this). """
+    return args, kwargs
+
+
+def compile_step(step_id, name, submodule, function, arguments, verification):
+    """ Return the compiled procedure step for given step data, compiling it on first use.
+    Steps are cached by their data, so identical steps across testcases are only compiled once.
+    """
+
+    key = (step_id, name, submodule, function, arguments, verification)
+    with COMPILED_STEPS_LOCK:
+        step = COMPILED_STEPS.get(key)
+        if step is None:
+            step = CompiledStep(step_id, name, submodule, function, arguments, verification)
+            COMPILED_STEPS[key] = step
+    return step
+
+
+class CompiledStep():
+    """ A procedure step compiled for execution: the submodule function to call and its
+    arguments (pre-evaluated when constant, or compiled to be evaluated against the testcase
+    executing the step).
+    """
+
+    def __init__(self, step_id, name, submodule, function, arguments, verification):
+        """
+        INPUT
+            step id: the id of the procedure step.
+            name: the name of the procedure step.
+            submodule: the code of the submodule (testcase attribute) owning the function.
+            function: the name of the function to call.
+            arguments: the arguments to call the function with (as written in a call, e.g.,
+                "'mr4 site', settings=self.site_settings"; None if none).
+            verification: whether the step verifies the testcase or not.
+        """
+
+        self.id = step_id
+        self.name = name
+        self.submodule = submodule
+        self.function = function
+        self.verification = verification
+        self.call = "%s.%s(%s)" % (submodule, function,
+                                   ', '.join([str(arguments), 'testcase=self'] if arguments
+                                             else ['testcase=self']))
+
+        # compile arguments (pre-evaluating them if they depend on nothing at execution)
+        #   invalid arguments fail the step when executed (not the testcase initialization)
+        self.code = None
+        self.arguments = ((), {})
+        self.error = None
+        if arguments is not None:
+            try:
+                self.code = compile("step_arguments(%s)" % arguments,
+                                    "<procedure step %s>" % step_id, 'eval')
+                if set(self.code.co_names) <= CONSTANT_NAMES:
+                    self.arguments = eval(self.code, globals(), {})
+                    self.code = None
+            except BaseException, e:
+                self.code = None
+                self.error = e
+
+    def __repr__(self):
+        return self.call
+
+    def return_arguments(self, testcase):
+        """ Return the positional and keyword arguments to call the function with.
+        """
+
+        if self.code is not None:
+            return eval(self.code, globals(), {'self': testcase})
+        else:
+            # copy constants, so a call never changes those of the next
+            return deepcopy(self.arguments)
+
+    def execute(self, testcase):
+        """ Call the function (of the testcase submodule) with the step arguments.
+        """
+
+        if self.error is not None:
+            raise self.error
+        function = getattr(getattr(testcase, self.submodule), self.function)
+        args, kwargs = self.return_arguments(testcase)
+        kwargs['testcase'] = testcase
+        return function(*args, **kwargs)
+
 ####################################################################################################
 # TestCase #########################################################################################
 ####################################################################################################
@@ -46,7 +144,7 @@ class TestCase():
     """ The root test case object class. Includes all root functions and parameters. """
 
     def __init__(self, logger, database, testcase_id, debugging=False, int_dvr_ip=None,
-                 results_plan_id=None):
+                 results_plan_id=None, requirements=None, profiling=False):
         """
         INPUT
             logger: An initialized instance of a logging class to use.
@@ -54,6 +152,9 @@ class TestCase():
             id: the testcase ID used for referencing in database.
             debugging: set to TRUE if debugging the testcase.
             int_dvr_ip: the ip address of the DVR being used for integration testing.
+            requirements: the declared requirements of the testcase (see
+                scheduler.parse_requirements; exclusive use of the server if None).
+            profiling: whether to profile (cProfile) the testcase run or not.
         """
 
         # instantialize logger
@@ -72,12 +173,17 @@ class TestCase():
         self.test_id = None
         self.procedure = []
         self.status = TEST_STATUSES['not tested']
+        self.initialized = False
         self.verified = False
         self.verifications = []
         self.duration = 0
         self.version = None
         self.int_dvr_ip = int_dvr_ip
         self.results_plan_id = results_plan_id
+        self.requirements = requirements
+        self.exclusive = parse_requirements(requirements).get(SERVER) == EXCLUSIVE
+        self.profiling = profiling
+        self.timings = None
 
         # naming attributes
         self.module = ''
@@ -201,6 +307,31 @@ class TestCase():
         # return
         return result
 
+    def get_procedure_data_from_database(self, step_ids):
+        """
+        @param step_ids: the ids of the procedure steps (in order of execution).
+        :return: a data dict containing:
+            'successful' - whether the function executed successfully or not.
+            'procedure data' - list of {step data, function data, submodule data} for each step.
+        """
+
+        operation = self.inspect.stack()[0][3]
+        result = {'successful': False, 'procedure data': []}
+
+        try:
+            self.log.trace("%s ..." % operation.replace('_', ' '))
+
+            data = self.database.return_procedure_data(step_ids)
+            result['procedure data'] = data['procedure data']
+
+            self.log.trace("... done %s." % operation.replace('_', ' '))
+            result['successful'] = data['successful']
+        except BaseException, e:
+            self.handle_exception(e, operation=operation)
+
+        # return
+        return result
+
     def initialize(self):
         """ Instance test case object by reference ID in database and assigning associated attributes.
         """
@@ -226,8 +357,11 @@ class TestCase():
             for item in procedure_raw_list:
                 procedure_list.append(int(item.strip()))
             #   build procedure function list
-            for procedure_step_id in procedure_list:
-                data = self.get_procedure_step_data_from_database(procedure_step_id)
+            returned = self.get_procedure_data_from_database(procedure_list)
+            if not returned['successful']:
+                raise LookupError("Failed to load procedure steps %s." % procedure_list)
+            procedure_data = returned['procedure data']
+            for procedure_step_id, data in zip(procedure_list, procedure_data):
                 # parse the data
                 step_data = data['step data']
                 function_data = data['function data']
@@ -238,19 +372,25 @@ class TestCase():
                 if str(step_data['arguments']).strip() == '': step_data['arguments'] = None
                 if step_data['arguments'] is not None:
                     arguments = str(step_data['arguments'])
-                    arguments += ','
                 else:
-                    arguments = ''
-                arguments += "testcase=self"
+                    arguments = None
                 # handle verification status
-                verification = eval(step_data['verification'])
+                #   (stored as 1/0 or True/False)
+                verification = str(step_data['verification']).strip()
+                try:
+                    verification = bool(int(verification))
+                except ValueError:
+                    verification = verification == 'True'
+                # compile the step (once for all testcases sharing it)
+                compiled = compile_step(procedure_step_id, step_data['name'],
+                                        submodule_data['code'], function, arguments, verification)
                 # combine into one data dict of relevant data
                 translated_step_data = {
                     'id':       procedure_step_id,
                     'name':     step_data['name'],
-                    'function': "%s.%s(%s)" % (submodule_data['code'], function,
-                        arguments),
-                    'verification': verification
+                    'function': compiled.call,
+                    'verification': verification,
+                    'compiled': compiled,
                 }
                 self.procedure.append(translated_step_data)
 
@@ -261,6 +401,7 @@ class TestCase():
             self.log.trace("\tProcedure:")
             for step in self.procedure:
                 self.log.trace("\t\t%s" % step['name'])
+            self.initialized = True
             result['successful'] = True
         except BaseException, e:
             self.handle_exception(e, operation)
@@ -282,17 +423,15 @@ class TestCase():
         try:
 
             self.log.info('Executing step "%s" ...' % step['name'])
-            function = "self.%s" % str(step['function'])
-            if self.debugging: self.log.trace("Function Call:\t%s" % function)
+            if self.debugging: self.log.trace("Function Call:\tself.%s" % step['function'])
 
             if step['verification']:
                 # execute with verification
-                function += "['verified']"
-                result = eval(function)
+                result = step['compiled'].execute(self)['verified']
                 self.verifications.append([step['name'], result])
             else:
                 # execute normally
-                eval(function)
+                step['compiled'].execute(self)
 
             self.log.trace("Executed step %s" % step['name'])
             #result['successful'] = True
@@ -483,29 +622,51 @@ class TestCase():
 
         self.log.info("Running %s testcase ..." % self.name)
         result = {'successful': False, 'verified': False}
+
+        # report a testcase that failed to initialize as errored (its procedure is incomplete)
+        if not self.initialized:
+            self.log.error("Could not run testcase %s as it failed to initialize." % self.id)
+            self.status = TEST_STATUSES['re-test']
+            self.processing = False
+            return result
+
         self.processing = True
 
         try:
+            # record timings of steps (and their HTTP requests and database queries)
+            self.timings = Timings(self.build_test_name)
+            activate_timings(self.timings)
+
             # send testcase start message to build server
             self.log.build_testcase_start(self.build_test_name)
 
             # begin timing testcase execution
             t0 = clock()
-
-            # execute testcase
-            for step in self.procedure:
-                if self.processing:
-                    if not self.debugging:
-                        try: self.execute_step(step)
-                        except BaseException, e:
-                            self.handle_step_execution_failure(step, e)
-                    else: self.execute_step(step)
-                else:
-                    self.log.error('Could not execute step "%s" due to previous step '
-                                   'execution failure.' % step['name'])
+            if self.profiling:
+                profile = Profile()
+                profile.enable()
+
+            # execute testcase (turning the profiler off however execution ends)
+            try:
+                for step in self.procedure:
+                    if self.processing:
+                        with timed(STEP, step['name']):
+                            if not self.debugging:
+                                try: self.execute_step(step)
+                                except BaseException, e:
+                                    self.handle_step_execution_failure(step, e)
+                            else: self.execute_step(step)
+                    else:
+                        self.log.error('Could not execute step "%s" due to previous step '
+                                       'execution failure.' % step['name'])
+            finally:
+                if self.profiling:
+                    profile.disable()
 
             # end timing testcase execution
             self.duration = clock() - t0
+            if self.profiling:
+                self.save_profile(profile)
 
             # determine test result
             self.determine_result()
@@ -538,10 +699,40 @@ class TestCase():
             self.handle_exception(e, 'run testcase %s' % self.name)
             self.verified = False
 
+        deactivate_timings()
+
         # return
         result['verified'] = self.verified
         return result
 
+    def save_profile(self, profile):
+        """ Save the profile (cProfile) of a testcase run to the profiles logging folder (to be
+        loaded with pstats).
+        """
+
+        operation = self.inspect.stack()[0][3]
+        result = {'successful': False, 'path': None}
+
+        try:
+            self.log.trace("%s ..." % operation.replace('_', ' '))
+
+            # verify profiles folder exists
+            profiles_path = TARTAROS_LOGGING_PATH + '\\profiles'
+            if not os.path.exists(profiles_path):
+                os.makedirs(profiles_path)
+
+            result['path'] = profiles_path + '\\testcase %s %s.prof' % (
+                self.id, datetime.now().strftime('%Y%m%d %H%M%S'))
+            profile.dump_stats(result['path'])
+
+            self.log.trace("... done %s: %s." % (operation.replace('_', ' '), result['path']))
+            result['successful'] = True
+        except BaseException, e:
+            self.handle_exception(e, operation=operation)
+
+        # return
+        return result
+
     def setup_for_product(self): pass
 
     def setup_test_environment(self, build, test_name): pass
@@ -666,6 +857,25 @@ class ThanatosTestCase(TestCase):
         # return
         return result
 
+    def get_procedure_data_from_database(self, step_ids):
+        """
+        @param step_ids: the ids of the procedure steps (in order of execution).
+        :return: a data dict containing:
+            'successful' - whether the function executed successfully or not.
+            'procedure data' - list of {step data, function data, submodule data} for each step.
+        """
+
+        result = {'successful': True, 'procedure data': []}
+
+        # product databases are resolved step-by-step
+        for step_id in step_ids:
+            data = self.get_procedure_step_data_from_database(step_id)
+            result['procedure data'].append(data)
+            result['successful'] = result['successful'] and data['successful']
+
+        # return
+        return result
+
     def setup_for_product(self):
         self.debug_product = DebugProduct()
 
@@ -683,5 +893,6 @@ class HestiaTestCase(TestCase):
         self.hestia.return_vim_server_version(testcase=self)
         self.hestia.determine_vim_server_release_version(self.version, testcase=self)
 
-        # reset environment for test case
-        self.hestia.reset_vim_server(testcase=self)
\ No newline at end of file
+        # reset environment for test case (unless sharing the server with other test cases)
+        if self.exclusive:
+            self.hestia.reset_vim_server(testcase=self)
\ No newline at end of file
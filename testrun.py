@@ -12,11 +12,15 @@
 ####################################################################################################
 
 from time import clock, sleep
+from datetime import datetime
+from json import dump
 from utility import move_up_windows_path
-from os import getcwdu, path, mkdir
-from mapping import TARTAROS
+from os import getcwdu, path, mkdir, makedirs
+from mapping import TARTAROS, TARTAROS_LOGGING_PATH
 from utility import return_execution_error
 from testcase import HestiaTestCase
+from scheduler import Scheduler, parse_requirements
+from logger import BufferedBuildLogger
 from Orpheus import Orpheus
 from Minos import Minos
 
@@ -48,7 +52,7 @@ class TestRun():
     """ The root test run object class. Includes all root functions and parameters. """
 
     def __init__(self, logger, database, name, submodule_id, testcases=[], results_plan_id=None,
-                 debugging=False, int_dvr_ip=None):
+                 debugging=False, int_dvr_ip=None, workers=1, profiling=False):
         """
         INPUT
             logger: An initialized instance of a logging class to use.
@@ -59,6 +63,9 @@ class TestRun():
             results plan id: the test plan id to publish results to.
             debugging: set to TRUE if debugging the testcase.
             int_dvr_ip: the ip address of the DVR being used for integration testing.
+            workers: the maximum number of test cases to run at once (test cases only run
+                alongside others their declared requirements allow).
+            profiling: whether to profile (cProfile) each test case run or not.
         """
 
         # instance logger
@@ -85,6 +92,9 @@ class TestRun():
         self.results = []
         self.testcase_obj = None
         self.int_dvr_ip = int_dvr_ip
+        self.workers = workers
+        self.profiling = profiling
+        self.timing_reports = []
 
         # instance testcase
         self.initialize()
@@ -126,12 +136,28 @@ class TestRun():
             # begin timing testcase execution
             t0 = clock()
 
-            # execute test cases
-            for testcase in self.testcases:
-                testcase = self.testcase_obj(self.log, self.database, testcase['id'],
+            # determine what each test case requires (to run test cases alongside others)
+            testcases = list(self.testcases)
+            requirements = self.database.return_testcase_requirements(
+                [testcase['id'] for testcase in testcases])['requirements']
+            claims = [parse_requirements(requirements[testcase['id']]) for testcase in testcases]
+
+            def execute(testcase):
+                # hold build server messages of test cases run alongside others
+                if self.workers > 1: logger = BufferedBuildLogger(self.log)
+                else: logger = self.log
+                testcase = self.testcase_obj(logger, self.database, testcase['id'],
                     debugging=self.debugging, int_dvr_ip=self.int_dvr_ip,
-                    results_plan_id=self.results_plan_id)
+                    results_plan_id=self.results_plan_id,
+                    requirements=requirements[testcase['id']], profiling=self.profiling)
                 testcase.run()
+                return testcase
+
+            def deliver(testcase_data, testcase):
+                if testcase is None:
+                    self.log.error("Failed to run testcase %s." % testcase_data['id'])
+                    return
+                if self.workers > 1: testcase.log.emit_build_messages()
 
                 # compile results data from execution
                 testcase_data = {
@@ -141,10 +167,18 @@ class TestRun():
                     'version':      testcase.version,
                 }
                 self.results.append(testcase_data)
+                if testcase.timings is not None:
+                    self.timing_reports.append(testcase.timings.return_report())
+
+            # execute test cases (delivering results in test case order)
+            Scheduler(self.log, self.workers).run(testcases, claims, execute, deliver)
 
             # end timing testcase execution
             self.duration = clock() - t0
 
+            # report timings
+            self.report_timings()
+
             # publish results
             #self.publish_results()
 
@@ -161,6 +195,60 @@ class TestRun():
         # return
         return result
 
+    def report_timings(self):
+        """ Write the timings of the test run (of each test case, its steps, HTTP requests and
+        database queries) to a report in the timing logging folder, and send the totals to the
+        build server as build statistics.
+        OUPUT
+            successful: whether the function executed successfully or not.
+            path: the path of the timing report written.
+        """
+
+        self.log.debug("Reporting timings for %s test run ..." % self.name)
+        result = {'successful': False, 'path': None}
+
+        try:
+            # total the timings of all test cases
+            totals = {}
+            for report in self.timing_reports:
+                for category, total in report['totals'].items():
+                    run_total = totals.setdefault(category, {'calls': 0, 'time': 0.0})
+                    run_total['calls'] += total['calls']
+                    run_total['time'] += total['time']
+
+            # write timing report
+            timing_path = TARTAROS_LOGGING_PATH + '\\timing'
+            if not path.exists(timing_path):
+                makedirs(timing_path)
+            result['path'] = timing_path + '\\%s.json' % datetime.now().strftime('%Y%m%d %H%M%S')
+            report = {
+                'name':         self.name,
+                'duration':     self.duration,
+                'workers':      self.workers,
+                'totals':       totals,
+                'testcases':    self.timing_reports,
+            }
+            f = open(result['path'], 'w')
+            dump(report, f, indent=1)
+            f.close()
+
+            # send build statistics (times in milliseconds)
+            self.log.build_statistic_value('tartaros.duration', int(self.duration * 1000))
+            for category, total in sorted(totals.items()):
+                self.log.build_statistic_value('tartaros.%s.calls' % category, total['calls'])
+                self.log.build_statistic_value('tartaros.%s.time' % category,
+                                               int(total['time'] * 1000))
+
+            self.log.trace("Reported timings to %s." % result['path'])
+            result['successful'] = True
+        except BaseException, e:
+            self.log.error("Failed to report timings for test run %s." % self.name)
+            self.log.error(str(e))
+            self.log.error("Error: %s." % return_execution_error()['error'])
+
+        # return
+        return result
+
     def translate_results_into_publishing_list(self):
         """ Translate the individual test case results from the test run into a publishable list.
         OUPUT
@@ -376,7 +464,8 @@ class TestRun():
         return result
 
     def build_testcase_list_for_run(self, module_id='', feature_id='', story_id='',
-                                    test_id='', case_id='', case_class=None):
+                                    test_id='', case_id='', case_class=None, case_type=None,
+                                    excluded_case_type=None, min_version=None):
         """ Build testcase list for test run.
         INPUT
             module id: the id of the module being tested (leave blank if all).
@@ -384,120 +473,40 @@ class TestRun():
             story id: the id of the story being tested (leave blank if all).
             test id: the id of the test being run (leave blank if all).
             case id: the id of the test case being run individually (leave blank if all).
+            case class: the class of test cases to run (leave blank if all).
+            case type: the type of test cases to run, e.g., 'regression' (leave blank if all).
+            excluded case type: the type of test cases not to run (leave blank if none).
+            min version: the release version of the product under test (leave blank if all).
         OUPUT
             successful: whether the function executed successfully or not.
-            testcases: the list of test cases for the test run.
+            testcases: the test cases for the test run (a list of test case data dicts).
         """
 
         self.log.trace("Building test case list for test run ...")
         result = {'successful': False, 'testcases': []}
 
         try:
-            # scope level
-            SCOPE_LEVELS = {
-                'full':         5,
-                'module':       4,
-                'feature':      3,
-                'user story':   2,
-                'test':         1,
-                'test case':    0,
-            }
-
-            # determine scope of test run
-            if case_id is not None and str(case_id) != BLANK_SEL and str(case_id)is not '0':
-                scope = SCOPE_LEVELS['test case']
-            elif test_id is not None and str(test_id) != BLANK_SEL and str(test_id)is not '0':
-                scope = SCOPE_LEVELS['test']
-            elif story_id is not None and str(story_id) != BLANK_SEL and str(story_id)is not '0':
-                scope = SCOPE_LEVELS['user story']
-            elif feature_id is not None and str(feature_id) != BLANK_SEL and str(feature_id)is not '0':
-                scope = SCOPE_LEVELS['feature']
-            elif str(module_id) is not None and str(module_id) != BLANK_SEL \
-                    and str(module_id)is not '0':
-                scope = SCOPE_LEVELS['module']
-            else:
-                scope = SCOPE_LEVELS['full']
-
-
-            # based on scope of test run, build list of test cases to run
-            self.log.trace("Scope of test run: %s." % scope)
-            # determine pertinent ids
-            if scope == 5:
-                # determine modules
-                modules = self.database.return_modules_for_submodule(2)['modules']
-                # append all test cases for product
-                for module in modules:
-                    # append all test cases for module
-                    features = self.database.return_features_for_module(module['id'])['features']
-                    for feature in features:
-                        # append all test cases for feature
-                        stories =\
-                        self.database.return_user_stories_for_feature(feature['id'],
-                                                                    module=module['id'])['user stories']
-                        for story in stories:
-                            # append all test cases for user story
-                            tests = self.database.return_tests_for_user_story(story['id'])['tests']
-                            for test in tests:
-                                # append all test cases for test
-                                testcases =\
-                                self.database.return_testcases_for_test(test['id'])['testcases']
-                                for testcase in testcases:
-                                    if int(testcase['active']) > 0:
-                                        result['testcases'].append({'id': testcase['id']})
-            if scope == 4:
-                # append all test cases for module
-                features = self.database.return_features_for_module(module_id)['features']
-                for feature in features:
-                    # append all test cases for feature
-                    stories =\
-                    self.database.return_user_stories_for_feature(feature['id'],
-                                                                  module=module_id)['user stories']
-                    for story in stories:
-                        # append all test cases for user story
-                        tests = self.database.return_tests_for_user_story(story['id'])['tests']
-                        for test in tests:
-                            # append all test cases for test
-                            testcases = self.database.return_testcases_for_test(test['id'])['testcases']
-                            for testcase in testcases:
-                                if int(testcase['active']) > 0:
-                                    result['testcases'].append({'id': testcase['id']})
-            if scope == 3:
-                # append all test cases for feature
-                stories = self.database.return_user_stories_for_feature(feature_id,
-                                                                        module=module_id)['user stories']
-                for story in stories:
-                    # append all test cases for user story
-                    tests = self.database.return_tests_for_user_story(story['id'])['tests']
-                    for test in tests:
-                        # append all test cases for test
-                        testcases = self.database.return_testcases_for_test(test['id'])['testcases']
-                        for testcase in testcases:
-                            if int(testcase['active']) > 0:
-                                result['testcases'].append({'id': testcase['id']})
-            if scope == 2:
-                # append all test cases for user story
-                tests = self.database.return_tests_for_user_story(story_id)['tests']
-                for test in tests:
-                    # append all test cases for test
-                    testcases = self.database.return_testcases_for_test(test['id'])['testcases']
-                    for testcase in testcases:
-                        if int(testcase['active']) > 0:
-                            result['testcases'].append({'id': testcase['id']})
-            if scope == 1:
-                # append all test cases for test
-                testcases = self.database.return_testcases_for_test(test_id)['testcases']
-                for testcase in testcases:
-                    if int(testcase['active']) > 0:
-                        result['testcases'].append({'id': testcase['id']})
-            if scope == 0:
-                # determine test case id
-                testcase = self.database.return_testcase_data(case_id)['testcase data']
-                # append test case
-                if int(testcase['active']) > 0:
-                    result['testcases'].append({'id': testcase['id']})
-
-            self.log.trace("Built testcase list for test run with %s test cases."
-                           % len(result['testcases']))
+            # determine scope of test run (blank and '0' selections are ignored)
+            def selection(value):
+                if value is None or str(value) == BLANK_SEL or str(value) == '0':
+                    return None
+                return value
+
+            def type_selection(value):
+                if selection(value) is None:
+                    return None
+                return TEST_TYPE_TO_ID[str(value).lower()]
+
+            testcase_ids = self.database.select_testcase_ids(
+                submodule_id=self.submodule_id, module_id=selection(module_id),
+                feature_id=selection(feature_id), story_id=selection(story_id),
+                test_id=selection(test_id), case_id=selection(case_id),
+                case_class=selection(case_class), case_type=type_selection(case_type),
+                excluded_case_type=type_selection(excluded_case_type),
+                min_version=selection(min_version))
+            result['testcases'] = [{'id': testcase_id} for testcase_id in testcase_ids]
+
+            self.log.trace("Built testcase list for test run.")
             result['successful'] = True
         except BaseException, e:
             self.log.error("Failed to build testcase list for test run.")
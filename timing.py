@@ -0,0 +1,171 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+import sys
+import time
+from threading import Lock, local
+from collections import OrderedDict
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+# categories of timings recorded
+STEP = 'step'
+HTTP = 'http'
+QUERY = 'query'
+
+# the timings being recorded by each thread (see activate_timings)
+THREAD = local()
+
+
+def return_monotonic_clock():
+    """ Return a function returning the seconds of a monotonic clock (unaffected by changes to the
+    system time, e.g., by tests), else of the system clock.
+    """
+
+    if sys.platform == 'win32':
+        # (performance counter)
+        return time.clock
+
+    try:
+        import ctypes
+        import ctypes.util
+
+        class timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+        library = ctypes.CDLL(ctypes.util.find_library('rt') or ctypes.util.find_library('c'))
+        clock_gettime = library.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+        CLOCK_MONOTONIC = 1
+
+        def monotonic():
+            t = timespec()
+            clock_gettime(CLOCK_MONOTONIC, ctypes.byref(t))
+            return t.tv_sec + t.tv_nsec * 1e-9
+
+        monotonic()
+        return monotonic
+    except BaseException:
+        return time.time
+
+
+monotonic = return_monotonic_clock()
+
+
+def activate_timings(timings):
+    """ Record timings made by the calling thread (see record_timing) in given timings. """
+    THREAD.timings = timings
+
+
+def deactivate_timings():
+    """ Stop recording timings made by the calling thread. """
+    THREAD.timings = None
+
+
+def record_timing(category, name, seconds):
+    """ Record a timing in the timings active for the calling thread (if any).
+    INPUT
+        category: the category of the timing (e.g., STEP, HTTP, QUERY).
+        name: what was timed (e.g., the step name, request path or SQL statement).
+        seconds: the wall time taken.
+    """
+
+    timings = getattr(THREAD, 'timings', None)
+    if timings is not None:
+        timings.record(category, name, seconds)
+
+
+class timed():
+    """ Context manager recording the wall time of its block (see record_timing). """
+
+    def __init__(self, category, name):
+        self.category = category
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = monotonic()
+        return self
+
+    def __exit__(self, *exc_info):
+        record_timing(self.category, self.name, monotonic() - self.t0)
+
+####################################################################################################
+# Timings ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Timings():
+    """ Wall times and call counts of what was timed (by category and name), e.g., for the
+    procedure steps, HTTP requests and database queries of a testcase.
+    """
+
+    def __init__(self, name):
+        """
+        INPUT
+            name: the name of what is being timed (e.g., the testcase).
+        """
+
+        self.name = name
+        self.lock = Lock()
+        self.entries = OrderedDict()
+
+    def record(self, category, name, seconds):
+        """ Record a timing.
+        """
+
+        with self.lock:
+            entry = self.entries.get((category, name))
+            if entry is None:
+                entry = self.entries[(category, name)] = {'calls': 0, 'time': 0.0, 'max time': 0.0}
+            entry['calls'] += 1
+            entry['time'] += seconds
+            entry['max time'] = max(entry['max time'], seconds)
+
+    def return_totals(self):
+        """ Return the total calls and time of each category.
+        OUTPUT
+            a dict pairing each category with a dict of its 'calls' and 'time'.
+        """
+
+        totals = OrderedDict()
+        with self.lock:
+            for (category, name), entry in self.entries.items():
+                total = totals.setdefault(category, {'calls': 0, 'time': 0.0})
+                total['calls'] += entry['calls']
+                total['time'] += entry['time']
+        return totals
+
+    def return_report(self):
+        """ Return a (JSON serializable) report of the timings.
+        OUTPUT
+            name: the name of what was timed.
+            totals: the total calls and time of each category.
+            timings: a dict pairing each category with its timings (name, calls, time, max time),
+                slowest first.
+        """
+
+        report = {'name': self.name, 'totals': self.return_totals(), 'timings': OrderedDict()}
+        with self.lock:
+            entries = sorted(self.entries.items(), key=lambda item: -item[1]['time'])
+        for (category, name), entry in entries:
+            report['timings'].setdefault(category, []).append({
+                'name':         name,
+                'calls':        entry['calls'],
+                'time':         entry['time'],
+                'max time':     entry['max time'],
+            })
+        return report
@@ -0,0 +1,500 @@
+###################################################################################################
+#
+# Copyright (c) by Jonathan Slattery for Apollo Video Technology
+#
+####################################################################################################
+
+
+
+####################################################################################################
+# Import Modules ###################################################################################
+####################################################################################################
+####################################################################################################
+
+import socket
+import select
+import errno
+from struct import Struct
+from collections import deque
+from time import sleep, time
+
+####################################################################################################
+# Globals ##########################################################################################
+####################################################################################################
+####################################################################################################
+
+# A framed message is the transport version (1 byte) and its length (4 bytes, network order)
+# followed by its data, so a message arrives whole however TCP splits or merges it. Peers of
+# another version (e.g., Hekate clients predating framing, which sent raw hex commands) are
+# refused rather than misread; update both ends together.
+TRANSPORT_VERSION = 1
+FRAME_HEADER = Struct('!BI')
+MAX_FRAME_SIZE = 1024 * 1024 * 1024
+RECEIVE_SIZE = 65536            # bytes read per recv call
+MAX_RECEIVE_SIZE = 1024 * 1024  # bytes read per recv call (while receiving a large frame)
+
+LISTEN_BACKLOG = 128            # connections queued on a listener before they are accepted
+KEEPALIVE_IDLE = 60             # seconds idle before keep-alive probes are sent
+KEEPALIVE_INTERVAL = 10         # seconds between keep-alive probes
+WRITE_BUFFER_LIMIT = 4 * 1024 * 1024    # bytes queued (async) before a transport is congested
+JOIN_LIMIT = 65536              # bytes of small queued messages joined into one send (async)
+
+# poller events
+READ = 1
+WRITE = 2
+
+# errors meaning a non-blocking call could not complete yet
+RETRY_ERRORS = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+
+
+class TransportError(Exception):
+    """ A connection failed (or sent an invalid frame). """
+    pass
+
+
+def return_socket_name(sock):
+    """ Return a printable name for a socket (its remote address, else its local address). """
+
+    try:
+        return str(sock.getpeername())
+    except BaseException:
+        try:
+            return str(sock.getsockname())
+        except BaseException:
+            return str(sock)
+
+
+def set_keepalive(sock, idle=KEEPALIVE_IDLE, interval=KEEPALIVE_INTERVAL):
+    """ Enable TCP keep-alive on a socket (so dead peers are detected on idle connections). """
+
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, 'SIO_KEEPALIVE_VALS'):
+        # windows
+        sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, idle * 1000, interval * 1000))
+    elif hasattr(socket, 'TCP_KEEPIDLE'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+
+
+def open_connection(address, timeout=None, keepalive=True):
+    """ Connect to an address.
+    INPUT
+        address: the address (ip, port) to connect to.
+        timeout: the seconds to wait for the connection (and later blocking calls; None to wait).
+        keepalive: whether to enable keep-alive on the connection or not.
+    OUTPUT
+        the connected socket.
+    """
+
+    sock = socket.create_connection(address, timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if keepalive:
+        set_keepalive(sock)
+    return sock
+
+
+def open_listener(address, backlog=LISTEN_BACKLOG, blocking=True):
+    """ Open a listener at an address.
+    INPUT
+        address: the address (ip, port) to listen at.
+        backlog: the number of connections queued before they are accepted.
+        blocking: whether the listener blocks on accept or not.
+    OUTPUT
+        the listening socket.
+    """
+
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(address)
+    listener.listen(backlog)
+    listener.setblocking(1 if blocking else 0)
+    return listener
+
+def check_frame_header(name, header):
+    """ Return the length of a framed message from its header (raising TransportError if the frame
+    is invalid, or of another transport version).
+    """
+
+    version, length = FRAME_HEADER.unpack_from(header)
+    if version != TRANSPORT_VERSION:
+        raise TransportError("Frame from %s is of transport version %d, not %d (update the peer)."
+                             % (name, version, TRANSPORT_VERSION))
+    if length > MAX_FRAME_SIZE:
+        raise TransportError("Invalid frame from %s (%d bytes)." % (name, length))
+    return length
+
+####################################################################################################
+# Transport ########################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Transport():
+    """ A connection (blocking), with buffered reads, framed messages and raw data. """
+
+    def __init__(self, sock, keepalive=False):
+        """
+        INPUT
+            sock: a connected socket.
+            keepalive: whether to enable keep-alive on the connection or not.
+        """
+
+        self.sock = sock
+        self.name = return_socket_name(sock)
+        self.buffer = ''
+        self.open = True
+        if keepalive:
+            set_keepalive(sock)
+
+    def fill(self, size=RECEIVE_SIZE):
+        """ Read what the socket has into the buffer (return False if the peer disconnected). """
+
+        data = self.sock.recv(size)
+        if not data:
+            self.open = False
+            return False
+        self.buffer += data
+        return True
+
+    def receive(self, size=RECEIVE_SIZE):
+        """ Return up to size bytes received (buffered first; '' once the peer disconnects). """
+
+        if not self.buffer and self.open:
+            self.fill(size)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def receive_exactly(self, size):
+        """ Return exactly size bytes (raising TransportError if the peer disconnects first). """
+
+        if len(self.buffer) < size:
+            # (collect large payloads in chunks rather than growing the buffer)
+            chunks = [self.buffer]
+            received = len(self.buffer)
+            while received < size:
+                data = self.sock.recv(min(size - received, MAX_RECEIVE_SIZE)) if self.open else ''
+                if not data:
+                    self.open = False
+                    self.buffer = ''.join(chunks)
+                    raise TransportError("%s disconnected after %d of %d bytes."
+                                         % (self.name, received, size))
+                chunks.append(data)
+                received += len(data)
+            self.buffer = ''.join(chunks)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def receive_message(self):
+        """ Return the next framed message (None once the peer disconnects between messages). """
+
+        if not self.buffer and (not self.open or not self.fill()):
+            return None
+        length = check_frame_header(self.name, self.receive_exactly(FRAME_HEADER.size))
+        return self.receive_exactly(length)
+
+    def receive_messages(self):
+        """ Return a generator of framed messages, until the peer disconnects. """
+
+        while True:
+            message = self.receive_message()
+            if message is None:
+                return
+            yield message
+
+    def send(self, data):
+        """ Send raw data (all of it). """
+
+        self.sock.sendall(data)
+
+    def send_message(self, data):
+        """ Send a framed message. """
+
+        if len(data) <= RECEIVE_SIZE:
+            self.sock.sendall(FRAME_HEADER.pack(TRANSPORT_VERSION, len(data)) + data)
+        else:
+            # (avoid copying large payloads)
+            self.sock.sendall(FRAME_HEADER.pack(TRANSPORT_VERSION, len(data)))
+            self.sock.sendall(data)
+
+    def close(self):
+        self.open = False
+        try:
+            self.sock.close()
+        except BaseException:
+            pass
+
+
+class AsyncTransport(Transport):
+    """ A non-blocking connection, driven by a readiness loop (see Poller): reads are handled as
+    the socket becomes readable, and writes are queued and sent as it becomes writable (small
+    queued messages are joined into one send). A transport whose queue is over its limit is
+    congested; senders should hold off (backpressure) until it drains.
+    """
+
+    def __init__(self, sock, keepalive=False, buffer_limit=WRITE_BUFFER_LIMIT):
+        """
+        INPUT
+            sock: a connected socket.
+            keepalive: whether to enable keep-alive on the connection or not.
+            buffer limit: the bytes queued before the transport is congested (None if never).
+        """
+
+        Transport.__init__(self, sock, keepalive)
+        self.sock.setblocking(0)
+        self.fd = sock.fileno()
+        self.buffer_limit = buffer_limit
+
+        # write queue (data, time queued)
+        self.outbox = deque()
+        self.queued = 0
+
+        # metrics
+        self.metrics = {
+            'bytes sent':       0,
+            'max queued':       0,
+            'max lag':          0.0,
+        }
+
+    def read(self, size=RECEIVE_SIZE):
+        """ Return the raw data the socket has (when readable), bypassing the buffer.
+        OUTPUT
+            the data ('' once the peer disconnects or the connection fails; None if there is none
+                yet).
+        """
+
+        try:
+            data = self.sock.recv(size)
+        except socket.error, e:
+            if e.args[0] in RETRY_ERRORS:
+                return None
+            data = ''
+        if not data:
+            self.open = False
+        return data
+
+    def handle_read(self):
+        """ Read what the socket has (when readable).
+        OUTPUT
+            the framed messages completed (see read_messages; data stays buffered for receive).
+        """
+
+        try:
+            self.fill()
+        except socket.error, e:
+            if e.args[0] not in RETRY_ERRORS:
+                self.open = False
+        return self.read_messages()
+
+    def read_messages(self):
+        """ Return the whole framed messages in the buffer (removing them). """
+
+        messages = []
+        while len(self.buffer) >= FRAME_HEADER.size:
+            length = check_frame_header(self.name, self.buffer)
+            end = FRAME_HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            messages.append(self.buffer[FRAME_HEADER.size:end])
+            self.buffer = self.buffer[end:]
+        return messages
+
+    def receive(self, size=RECEIVE_SIZE):
+        """ Return up to size bytes of buffered raw data (see handle_read). """
+
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def queue(self, data):
+        """ Queue raw data (sent by handle_write). """
+
+        self.outbox.append((data, time()))
+        self.queued += len(data)
+        self.metrics['max queued'] = max(self.metrics['max queued'], self.queued)
+
+    def send(self, data):
+        """ Queue raw data, sending what can be sent now (return False if congested). """
+
+        self.queue(data)
+        self.handle_write()
+        return not self.is_congested()
+
+    def send_message(self, data):
+        """ Queue a framed message (return False if congested). """
+
+        self.queue(FRAME_HEADER.pack(TRANSPORT_VERSION, len(data)))
+        return self.send(data)
+
+    def handle_write(self):
+        """ Send as much of the queue as the socket accepts (when writable).
+        OUTPUT
+            whether data is still queued or not (i.e., whether to wait for WRITE).
+        """
+
+        outbox = self.outbox
+        if outbox:
+            self.metrics['max lag'] = max(self.metrics['max lag'], self.return_lag())
+        while outbox and self.open:
+            data, queued = outbox.popleft()
+
+            # join small messages into one send (large messages are sent as they are)
+            if outbox and isinstance(data, str) and isinstance(outbox[0][0], str) \
+                    and len(data) + len(outbox[0][0]) <= JOIN_LIMIT:
+                parts = [data]
+                size = len(data)
+                while outbox and isinstance(outbox[0][0], str) \
+                        and size + len(outbox[0][0]) <= JOIN_LIMIT:
+                    size += len(outbox[0][0])
+                    parts.append(outbox.popleft()[0])
+                data = ''.join(parts)
+
+            try:
+                sent = self.sock.send(data)
+            except socket.error, e:
+                if e.args[0] in RETRY_ERRORS:
+                    outbox.appendleft((data, queued))
+                    break
+                self.open = False
+                raise TransportError("Failed to send to %s: %s." % (self.name, str(e)))
+
+            # keep the unsent remainder (as a view, rather than a copy)
+            self.queued -= sent
+            self.metrics['bytes sent'] += sent
+            if sent < len(data):
+                outbox.appendleft((buffer(data, sent), queued))
+                break
+        return len(outbox) > 0
+
+    def flush(self, timeout=5):
+        """ Block (up to timeout) until the queue is sent (return whether it was or not). """
+
+        try:
+            self.sock.settimeout(timeout)
+            while self.outbox:
+                data, queued = self.outbox.popleft()
+                self.queued -= len(data)
+                self.sock.sendall(data)
+            return True
+        except BaseException:
+            return False
+        finally:
+            try:
+                self.sock.setblocking(0)
+            except BaseException:
+                pass
+
+    def return_lag(self, now=None):
+        """ Return the seconds the oldest unsent data has been queued (0 if none). """
+
+        if not self.outbox:
+            return 0.0
+        return (now or time()) - self.outbox[0][1]
+
+    def is_congested(self):
+        return self.buffer_limit is not None and self.queued > self.buffer_limit
+
+
+####################################################################################################
+# Poller ###########################################################################################
+####################################################################################################
+####################################################################################################
+
+
+class Poller():
+    """ Socket readiness polling over the best mechanism available (epoll, poll, else select).
+    NOTE: select (e.g., on Windows) is limited to FD_SETSIZE sockets per loop; run more loops to
+        serve more sockets.
+    """
+
+    def __init__(self):
+        self.events = {}
+        if hasattr(select, 'epoll'):
+            self.mechanism = 'epoll'
+            self.poller = select.epoll()
+            self.masks = {READ: select.EPOLLIN, WRITE: select.EPOLLOUT}
+            self.error_mask = select.EPOLLERR | select.EPOLLHUP
+        elif hasattr(select, 'poll'):
+            self.mechanism = 'poll'
+            self.poller = select.poll()
+            self.masks = {READ: select.POLLIN, WRITE: select.POLLOUT}
+            self.error_mask = select.POLLERR | select.POLLHUP | select.POLLNVAL
+        else:
+            self.mechanism = 'select'
+            self.poller = None
+
+    def return_mask(self, events):
+        mask = 0
+        for event, event_mask in self.masks.items():
+            if events & event:
+                mask |= event_mask
+        return mask
+
+    def register(self, fd, events):
+        self.events[fd] = events
+        if self.poller is not None:
+            self.poller.register(fd, self.return_mask(events))
+
+    def modify(self, fd, events):
+        if self.events.get(fd) == events:
+            return
+        self.events[fd] = events
+        if self.poller is not None:
+            self.poller.modify(fd, self.return_mask(events))
+
+    def unregister(self, fd):
+        if self.events.pop(fd, None) is not None and self.poller is not None:
+            try:
+                self.poller.unregister(fd)
+            except (IOError, OSError, ValueError, KeyError):
+                pass
+
+    def poll(self, timeout):
+        """ Wait for socket events.
+        INPUT
+            timeout: the maximum seconds to wait.
+        OUTPUT
+            a list of (fd, events) ready (an error or hang-up is reported as READ, so that the
+                following recv reports it).
+        """
+
+        if self.mechanism == 'select':
+            if not self.events:
+                sleep(timeout)
+                return []
+            readers = [fd for fd, events in self.events.items() if events & READ]
+            writers = [fd for fd, events in self.events.items() if events & WRITE]
+            try:
+                rlist, wlist, xlist = select.select(readers, writers, readers, timeout)
+            except select.error, e:
+                if e.args[0] == errno.EINTR:
+                    return []
+                raise
+            ready = {}
+            for fd in rlist + xlist:
+                ready[fd] = READ
+            for fd in wlist:
+                ready[fd] = ready.get(fd, 0) | WRITE
+            return ready.items()
+
+        try:
+            if self.mechanism == 'epoll':
+                polled = self.poller.poll(timeout)
+            else:
+                polled = self.poller.poll(int(timeout * 1000))
+        except (IOError, select.error), e:
+            if e.args[0] == errno.EINTR:
+                return []
+            raise
+        ready = []
+        for fd, mask in polled:
+            events = 0
+            if mask & (self.masks[READ] | self.error_mask):
+                events |= READ
+            if mask & self.masks[WRITE]:
+                events |= WRITE
+            ready.append((fd, events))
+        return ready
+
+    def close(self):
+        if self.poller is not None and self.mechanism == 'epoll':
+            self.poller.close()
+        self.events = {}
@@ -24,8 +24,9 @@ import subprocess
 from os import getcwdu
 from utility import move_up_windows_path
 from mapping import HESTIA, TARTAROS_DB_PATH, TARTAROS_WEB_DB_PATH
-import socket
 from binascii import hexlify, unhexlify
+from transport import Transport, open_connection
+from Hekate.sync import DatabaseSender
 
 ####################################################################################################
 # Globals ##########################################################################################
@@ -1907,6 +1908,7 @@ class TestManager():
             btn_run_remote_test_addr = 'btn_run_remote_test'
             inp_test_run_type_addr = 'inp_test_run_type'
             btn_update_remote_db_addr = 'btn_update_remote_db'
+            inp_full_sync_addr = 'inp_full_sync'
             div_test_runner_addr = 'div_test_runner'
 
             # build the onclick scripts
@@ -1938,7 +1940,8 @@ class TestManager():
             db_script = "ajax('%(function)s', %(values)s, '%(target)s');" \
                         "jQuery(%(remove)s).remove();" \
                         % {'function': 'update_remote_database',
-                           'values': "['%s']" % inp_remote_server_addr,
+                           'values': "['%s', '%s']" % (inp_remote_server_addr,
+                                                       inp_full_sync_addr),
                            'target': '',
                            'remove': ''}
 
@@ -1981,6 +1984,9 @@ class TestManager():
                                          _id=btn_update_remote_db_addr,
                                          _name=btn_update_remote_db_addr,
                                          _onclick=db_script)
+            lbl_full_sync = LABEL("FULL SYNC: ")
+            inp_full_sync = INPUT(_type='checkbox',
+                                  _id=inp_full_sync_addr, _name=inp_full_sync_addr)
 
             div_test_runner = DIV(lbl_plan_id, inp_plan_id,
                                   lbl_int_dvr_id, inp_int_dvr_id,
@@ -1990,6 +1996,7 @@ class TestManager():
                                   lbl_test_run_type, inp_test_run_type,
                                   btn_run_remote_test,
                                   btn_update_remote_db,
+                                  lbl_full_sync, inp_full_sync,
                                   _id=div_test_runner_addr)
 
             # compile results
@@ -2657,25 +2664,26 @@ def update_remote_database():
 
         log.trace("Connecting to remote client at %s ..." % str(client_addr))
 
-        server = socket.socket()
-        server.connect(client_addr)
+        server = Transport(open_connection(client_addr))
 
         log.trace("... connected.")
 
-        # send commands to client
-        f = open(TARTAROS_WEB_DB_PATH, 'rb')
-        l = f.read(1024)
-        while l:
-            server.send(l)
-            l = f.read(1024)
-
-        # close file
-        f.close()
+        # sync database to client (only the pages it does not have, unless a full sync is asked)
+        incremental = str(request.vars.inp_full_sync).lower() not in ('true', 'on', '1')
+        synced = DatabaseSender(log, TARTAROS_WEB_DB_PATH).send(server, incremental)
 
         # close connection to client
         server.close()
+
+        # report the result
+        if synced['successful']:
+            response.flash = 'Updated remote database (%d of %d pages sent).' \
+                             % (synced['pages sent'], synced['pages'])
+        else:
+            response.flash = 'Failed to update remote database.'
     except BaseException, e:
         handle_exception(log, e, 'updating remote database')
+        response.flash = 'Failed to update remote database.'
 
 
 def run_remote_test():
@@ -2787,15 +2795,14 @@ def run_remote_test():
 
         log.trace("Connecting to remote client at %s ..." % str(client_addr))
 
-        server = socket.socket()
-        server.connect(client_addr)
+        server = Transport(open_connection(client_addr))
 
         log.trace("... connected.")
 
-        # send commands to client
+        # send commands to client (a message each)
         for command in commands:
             log.trace("Sending command:\t'%s'." % unhexlify(command))
-            server.send(command)
+            server.send_message(command)
 
         # close connection to client
         server.close()
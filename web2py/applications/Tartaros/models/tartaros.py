@@ -50,6 +50,7 @@ db.define_table('test_cases',
                 Field('type_id', type='integer', required=True),
                 Field('results_id', type='integer'),
                 Field('parent_id', type='integer'),
+                Field('requirements', type='string', required=False),
 )
 
 # table: user types